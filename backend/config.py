@@ -26,6 +26,22 @@ class Config:
     DB_NAME: str = os.getenv('DB_NAME', 'accountdb')
     DB_USER: str = os.getenv('PG_USER', 'postgres')
     DB_PASS: str = os.getenv('PG_PASSWORD')
+    RLS_CONTEXT_MODE: str = os.getenv('RLS_CONTEXT_MODE', 'session')  # 'session' or 'transaction'
+    RLS_CONTEXT_CACHE: bool = os.getenv('RLS_CONTEXT_CACHE', 'true').lower() == 'true'
+    QUERY_CACHE_TTL: int = int(os.getenv('QUERY_CACHE_TTL', '60'))  # seconds
+    QUERY_CACHE_NOTIFY: bool = os.getenv('QUERY_CACHE_NOTIFY', 'false').lower() == 'true'
+    QUERY_CACHE_NOTIFY_CHANNEL: str = os.getenv('QUERY_CACHE_NOTIFY_CHANNEL', 'query_cache_invalidation')
+    API_KEY_CACHE_TTL: int = int(os.getenv('API_KEY_CACHE_TTL', '60'))  # seconds
+    API_KEY_NEGATIVE_CACHE_TTL: int = int(os.getenv('API_KEY_NEGATIVE_CACHE_TTL', '10'))  # seconds
+    API_KEY_LAST_USED_FLUSH_INTERVAL: int = int(os.getenv('API_KEY_LAST_USED_FLUSH_INTERVAL', '30'))  # seconds
+    USER_CACHE_TTL: int = int(os.getenv('USER_CACHE_TTL', '30'))  # seconds
+    METRICS_REGISTRY_TTL: int = int(os.getenv('METRICS_REGISTRY_TTL', '300'))  # seconds
+    METRICS_REGISTRY_MISS_INTERVAL: int = int(os.getenv('METRICS_REGISTRY_MISS_INTERVAL', '10'))  # seconds
+    PARTITION_PREMAKE_DAYS: int = int(os.getenv('PARTITION_PREMAKE_DAYS', '7'))  # days
+    PARTITION_MAINTENANCE_INTERVAL: int = int(os.getenv('PARTITION_MAINTENANCE_INTERVAL', '3600'))  # seconds
+    ACCOUNT_LEASE_SECONDS: int = int(os.getenv('ACCOUNT_LEASE_SECONDS', '300'))  # seconds
+    ACCOUNT_LEASE_MAX_SECONDS: int = int(os.getenv('ACCOUNT_LEASE_MAX_SECONDS', '86400'))  # seconds
+    PAGINATION_EXACT_COUNT_THRESHOLD: int = int(os.getenv('PAGINATION_EXACT_COUNT_THRESHOLD', '10000'))  # rows
 
     # JWT configuration
     JWT_SECRET: str = os.getenv('JWT_SECRET_KEY')
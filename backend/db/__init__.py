@@ -11,9 +11,15 @@ from .connection import (
     get_pool_stats, close_all_connections, recreate_connection_pool
 )
 
+from .async_connection import (
+    get_async_connection, return_async_connection, get_async_db_connection,
+    open_async_connection_pool, close_async_connection_pool,
+    get_async_pool_stats, check_async_database_health
+)
+
 from .user_connection import (
     get_user_db_connection, get_user_db_connection_with_retries,
-    get_user_connection_info
+    get_async_user_db_connection, get_user_connection_info
 )
 
 from .wait_for_database import (
@@ -58,9 +64,14 @@ __all__ = [
     'get_connection_with_retries', 'get_db_connection_with_retries',
     'get_pool_stats', 'close_all_connections',
 
+    # Async connection management
+    'get_async_connection', 'return_async_connection', 'get_async_db_connection',
+    'open_async_connection_pool', 'close_async_connection_pool',
+    'get_async_pool_stats', 'check_async_database_health',
+
     # User connection management
     'get_user_db_connection', 'get_user_db_connection_with_retries',
-    'get_user_connection_info',
+    'get_async_user_db_connection', 'get_user_connection_info',
 
     # Database utilities
     'get_cursor', 'transaction', 'execute_query', 'execute_query_with_transaction',
@@ -6,17 +6,23 @@ It ensures that all database operations respect RLS policies and provides a cons
 interface for database operations.
 
 It also includes query analysis and caching for improved performance and monitoring.
+
+Every execute_* and CRUD helper has an *_async counterpart that runs on the psycopg 3
+async pool, so request handlers can await the database instead of blocking the event loop.
 """
 
 import logging
 import time
 from typing import Optional, Dict, Any, List, Tuple, Union
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 
 from .connection import get_db_connection
-from .user_connection import get_user_db_connection
+from .user_connection import get_user_db_connection, get_async_user_db_connection
+from .async_connection import get_async_db_connection
 from .query_analyzer import query_analyzer
-from .query_cache import cached_query, invalidate_cache_by_table
+from .query_cache import cached_query, get_invalidated_tables, invalidate_cache_by_tables, is_read_only_query
+from .cache_invalidation import publish_cache_invalidation, publish_cache_invalidation_async
+from .user_cache import invalidate_user_cache_by_tables
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -129,17 +135,11 @@ class DatabaseAccess:
                 with query_analyzer(query, params):
                     cursor.execute(query, params or ())
 
-                # Invalidate cache for the affected table
-                # This is a simple implementation that invalidates the entire cache
-                # For a more sophisticated implementation, you would parse the query
-                # and determine which tables are affected
-                if query.upper().startswith(("INSERT", "UPDATE", "DELETE")):
-                    from .query_analyzer import get_tables_from_query
-                    tables = get_tables_from_query(query)
-                    for table in tables:
-                        invalidate_cache_by_table(table)
+                # Invalidate cache for the affected table once committed
+                tables = self._publish_cache_invalidation(query, cursor)
 
                 conn.commit()
+                self._invalidate_cache_for_tables(tables)
                 return cursor.rowcount
             except Exception as e:
                 logger.error(f"Error executing command: {e}")
@@ -189,24 +189,20 @@ class DatabaseAccess:
             cursor = conn.cursor()
             try:
                 cursor.execute(query, params or ())
+                tables = self._publish_cache_invalidation(query, cursor)
 
                 if returning:
-                    if not cursor.description:
-                        conn.commit()
-                        return None
-
-                    columns = [desc[0] for desc in cursor.description]
-                    result = cursor.fetchone()
-
-                    if result:
-                        conn.commit()
-                        return dict(zip(columns, result))
-                    else:
-                        conn.commit()
-                        return None
+                    result = None
+                    if cursor.description:
+                        columns = [desc[0] for desc in cursor.description]
+                        row = cursor.fetchone()
+                        result = dict(zip(columns, row)) if row else None
                 else:
-                    conn.commit()
-                    return {"rowcount": cursor.rowcount}
+                    result = {"rowcount": cursor.rowcount}
+
+                conn.commit()
+                self._invalidate_cache_for_tables(tables)
+                return result
             except Exception as e:
                 logger.error(f"Error executing insert: {e}")
                 logger.debug(f"Query: {query}")
@@ -237,24 +233,20 @@ class DatabaseAccess:
             cursor = conn.cursor()
             try:
                 cursor.execute(query, params or ())
+                tables = self._publish_cache_invalidation(query, cursor)
 
                 if returning:
-                    if not cursor.description:
-                        conn.commit()
-                        return None
-
-                    columns = [desc[0] for desc in cursor.description]
-                    result = cursor.fetchone()
-
-                    if result:
-                        conn.commit()
-                        return dict(zip(columns, result))
-                    else:
-                        conn.commit()
-                        return None
+                    result = None
+                    if cursor.description:
+                        columns = [desc[0] for desc in cursor.description]
+                        row = cursor.fetchone()
+                        result = dict(zip(columns, row)) if row else None
                 else:
-                    conn.commit()
-                    return cursor.rowcount
+                    result = cursor.rowcount
+
+                conn.commit()
+                self._invalidate_cache_for_tables(tables)
+                return result
             except Exception as e:
                 logger.error(f"Error executing update: {e}")
                 logger.debug(f"Query: {query}")
@@ -299,7 +291,13 @@ class DatabaseAccess:
                 for query, params in queries:
                     cursor.execute(query, params or ())
 
+                # Invalidate cache for the tables written by the transaction once committed
+                tables = self._get_transaction_tables(queries)
+                if tables:
+                    publish_cache_invalidation(cursor, tables)
+
                 conn.commit()
+                self._invalidate_cache_for_tables(tables)
                 return True
             except Exception as e:
                 logger.error(f"Error executing transaction: {e}")
@@ -321,10 +319,7 @@ class DatabaseAccess:
         Returns:
             int: The count of rows.
         """
-        query = f"SELECT COUNT(*) FROM {table}"
-        if condition:
-            query += f" WHERE {condition}"
-
+        query = self._build_count_query(table, condition)
         result = self.execute_query_single(query, params, with_rls)
         return result["count"] if result else 0
 
@@ -363,16 +358,7 @@ class DatabaseAccess:
         Returns:
             List[Dict[str, Any]]: A list of dictionaries with the rows.
         """
-        query = f"SELECT {columns} FROM {table}"
-        if condition:
-            query += f" WHERE {condition}"
-        if order_by:
-            query += f" ORDER BY {order_by}"
-        if limit > 0:
-            query += f" LIMIT {limit}"
-        if offset > 0:
-            query += f" OFFSET {offset}"
-
+        query = self._build_select_query(table, condition, columns, order_by, limit, offset)
         return self.execute_query(query, params, with_rls)
 
     def insert(self, table: str, data: Dict[str, Any], returning: bool = True, with_rls: bool = True) -> Optional[Dict[str, Any]]:
@@ -388,15 +374,8 @@ class DatabaseAccess:
         Returns:
             Optional[Dict[str, Any]]: A dictionary with the inserted row or None if not returning.
         """
-        columns = list(data.keys())
-        values = list(data.values())
-        placeholders = ["%s"] * len(columns)
-
-        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(placeholders)})"
-        if returning:
-            query += " RETURNING *"
-
-        return self.execute_insert(query, tuple(values), with_rls, returning)
+        query, values = self._build_insert_query(table, data, returning)
+        return self.execute_insert(query, values, with_rls, returning)
 
     def update(self, table: str, data: Dict[str, Any], condition: str, params: Tuple = None,
                returning: bool = False, with_rls: bool = True) -> Union[int, Optional[Dict[str, Any]]]:
@@ -414,19 +393,455 @@ class DatabaseAccess:
         Returns:
             Union[int, Optional[Dict[str, Any]]]: The number of affected rows or a dictionary with the updated row.
         """
+        query, all_params = self._build_update_query(table, data, condition, params, returning)
+        return self.execute_update(query, all_params, with_rls, returning)
+
+    def delete(self, table: str, condition: str, params: Tuple = None, with_rls: bool = True) -> int:
+        """
+        Delete rows from a table.
+
+        Args:
+            table (str): The table name.
+            condition (str): The WHERE condition.
+            params (Tuple, optional): The parameters for the condition. Defaults to None.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            int: The number of affected rows.
+        """
+        query = f"DELETE FROM {table} WHERE {condition}"
+        return self.execute_delete(query, params, with_rls)
+
+    # Query builders shared by the sync and async code paths
+
+    @staticmethod
+    def _build_count_query(table: str, condition: str = "") -> str:
+        """Build a SELECT COUNT(*) query for a table and optional WHERE condition."""
+        query = f"SELECT COUNT(*) FROM {table}"
+        if condition:
+            query += f" WHERE {condition}"
+        return query
+
+    @staticmethod
+    def _build_select_query(table: str, condition: str = "", columns: str = "*",
+                            order_by: str = "", limit: int = 0, offset: int = 0) -> str:
+        """Build a SELECT query with optional WHERE, ORDER BY, LIMIT and OFFSET clauses."""
+        query = f"SELECT {columns} FROM {table}"
+        if condition:
+            query += f" WHERE {condition}"
+        if order_by:
+            query += f" ORDER BY {order_by}"
+        if limit > 0:
+            query += f" LIMIT {limit}"
+        if offset > 0:
+            query += f" OFFSET {offset}"
+        return query
+
+    @staticmethod
+    def _build_insert_query(table: str, data: Dict[str, Any], returning: bool = True) -> Tuple[str, Tuple]:
+        """Build an INSERT query and its parameters from a column/value mapping."""
+        columns = list(data.keys())
+        placeholders = ["%s"] * len(columns)
+
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(placeholders)})"
+        if returning:
+            query += " RETURNING *"
+
+        return query, tuple(data.values())
+
+    @staticmethod
+    def _build_update_query(table: str, data: Dict[str, Any], condition: str, params: Tuple = None,
+                            returning: bool = False) -> Tuple[str, Tuple]:
+        """Build an UPDATE query and its parameters from a column/value mapping."""
         set_clause = ", ".join([f"{column} = %s" for column in data.keys()])
-        values = list(data.values())
 
         query = f"UPDATE {table} SET {set_clause} WHERE {condition}"
         if returning:
             query += " RETURNING *"
 
-        all_params = tuple(values) + (params or ())
-        return self.execute_update(query, all_params, with_rls, returning)
+        return query, tuple(data.values()) + tuple(params or ())
 
-    def delete(self, table: str, condition: str, params: Tuple = None, with_rls: bool = True) -> int:
+    @staticmethod
+    def _publish_cache_invalidation(query: str, cursor) -> List[str]:
         """
-        Delete rows from a table.
+        Publish the invalidation of the tables written by a query to the other processes.
+
+        The notification is sent on the transaction of the write, so it is only delivered
+        once the write commits. The local caches are left alone: the returned tables are
+        passed to _invalidate_cache_for_tables() after the commit, so a read in this process
+        before the commit cannot cache the rows being replaced again.
+
+        Args:
+            query (str): The SQL command being executed.
+            cursor (psycopg2.extensions.cursor): The cursor executing the command.
+
+        Returns:
+            List[str]: The written tables, or [ALL_TABLES] if they cannot be determined.
+        """
+        tables = get_invalidated_tables(query)
+        publish_cache_invalidation(cursor, tables)
+        return tables
+
+    @staticmethod
+    async def _publish_cache_invalidation_async(query: str, cursor) -> List[str]:
+        """
+        Publish the invalidation of the tables written by a query to the other processes asynchronously.
+
+        Args:
+            query (str): The SQL command being executed.
+            cursor (psycopg.AsyncCursor): The cursor executing the command.
+
+        Returns:
+            List[str]: The written tables, or [ALL_TABLES] if they cannot be determined.
+        """
+        tables = get_invalidated_tables(query)
+        await publish_cache_invalidation_async(cursor, tables)
+        return tables
+
+    @staticmethod
+    def _get_transaction_tables(queries: List[Tuple[str, Tuple]]) -> List[str]:
+        """
+        Get the tables written by the statements of a transaction.
+
+        Args:
+            queries (List[Tuple[str, Tuple]]): A list of tuples with queries and their parameters.
+
+        Returns:
+            List[str]: The written tables, including ALL_TABLES if a statement's cannot be determined.
+        """
+        tables = []
+        for query, _ in queries:
+            if is_read_only_query(query):
+                continue
+            tables.extend(table for table in get_invalidated_tables(query) if table not in tables)
+        return tables
+
+    @staticmethod
+    def _invalidate_cache_for_tables(tables: List[str]) -> None:
+        """
+        Invalidate cached query results for written tables, once the write has committed.
+
+        Only the entries tagged with the written tables are removed. Writes to users also
+        invalidate the authenticated user cache.
+
+        Args:
+            tables (List[str]): The tables from _publish_cache_invalidation().
+        """
+        if not tables:
+            return
+
+        invalidate_cache_by_tables(tables)
+        invalidate_user_cache_by_tables(tables)
+
+    # Async API
+
+    @asynccontextmanager
+    async def get_async_connection(self, with_rls: bool = True):
+        """
+        Get an async database connection with or without RLS context.
+
+        Args:
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Yields:
+            An async (psycopg 3) database connection with or without RLS context.
+        """
+        if with_rls and self.user_id and self.user_role:
+            async with get_async_user_db_connection(user_id=self.user_id, user_role=self.user_role) as conn:
+                yield conn
+        else:
+            async with get_async_db_connection() as conn:
+                yield conn
+
+    @cached_query()
+    async def execute_query_async(self, query: str, params: Tuple = None, with_rls: bool = True) -> List[Dict[str, Any]]:
+        """
+        Execute a query asynchronously and return the results as a list of dictionaries.
+
+        Args:
+            query (str): The SQL query to execute.
+            params (Tuple, optional): The parameters for the query. Defaults to None.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            List[Dict[str, Any]]: A list of dictionaries with the query results.
+        """
+        async with self.get_async_connection(with_rls) as conn:
+            if not conn:
+                logger.error("No database connection available")
+                return []
+
+            try:
+                async with conn.cursor() as cursor:
+                    with query_analyzer(query, params):
+                        await cursor.execute(query, params or ())
+
+                    if not cursor.description:
+                        return []
+
+                    columns = [desc[0] for desc in cursor.description]
+                    return [dict(zip(columns, row)) for row in await cursor.fetchall()]
+            except Exception as e:
+                logger.error(f"Error executing query: {e}")
+                logger.debug(f"Query: {query}")
+                logger.debug(f"Params: {params}")
+                await conn.rollback()
+                return []
+
+    async def execute_query_single_async(self, query: str, params: Tuple = None, with_rls: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Execute a query asynchronously and return the first result as a dictionary.
+
+        Args:
+            query (str): The SQL query to execute.
+            params (Tuple, optional): The parameters for the query. Defaults to None.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            Optional[Dict[str, Any]]: A dictionary with the first result or None if no results.
+        """
+        results = await self.execute_query_async(query, params, with_rls)
+        return results[0] if results else None
+
+    async def execute_command_async(self, query: str, params: Tuple = None, with_rls: bool = True) -> int:
+        """
+        Execute a command asynchronously and return the number of affected rows.
+
+        Args:
+            query (str): The SQL command to execute.
+            params (Tuple, optional): The parameters for the command. Defaults to None.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            int: The number of affected rows.
+        """
+        async with self.get_async_connection(with_rls) as conn:
+            if not conn:
+                logger.error("No database connection available")
+                return 0
+
+            try:
+                async with conn.cursor() as cursor:
+                    with query_analyzer(query, params):
+                        await cursor.execute(query, params or ())
+
+                    tables = await self._publish_cache_invalidation_async(query, cursor)
+
+                    await conn.commit()
+                    self._invalidate_cache_for_tables(tables)
+                    return cursor.rowcount
+            except Exception as e:
+                logger.error(f"Error executing command: {e}")
+                logger.debug(f"Query: {query}")
+                logger.debug(f"Params: {params}")
+                await conn.rollback()
+                return 0
+
+    async def _execute_write_async(self, query: str, params: Tuple, with_rls: bool, returning: bool,
+                                   operation: str) -> Union[int, Optional[Dict[str, Any]]]:
+        """
+        Execute an INSERT or UPDATE asynchronously, commit it, and return the first row or the rowcount.
+
+        Args:
+            query (str): The SQL command to execute.
+            params (Tuple): The parameters for the command.
+            with_rls (bool): Whether to use RLS context.
+            returning (bool): Whether the query has a RETURNING clause.
+            operation (str): The operation name used in error messages.
+
+        Returns:
+            Union[int, Optional[Dict[str, Any]]]: The returned row when returning is True, otherwise the rowcount.
+            None is returned on error.
+        """
+        async with self.get_async_connection(with_rls) as conn:
+            if not conn:
+                logger.error("No database connection available")
+                return None
+
+            try:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(query, params or ())
+                    tables = await self._publish_cache_invalidation_async(query, cursor)
+
+                    result = None
+                    if returning and cursor.description:
+                        columns = [desc[0] for desc in cursor.description]
+                        row = await cursor.fetchone()
+                        result = dict(zip(columns, row)) if row else None
+                    rowcount = cursor.rowcount
+
+                await conn.commit()
+                self._invalidate_cache_for_tables(tables)
+                return result if returning else rowcount
+            except Exception as e:
+                logger.error(f"Error executing {operation}: {e}")
+                logger.debug(f"Query: {query}")
+                logger.debug(f"Params: {params}")
+                await conn.rollback()
+                return None
+
+    async def execute_insert_async(self, query: str, params: Tuple = None, with_rls: bool = True, returning: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Execute an INSERT command asynchronously and return the inserted row if RETURNING clause is used.
+
+        Args:
+            query (str): The SQL INSERT command to execute.
+            params (Tuple, optional): The parameters for the command. Defaults to None.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+            returning (bool, optional): Whether the query has a RETURNING clause. Defaults to True.
+
+        Returns:
+            Optional[Dict[str, Any]]: A dictionary with the inserted row or None if no RETURNING clause.
+        """
+        result = await self._execute_write_async(query, params, with_rls, returning, "insert")
+        if returning or result is None:
+            return result
+        return {"rowcount": result}
+
+    async def execute_update_async(self, query: str, params: Tuple = None, with_rls: bool = True, returning: bool = False) -> Union[int, Optional[Dict[str, Any]]]:
+        """
+        Execute an UPDATE command asynchronously and return the number of affected rows or the updated row.
+
+        Args:
+            query (str): The SQL UPDATE command to execute.
+            params (Tuple, optional): The parameters for the command. Defaults to None.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+            returning (bool, optional): Whether the query has a RETURNING clause. Defaults to False.
+
+        Returns:
+            Union[int, Optional[Dict[str, Any]]]: The number of affected rows or a dictionary with the updated row.
+        """
+        result = await self._execute_write_async(query, params, with_rls, returning, "update")
+        if result is None and not returning:
+            return 0
+        return result
+
+    async def execute_transaction_async(self, queries: List[Tuple[str, Tuple]], with_rls: bool = True) -> bool:
+        """
+        Execute multiple queries asynchronously in a transaction.
+
+        Args:
+            queries (List[Tuple[str, Tuple]]): A list of tuples with queries and their parameters.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            bool: True if the transaction was successful, False otherwise.
+        """
+        async with self.get_async_connection(with_rls) as conn:
+            if not conn:
+                logger.error("No database connection available")
+                return False
+
+            try:
+                async with conn.cursor() as cursor:
+                    for query, params in queries:
+                        await cursor.execute(query, params or ())
+
+                    tables = self._get_transaction_tables(queries)
+                    if tables:
+                        await publish_cache_invalidation_async(cursor, tables)
+
+                await conn.commit()
+                self._invalidate_cache_for_tables(tables)
+                return True
+            except Exception as e:
+                logger.error(f"Error executing transaction: {e}")
+                await conn.rollback()
+                return False
+
+    async def get_count_async(self, table: str, condition: str = "", params: Tuple = None, with_rls: bool = True) -> int:
+        """
+        Get the count of rows in a table asynchronously.
+
+        Args:
+            table (str): The table name.
+            condition (str, optional): The WHERE condition. Defaults to "".
+            params (Tuple, optional): The parameters for the condition. Defaults to None.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            int: The count of rows.
+        """
+        query = self._build_count_query(table, condition)
+        result = await self.execute_query_single_async(query, params, with_rls)
+        return result["count"] if result else 0
+
+    async def get_by_id_async(self, table: str, id_column: str, id_value: Any, columns: str = "*", with_rls: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Get a row by its ID asynchronously.
+
+        Args:
+            table (str): The table name.
+            id_column (str): The ID column name.
+            id_value (Any): The ID value.
+            columns (str, optional): The columns to select. Defaults to "*".
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            Optional[Dict[str, Any]]: A dictionary with the row or None if not found.
+        """
+        query = f"SELECT {columns} FROM {table} WHERE {id_column} = %s"
+        return await self.execute_query_single_async(query, (id_value,), with_rls)
+
+    async def get_all_async(self, table: str, condition: str = "", params: Tuple = None, columns: str = "*",
+                            order_by: str = "", limit: int = 0, offset: int = 0, with_rls: bool = True) -> List[Dict[str, Any]]:
+        """
+        Get all rows from a table asynchronously.
+
+        Args:
+            table (str): The table name.
+            condition (str, optional): The WHERE condition. Defaults to "".
+            params (Tuple, optional): The parameters for the condition. Defaults to None.
+            columns (str, optional): The columns to select. Defaults to "*".
+            order_by (str, optional): The ORDER BY clause. Defaults to "".
+            limit (int, optional): The LIMIT clause. Defaults to 0 (no limit).
+            offset (int, optional): The OFFSET clause. Defaults to 0.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            List[Dict[str, Any]]: A list of dictionaries with the rows.
+        """
+        query = self._build_select_query(table, condition, columns, order_by, limit, offset)
+        return await self.execute_query_async(query, params, with_rls)
+
+    async def insert_async(self, table: str, data: Dict[str, Any], returning: bool = True, with_rls: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Insert a row into a table asynchronously.
+
+        Args:
+            table (str): The table name.
+            data (Dict[str, Any]): The data to insert.
+            returning (bool, optional): Whether to return the inserted row. Defaults to True.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            Optional[Dict[str, Any]]: A dictionary with the inserted row or None if not returning.
+        """
+        query, values = self._build_insert_query(table, data, returning)
+        return await self.execute_insert_async(query, values, with_rls, returning)
+
+    async def update_async(self, table: str, data: Dict[str, Any], condition: str, params: Tuple = None,
+                           returning: bool = False, with_rls: bool = True) -> Union[int, Optional[Dict[str, Any]]]:
+        """
+        Update rows in a table asynchronously.
+
+        Args:
+            table (str): The table name.
+            data (Dict[str, Any]): The data to update.
+            condition (str): The WHERE condition.
+            params (Tuple, optional): The parameters for the condition. Defaults to None.
+            returning (bool, optional): Whether to return the updated row. Defaults to False.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            Union[int, Optional[Dict[str, Any]]]: The number of affected rows or a dictionary with the updated row.
+        """
+        query, all_params = self._build_update_query(table, data, condition, params, returning)
+        return await self.execute_update_async(query, all_params, with_rls, returning)
+
+    async def delete_async(self, table: str, condition: str, params: Tuple = None, with_rls: bool = True) -> int:
+        """
+        Delete rows from a table asynchronously.
 
         Args:
             table (str): The table name.
@@ -438,4 +853,4 @@ class DatabaseAccess:
             int: The number of affected rows.
         """
         query = f"DELETE FROM {table} WHERE {condition}"
-        return self.execute_delete(query, params, with_rls)
+        return await self.execute_command_async(query, params, with_rls)
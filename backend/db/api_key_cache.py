@@ -0,0 +1,427 @@
+"""
+API key verification cache.
+
+Agents and Proxmox hosts send their API key with every heartbeat, log batch and sync.
+Validated keys are cached in memory for API_KEY_CACHE_TTL seconds, and keys that failed
+validation for API_KEY_NEGATIVE_CACHE_TTL seconds, so a client retrying a bad key does
+not reach the database on every attempt. Entries are keyed by the hash of the key, the
+requested key type and resource, and the RLS identity the key was validated with.
+
+last_used_at is not written on every request. Uses are recorded in memory and written
+in one UPDATE per RLS identity by a flush thread every API_KEY_LAST_USED_FLUSH_INTERVAL
+seconds, and on shutdown.
+
+Revoking or regenerating a key evicts its entries in this process immediately. Other
+worker processes evict them when the query cache invalidation bus notifies them of the
+write to api_keys, or when their entries expire if the bus is disabled.
+
+Every eviction bumps a generation counter. A validation reads the generation before
+its lookup and passes it to put_api_key(), which drops the result if an eviction
+happened in the meantime, so a lookup that raced a revocation cannot cache the row it
+read before the key was revoked.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import Config
+from .user_connection import get_user_db_connection
+from .query_cache import ALL_TABLES
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+DEFAULT_MAX_ENTRIES = 10000
+
+# Table whose writes invalidate the cache
+API_KEYS_TABLE = "api_keys"
+
+# Batch update of the recorded uses, which never moves last_used_at backwards
+FLUSH_LAST_USED_QUERY = """
+    UPDATE api_keys AS k
+    SET last_used_at = u.last_used_at
+    FROM unnest(%s::integer[], %s::timestamptz[]) AS u(id, last_used_at)
+    WHERE k.id = u.id
+    AND (k.last_used_at IS NULL OR k.last_used_at < u.last_used_at)
+"""
+
+# Cache state: cache key -> (api key data or None, expires_at)
+_cache: "OrderedDict[Tuple, Tuple[Optional[Dict[str, Any]], float]]" = OrderedDict()
+_cache_lock = threading.Lock()
+_max_entries = DEFAULT_MAX_ENTRIES
+
+# Bumped by every eviction; results of lookups started before it are not cached
+_generation = 0
+
+# Recorded uses: (user_id, user_role) -> {key_id: last used timestamp}
+_pending_uses: Dict[Tuple[int, str], Dict[int, datetime]] = {}
+_pending_lock = threading.Lock()
+
+# Flush thread state
+_flush_thread = None
+_flush_stop_event = threading.Event()
+
+# Cache statistics
+_cache_stats = {
+    "hits": 0,
+    "negative_hits": 0,
+    "misses": 0,
+    "evictions": 0,
+    "stale_puts": 0,
+    "flushes": 0,
+    "flushed_keys": 0,
+    "flush_errors": 0
+}
+
+def _count(name: str, value: int = 1) -> None:
+    """Increment a cache counter. Must be called with _cache_lock held."""
+    _cache_stats[name] += value
+
+def get_cache_key(api_key_hash: str, key_type: Optional[str], resource_id: Optional[int],
+                  user_id: int, user_role: str) -> Tuple:
+    """
+    Get the cache key of an API key validation.
+
+    Args:
+        api_key_hash (str): The SHA-256 hash of the API key
+        key_type (Optional[str]): The requested key type
+        resource_id (Optional[int]): The requested resource ID
+        user_id (int): The user ID of the RLS context
+        user_role (str): The user role of the RLS context
+
+    Returns:
+        Tuple: The cache key
+    """
+    return (api_key_hash, key_type, resource_id, user_id, user_role)
+
+def get_api_key_cache_generation() -> int:
+    """
+    Get the eviction generation of the cache, to be read before a validation queries
+    the database and passed to put_api_key() with its result.
+
+    Returns:
+        int: The current generation
+    """
+    with _cache_lock:
+        return _generation
+
+def get_cached_api_key(cache_key: Tuple) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """
+    Look up the result of an API key validation.
+
+    Args:
+        cache_key (Tuple): The cache key from get_cache_key()
+
+    Returns:
+        Tuple[bool, Optional[Dict[str, Any]]]: Whether the validation is cached, and
+            a copy of the API key data, or None for a key that failed validation
+    """
+    with _cache_lock:
+        entry = _cache.get(cache_key)
+        if entry is None:
+            _count("misses")
+            return False, None
+
+        api_key_data, expires_at = entry
+        if expires_at <= time.time():
+            del _cache[cache_key]
+            _count("misses")
+            return False, None
+
+        _cache.move_to_end(cache_key)
+        if api_key_data is None:
+            _count("negative_hits")
+            return True, None
+
+        _count("hits")
+        return True, dict(api_key_data)
+
+def put_api_key(cache_key: Tuple, api_key_data: Optional[Dict[str, Any]],
+                generation: Optional[int] = None) -> None:
+    """
+    Cache the result of an API key validation.
+
+    Args:
+        cache_key (Tuple): The cache key from get_cache_key()
+        api_key_data (Optional[Dict[str, Any]]): The API key data, or None if the key
+            failed validation
+        generation (Optional[int]): The generation from get_api_key_cache_generation()
+            read before the validation; the result is not cached if an eviction
+            happened since
+    """
+    if api_key_data is None:
+        ttl = Config.API_KEY_NEGATIVE_CACHE_TTL
+    else:
+        ttl = Config.API_KEY_CACHE_TTL
+        api_key_data = dict(api_key_data)
+
+    if ttl <= 0:
+        return
+
+    with _cache_lock:
+        if generation is not None and generation != _generation:
+            _count("stale_puts")
+            return
+
+        _cache[cache_key] = (api_key_data, time.time() + ttl)
+        _cache.move_to_end(cache_key)
+
+        # Evict the least recently used entries
+        while len(_cache) > _max_entries:
+            _cache.popitem(last=False)
+            _count("evictions")
+
+def _evict(predicate) -> int:
+    """Evict the entries matching a predicate of the cache key and API key data."""
+    global _generation
+
+    with _cache_lock:
+        # Bumped even if nothing is cached yet, for lookups still in flight
+        _generation += 1
+        keys = [key for key, (api_key_data, _) in _cache.items() if predicate(key, api_key_data)]
+        for key in keys:
+            del _cache[key]
+        _count("evictions", len(keys))
+
+    return len(keys)
+
+def evict_api_key(key_id: int) -> int:
+    """
+    Evict the cached validations of an API key.
+
+    Args:
+        key_id (int): The ID of the API key
+
+    Returns:
+        int: The number of evicted entries
+    """
+    return _evict(lambda key, data: data is not None and data["id"] == key_id)
+
+def evict_api_key_hash(api_key_hash: str) -> int:
+    """
+    Evict the cached validations, including failed ones, of an API key hash.
+
+    Args:
+        api_key_hash (str): The SHA-256 hash of the API key
+
+    Returns:
+        int: The number of evicted entries
+    """
+    return _evict(lambda key, data: key[0] == api_key_hash)
+
+def evict_api_keys_for_resource(key_type: str, resource_id: int) -> int:
+    """
+    Evict the cached validations of the API keys of a resource.
+
+    Args:
+        key_type (str): The type of the API keys (proxmox_node, windows_vm)
+        resource_id (int): The ID of the resource
+
+    Returns:
+        int: The number of evicted entries
+    """
+    def matches(key, data):
+        if data is not None:
+            return data["key_type"] == key_type and data["resource_id"] == resource_id
+        return key[1] == key_type and key[2] == resource_id
+
+    return _evict(matches)
+
+def invalidate_api_key_cache() -> None:
+    """
+    Evict all cached validations.
+    """
+    global _generation
+
+    with _cache_lock:
+        _generation += 1
+        _count("evictions", len(_cache))
+        _cache.clear()
+
+def invalidate_api_key_cache_by_tables(tables: List[str]) -> bool:
+    """
+    Evict all cached validations if api_keys is among the written tables.
+
+    Args:
+        tables (List[str]): The written tables, or [ALL_TABLES]
+
+    Returns:
+        bool: True if the cache was invalidated, False otherwise
+    """
+    if API_KEYS_TABLE not in tables and ALL_TABLES not in tables:
+        return False
+
+    invalidate_api_key_cache()
+    return True
+
+def record_api_key_use(key_id: int, user_id: int, user_role: str) -> None:
+    """
+    Record a use of an API key, to be written to last_used_at by the next flush.
+
+    Args:
+        key_id (int): The ID of the API key
+        user_id (int): The user ID of the RLS context the key was validated with
+        user_role (str): The user role of the RLS context the key was validated with
+    """
+    with _pending_lock:
+        _pending_uses.setdefault((user_id, user_role), {})[key_id] = datetime.now(timezone.utc)
+
+def _restore_pending_uses(identity: Tuple[int, str], uses: Dict[int, datetime]) -> None:
+    """Put back the uses of a failed flush, keeping uses recorded in the meantime."""
+    with _pending_lock:
+        pending = _pending_uses.setdefault(identity, {})
+        for key_id, used_at in uses.items():
+            if key_id not in pending or pending[key_id] < used_at:
+                pending[key_id] = used_at
+
+def flush_api_key_last_used() -> int:
+    """
+    Write the recorded uses of API keys to last_used_at.
+
+    Returns:
+        int: The number of API keys updated, or 0 if the flush failed
+    """
+    global _pending_uses
+
+    with _pending_lock:
+        pending = _pending_uses
+        _pending_uses = {}
+
+    updated = 0
+    for identity, uses in pending.items():
+        user_id, user_role = identity
+        key_ids = list(uses)
+
+        try:
+            with get_user_db_connection(user_id=user_id, user_role=user_role) as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(FLUSH_LAST_USED_QUERY, (key_ids, [uses[key_id] for key_id in key_ids]))
+                    updated += cursor.rowcount
+                    conn.commit()
+                finally:
+                    cursor.close()
+        except Exception as e:
+            logger.error(f"Error flushing API key last_used_at: {e}")
+            _restore_pending_uses(identity, uses)
+            with _cache_lock:
+                _count("flush_errors")
+            continue
+
+        with _cache_lock:
+            _count("flushes")
+            _count("flushed_keys", len(key_ids))
+
+    return updated
+
+def get_pending_api_key_uses() -> int:
+    """
+    Get the number of API key uses waiting for the next flush.
+
+    Returns:
+        int: The number of pending uses
+    """
+    with _pending_lock:
+        return sum(len(uses) for uses in _pending_uses.values())
+
+def flush_thread_func() -> None:
+    """
+    Flush thread function.
+    """
+    logger.info("API key last_used_at flush thread started")
+
+    while not _flush_stop_event.wait(Config.API_KEY_LAST_USED_FLUSH_INTERVAL):
+        try:
+            flush_api_key_last_used()
+        except Exception as e:
+            logger.error(f"Error in API key flush thread: {e}")
+
+    logger.info("API key last_used_at flush thread stopped")
+
+def start_api_key_flush() -> None:
+    """
+    Start the periodic flush of last_used_at.
+    """
+    global _flush_thread
+
+    if _flush_thread and _flush_thread.is_alive():
+        logger.warning("API key flush thread is already running")
+        return
+
+    # Reset stop event
+    _flush_stop_event.clear()
+
+    # Create and start flush thread
+    _flush_thread = threading.Thread(target=flush_thread_func, daemon=True)
+    _flush_thread.start()
+
+    logger.info("API key flush started")
+
+def stop_api_key_flush() -> None:
+    """
+    Stop the periodic flush of last_used_at and write the remaining uses.
+    """
+    global _flush_thread
+
+    if not _flush_thread or not _flush_thread.is_alive():
+        logger.warning("API key flush thread is not running")
+    else:
+        # Set stop event
+        _flush_stop_event.set()
+
+        # Wait for thread to stop
+        _flush_thread.join(timeout=5)
+        _flush_thread = None
+
+    flush_api_key_last_used()
+
+    logger.info("API key flush stopped")
+
+def get_api_key_cache_stats() -> Dict[str, Any]:
+    """
+    Get statistics of the API key cache.
+
+    Returns:
+        Dict[str, Any]: Cache statistics
+    """
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["entries"] = len(_cache)
+        stats["negative_entries"] = sum(1 for api_key_data, _ in _cache.values() if api_key_data is None)
+
+    lookups = stats["hits"] + stats["negative_hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["hits"] + stats["negative_hits"]) / lookups if lookups > 0 else 0
+    stats["pending_uses"] = get_pending_api_key_uses()
+    stats["ttl"] = Config.API_KEY_CACHE_TTL
+    stats["negative_ttl"] = Config.API_KEY_NEGATIVE_CACHE_TTL
+    return stats
+
+def reset_api_key_cache_stats() -> None:
+    """
+    Reset the counters of the API key cache.
+    """
+    with _cache_lock:
+        for name in _cache_stats:
+            _cache_stats[name] = 0
+
+def init_api_key_cache() -> None:
+    """
+    Initialize the API key cache and start the periodic flush of last_used_at.
+    """
+    start_api_key_flush()
+
+    logger.info("API key cache initialized")
+
+def shutdown_api_key_cache() -> None:
+    """
+    Shutdown the API key cache, writing the remaining uses of API keys.
+    """
+    stop_api_key_flush()
+    invalidate_api_key_cache()
+
+    logger.info("API key cache shutdown")
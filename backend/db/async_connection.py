@@ -0,0 +1,320 @@
+"""
+Async database connection management module.
+
+This module provides a native asyncio connection pool built on psycopg 3, so that
+request handlers can wait on the database without blocking the event loop.
+
+Connections use client-side parameter binding (AsyncClientCursor), which keeps the
+psycopg2 query style (%s placeholders, placeholders inside literals) used by the
+rest of the code base working unchanged.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Optional, Dict, Any, AsyncGenerator
+from contextlib import asynccontextmanager
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg.pq import TransactionStatus
+from psycopg_pool import AsyncConnectionPool
+
+from config import Config
+from .connection import (
+    DEFAULT_MIN_CONNECTIONS, DEFAULT_MAX_CONNECTIONS, DEFAULT_CONNECTION_TIMEOUT
+)
+from .rls_context import RLS_MODE_TRANSACTION, set_rls_context_async
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Async connection pool, created lazily on first use or at application startup
+async_connection_pool: Optional[AsyncConnectionPool] = None
+_pool_lock: Optional[asyncio.Lock] = None
+
+# Async connection pool statistics
+async_pool_stats = {
+    "created_connections": 0,
+    "returned_connections": 0,
+    "failed_connections": 0,
+    "max_connections_used": 0,
+}
+
+class RlsAsyncConnection(psycopg.AsyncConnection):
+    """
+    Async connection of the pool that keeps a transaction-local RLS context across transactions.
+
+    This is the psycopg 3 counterpart of RlsConnection: while the connection is checked
+    out to a user, the context is set again whenever the caller commits or rolls back.
+    """
+
+    transaction_rls_context = None
+
+    async def commit(self) -> None:
+        await super().commit()
+        await self._restore_transaction_rls_context()
+
+    async def rollback(self) -> None:
+        await super().rollback()
+        await self._restore_transaction_rls_context()
+
+    async def _restore_transaction_rls_context(self) -> None:
+        """Set the transaction-local RLS context of the user again after a transaction ended."""
+        if self.transaction_rls_context is None or self.autocommit:
+            return
+
+        user_id, user_role = self.transaction_rls_context
+        async with self.cursor() as cursor:
+            if not await set_rls_context_async(cursor, user_id, user_role, mode=RLS_MODE_TRANSACTION):
+                logger.error(f"Failed to restore RLS context: user_id={user_id}, role={user_role}")
+
+def create_async_connection_pool(
+    min_connections: int = None,
+    max_connections: int = None,
+    connection_timeout: int = None,
+    **kwargs
+) -> Optional[AsyncConnectionPool]:
+    """
+    Create an async database connection pool.
+
+    The pool is created closed; it is opened by open_async_connection_pool() or on
+    first use by get_async_connection_pool().
+
+    Args:
+        min_connections (int, optional): Minimum number of connections. Defaults to Config.DB_MIN_CONNECTIONS or DEFAULT_MIN_CONNECTIONS.
+        max_connections (int, optional): Maximum number of connections. Defaults to Config.DB_MAX_CONNECTIONS or DEFAULT_MAX_CONNECTIONS.
+        connection_timeout (int, optional): Connection timeout in seconds. Defaults to Config.DB_CONNECTION_TIMEOUT or DEFAULT_CONNECTION_TIMEOUT.
+        **kwargs: Additional arguments to pass to each connection.
+
+    Returns:
+        Optional[AsyncConnectionPool]: An async connection pool or None if creation fails.
+    """
+    # Get configuration values
+    min_conn = min_connections or getattr(Config, 'DB_MIN_CONNECTIONS', DEFAULT_MIN_CONNECTIONS)
+    max_conn = max_connections or getattr(Config, 'DB_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS)
+    timeout = connection_timeout or getattr(Config, 'DB_CONNECTION_TIMEOUT', DEFAULT_CONNECTION_TIMEOUT)
+
+    # Validate configuration values
+    min_conn = max(1, min_conn)  # Minimum of 1 connection
+    max_conn = max(min_conn, max_conn)  # Maximum must be at least minimum
+    timeout = max(1, timeout)  # Minimum timeout of 1 second
+
+    try:
+        conninfo = make_conninfo(
+            host=Config.DB_HOST,
+            port=Config.DB_PORT,
+            dbname=Config.DB_NAME,
+            user=Config.DB_USER,
+            password=Config.DB_PASS,
+            connect_timeout=timeout,
+            target_session_attrs="read-write"
+        )
+
+        connection_kwargs = {"cursor_factory": psycopg.AsyncClientCursor}
+        connection_kwargs.update(kwargs)
+
+        pool = AsyncConnectionPool(
+            conninfo,
+            min_size=min_conn,
+            max_size=max_conn,
+            timeout=timeout,
+            kwargs=connection_kwargs,
+            connection_class=RlsAsyncConnection,
+            open=False,
+            name="accountdb-async"
+        )
+        logger.info(f"Async database connection pool created (min={min_conn}, max={max_conn})")
+        return pool
+    except Exception as e:
+        logger.error(f"Error creating async database connection pool: {e}")
+        return None
+
+async def open_async_connection_pool(wait: bool = False) -> bool:
+    """
+    Open the async connection pool, creating it if necessary.
+
+    Args:
+        wait (bool, optional): Whether to wait until the minimum number of connections is ready. Defaults to False.
+
+    Returns:
+        bool: True if the pool is open, False otherwise.
+    """
+    global async_connection_pool, _pool_lock
+
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+
+    async with _pool_lock:
+        if async_connection_pool is None:
+            async_connection_pool = create_async_connection_pool()
+            if async_connection_pool is None:
+                return False
+
+        if async_connection_pool.closed:
+            try:
+                await async_connection_pool.open(wait=wait)
+                logger.info("Async database connection pool opened")
+            except Exception as e:
+                logger.error(f"Error opening async database connection pool: {e}")
+                return False
+
+    return True
+
+async def get_async_connection_pool() -> Optional[AsyncConnectionPool]:
+    """
+    Get the async connection pool, opening it on first use.
+
+    Returns:
+        Optional[AsyncConnectionPool]: The async connection pool or None if not available.
+    """
+    if async_connection_pool is not None and not async_connection_pool.closed:
+        return async_connection_pool
+
+    if await open_async_connection_pool():
+        return async_connection_pool
+
+    return None
+
+async def get_async_connection() -> Optional[psycopg.AsyncConnection]:
+    """
+    Get a connection from the async pool.
+
+    Returns:
+        Optional[psycopg.AsyncConnection]: A database connection or None if not available.
+    """
+    pool = await get_async_connection_pool()
+    if not pool:
+        logger.warning("Async connection pool not available")
+        return None
+
+    try:
+        conn = await pool.getconn()
+        async_pool_stats["created_connections"] += 1
+        async_pool_stats["max_connections_used"] = max(
+            async_pool_stats["max_connections_used"],
+            async_pool_stats["created_connections"] - async_pool_stats["returned_connections"]
+        )
+        return conn
+    except Exception as e:
+        logger.error(f"Error getting connection from async pool: {e}")
+        async_pool_stats["failed_connections"] += 1
+        return None
+
+async def return_async_connection(conn: Optional[psycopg.AsyncConnection]) -> None:
+    """
+    Return a connection to the async pool.
+
+    Args:
+        conn (Optional[psycopg.AsyncConnection]): The connection to return.
+    """
+    if async_connection_pool and conn:
+        try:
+            # End any transaction left open by read-only callers before handing the
+            # connection back, so the pool does not have to (and warn about it)
+            if not conn.closed and conn.info.transaction_status != TransactionStatus.IDLE:
+                try:
+                    await conn.rollback()
+                except Exception as e:
+                    # The pool discards broken connections on putconn
+                    logger.warning(f"Error rolling back connection before returning it: {e}")
+
+            await async_connection_pool.putconn(conn)
+            async_pool_stats["returned_connections"] += 1
+        except Exception as e:
+            logger.error(f"Error returning connection to async pool: {e}")
+
+@asynccontextmanager
+async def get_async_db_connection() -> AsyncGenerator[Optional[psycopg.AsyncConnection], None]:
+    """
+    Async context manager for database connections.
+
+    Yields:
+        AsyncGenerator[Optional[psycopg.AsyncConnection], None]: A database connection or None if not available.
+    """
+    conn = await get_async_connection()
+    try:
+        yield conn
+    finally:
+        if conn:
+            await return_async_connection(conn)
+
+def get_async_pool_stats() -> Dict[str, Any]:
+    """
+    Get async connection pool statistics.
+
+    Returns:
+        Dict[str, Any]: A dictionary with async connection pool statistics.
+    """
+    stats = async_pool_stats.copy()
+
+    if async_connection_pool and not async_connection_pool.closed:
+        pool_stats = async_connection_pool.get_stats()
+        stats["min_connections"] = async_connection_pool.min_size
+        stats["max_connections"] = async_connection_pool.max_size
+        stats["pool_size"] = pool_stats.get("pool_size", 0)
+        stats["available_connections"] = pool_stats.get("pool_available", 0)
+        stats["waiting_requests"] = pool_stats.get("requests_waiting", 0)
+        stats["used_connections"] = stats["pool_size"] - stats["available_connections"]
+    else:
+        stats["min_connections"] = 0
+        stats["max_connections"] = 0
+        stats["pool_size"] = 0
+        stats["available_connections"] = 0
+        stats["waiting_requests"] = 0
+        stats["used_connections"] = 0
+
+    return stats
+
+async def check_async_database_health() -> Dict[str, Any]:
+    """
+    Check database health through the async pool.
+
+    Returns:
+        Dict[str, Any]: A dictionary with database health information.
+    """
+    health = {
+        "healthy": True,
+        "connection_health": {},
+        "pool_health": {},
+        "query_performance": {}
+    }
+
+    try:
+        async with get_async_db_connection() as conn:
+            if not conn:
+                health["healthy"] = False
+                health["connection_health"]["can_connect"] = False
+                return health
+
+            health["connection_health"]["can_connect"] = True
+
+            start_time = time.time()
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT 1")
+                await cursor.fetchone()
+            health["query_performance"]["simple_query_time"] = time.time() - start_time
+
+            await conn.rollback()
+
+        health["pool_health"] = get_async_pool_stats()
+    except Exception as e:
+        health["healthy"] = False
+        health["error"] = str(e)
+
+    return health
+
+async def close_async_connection_pool() -> None:
+    """
+    Close the async connection pool.
+    """
+    global async_connection_pool
+
+    if async_connection_pool:
+        try:
+            await async_connection_pool.close()
+            logger.info("Async database connection pool closed")
+        except Exception as e:
+            logger.error(f"Error closing async database connection pool: {e}")
+        finally:
+            async_connection_pool = None
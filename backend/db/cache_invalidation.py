@@ -0,0 +1,329 @@
+"""
+Cross-process invalidation of the query cache.
+
+The query cache is private to each worker process. With the invalidation bus enabled
+(Config.QUERY_CACHE_NOTIFY), every write publishes the tables it invalidated with
+PostgreSQL NOTIFY, in the transaction of the write, so the message is only delivered
+once the write is committed. A listener thread in every worker LISTENs on the channel
+and evicts the matching entries from its own cache, from its API key cache when
+api_keys was written, from its user cache when users was written, and reloads its
+metric definitions registry when metrics_definitions or metrics_categories was written.
+
+The listener has its own connection outside the pool. Whenever it (re)connects, the
+local cache is cleared, as notifications sent while it was not listening are lost.
+"""
+
+import json
+import logging
+import os
+import select
+import socket
+import threading
+import uuid
+from typing import Dict, Any, List
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import sql
+
+from config import Config
+from .query_cache import invalidate_cache, invalidate_cache_by_tables, set_cache_ttl
+from .api_key_cache import invalidate_api_key_cache, invalidate_api_key_cache_by_tables
+from .user_cache import invalidate_user_cache, invalidate_user_cache_by_tables
+from .metrics_registry import invalidate_metrics_registry, invalidate_metrics_registry_by_tables
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Listener configuration
+DEFAULT_LISTEN_TIMEOUT = 1  # seconds between checks of the stop event
+DEFAULT_RECONNECT_INTERVAL = 5  # seconds
+
+# Identifies the messages published by this process, which it has already applied
+_ORIGIN_TOKEN = uuid.uuid4().hex
+
+# Listener state
+_listener_thread = None
+_listener_stop_event = threading.Event()
+_bus_enabled = False
+
+# Bus statistics
+_bus_stats = {
+    "published": 0,
+    "publish_errors": 0,
+    "received": 0,
+    "ignored": 0,
+    "invalid": 0,
+    "connects": 0,
+    "connected": False
+}
+_bus_stats_lock = threading.Lock()
+
+def _count(name: str) -> None:
+    """Increment a bus counter."""
+    with _bus_stats_lock:
+        _bus_stats[name] += 1
+
+def get_origin() -> str:
+    """
+    Get the origin identifier of the messages published by this process.
+
+    The process ID is part of the identifier, so forked workers do not share it.
+
+    Returns:
+        str: The origin identifier
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{_ORIGIN_TOKEN}"
+
+def get_channel() -> str:
+    """
+    Get the notification channel of the invalidation bus.
+
+    Returns:
+        str: The channel name
+    """
+    return Config.QUERY_CACHE_NOTIFY_CHANNEL
+
+def is_cache_invalidation_enabled() -> bool:
+    """
+    Check if the invalidation bus is enabled in this process.
+
+    Returns:
+        bool: True if writes publish their invalidations, False otherwise
+    """
+    return _bus_enabled
+
+def build_invalidation_message(tables: List[str]) -> str:
+    """
+    Build the payload of an invalidation notification.
+
+    Args:
+        tables (List[str]): The invalidated tables, or [ALL_TABLES]
+
+    Returns:
+        str: The JSON payload
+    """
+    return json.dumps({"origin": get_origin(), "tables": sorted(set(tables))})
+
+def publish_cache_invalidation(cursor: psycopg2.extensions.cursor, tables: List[str]) -> None:
+    """
+    Publish the tables invalidated by a write on the transaction of the write.
+
+    Nothing is sent when the invalidation bus is disabled.
+
+    Args:
+        cursor (psycopg2.extensions.cursor): The cursor that executed the write
+        tables (List[str]): The invalidated tables, or [ALL_TABLES]
+    """
+    if not _bus_enabled or not tables:
+        return
+
+    try:
+        cursor.execute("SELECT pg_notify(%s, %s)", (get_channel(), build_invalidation_message(tables)))
+        _count("published")
+    except Exception as e:
+        _count("publish_errors")
+        logger.error(f"Error publishing cache invalidation: {e}")
+        raise
+
+async def publish_cache_invalidation_async(cursor: Any, tables: List[str]) -> None:
+    """
+    Publish the tables invalidated by a write on the transaction of the write asynchronously.
+
+    Nothing is sent when the invalidation bus is disabled.
+
+    Args:
+        cursor (psycopg.AsyncCursor): The cursor that executed the write
+        tables (List[str]): The invalidated tables, or [ALL_TABLES]
+    """
+    if not _bus_enabled or not tables:
+        return
+
+    try:
+        await cursor.execute("SELECT pg_notify(%s, %s)", (get_channel(), build_invalidation_message(tables)))
+        _count("published")
+    except Exception as e:
+        _count("publish_errors")
+        logger.error(f"Error publishing cache invalidation: {e}")
+        raise
+
+def handle_invalidation_message(payload: str) -> bool:
+    """
+    Apply an invalidation notification to the local cache.
+
+    Messages published by this process are ignored, as the write applies them locally once committed.
+
+    Args:
+        payload (str): The JSON payload of the notification
+
+    Returns:
+        bool: True if the local cache was invalidated, False otherwise
+    """
+    _count("received")
+    try:
+        message = json.loads(payload)
+        origin = message["origin"]
+        tables = message["tables"]
+        if not isinstance(tables, list):
+            raise ValueError("tables is not a list")
+    except Exception as e:
+        _count("invalid")
+        logger.warning(f"Invalid cache invalidation message {payload!r}: {e}")
+        return False
+
+    if origin == get_origin():
+        _count("ignored")
+        return False
+
+    invalidate_cache_by_tables(tables)
+    invalidate_api_key_cache_by_tables(tables)
+    invalidate_user_cache_by_tables(tables)
+    invalidate_metrics_registry_by_tables(tables)
+    return True
+
+def _connect_listener() -> psycopg2.extensions.connection:
+    """Open the listener connection and LISTEN on the channel."""
+    conn = psycopg2.connect(
+        host=Config.DB_HOST,
+        port=Config.DB_PORT,
+        dbname=Config.DB_NAME,
+        user=Config.DB_USER,
+        password=Config.DB_PASS,
+        application_name="query_cache_listener"
+    )
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql.SQL("LISTEN {}").format(sql.Identifier(get_channel())))
+    finally:
+        cursor.close()
+
+    return conn
+
+def listener_thread_func() -> None:
+    """
+    Listener thread function.
+    """
+    logger.info("Query cache invalidation listener started")
+
+    while not _listener_stop_event.is_set():
+        conn = None
+        try:
+            conn = _connect_listener()
+            with _bus_stats_lock:
+                _bus_stats["connects"] += 1
+                _bus_stats["connected"] = True
+
+            # Notifications sent before we were listening are lost
+            invalidate_cache()
+            invalidate_api_key_cache()
+            invalidate_user_cache()
+            invalidate_metrics_registry()
+
+            while not _listener_stop_event.is_set():
+                if select.select([conn], [], [], DEFAULT_LISTEN_TIMEOUT) == ([], [], []):
+                    continue
+
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    handle_invalidation_message(notify.payload)
+        except Exception as e:
+            logger.error(f"Error in query cache invalidation listener: {e}")
+            # Sleep for a short time to avoid busy-waiting in case of persistent errors
+            _listener_stop_event.wait(DEFAULT_RECONNECT_INTERVAL)
+        finally:
+            with _bus_stats_lock:
+                _bus_stats["connected"] = False
+            if conn is not None and not conn.closed:
+                conn.close()
+
+    logger.info("Query cache invalidation listener stopped")
+
+def start_cache_invalidation_listener() -> None:
+    """
+    Start the invalidation bus: publish invalidations and listen for other processes.
+    """
+    global _listener_thread
+    global _bus_enabled
+
+    if _listener_thread and _listener_thread.is_alive():
+        logger.warning("Query cache invalidation listener is already running")
+        return
+
+    # Reset stop event
+    _listener_stop_event.clear()
+
+    # Create and start listener thread
+    _listener_thread = threading.Thread(target=listener_thread_func, daemon=True)
+    _listener_thread.start()
+
+    _bus_enabled = True
+
+    logger.info("Query cache invalidation bus started")
+
+def stop_cache_invalidation_listener() -> None:
+    """
+    Stop the invalidation bus.
+    """
+    global _listener_thread
+    global _bus_enabled
+
+    _bus_enabled = False
+
+    if not _listener_thread or not _listener_thread.is_alive():
+        logger.warning("Query cache invalidation listener is not running")
+        return
+
+    # Set stop event
+    _listener_stop_event.set()
+
+    # Wait for thread to stop
+    _listener_thread.join(timeout=DEFAULT_LISTEN_TIMEOUT + 5)
+    _listener_thread = None
+
+    logger.info("Query cache invalidation bus stopped")
+
+def get_cache_invalidation_stats() -> Dict[str, Any]:
+    """
+    Get statistics of the invalidation bus.
+
+    Returns:
+        Dict[str, Any]: Bus statistics
+    """
+    with _bus_stats_lock:
+        stats = dict(_bus_stats)
+
+    stats["enabled"] = _bus_enabled
+    stats["channel"] = get_channel()
+    return stats
+
+def reset_cache_invalidation_stats() -> None:
+    """
+    Reset the counters of the invalidation bus.
+    """
+    with _bus_stats_lock:
+        for name, value in _bus_stats.items():
+            if not isinstance(value, bool):
+                _bus_stats[name] = 0
+
+def init_cache_invalidation() -> None:
+    """
+    Initialize the query cache TTL and the invalidation bus if it is enabled in the configuration.
+    """
+    set_cache_ttl(Config.QUERY_CACHE_TTL)
+
+    if Config.QUERY_CACHE_NOTIFY:
+        start_cache_invalidation_listener()
+
+    logger.info("Query cache invalidation initialized")
+
+def shutdown_cache_invalidation() -> None:
+    """
+    Shutdown the invalidation bus.
+    """
+    if _bus_enabled:
+        stop_cache_invalidation_listener()
+
+    logger.info("Query cache invalidation shutdown")
@@ -14,6 +14,7 @@ from typing import Optional, Dict, Any, Generator
 from contextlib import contextmanager
 
 from config import Config
+from .rls_context import reset_connection_rls_context, get_rls_context_stats, RlsConnection
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -63,6 +64,9 @@ def create_connection_pool(
     max_conn = max(min_conn, max_conn)  # Maximum must be at least minimum
     timeout = max(1, timeout)  # Minimum timeout of 1 second
 
+    # Pooled connections keep a transaction-local RLS context across commits
+    kwargs.setdefault('connection_factory', RlsConnection)
+
     try:
         # Create the connection pool
         pool = psycopg2.pool.ThreadedConnectionPool(
@@ -87,10 +91,15 @@ def create_connection_pool(
 connection_pool = create_connection_pool()
 
 # Get a connection from the pool
-def get_connection() -> Optional[psycopg2.extensions.connection]:
+def get_connection(reset_rls_context: bool = True) -> Optional[psycopg2.extensions.connection]:
     """
     Get a connection from the pool.
 
+    Args:
+        reset_rls_context (bool, optional): Whether to clear an RLS context the connection
+            kept from a previous checkout. Defaults to True. Only user connections, which
+            set their own context, pass False.
+
     Returns:
         Optional[psycopg2.extensions.connection]: A database connection or None if not available.
     """
@@ -102,6 +111,15 @@ def get_connection() -> Optional[psycopg2.extensions.connection]:
                 pool_stats["max_connections_used"],
                 pool_stats["created_connections"] - pool_stats["returned_connections"]
             )
+
+            # Never hand out a connection that still carries a user's RLS context
+            if reset_rls_context and not reset_connection_rls_context(conn):
+                logger.error("Could not clear RLS context of pooled connection, discarding it")
+                connection_pool.putconn(conn, close=True)
+                pool_stats["returned_connections"] += 1
+                pool_stats["failed_connections"] += 1
+                return None
+
             return conn
         except Exception as e:
             logger.error(f"Error getting connection from pool: {e}")
@@ -145,7 +163,8 @@ def get_db_connection() -> Generator[Optional[psycopg2.extensions.connection], N
 # Get a connection with retries
 def get_connection_with_retries(
     max_retries: int = None,
-    retry_interval: int = None
+    retry_interval: int = None,
+    reset_rls_context: bool = True
 ) -> Optional[psycopg2.extensions.connection]:
     """
     Get a connection from the pool with retries.
@@ -153,6 +172,7 @@ def get_connection_with_retries(
     Args:
         max_retries (int, optional): Maximum number of retries. Defaults to Config.DB_MAX_RETRIES or DEFAULT_MAX_RETRIES.
         retry_interval (int, optional): Retry interval in seconds. Defaults to Config.DB_RETRY_INTERVAL or DEFAULT_RETRY_INTERVAL.
+        reset_rls_context (bool, optional): Whether to clear an RLS context kept from a previous checkout. Defaults to True.
 
     Returns:
         Optional[psycopg2.extensions.connection]: A database connection or None if not available after retries.
@@ -166,7 +186,7 @@ def get_connection_with_retries(
     interval = max(0.1, interval)  # Minimum interval of 0.1 seconds
 
     for i in range(retries):
-        conn = get_connection()
+        conn = get_connection(reset_rls_context)
         if conn:
             return conn
 
@@ -242,6 +262,9 @@ def get_pool_stats() -> Dict[str, Any]:
         stats["pool_size"] = 0
         stats["used_connections"] = 0
 
+    # Add RLS context cache statistics
+    stats["rls_context"] = get_rls_context_stats()
+
     return stats
 
 # Check database health
@@ -0,0 +1,294 @@
+"""
+Metric definitions registry.
+
+Storing and reading timeseries data needs the ID and data type of a metric, which used
+to be looked up in metrics_definitions by every call. The definitions and their
+categories are loaded once per process and kept in memory, and shared by the
+collector, the aggregator and the routers.
+
+The registry is reloaded when its version is bumped by invalidate_metrics_registry(),
+when the query cache invalidation bus notifies a write to metrics_definitions or
+metrics_categories, and otherwise every METRICS_REGISTRY_TTL seconds. Metrics are
+mostly added by SQL scripts, which do not publish on the bus, so a lookup of an
+unknown metric reloads the registry, at most once every METRICS_REGISTRY_MISS_INTERVAL
+seconds, before reporting the metric as unknown.
+
+Metric names are only unique per category, so the definitions are keyed by category
+and name. A lookup by name alone resolves the definition only when the name belongs to
+a single category; a name defined in several categories has to be looked up with its
+category, and is otherwise reported as ambiguous instead of resolving to either.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import Config
+from .connection import get_db_connection
+from .query_cache import ALL_TABLES
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Tables whose writes invalidate the registry
+METRICS_TABLES = ("metrics_definitions", "metrics_categories")
+
+LOAD_METRICS_QUERY = """
+    SELECT
+        md.id, md.name, md.display_name, md.description, md.unit, md.data_type, md.is_active,
+        md.category_id, mc.name
+    FROM public.metrics_definitions md
+    LEFT JOIN public.metrics_categories mc ON mc.id = md.category_id
+    ORDER BY md.id
+"""
+
+LOAD_CATEGORIES_QUERY = """
+    SELECT id, name, description
+    FROM public.metrics_categories
+    ORDER BY name
+"""
+
+# Key of a metric definition: the name of its category (None if it has none) and its name
+MetricKey = Tuple[Optional[str], str]
+
+# Registry state. The version is bumped by every invalidation, so that a load that
+# started before an invalidation is not installed. The definitions are indexed by
+# metric name, then by category name.
+_metrics: Optional[Dict[str, Dict[Optional[str], Dict[str, Any]]]] = None
+_categories: List[Dict[str, Any]] = []
+_loaded_at = 0.0
+_last_miss_reload = 0.0
+_version = 0
+_registry_lock = threading.Lock()
+
+# Registry statistics
+_registry_stats = {
+    "hits": 0,
+    "misses": 0,
+    "ambiguous": 0,
+    "loads": 0,
+    "load_errors": 0,
+    "invalidations": 0
+}
+
+def _count(name: str, value: int = 1) -> None:
+    """Increment a registry counter. Must be called with _registry_lock held."""
+    _registry_stats[name] += value
+
+def _load() -> Dict[str, Dict[Optional[str], Dict[str, Any]]]:
+    """Load the definitions and categories, installing them unless the version was bumped meanwhile."""
+    global _metrics, _categories, _loaded_at
+
+    with _registry_lock:
+        version = _version
+
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(LOAD_METRICS_QUERY)
+                metrics = {}
+                duplicates = set()
+                for row in cursor.fetchall():
+                    metric_id, name, display_name, description, unit, data_type, is_active, category_id, category = row
+                    definitions = metrics.setdefault(name, {})
+                    if category in definitions:
+                        # Only possible for metrics without a category, since NULL categories are distinct
+                        duplicates.add((category, name))
+                        continue
+                    definitions[category] = {
+                        "id": metric_id,
+                        "name": name,
+                        "display_name": display_name,
+                        "description": description,
+                        "unit": unit,
+                        "data_type": data_type,
+                        "is_active": is_active,
+                        "category_id": category_id,
+                        "category": category
+                    }
+
+                cursor.execute(LOAD_CATEGORIES_QUERY)
+                categories = [
+                    {"id": category_id, "name": name, "description": description}
+                    for category_id, name, description in cursor.fetchall()
+                ]
+            finally:
+                cursor.close()
+    except Exception:
+        with _registry_lock:
+            _count("load_errors")
+        raise
+
+    # Definitions that cannot be told apart are not loaded at all
+    for category, name in duplicates:
+        logger.error(f"Metric '{name}' is defined several times in category {category}, ignoring its definitions")
+        del metrics[name][category]
+        if not metrics[name]:
+            del metrics[name]
+
+    with _registry_lock:
+        _count("loads")
+        if _version == version:
+            _metrics = metrics
+            _categories = categories
+            _loaded_at = time.time()
+
+    logger.info(f"Loaded {sum(len(definitions) for definitions in metrics.values())} metric definitions")
+    return metrics
+
+def _get_metrics() -> Dict[str, Dict[Optional[str], Dict[str, Any]]]:
+    """Get the loaded definitions, loading them if the registry is empty or expired."""
+    with _registry_lock:
+        metrics = _metrics
+        expired = time.time() - _loaded_at >= Config.METRICS_REGISTRY_TTL
+
+    if metrics is None:
+        return _load()
+
+    if expired:
+        try:
+            return _load()
+        except Exception as e:
+            # Keep serving the previous definitions until the database is back
+            logger.error(f"Error reloading metric definitions: {e}")
+
+    return metrics
+
+def _find(
+    metrics: Dict[str, Dict[Optional[str], Dict[str, Any]]],
+    metric_name: str,
+    category: Optional[str]
+) -> List[Dict[str, Any]]:
+    """Find the definitions of a name, in the given category or in any category."""
+    definitions = metrics.get(metric_name, {})
+    if category is not None:
+        return [definitions[category]] if category in definitions else []
+    return list(definitions.values())
+
+def get_metric_definition(metric_name: str, category: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Look up the definition of a metric by name, and category if the name is not unique.
+
+    Args:
+        metric_name (str): The name of the metric
+        category (Optional[str], optional): The name of the category of the metric. Defaults to None,
+            which only resolves names defined in a single category.
+
+    Returns:
+        Optional[Dict[str, Any]]: A copy of the definition, with its id, data_type and
+            category, or None if the metric is not defined, or its name is ambiguous
+    """
+    global _last_miss_reload
+
+    matches = _find(_get_metrics(), metric_name, category)
+
+    if not matches:
+        # The metric may have been defined since the registry was loaded
+        with _registry_lock:
+            reload = time.time() - _last_miss_reload >= Config.METRICS_REGISTRY_MISS_INTERVAL
+            if reload:
+                _last_miss_reload = time.time()
+
+        if reload:
+            matches = _find(_load(), metric_name, category)
+
+    if len(matches) > 1:
+        categories = sorted(str(metric["category"]) for metric in matches)
+        logger.error(f"Metric '{metric_name}' is defined in several categories ({', '.join(categories)}), "
+                     f"its category is needed to look it up")
+        with _registry_lock:
+            _count("ambiguous")
+        return None
+
+    metric = matches[0] if matches else None
+    with _registry_lock:
+        _count("hits" if metric is not None else "misses")
+
+    return dict(metric) if metric is not None else None
+
+def get_metric_definitions() -> Dict[MetricKey, Dict[str, Any]]:
+    """
+    Get the definitions of all metrics.
+
+    Returns:
+        Dict[MetricKey, Dict[str, Any]]: Copies of the definitions by category and metric name
+    """
+    return {
+        (category, name): dict(metric)
+        for name, definitions in _get_metrics().items()
+        for category, metric in definitions.items()
+    }
+
+def get_metric_categories() -> List[Dict[str, Any]]:
+    """
+    Get the metric categories.
+
+    Returns:
+        List[Dict[str, Any]]: Copies of the categories, ordered by name
+    """
+    _get_metrics()
+    with _registry_lock:
+        return [dict(category) for category in _categories]
+
+def refresh_metrics_registry() -> int:
+    """
+    Reload the metric definitions.
+
+    Returns:
+        int: The number of metric definitions
+    """
+    return len(_load())
+
+def invalidate_metrics_registry() -> None:
+    """
+    Bump the registry version, so that the next lookup reloads the definitions.
+    """
+    global _metrics, _version
+
+    with _registry_lock:
+        _version += 1
+        _metrics = None
+        _count("invalidations")
+
+def invalidate_metrics_registry_by_tables(tables: List[str]) -> bool:
+    """
+    Invalidate the registry if metrics_definitions or metrics_categories is among the written tables.
+
+    Args:
+        tables (List[str]): The written tables, or [ALL_TABLES]
+
+    Returns:
+        bool: True if the registry was invalidated, False otherwise
+    """
+    if not any(table in tables for table in METRICS_TABLES + (ALL_TABLES,)):
+        return False
+
+    invalidate_metrics_registry()
+    return True
+
+def get_metrics_registry_stats() -> Dict[str, Any]:
+    """
+    Get statistics of the metric definitions registry.
+
+    Returns:
+        Dict[str, Any]: Registry statistics
+    """
+    with _registry_lock:
+        stats = dict(_registry_stats)
+        stats["metrics"] = sum(len(definitions) for definitions in _metrics.values()) if _metrics is not None else 0
+        stats["loaded"] = _metrics is not None
+        stats["version"] = _version
+        stats["age"] = time.time() - _loaded_at if _metrics is not None else None
+
+    stats["ttl"] = Config.METRICS_REGISTRY_TTL
+    return stats
+
+def reset_metrics_registry_stats() -> None:
+    """
+    Reset the counters of the metric definitions registry.
+    """
+    with _registry_lock:
+        for name in _registry_stats:
+            _registry_stats[name] = 0
@@ -123,57 +123,6 @@ def build_batch_fetch_query(
     
     return query, params
 
-def build_cursor_pagination_query(
-    table_name: str,
-    cursor_column: str,
-    cursor_value: Optional[Any],
-    sort_order: str,
-    limit: int,
-    filter_conditions: Dict[str, Any] = None
-) -> Tuple[str, List[Any]]:
-    """
-    Build a query using cursor-based pagination.
-    
-    Args:
-        table_name (str): The name of the table to query
-        cursor_column (str): The column to use for the cursor
-        cursor_value (Optional[Any]): The cursor value
-        sort_order (str): The sort order (asc or desc)
-        limit (int): The maximum number of rows to return
-        filter_conditions (Dict[str, Any], optional): Filter conditions to apply
-        
-    Returns:
-        Tuple[str, List[Any]]: The query string and parameters
-    """
-    # Start building the query
-    query = f"""
-    SELECT *
-    FROM {table_name}
-    WHERE 1=1
-    """
-    
-    # Initialize parameters list
-    params = []
-    
-    # Add cursor condition if provided
-    if cursor_value is not None:
-        operator = ">" if sort_order.lower() == "asc" else "<"
-        query += f" AND {cursor_column} {operator} %s"
-        params.append(cursor_value)
-    
-    # Add filter conditions if provided
-    if filter_conditions:
-        for key, value in filter_conditions.items():
-            if value is not None:
-                query += f" AND {key} = %s"
-                params.append(value)
-    
-    # Add sorting and limit
-    query += f" ORDER BY {cursor_column} {sort_order} LIMIT %s"
-    params.append(limit)
-    
-    return query, params
-
 def build_projection_query(
     table_name: str,
     columns: List[str],
@@ -0,0 +1,280 @@
+"""
+Keyset pagination for the repositories.
+
+This module pages through the rows of a listing by the values of the last row of the
+previous page instead of an OFFSET, so that the cost of a page does not grow with its
+depth. Rows are ordered by a sort column and a unique key column, which breaks the ties
+between rows with the same sort value, and the position in the listing is passed from
+page to page as an opaque cursor.
+"""
+
+import base64
+import binascii
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# How the total number of rows of a listing is counted
+COUNT_MODES = ("exact", "estimate", "none")
+
+# Values of the sort columns that JSON does not represent, tagged in the cursors.
+# datetime is checked before date, which it is a subclass of.
+_CURSOR_VALUE_TYPES = {
+    "datetime": (datetime, datetime.isoformat, datetime.fromisoformat),
+    "date": (date, date.isoformat, date.fromisoformat),
+    "decimal": (Decimal, str, Decimal),
+    "uuid": (UUID, str, UUID)
+}
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor cannot be decoded, or was issued for another ordering."""
+
+def _encode_value(value: Any) -> Any:
+    for tag, (value_type, encode, _) in _CURSOR_VALUE_TYPES.items():
+        if isinstance(value, value_type):
+            return {tag: encode(value)}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, list):
+        raise InvalidCursorError("Invalid cursor")
+    if not isinstance(value, dict):
+        return value
+
+    if len(value) != 1:
+        raise InvalidCursorError("Invalid cursor")
+    (tag, text), = value.items()
+    if tag not in _CURSOR_VALUE_TYPES or not isinstance(text, str):
+        raise InvalidCursorError("Invalid cursor")
+    try:
+        return _CURSOR_VALUE_TYPES[tag][2](text)
+    except (ArithmeticError, ValueError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+def encode_cursor(sort_by: str, sort_order: str, values: List[Any]) -> str:
+    """
+    Encode a position in an ordering as an opaque cursor.
+
+    Args:
+        sort_by (str): The name of the sort column
+        sort_order (str): The sort order (asc or desc)
+        values (List[Any]): The values of the sort and key columns of the last row of a page
+
+    Returns:
+        str: The cursor, in URL-safe base64 without padding
+    """
+    data = {"s": sort_by, "o": sort_order, "v": [_encode_value(value) for value in values]}
+    text = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str, List[Any]]:
+    """
+    Decode a cursor created by encode_cursor().
+
+    Args:
+        cursor (str): The cursor
+
+    Returns:
+        Tuple[str, str, List[Any]]: The name of the sort column, the sort order and the values
+
+    Raises:
+        InvalidCursorError: If the cursor is not valid
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except (binascii.Error, UnicodeError, ValueError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+    if (not isinstance(data, dict) or not isinstance(data.get("s"), str)
+            or data.get("o") not in ("asc", "desc") or not isinstance(data.get("v"), list)):
+        raise InvalidCursorError("Invalid cursor")
+
+    return data["s"], data["o"], [_decode_value(value) for value in data["v"]]
+
+class Keyset:
+    """The condition, ordering and cursors of a page of a listing."""
+
+    def __init__(self, paginator: "KeysetPaginator", sort_by: str, sort_order: str,
+                 values: Optional[List[Any]] = None):
+        """
+        Initialize the keyset of a page.
+
+        Args:
+            paginator (KeysetPaginator): The paginator of the listing
+            sort_by (str): The name of the sort column
+            sort_order (str): The sort order (asc or desc)
+            values (Optional[List[Any]], optional): The values of the cursor, or None for the first page.
+                Defaults to None.
+        """
+        self.paginator = paginator
+        self.sort_by = sort_by
+        self.sort_order = sort_order
+        self.is_first = values is None
+        self.columns = [sort_by] if sort_by == paginator.key_column else [sort_by, paginator.key_column]
+        self.order_by = ", ".join(
+            f"{paginator.sort_columns[column]} {sort_order.upper()}" for column in self.columns
+        )
+        self.condition, self.params = ("", []) if values is None else self._build_condition(values)
+
+    def _build_condition(self, values: List[Any]) -> Tuple[str, List[Any]]:
+        """
+        Build the condition selecting the rows after the values of the cursor.
+
+        NULL sort values follow PostgreSQL's default ordering, last in ascending order and
+        first in descending order, so that the indexes on the sort columns can be used.
+        """
+        operator = ">" if self.sort_order == "asc" else "<"
+        key = self.paginator.sort_columns[self.paginator.key_column]
+        if len(self.columns) == 1:
+            return f"{key} {operator} %s", list(values)
+
+        sort = self.paginator.sort_columns[self.sort_by]
+        value, key_value = values
+        if self.sort_by not in self.paginator.nullable_columns:
+            # The bound on the sort column alone is implied by the row comparison, but lets
+            # the planner prune the partitions of tables partitioned by the sort column
+            return f"{sort} {operator}= %s AND ({sort}, {key}) {operator} (%s, %s)", [value, value, key_value]
+
+        if value is None:
+            if self.sort_order == "asc":
+                return f"({sort} IS NULL AND {key} > %s)", [key_value]
+            return f"({sort} IS NOT NULL OR {key} < %s)", [key_value]
+
+        if self.sort_order == "asc":
+            return f"(({sort}, {key}) > (%s, %s) OR {sort} IS NULL)", [value, key_value]
+        return f"({sort}, {key}) < (%s, %s)", [value, key_value]
+
+    def where(self, condition: str = "", params: Optional[Tuple] = None) -> Tuple[str, Optional[Tuple]]:
+        """
+        Combine a WHERE condition with the keyset condition.
+
+        Args:
+            condition (str, optional): The WHERE condition. Defaults to "".
+            params (Optional[Tuple], optional): The parameters of the condition. Defaults to None.
+
+        Returns:
+            Tuple[str, Optional[Tuple]]: The combined condition and its parameters
+        """
+        if not self.condition:
+            return condition, params
+        if condition:
+            return f"({condition}) AND {self.condition}", tuple(params or ()) + tuple(self.params)
+        return self.condition, tuple(self.params)
+
+    def cursor_for(self, row: Dict[str, Any]) -> str:
+        """
+        Create the cursor of the rows after a row.
+
+        Args:
+            row (Dict[str, Any]): The row, with the sort and key columns
+
+        Returns:
+            str: The cursor
+        """
+        return encode_cursor(self.sort_by, self.sort_order, [row[column] for column in self.columns])
+
+    def page(self, rows: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Split the rows fetched with a LIMIT of limit + 1 into a page and the cursor of the next page.
+
+        Args:
+            rows (List[Dict[str, Any]]): The rows, in the order of the keyset
+            limit (int): The size of the page
+
+        Returns:
+            Tuple[List[Dict[str, Any]], Optional[str]]: The rows of the page and the cursor of the
+                next page, or None if this is the last page
+        """
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, self.cursor_for(rows[-1])
+
+class KeysetPaginator:
+    """
+    Keyset pagination of a listing.
+
+    The sort columns are named by the keys of the rows they are read from, and mapped to
+    the SQL expressions they are compared with, so that listings of aliased or joined
+    tables are paginated the same way as plain ones.
+    """
+
+    def __init__(self, sort_columns: Dict[str, str], key_column: str, default_sort: Optional[str] = None,
+                 default_order: str = "asc", nullable_columns: Iterable[str] = ()):
+        """
+        Initialize the paginator.
+
+        Args:
+            sort_columns (Dict[str, str]): The SQL expressions of the sort columns, by name
+            key_column (str): The name of the unique, non-null column that breaks the ties between rows
+            default_sort (Optional[str], optional): The default sort column. Defaults to the key column.
+            default_order (str, optional): The default sort order. Defaults to "asc".
+            nullable_columns (Iterable[str], optional): The sort columns that may be NULL. Defaults to ().
+        """
+        if key_column not in sort_columns:
+            raise ValueError(f"The key column {key_column} must be a sort column")
+
+        self.sort_columns = dict(sort_columns)
+        self.key_column = key_column
+        self.default_sort = default_sort or key_column
+        self.default_order = default_order
+        self.nullable_columns = frozenset(nullable_columns)
+
+    def resolve(self, sort_by: Optional[str] = None, sort_order: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Validate a sort column and order, falling back to the defaults for unknown ones.
+
+        Args:
+            sort_by (Optional[str], optional): The name of the sort column. Defaults to None.
+            sort_order (Optional[str], optional): The sort order (asc or desc). Defaults to None.
+
+        Returns:
+            Tuple[str, str]: The sort column and order
+        """
+        if sort_by not in self.sort_columns:
+            sort_by = self.default_sort
+
+        sort_order = (sort_order or "").lower()
+        if sort_order not in ("asc", "desc"):
+            sort_order = self.default_order
+
+        return sort_by, sort_order
+
+    def keyset(self, cursor: Optional[str] = None, sort_by: Optional[str] = None,
+               sort_order: Optional[str] = None) -> Keyset:
+        """
+        Get the keyset of a page.
+
+        Args:
+            cursor (Optional[str], optional): The cursor of the page, or None for the first page.
+                Defaults to None.
+            sort_by (Optional[str], optional): The name of the sort column. Defaults to None.
+            sort_order (Optional[str], optional): The sort order (asc or desc). Defaults to None.
+
+        Returns:
+            Keyset: The keyset of the page
+
+        Raises:
+            InvalidCursorError: If the cursor is not valid, or was issued for another ordering
+        """
+        sort_by, sort_order = self.resolve(sort_by, sort_order)
+        if not cursor:
+            return Keyset(self, sort_by, sort_order)
+
+        cursor_sort_by, cursor_sort_order, values = decode_cursor(cursor)
+        if (cursor_sort_by, cursor_sort_order) != (sort_by, sort_order):
+            raise InvalidCursorError(
+                f"The cursor was issued for sort_by={cursor_sort_by} and sort_order={cursor_sort_order}"
+            )
+
+        # The key value is never NULL, and is preceded by the sort value unless sorting by the key
+        if len(values) != (1 if sort_by == self.key_column else 2) or values[-1] is None:
+            raise InvalidCursorError("Invalid cursor")
+        return Keyset(self, sort_by, sort_order, values)
@@ -0,0 +1,181 @@
+"""
+Time partition maintenance.
+
+timeseries_data is partitioned by day and logs by week. Rows no partition covers land
+in a default partition, so inserts never fail, but queries only prune to a partition
+that exists. A maintenance thread creates the partitions of the next PARTITION_PREMAKE_DAYS
+days every PARTITION_MAINTENANCE_INTERVAL seconds, moving any rows of their range out of
+the default partition.
+
+Retention detaches and drops the partitions whose whole range is past the retention
+period instead of deleting their rows, which leaves no dead tuples for autovacuum.
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Dict
+
+from config import Config
+from .connection import get_db_connection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Time-partitioned tables and the range of their partitions
+TIME_PARTITIONED_TABLES = {
+    "timeseries_data": "1 day",
+    "logs": "1 week"
+}
+
+CREATE_TIME_PARTITIONS_QUERY = """
+    SELECT public.create_time_partitions(
+        %s, %s::interval, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP + make_interval(days => %s)
+    )
+"""
+
+DROP_TIME_PARTITIONS_QUERY = "SELECT public.drop_time_partitions(%s, %s)"
+
+# Maintenance thread state
+_maintenance_thread = None
+_maintenance_stop_event = threading.Event()
+
+def create_time_partitions(cursor, table: str, days_ahead: int) -> int:
+    """
+    Create the missing partitions of a table from now to a number of days ahead.
+
+    Args:
+        cursor: The database cursor
+        table (str): The time-partitioned table
+        days_ahead (int): The number of days ahead to create partitions for
+
+    Returns:
+        int: The number of created partitions
+    """
+    cursor.execute(CREATE_TIME_PARTITIONS_QUERY, (table, TIME_PARTITIONED_TABLES[table], days_ahead))
+    return cursor.fetchone()[0]
+
+def drop_time_partitions(cursor, table: str, before: datetime) -> int:
+    """
+    Detach and drop the partitions of a table whose whole range is older than a cutoff.
+
+    Rows older than the cutoff in the default partition are deleted.
+
+    Args:
+        cursor: The database cursor
+        table (str): The time-partitioned table
+        before (datetime): The cutoff
+
+    Returns:
+        int: The number of dropped rows
+    """
+    if table not in TIME_PARTITIONED_TABLES:
+        raise ValueError(f"Table '{table}' is not time-partitioned")
+
+    cursor.execute(DROP_TIME_PARTITIONS_QUERY, (table, before))
+    return cursor.fetchone()[0]
+
+def ensure_time_partitions(days_ahead: int = None) -> Dict[str, int]:
+    """
+    Create the missing partitions of every time-partitioned table.
+
+    Args:
+        days_ahead (int, optional): The number of days ahead to create partitions for.
+            Defaults to Config.PARTITION_PREMAKE_DAYS.
+
+    Returns:
+        Dict[str, int]: The number of created partitions per table
+    """
+    if days_ahead is None:
+        days_ahead = Config.PARTITION_PREMAKE_DAYS
+
+    created = {}
+    with get_db_connection() as conn:
+        if not conn:
+            logger.error("Failed to get database connection for partition maintenance")
+            return created
+
+        cursor = conn.cursor()
+        try:
+            for table in TIME_PARTITIONED_TABLES:
+                try:
+                    created[table] = create_time_partitions(cursor, table, days_ahead)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    logger.error(f"Error creating partitions of {table}: {e}")
+                    continue
+
+                if created[table]:
+                    logger.info(f"Created {created[table]} partitions of {table}")
+        finally:
+            cursor.close()
+
+    return created
+
+def maintenance_thread_func() -> None:
+    """
+    Partition maintenance thread function.
+    """
+    logger.info("Partition maintenance thread started")
+
+    while True:
+        try:
+            ensure_time_partitions()
+        except Exception as e:
+            logger.error(f"Error in partition maintenance thread: {e}")
+
+        if _maintenance_stop_event.wait(Config.PARTITION_MAINTENANCE_INTERVAL):
+            break
+
+    logger.info("Partition maintenance thread stopped")
+
+def start_partition_maintenance() -> None:
+    """
+    Start the periodic creation of partitions.
+    """
+    global _maintenance_thread
+
+    if _maintenance_thread and _maintenance_thread.is_alive():
+        logger.warning("Partition maintenance thread is already running")
+        return
+
+    # Reset stop event
+    _maintenance_stop_event.clear()
+
+    # Create and start maintenance thread
+    _maintenance_thread = threading.Thread(target=maintenance_thread_func, daemon=True)
+    _maintenance_thread.start()
+
+    logger.info("Partition maintenance started")
+
+def stop_partition_maintenance() -> None:
+    """
+    Stop the periodic creation of partitions.
+    """
+    global _maintenance_thread
+
+    if not _maintenance_thread or not _maintenance_thread.is_alive():
+        logger.warning("Partition maintenance thread is not running")
+        return
+
+    # Set stop event
+    _maintenance_stop_event.set()
+
+    # Wait for thread to stop
+    _maintenance_thread.join(timeout=5)
+    _maintenance_thread = None
+
+    logger.info("Partition maintenance stopped")
+
+def init_partition_maintenance() -> None:
+    """
+    Initialize partition maintenance.
+    """
+    start_partition_maintenance()
+
+def shutdown_partition_maintenance() -> None:
+    """
+    Shutdown partition maintenance.
+    """
+    stop_partition_maintenance()
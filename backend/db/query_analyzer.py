@@ -10,7 +10,7 @@ import time
 import re
 import json
 from typing import Dict, Any, List, Optional, Tuple, Callable
-from functools import wraps
+from functools import wraps, lru_cache
 from contextlib import contextmanager
 from threading import local
 
@@ -70,58 +70,130 @@ def get_query_type(query: str) -> str:
     else:
         return "OTHER"
 
+# SQL comments and string literals are removed before looking for table names
+_COMMENT_PATTERN = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_STRING_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'")
+
+# Table names, optionally schema-qualified and quoted
+_IDENTIFIER = r'(?:"[^"]+"|[a-z_][a-z0-9_$]*)'
+_TABLE_NAME = rf'{_IDENTIFIER}(?:\s*\.\s*{_IDENTIFIER})?'
+
+# Tables read in FROM and JOIN clauses; group 2 is set for function calls, which are skipped
+_FROM_TABLE_PATTERN = re.compile(
+    rf'\b(?:from|join)\s+(?:only\s+)?({_TABLE_NAME})(?![a-z0-9_$".])(\s*\([^()]*\))?'
+)
+# Further items of a comma-separated FROM list, each after an optional alias
+_FROM_LIST_TABLE_PATTERN = re.compile(
+    rf'(?:\s+(?:as\s+)?{_IDENTIFIER})?\s*,\s*(?:only\s+)?({_TABLE_NAME})(?![a-z0-9_$".])(\s*\([^()]*\))?'
+)
+
+# Tables written by a statement
+_WRITE_TABLE_PATTERNS = [
+    re.compile(rf'\binsert\s+into\s+({_TABLE_NAME})'),
+    re.compile(rf'\bupdate\s+(?:only\s+)?({_TABLE_NAME})(?:\s+(?:as\s+)?{_IDENTIFIER})?\s+set\b'),
+    re.compile(rf'\bdelete\s+from\s+(?:only\s+)?({_TABLE_NAME})'),
+    re.compile(rf'\bmerge\s+into\s+({_TABLE_NAME})'),
+    re.compile(rf'\bcopy\s+({_TABLE_NAME})(?:\s*\([^)]*\))?\s+from\b'),
+]
+_TRUNCATE_PATTERN = re.compile(rf'\btruncate\s+(?:table\s+)?(?:only\s+)?({_TABLE_NAME}(?:\s*,\s*{_TABLE_NAME})*)')
+
+# Words that can follow FROM without being a table
+_NON_TABLE_WORDS = {"select", "lateral", "stdin", "stdout", "values", "only"}
+
+# Database functions that write to tables, for statements like SELECT add_log_entry(...)
+WRITE_FUNCTION_TABLES = {
+    "add_log_entry": ["logs"],
+    "cleanup_old_logs": ["logs"],
+}
+_WRITE_FUNCTION_PATTERN = re.compile(
+    r'\b(' + '|'.join(re.escape(name) for name in WRITE_FUNCTION_TABLES) + r')\s*\('
+)
+
+def _normalize_sql(query: str) -> str:
+    """Lowercase a query and strip its comments and string literals."""
+    query = _COMMENT_PATTERN.sub(" ", query)
+    query = _STRING_LITERAL_PATTERN.sub("''", query)
+    return query.lower()
+
+def _normalize_table_name(name: str) -> str:
+    """Strip quotes, whitespace and the public schema from a table name."""
+    name = re.sub(r'\s+', '', name).replace('"', '')
+    if name.startswith("public."):
+        name = name[len("public."):]
+    return name
+
+@lru_cache(maxsize=1024)
+def _parse_read_tables(query: str) -> Tuple[str, ...]:
+    """Extract the tables read by a query (cached, as the same queries run repeatedly)."""
+    query = _normalize_sql(query)
+    tables = set()
+
+    for match in _FROM_TABLE_PATTERN.finditer(query):
+        if not match.group(2):
+            tables.add(match.group(1))
+
+        # Follow a comma-separated FROM list
+        list_match = _FROM_LIST_TABLE_PATTERN.match(query, match.end())
+        while list_match:
+            if not list_match.group(2):
+                tables.add(list_match.group(1))
+            list_match = _FROM_LIST_TABLE_PATTERN.match(query, list_match.end())
+
+    return tuple(sorted(
+        _normalize_table_name(table) for table in tables
+        if _normalize_table_name(table) not in _NON_TABLE_WORDS
+    ))
+
+@lru_cache(maxsize=1024)
+def _parse_write_tables(query: str) -> Tuple[str, ...]:
+    """Extract the tables written by a statement (cached, as the same statements run repeatedly)."""
+    query = _normalize_sql(query)
+    tables = set()
+
+    for pattern in _WRITE_TABLE_PATTERNS:
+        for match in pattern.finditer(query):
+            tables.add(_normalize_table_name(match.group(1)))
+
+    for match in _TRUNCATE_PATTERN.finditer(query):
+        tables.update(_normalize_table_name(table) for table in match.group(1).split(","))
+
+    for match in _WRITE_FUNCTION_PATTERN.finditer(query):
+        tables.update(WRITE_FUNCTION_TABLES[match.group(1)])
+
+    return tuple(sorted(tables))
+
 def get_tables_from_query(query: str) -> List[str]:
     """
     Extract table names from a query.
-    
+
+    This covers the tables a query reads (FROM and JOIN clauses, including
+    comma-separated FROM lists) and the tables it writes. It is a pattern-based
+    parser, not a full SQL parser; it errs on the side of reporting extra names,
+    such as CTE names.
+
     Args:
         query (str): The SQL query
-        
+
+    Returns:
+        List[str]: List of table names
+    """
+    return sorted(set(_parse_read_tables(query)) | set(_parse_write_tables(query)))
+
+def get_write_tables_from_query(query: str) -> List[str]:
+    """
+    Extract the names of the tables a statement writes.
+
+    This covers INSERT, UPDATE, DELETE, MERGE, TRUNCATE and COPY ... FROM targets,
+    including data-modifying CTEs, and calls to the functions in WRITE_FUNCTION_TABLES.
+    Tables only read by the statement (e.g. in INSERT ... SELECT) are not included.
+
+    Args:
+        query (str): The SQL statement
+
     Returns:
         List[str]: List of table names
     """
-    # This is a simple implementation that may not work for all queries
-    # For a more robust solution, consider using a SQL parser
-    
-    # Convert to lowercase for case-insensitive matching
-    query = query.lower()
-    
-    # Find tables in FROM clause
-    from_tables = []
-    from_match = re.search(r'from\s+([a-zA-Z0-9_,\s]+)', query)
-    if from_match:
-        tables_str = from_match.group(1)
-        from_tables = [t.strip() for t in tables_str.split(',')]
-    
-    # Find tables in JOIN clauses
-    join_tables = []
-    join_matches = re.finditer(r'join\s+([a-zA-Z0-9_]+)', query)
-    for match in join_matches:
-        join_tables.append(match.group(1).strip())
-    
-    # Find tables in UPDATE clause
-    update_tables = []
-    update_match = re.search(r'update\s+([a-zA-Z0-9_]+)', query)
-    if update_match:
-        update_tables.append(update_match.group(1).strip())
-    
-    # Find tables in INSERT clause
-    insert_tables = []
-    insert_match = re.search(r'insert\s+into\s+([a-zA-Z0-9_]+)', query)
-    if insert_match:
-        insert_tables.append(insert_match.group(1).strip())
-    
-    # Find tables in DELETE clause
-    delete_tables = []
-    delete_match = re.search(r'delete\s+from\s+([a-zA-Z0-9_]+)', query)
-    if delete_match:
-        delete_tables.append(delete_match.group(1).strip())
-    
-    # Combine all tables
-    all_tables = from_tables + join_tables + update_tables + insert_tables + delete_tables
-    
-    # Remove duplicates and return
-    return list(set(all_tables))
+    return list(_parse_write_tables(query))
 
 def analyze_query(query: str, execution_time: float) -> Dict[str, Any]:
     """
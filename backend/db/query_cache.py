@@ -3,227 +3,546 @@ Query cache for caching database query results.
 
 This module provides functions for caching database query results to improve performance.
 It supports time-based and size-based cache invalidation.
+
+The cache is split into lock-striped segments. Each segment is an LRU (an OrderedDict
+in access order) with its own lock, item limit and byte budget, so lookups, inserts and
+evictions are O(1) and threads working on different keys do not serialize on one lock.
+Every entry carries its own expiry time.
+
+Keys are tuples of the RLS identity the query runs under, the query text and the
+normalized parameters, so results are never shared between users with different
+Row-Level Security contexts.
+
+Every entry is tagged with the tables its query reads (see get_tables_from_query()).
+A write only invalidates the entries tagged with the tables it writes; entries whose
+tables cannot be determined are tagged ALL_TABLES and invalidated by every write.
 """
 
 import logging
 import time
-import hashlib
 import json
+import sys
 import threading
-from typing import Dict, Any, List, Optional, Tuple, Callable, Union
-from functools import wraps
+import inspect
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple, Callable, Union, Hashable, FrozenSet, Iterable
+from uuid import UUID
+from functools import wraps, lru_cache
 from contextlib import contextmanager
 
+from .query_analyzer import get_tables_from_query, get_write_tables_from_query
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Cache configuration
 DEFAULT_CACHE_TTL = 60  # seconds
-DEFAULT_CACHE_SIZE = 100  # items
+DEFAULT_CACHE_SIZE = 1000  # items
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 64 MB
+DEFAULT_CACHE_STRIPES = 16  # must be a power of two
 DEFAULT_ENABLE_CACHE = True
 
+# Number of items sampled to estimate the size of large results
+SIZE_SAMPLE_ITEMS = 32
+
+# Tag of entries whose tables are unknown; they are invalidated by every write
+ALL_TABLES = "*"
+
+# Suffix of the views that apply RLS to a table (e.g. accounts_with_rls)
+RLS_VIEW_SUFFIX = "_with_rls"
+
+# Parameter types that are hashable and compare only to values of the same meaning
+_SCALAR_PARAM_TYPES = (str, int, float, bool, bytes, type(None), Decimal, UUID, datetime, date, dt_time, timedelta)
+
+class _CacheStripe:
+    """One lock-protected LRU segment of the query cache."""
+
+    __slots__ = ("lock", "entries", "tables", "max_items", "max_bytes", "bytes", "stats", "table_stats")
+
+    def __init__(self, max_items: int, max_bytes: int):
+        self.lock = threading.Lock()
+        # key -> (value, expires_at, size, tables), least recently used first
+        self.entries = OrderedDict()
+        # table -> keys of the entries tagged with the table
+        self.tables = {}
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.stats = _new_stripe_stats()
+        self.table_stats = {}
+
+    def get(self, key: Hashable, now: float, tables: Optional[FrozenSet[str]] = None) -> Optional[Tuple[Any, float]]:
+        """Get a value and its expiry time, moving the entry to the most recently used end."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                self._count_tables(tables, "misses")
+                return None
+
+            value, expires_at, _, entry_tables = entry
+            if now >= expires_at:
+                # Remove the expired value
+                self._unlink(key)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                self._count_tables(entry_tables, "misses")
+                return None
+
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            self._count_tables(entry_tables, "hits")
+            return value, expires_at
+
+    def put(self, key: Hashable, value: Any, expires_at: float, size: int, tables: FrozenSet[str]) -> bool:
+        """Put a value in the stripe, evicting least recently used entries as needed."""
+        with self.lock:
+            # A value larger than the whole stripe budget would evict everything else
+            if size > self.max_bytes:
+                self.stats["rejections"] += 1
+                return False
+
+            if key in self.entries:
+                self._unlink(key)
+
+            self.entries[key] = (value, expires_at, size, tables)
+            self.bytes += size
+            for table in tables:
+                self.tables.setdefault(table, set()).add(key)
+            self.stats["inserts"] += 1
+
+            self._evict()
+            return True
+
+    def pop(self, key: Hashable) -> bool:
+        """Remove an entry, returning True if it existed."""
+        with self.lock:
+            if key not in self.entries:
+                return False
+
+            self._unlink(key)
+            self.stats["invalidations"] += 1
+            return True
+
+    def remove_matching(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove all entries whose key matches a predicate, returning the number removed."""
+        with self.lock:
+            keys_to_remove = [key for key in self.entries if predicate(key)]
+            for key in keys_to_remove:
+                self._unlink(key)
+
+            self.stats["invalidations"] += len(keys_to_remove)
+            return len(keys_to_remove)
+
+    def remove_tables(self, tables: Iterable[str]) -> int:
+        """Remove all entries tagged with any of the tables or with ALL_TABLES, returning the number removed."""
+        with self.lock:
+            keys_to_remove = set()
+            for table in tables:
+                keys = self.tables.get(table)
+                if keys:
+                    keys_to_remove.update(keys)
+                    self._count_table(table, "invalidations", len(keys))
+
+            keys_to_remove.update(self.tables.get(ALL_TABLES, ()))
+
+            for key in keys_to_remove:
+                self._unlink(key)
+
+            self.stats["invalidations"] += len(keys_to_remove)
+            return len(keys_to_remove)
+
+    def remove_expired(self, now: float) -> int:
+        """Remove all expired entries, returning the number removed."""
+        with self.lock:
+            keys_to_remove = [key for key, entry in self.entries.items() if now >= entry[1]]
+            for key in keys_to_remove:
+                self._unlink(key)
+
+            self.stats["expirations"] += len(keys_to_remove)
+            return len(keys_to_remove)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        with self.lock:
+            self.entries.clear()
+            self.tables.clear()
+            self.bytes = 0
+            self.stats["invalidations"] += 1
+
+    def resize(self, max_items: int, max_bytes: int) -> None:
+        """Change the limits of the stripe, evicting entries that no longer fit."""
+        with self.lock:
+            self.max_items = max_items
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def _evict(self) -> None:
+        """Evict least recently used entries until the stripe is within its limits (lock held)."""
+        while self.entries and (len(self.entries) > self.max_items or self.bytes > self.max_bytes):
+            self._unlink(next(iter(self.entries)))
+            self.stats["evictions"] += 1
+
+    def _unlink(self, key: Hashable) -> None:
+        """Remove an entry and its table tags (lock held)."""
+        _, _, size, tables = self.entries.pop(key)
+        self.bytes -= size
+        for table in tables:
+            keys = self.tables.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tables[table]
+
+    def _count_tables(self, tables: Optional[FrozenSet[str]], name: str) -> None:
+        """Count a hit or miss for every table of an entry (lock held)."""
+        if tables:
+            for table in tables:
+                self._count_table(table, name)
+
+    def _count_table(self, table: str, name: str, count: int = 1) -> None:
+        """Add to a per-table counter (lock held)."""
+        table_stats = self.table_stats.get(table)
+        if table_stats is None:
+            table_stats = self.table_stats[table] = {"hits": 0, "misses": 0, "invalidations": 0}
+        table_stats[name] += count
+
+def _new_stripe_stats() -> Dict[str, int]:
+    """Create the statistics counters of a cache stripe."""
+    return {
+        "hits": 0,
+        "misses": 0,
+        "inserts": 0,
+        "evictions": 0,
+        "expirations": 0,
+        "rejections": 0,
+        "invalidations": 0,
+    }
+
+def _stripe_limits(max_items: int, max_bytes: int, stripes: int) -> Tuple[int, int]:
+    """Split the cache limits evenly across the stripes."""
+    return max(1, -(-max_items // stripes)), max(1, max_bytes // stripes)
+
+def _create_stripes() -> List[_CacheStripe]:
+    """Create the cache stripes for the current configuration."""
+    max_items, max_bytes = _stripe_limits(DEFAULT_CACHE_SIZE, DEFAULT_CACHE_MAX_BYTES, DEFAULT_CACHE_STRIPES)
+    return [_CacheStripe(max_items, max_bytes) for _ in range(DEFAULT_CACHE_STRIPES)]
+
 # Cache storage
-_cache = {}
-_cache_stats = {
-    "hits": 0,
-    "misses": 0,
-    "inserts": 0,
-    "evictions": 0,
-    "invalidations": 0,
-    "size": 0
-}
+_stripes = _create_stripes()
+_stripe_mask = DEFAULT_CACHE_STRIPES - 1
+
+def _get_stripe(key: Hashable) -> _CacheStripe:
+    """Get the stripe responsible for a key."""
+    return _stripes[hash(key) & _stripe_mask]
+
+def _normalize_param(param: Any) -> Hashable:
+    """
+    Convert a query parameter into a hashable value for a cache key.
 
-# Cache lock
-_cache_lock = threading.RLock()
+    The type is kept with scalar values so that values that compare equal in Python
+    but differ in SQL (1, 1.0 and True) do not share a cache entry.
+    """
+    if isinstance(param, _SCALAR_PARAM_TYPES):
+        return (param.__class__, param)
+    if isinstance(param, (list, tuple)):
+        return (param.__class__, tuple(_normalize_param(item) for item in param))
+    if isinstance(param, dict):
+        return (dict, tuple(sorted((str(k), _normalize_param(v)) for k, v in param.items())))
+    if isinstance(param, (set, frozenset)):
+        return (frozenset, tuple(sorted(repr(_normalize_param(item)) for item in param)))
+
+    # Fall back to the textual representation of other objects
+    return (param.__class__, repr(param))
 
-def generate_cache_key(query: str, params: Optional[Tuple] = None) -> str:
+def generate_cache_key(query: str, params: Optional[Union[Tuple, List, Dict, Any]] = None,
+                       identity: Optional[Tuple] = None) -> Tuple:
     """
     Generate a cache key for a query and parameters.
 
     Args:
         query (str): The SQL query
-        params (Optional[Tuple], optional): Query parameters. Defaults to None.
+        params (Optional[Union[Tuple, List, Dict, Any]], optional): Query parameters; a sequence,
+            a mapping for named placeholders, or a single value. Defaults to None.
+        identity (Optional[Tuple], optional): The RLS identity the query runs under. Defaults to None.
 
     Returns:
-        str: The cache key
-    """
-    # Create a string representation of the query
-    key_str = str(query)
-
-    # If params is provided, add a hash of the params
-    if params:
-        try:
-            # Check if params is actually a tuple or list
-            if not isinstance(params, (tuple, list)):
-                # Convert string or other single value to a tuple with one element
-                if isinstance(params, (str, int, float, bool)):
-                    params = (params,)
-                    logger.debug(f"Converted single value param to tuple: {params}")
-                else:
-                    logger.warning(f"Params is not a tuple or list: {type(params)}")
-                    # Try to convert to a tuple if possible
-                    try:
-                        params = tuple([params])
-                        logger.debug(f"Converted non-standard param to tuple: {params}")
-                    except:
-                        # Use a random hash for non-tuple/list params
-                        import random
-                        random_suffix = "_random_" + str(random.getrandbits(32))
-                        key_str = str(key_str) + random_suffix
-                        # Skip the rest of the param processing
-                        return hashlib.md5(key_str.encode()).hexdigest()
-            else:
-                # Convert params to a JSON-serializable format
-                serializable_params = []
-                for param in params:
-                    if isinstance(param, (str, int, float, bool, type(None))):
-                        serializable_params.append(param)
-                    else:
-                        # For complex objects, use their class name and id
-                        param_repr = f"<{param.__class__.__name__}_{id(param)}>"
-                        serializable_params.append(param_repr)
-
-                # Create a hash of the serialized params
-                params_str = json.dumps(serializable_params, sort_keys=True)
-                params_hash = hashlib.md5(params_str.encode()).hexdigest()
-                key_str = str(key_str) + "_params_" + params_hash
-        except Exception as e:
-            logger.warning(f"Error serializing params for cache key: {e}")
-            # Use a random hash as fallback
-            import random
-            random_suffix = "_random_" + str(random.getrandbits(32))
-            key_str = str(key_str) + random_suffix
-
-    # Generate a hash of the final key string
-    return hashlib.md5(key_str.encode()).hexdigest()
-
-def get_from_cache(key: str) -> Optional[Tuple[Any, float]]:
+        Tuple: The cache key
     """
-    Get a value from the cache.
+    if params is None:
+        params_key = None
+    elif isinstance(params, (tuple, list)):
+        params_key = tuple(_normalize_param(param) for param in params)
+    else:
+        params_key = _normalize_param(params)
+
+    return (identity, str(query), params_key)
+
+def get_rls_identity(user_id: Any, user_role: Any, with_rls: bool = True) -> Optional[Tuple[str, str]]:
+    """
+    Get the RLS identity a query runs under.
+
+    This mirrors DatabaseAccess.get_connection(): the RLS context is only set when
+    with_rls is True and both user_id and user_role are set. Queries without an RLS
+    context see the same rows for every caller and share one identity (None).
 
     Args:
-        key (str): The cache key
+        user_id (Any): The ID of the user
+        user_role (Any): The role of the user
+        with_rls (bool, optional): Whether the query uses the RLS context. Defaults to True.
 
     Returns:
-        Optional[Tuple[Any, float]]: The cached value and timestamp, or None if not found
+        Optional[Tuple[str, str]]: The (user_id, user_role) identity, or None without RLS context
     """
-    with _cache_lock:
-        if key in _cache:
-            value, timestamp = _cache[key]
+    if with_rls and user_id and user_role:
+        return (str(user_id), str(user_role))
+    return None
 
-            # Check if the value has expired
-            if time.time() - timestamp > DEFAULT_CACHE_TTL:
-                # Remove the expired value
-                del _cache[key]
-                _cache_stats["evictions"] += 1
-                _cache_stats["size"] = len(_cache)
-                return None
+def _get_base_table(table: str) -> str:
+    """Map an RLS view to the table it reads, so that writes to the table invalidate it."""
+    if table.endswith(RLS_VIEW_SUFFIX):
+        return table[:-len(RLS_VIEW_SUFFIX)]
+    return table
 
-            # Update cache statistics
-            _cache_stats["hits"] += 1
+@lru_cache(maxsize=1024)
+def get_query_tables(query: str) -> FrozenSet[str]:
+    """
+    Get the tables a cached query is tagged with.
 
-            return value, timestamp
+    Args:
+        query (str): The SQL query
 
-        # Update cache statistics
-        _cache_stats["misses"] += 1
+    Returns:
+        FrozenSet[str]: The tables the query reads, or ALL_TABLES if they cannot be determined
+    """
+    tables = frozenset(_get_base_table(table) for table in get_tables_from_query(query))
+    return tables or frozenset((ALL_TABLES,))
 
-        return None
+@lru_cache(maxsize=1024)
+def is_read_only_query(query: str) -> bool:
+    """
+    Check whether a query only reads data, so that its results may be cached.
+
+    Args:
+        query (str): The SQL query
+
+    Returns:
+        bool: True for SELECT (and WITH ... SELECT) queries that write no table, False otherwise
+    """
+    if not query.lstrip().upper().startswith(("SELECT", "WITH")):
+        return False
+    return not get_write_tables_from_query(query)
+
+def _estimate_size(value: Any, depth: int = 0) -> int:
+    """
+    Estimate the memory used by a cached value in bytes.
+
+    Containers with more than SIZE_SAMPLE_ITEMS items are estimated from a sample of
+    their first items, so large results are sized in constant time.
+    """
+    size = sys.getsizeof(value)
+    if depth > 3:
+        return size
+
+    if isinstance(value, dict):
+        # Keys of result rows are column names shared by every row, so only values are counted
+        size += sum(_estimate_size(item, depth + 1) for item in value.values())
+    elif isinstance(value, (list, tuple)):
+        count = len(value)
+        if count > SIZE_SAMPLE_ITEMS:
+            sample_size = sum(_estimate_size(item, depth + 1) for item in value[:SIZE_SAMPLE_ITEMS])
+            size += sample_size * count // SIZE_SAMPLE_ITEMS
+        else:
+            size += sum(_estimate_size(item, depth + 1) for item in value)
+
+    return size
+
+def _get_key_tables(key: Hashable) -> FrozenSet[str]:
+    """Get the tables of a key built by generate_cache_key()."""
+    if isinstance(key, tuple) and len(key) == 3 and isinstance(key[1], str):
+        return get_query_tables(key[1])
+    return frozenset((ALL_TABLES,))
+
+def get_from_cache(key: Hashable) -> Optional[Tuple[Any, float]]:
+    """
+    Get a value from the cache.
+
+    Args:
+        key (Hashable): The cache key
+
+    Returns:
+        Optional[Tuple[Any, float]]: The cached value and its expiry time, or None if not found
+    """
+    return _get_stripe(key).get(key, time.time(), _get_key_tables(key))
 
-def put_in_cache(key: str, value: Any) -> None:
+def put_in_cache(key: Hashable, value: Any, ttl: Optional[int] = None) -> bool:
     """
     Put a value in the cache.
 
+    The entry is tagged with the tables read by the query of the key.
+
     Args:
-        key (str): The cache key
+        key (Hashable): The cache key
         value (Any): The value to cache
-    """
-    with _cache_lock:
-        # Check if the cache is full
-        if len(_cache) >= DEFAULT_CACHE_SIZE:
-            # Remove the oldest item
-            oldest_key = min(_cache.items(), key=lambda x: x[1][1])[0]
-            del _cache[oldest_key]
-            _cache_stats["evictions"] += 1
+        ttl (Optional[int], optional): The TTL of the entry in seconds. Defaults to DEFAULT_CACHE_TTL.
 
-        # Add the new item
-        _cache[key] = (value, time.time())
-        _cache_stats["inserts"] += 1
-        _cache_stats["size"] = len(_cache)
+    Returns:
+        bool: True if the value was cached, False if it is too large for the cache
+    """
+    expires_at = time.time() + (ttl if ttl is not None else DEFAULT_CACHE_TTL)
+    return _get_stripe(key).put(key, value, expires_at, _estimate_size(value), _get_key_tables(key))
 
-def invalidate_cache(key: Optional[str] = None) -> None:
+def invalidate_cache(key: Optional[Hashable] = None) -> None:
     """
     Invalidate the cache.
 
     Args:
-        key (Optional[str], optional): The cache key to invalidate. Defaults to None.
-    """
-    with _cache_lock:
-        if key:
-            # Invalidate a specific key
-            if key in _cache:
-                del _cache[key]
-                _cache_stats["invalidations"] += 1
-                _cache_stats["size"] = len(_cache)
-        else:
-            # Invalidate the entire cache
-            _cache.clear()
-            _cache_stats["invalidations"] += 1
-            _cache_stats["size"] = 0
+        key (Optional[Hashable], optional): The cache key to invalidate. Defaults to None.
+    """
+    if key:
+        # Invalidate a specific key
+        _get_stripe(key).pop(key)
+    else:
+        # Invalidate the entire cache
+        for stripe in _stripes:
+            stripe.clear()
 
 def invalidate_cache_by_prefix(prefix: str) -> None:
     """
-    Invalidate cache entries with keys starting with a prefix.
+    Invalidate cache entries for queries starting with a prefix.
 
     Args:
-        prefix (str): The prefix
+        prefix (str): The query prefix
     """
-    with _cache_lock:
-        # Find keys that start with the prefix
-        keys_to_remove = [k for k in _cache.keys() if k.startswith(prefix)]
+    for stripe in _stripes:
+        stripe.remove_matching(lambda key: key[1].startswith(prefix))
 
-        # Remove the keys
-        for key in keys_to_remove:
-            del _cache[key]
-            _cache_stats["invalidations"] += 1
+def invalidate_cache_by_identity(identity: Optional[Tuple[str, str]]) -> None:
+    """
+    Invalidate cache entries of one RLS identity.
 
-        _cache_stats["size"] = len(_cache)
+    Args:
+        identity (Optional[Tuple[str, str]]): The identity, as returned by get_rls_identity()
+    """
+    for stripe in _stripes:
+        stripe.remove_matching(lambda key: key[0] == identity)
 
 def invalidate_cache_by_table(table: str) -> None:
     """
     Invalidate cache entries for a specific table.
 
+    This removes the entries tagged with the table (or with the view applying RLS to
+    it) and the entries whose tables are unknown.
+
     Args:
         table (str): The table name
     """
-    # This is a simple implementation that invalidates all cache entries
-    # For a more sophisticated implementation, you would need to parse the queries
-    # and determine which tables they affect
-    invalidate_cache()
+    invalidate_cache_by_tables([table])
 
-def get_cache_stats() -> Dict[str, int]:
+def invalidate_cache_by_tables(tables: Iterable[str]) -> None:
     """
-    Get cache statistics.
+    Invalidate cache entries for several tables at once.
+
+    Args:
+        tables (Iterable[str]): The table names
+    """
+    tables = {_get_base_table(table) for table in tables}
+    if ALL_TABLES in tables:
+        invalidate_cache()
+        return
+
+    for stripe in _stripes:
+        stripe.remove_tables(tables)
+
+def get_invalidated_tables(query: str) -> List[str]:
+    """
+    Get the tables whose cached results a statement invalidates.
+
+    If the written tables cannot be determined (DDL, or a function call that is not
+    listed in WRITE_FUNCTION_TABLES), the whole cache is invalidated.
+
+    Args:
+        query (str): The SQL statement being executed
 
     Returns:
-        Dict[str, int]: Cache statistics
+        List[str]: The written tables, or [ALL_TABLES] if the whole cache is invalidated
+    """
+    return get_write_tables_from_query(query) or [ALL_TABLES]
+
+def invalidate_cache_for_query(query: str) -> List[str]:
+    """
+    Invalidate cached query results for the tables written by a statement.
+
+    Args:
+        query (str): The SQL statement being executed
+
+    Returns:
+        List[str]: The invalidated tables, or [ALL_TABLES] if the whole cache was invalidated
+    """
+    tables = get_invalidated_tables(query)
+    invalidate_cache_by_tables(tables)
+    return tables
+
+def evict_expired_entries() -> int:
+    """
+    Remove all expired entries from the cache.
+
+    Expired entries are otherwise only removed when they are looked up or reach the
+    least recently used end of their stripe.
+
+    Returns:
+        int: The number of entries removed
+    """
+    now = time.time()
+    return sum(stripe.remove_expired(now) for stripe in _stripes)
+
+def get_cache_stats() -> Dict[str, Any]:
     """
-    with _cache_lock:
-        return _cache_stats.copy()
+    Get cache statistics.
+
+    Returns:
+        Dict[str, Any]: Cache statistics, with per-table hit rates under "tables"
+    """
+    stats = _new_stripe_stats()
+    stats["size"] = 0
+    stats["bytes"] = 0
+    tables = {}
+
+    for stripe in _stripes:
+        with stripe.lock:
+            for name, count in stripe.stats.items():
+                stats[name] += count
+            stats["size"] += len(stripe.entries)
+            stats["bytes"] += stripe.bytes
+
+            for table, table_stats in stripe.table_stats.items():
+                totals = tables.setdefault(table, {"hits": 0, "misses": 0, "invalidations": 0, "entries": 0})
+                for name, count in table_stats.items():
+                    totals[name] += count
+            for table, keys in stripe.tables.items():
+                totals = tables.setdefault(table, {"hits": 0, "misses": 0, "invalidations": 0, "entries": 0})
+                totals["entries"] += len(keys)
+
+    for totals in tables.values():
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_rate"] = round(totals["hits"] / lookups * 100, 2) if lookups else 0
+
+    stats["max_size"] = DEFAULT_CACHE_SIZE
+    stats["max_bytes"] = DEFAULT_CACHE_MAX_BYTES
+    stats["stripes"] = len(_stripes)
+    stats["tables"] = tables
+    return stats
 
 def reset_cache_stats() -> None:
     """
     Reset cache statistics.
     """
-    with _cache_lock:
-        global _cache_stats
-        _cache_stats = {
-            "hits": 0,
-            "misses": 0,
-            "inserts": 0,
-            "evictions": 0,
-            "invalidations": 0,
-            "size": len(_cache)
-        }
+    for stripe in _stripes:
+        with stripe.lock:
+            stripe.stats = _new_stripe_stats()
+            stripe.table_stats = {}
 
 def enable_cache() -> None:
     """
@@ -250,7 +569,9 @@ def is_cache_enabled() -> bool:
 
 def set_cache_ttl(ttl: int) -> None:
     """
-    Set the cache TTL.
+    Set the default cache TTL.
+
+    Entries already in the cache keep the expiry time they were stored with.
 
     Args:
         ttl (int): The TTL in seconds
@@ -258,56 +579,150 @@ def set_cache_ttl(ttl: int) -> None:
     global DEFAULT_CACHE_TTL
     DEFAULT_CACHE_TTL = ttl
 
+def _resize_stripes() -> None:
+    """Apply the configured cache limits to every stripe."""
+    max_items, max_bytes = _stripe_limits(DEFAULT_CACHE_SIZE, DEFAULT_CACHE_MAX_BYTES, len(_stripes))
+    for stripe in _stripes:
+        stripe.resize(max_items, max_bytes)
+
 def set_cache_size(size: int) -> None:
     """
     Set the cache size.
 
     Args:
-        size (int): The cache size
+        size (int): The cache size in items
     """
     global DEFAULT_CACHE_SIZE
     DEFAULT_CACHE_SIZE = size
+    _resize_stripes()
+
+def set_cache_max_bytes(max_bytes: int) -> None:
+    """
+    Set the maximum memory used by cached values.
+
+    Args:
+        max_bytes (int): The limit in bytes
+    """
+    global DEFAULT_CACHE_MAX_BYTES
+    DEFAULT_CACHE_MAX_BYTES = max_bytes
+    _resize_stripes()
+
+def _get_call_cache_key(args: Tuple, kwargs: Dict[str, Any]) -> Optional[Tuple]:
+    """
+    Build the cache key for a call to a function decorated with cached_query().
+
+    Args:
+        args (Tuple): Positional arguments of the call
+        kwargs (Dict[str, Any]): Keyword arguments of the call
+
+    Returns:
+        Optional[Tuple]: The cache key, or None if the call has no query to key on
+    """
+    # Get query and params from args or kwargs
+    query = None
+    params = None
+    identity = None
+
+    # For decorated methods the first argument is the instance, not the query.
+    # Entries are scoped to the RLS identity of the instance.
+    if len(args) > 0 and not isinstance(args[0], str):
+        instance = args[0]
+        args = args[1:]
+        with_rls = args[2] if len(args) > 2 else kwargs.get("with_rls", True)
+        identity = get_rls_identity(getattr(instance, 'user_id', None),
+                                    getattr(instance, 'user_role', None), with_rls)
+
+    # Try to find query and params in args
+    if len(args) > 0:
+        query = args[0]
+    if len(args) > 1:
+        params = args[1]
+
+    # Try to find query and params in kwargs
+    if "query" in kwargs:
+        query = kwargs["query"]
+    if "params" in kwargs:
+        params = kwargs["params"]
+
+    # If query is not found, the call is not cacheable
+    if not query:
+        return None
+
+    return generate_cache_key(query, params, identity)
 
 def cached_query(ttl: Optional[int] = None) -> Callable:
     """
     Decorator for caching query results.
 
+    Both regular functions and coroutine functions can be decorated.
+
     Args:
-        ttl (Optional[int], optional): The TTL in seconds. Defaults to None.
+        ttl (Optional[int], optional): The TTL in seconds. Defaults to DEFAULT_CACHE_TTL.
 
     Returns:
         Callable: The decorated function
     """
     def decorator(func: Callable) -> Callable:
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            # Check if the cache is enabled
-            if not DEFAULT_ENABLE_CACHE:
-                return func(*args, **kwargs)
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                # Check if the cache is enabled
+                if not DEFAULT_ENABLE_CACHE:
+                    return await func(*args, **kwargs)
+
+                try:
+                    key = _get_call_cache_key(args, kwargs)
+                    if key is None:
+                        return await func(*args, **kwargs)
+
+                    # Statements that write are never cached, but invalidate what they write
+                    if not is_read_only_query(key[1]):
+                        result = await func(*args, **kwargs)
+                        invalidate_cache_for_query(key[1])
+                        return result
+
+                    # Try to get the value from the cache
+                    cached_value = get_from_cache(key)
+
+                    if cached_value:
+                        value, _ = cached_value
+                        return value
+                except Exception as e:
+                    logger.warning(f"Error in cache handling, bypassing cache: {e}")
+                    return await func(*args, **kwargs)
 
-            # Get query and params from args or kwargs
-            query = None
-            params = None
+                # Call the function
+                result = await func(*args, **kwargs)
+
+                # Cache the result
+                try:
+                    put_in_cache(key, result, ttl)
+                except Exception as e:
+                    logger.warning(f"Error in cache handling, result not cached: {e}")
 
-            # Try to find query and params in args
-            if len(args) > 0:
-                query = args[0]
-            if len(args) > 1:
-                params = args[1]
+                return result
 
-            # Try to find query and params in kwargs
-            if "query" in kwargs:
-                query = kwargs["query"]
-            if "params" in kwargs:
-                params = kwargs["params"]
+            return async_wrapper
 
-            # If query is not found, just call the function
-            if not query:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            # Check if the cache is enabled
+            if not DEFAULT_ENABLE_CACHE:
                 return func(*args, **kwargs)
 
             # Generate a cache key with error handling
             try:
-                key = generate_cache_key(query, params)
+                key = _get_call_cache_key(args, kwargs)
+
+                # If query is not found, just call the function
+                if key is None:
+                    return func(*args, **kwargs)
+
+                # Statements that write are never cached, but invalidate what they write
+                if not is_read_only_query(key[1]):
+                    result = func(*args, **kwargs)
+                    invalidate_cache_for_query(key[1])
+                    return result
 
                 # Try to get the value from the cache
                 cached_value = get_from_cache(key)
@@ -315,19 +730,22 @@ def cached_query(ttl: Optional[int] = None) -> Callable:
                 if cached_value:
                     value, _ = cached_value
                     return value
-
-                # Call the function
-                result = func(*args, **kwargs)
-
-                # Cache the result
-                put_in_cache(key, result)
-
-                return result
             except Exception as e:
                 logger.warning(f"Error in cache handling, bypassing cache: {e}")
                 # If there's any error in the caching logic, just call the function directly
                 return func(*args, **kwargs)
 
+            # Call the function
+            result = func(*args, **kwargs)
+
+            # Cache the result
+            try:
+                put_in_cache(key, result, ttl)
+            except Exception as e:
+                logger.warning(f"Error in cache handling, result not cached: {e}")
+
+            return result
+
         return wrapper
 
     return decorator
@@ -368,13 +786,18 @@ def get_cache_report() -> str:
     report.append(f"Cache enabled: {is_cache_enabled()}")
     report.append(f"Cache TTL: {DEFAULT_CACHE_TTL} seconds")
     report.append(f"Cache size: {DEFAULT_CACHE_SIZE} items")
+    report.append(f"Cache memory limit: {DEFAULT_CACHE_MAX_BYTES} bytes")
+    report.append(f"Cache stripes: {stats['stripes']}")
     report.append(f"Current size: {stats['size']} items")
+    report.append(f"Current memory: {stats['bytes']} bytes")
     report.append("")
 
     report.append(f"Hits: {stats['hits']}")
     report.append(f"Misses: {stats['misses']}")
     report.append(f"Inserts: {stats['inserts']}")
     report.append(f"Evictions: {stats['evictions']}")
+    report.append(f"Expirations: {stats['expirations']}")
+    report.append(f"Rejections: {stats['rejections']}")
     report.append(f"Invalidations: {stats['invalidations']}")
 
     total_requests = stats["hits"] + stats["misses"]
@@ -382,6 +805,15 @@ def get_cache_report() -> str:
         hit_ratio = stats["hits"] / total_requests * 100
         report.append(f"Hit ratio: {hit_ratio:.2f}%")
 
+    if stats["tables"]:
+        report.append("")
+        report.append("Tables:")
+        for table, table_stats in sorted(stats["tables"].items()):
+            report.append(
+                f"  {table}: {table_stats['entries']} entries, hit ratio {table_stats['hit_rate']:.2f}%, "
+                f"{table_stats['invalidations']} invalidations"
+            )
+
     return "\n".join(report)
 
 def export_cache_stats(file_path: str) -> None:
@@ -391,15 +823,15 @@ def export_cache_stats(file_path: str) -> None:
     Args:
         file_path (str): The file path
     """
-    with _cache_lock:
-        data = {
-            "stats": _cache_stats,
-            "config": {
-                "ttl": DEFAULT_CACHE_TTL,
-                "size": DEFAULT_CACHE_SIZE,
-                "enabled": DEFAULT_ENABLE_CACHE
-            }
+    data = {
+        "stats": get_cache_stats(),
+        "config": {
+            "ttl": DEFAULT_CACHE_TTL,
+            "size": DEFAULT_CACHE_SIZE,
+            "max_bytes": DEFAULT_CACHE_MAX_BYTES,
+            "enabled": DEFAULT_ENABLE_CACHE
         }
+    }
 
     with open(file_path, "w") as f:
         json.dump(data, f, indent=2)
@@ -416,15 +848,21 @@ def import_cache_stats(file_path: str) -> None:
     with open(file_path, "r") as f:
         data = json.load(f)
 
-    with _cache_lock:
-        global _cache_stats
-        global DEFAULT_CACHE_TTL
-        global DEFAULT_CACHE_SIZE
-        global DEFAULT_ENABLE_CACHE
+    global DEFAULT_CACHE_TTL
+    global DEFAULT_CACHE_SIZE
+    global DEFAULT_CACHE_MAX_BYTES
+    global DEFAULT_ENABLE_CACHE
 
-        _cache_stats = data["stats"]
-        DEFAULT_CACHE_TTL = data["config"]["ttl"]
-        DEFAULT_CACHE_SIZE = data["config"]["size"]
-        DEFAULT_ENABLE_CACHE = data["config"]["enabled"]
+    DEFAULT_CACHE_TTL = data["config"]["ttl"]
+    DEFAULT_CACHE_SIZE = data["config"]["size"]
+    DEFAULT_CACHE_MAX_BYTES = data["config"].get("max_bytes", DEFAULT_CACHE_MAX_BYTES)
+    DEFAULT_ENABLE_CACHE = data["config"]["enabled"]
+    _resize_stripes()
+
+    # The imported counters are carried by the first stripe
+    reset_cache_stats()
+    with _stripes[0].lock:
+        for name in _stripes[0].stats:
+            _stripes[0].stats[name] = data["stats"].get(name, 0)
 
     logger.info(f"Cache statistics imported from {file_path}")
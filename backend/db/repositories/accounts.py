@@ -4,14 +4,349 @@ Account repository for database access.
 This module provides a repository class for accessing account data in the database.
 """
 
+import asyncio
+import io
 import logging
+import threading
 import time
-from typing import Optional, Dict, Any, List, Tuple, Union
+import uuid
+from contextlib import ExitStack
+from typing import Optional, Dict, Any, List, Tuple, Union, AsyncIterator, Callable
+from psycopg.rows import dict_row
+from config import Config
 from .base import BaseRepository
+from ..pagination import KeysetPaginator
+from ..query_analyzer import query_analyzer
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Fields that may be requested through get_account_info()
+ACCOUNT_INFO_FIELDS = [
+    "acc_id", "acc_username", "acc_password", "acc_email_address",
+    "acc_email_password", "acc_vault_address", "acc_vault_password",
+    "acc_created_at", "acc_session_start", "acc_steamguard_account_name",
+    "acc_confirm_type", "acc_device_id", "acc_identity_secret",
+    "acc_revocation_code", "acc_secret_1", "acc_serial_number",
+    "acc_server_time", "acc_shared_secret", "acc_status",
+    "acc_token_gid", "acc_uri", "id", "prime", "lock", "perm_lock",
+    "farmlabs_upload"
+]
+
+# Fields that accounts may be sorted by, the last tie broken by acc_id
+ACCOUNT_SORT_FIELDS = [
+    "acc_id", "acc_username", "acc_email_address",
+    "prime", "lock", "perm_lock", "acc_created_at"
+]
+
+# Fields that may be exported through export_accounts_async()
+ACCOUNT_EXPORT_FIELDS = [
+    "acc_id", "acc_username", "acc_email_address",
+    "prime", "lock", "perm_lock", "acc_created_at"
+]
+
+# Export formats: CSV with a header line, or one JSON object per line
+EXPORT_FORMATS = ("csv", "ndjson")
+
+# Size of the chunks yielded by export_accounts_async(). COPY sends one message per
+# row, which are gathered into chunks so that the response is not written row by row.
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Number of chunks the COPY may be ahead of the response
+EXPORT_QUEUE_SIZE = 8
+
+# Number of rows fetched at a time by stream_accounts_async()
+STREAM_BATCH_SIZE = 1000
+
+# Columns written by import_accounts(), besides owner_id
+ACCOUNT_IMPORT_COLUMNS = [
+    "acc_id", "acc_username", "acc_password", "acc_email_address", "acc_email_password",
+    "acc_vault_address", "acc_vault_password", "acc_created_at", "acc_session_start",
+    "acc_steamguard_account_name", "acc_confirm_type", "acc_device_id", "acc_identity_secret",
+    "acc_revocation_code", "acc_secret_1", "acc_serial_number", "acc_server_time",
+    "acc_shared_secret", "acc_status", "acc_token_gid", "acc_uri"
+]
+
+# Columns of ACCOUNT_IMPORT_COLUMNS that are NOT NULL in the accounts table
+ACCOUNT_IMPORT_REQUIRED_COLUMNS = [
+    column for column in ACCOUNT_IMPORT_COLUMNS
+    if column not in ("acc_email_address", "acc_email_password")
+]
+
+# Integer columns of ACCOUNT_IMPORT_COLUMNS, with their largest value
+ACCOUNT_IMPORT_INTEGER_COLUMNS = {
+    "acc_created_at": 2 ** 63 - 1,
+    "acc_session_start": 2 ** 63 - 1,
+    "acc_server_time": 2 ** 63 - 1,
+    "acc_confirm_type": 2 ** 31 - 1,
+    "acc_status": 2 ** 31 - 1
+}
+
+# Columns updated when an imported account already exists
+ACCOUNT_IMPORT_UPDATE_COLUMNS = [
+    "acc_username", "acc_password", "acc_email_address", "acc_email_password",
+    "acc_vault_address", "acc_vault_password"
+]
+
+_IMPORT_COLUMN_LIST = ", ".join(ACCOUNT_IMPORT_COLUMNS + ["owner_id"])
+
+# Staging table of an import, dropped at the end of its transaction
+CREATE_IMPORT_STAGING_QUERY = f"""
+    CREATE TEMPORARY TABLE account_import ON COMMIT DROP AS
+    SELECT 0 AS row_number, {_IMPORT_COLUMN_LIST}
+    FROM public.accounts
+    WITH NO DATA
+"""
+
+COPY_IMPORT_STAGING_QUERY = "COPY account_import FROM STDIN"
+
+# Rows of an account imported again by a later row, which takes precedence
+DELETE_SUPERSEDED_IMPORT_ROWS_QUERY = """
+    DELETE FROM account_import earlier
+    USING account_import later
+    WHERE earlier.acc_id = later.acc_id AND earlier.row_number < later.row_number
+"""
+
+# Staged rows are merged in two statements: existing accounts are only updated when the
+# RLS context can see them, new accounts are inserted. Accounts of other users are left
+# out of both and reported as failed instead of failing the whole statement.
+_IMPORT_UPSERT = f"""
+    INSERT INTO public.accounts ({_IMPORT_COLUMN_LIST})
+    SELECT {_IMPORT_COLUMN_LIST}
+    FROM account_import i
+    WHERE {{condition}}
+    ON CONFLICT (acc_id) DO {{action}}
+    RETURNING acc_id
+"""
+
+UPDATE_IMPORTED_ACCOUNTS_QUERY = _IMPORT_UPSERT.format(
+    condition="EXISTS (SELECT 1 FROM public.accounts a WHERE a.acc_id = i.acc_id)",
+    action="UPDATE SET " + ", ".join(f"{column} = EXCLUDED.{column}" for column in ACCOUNT_IMPORT_UPDATE_COLUMNS)
+)
+
+INSERT_IMPORTED_ACCOUNTS_QUERY = _IMPORT_UPSERT.format(
+    condition="NOT EXISTS (SELECT 1 FROM public.accounts a WHERE a.acc_id = i.acc_id)",
+    action="NOTHING"
+)
+
+# Release the locks of the leases that expired without being renewed
+RECLAIM_EXPIRED_LEASES_QUERY = """
+    UPDATE public.accounts
+    SET lock = false, lease_id = NULL, lease_expires_at = NULL
+    WHERE acc_id IN (
+        SELECT acc_id FROM public.accounts
+        WHERE lease_expires_at < NOW()
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+
+# Lock the first fresh accounts not being leased by a concurrent request, in one statement
+LEASE_FRESH_ACCOUNTS_QUERY = """
+    UPDATE public.accounts
+    SET lock = true, lease_id = %s, lease_expires_at = NOW() + make_interval(secs => %s)
+    WHERE acc_id IN (
+        SELECT acc_id FROM public.accounts
+        WHERE prime = false AND lock = false AND perm_lock = false
+        ORDER BY id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, acc_id, acc_username, lease_expires_at
+"""
+
+# Extend a lease that has not expired yet, since an expired lease may be reclaimed at any time
+RENEW_LEASE_QUERY = """
+    UPDATE public.accounts
+    SET lease_expires_at = NOW() + make_interval(secs => %s)
+    WHERE lease_id = %s AND lease_expires_at > NOW()
+    RETURNING acc_id, lease_expires_at
+"""
+
+# Release the accounts of a lease, unlocking them or keeping them locked without expiry
+RELEASE_LEASE_QUERY = """
+    UPDATE public.accounts
+    SET lock = %s, lease_id = NULL, lease_expires_at = NULL
+    WHERE lease_id = %s {acc_id_condition}
+    RETURNING acc_id
+"""
+
+# Proxy settings returned when an account has neither custom nor default settings
+EMPTY_PROXY_SETTINGS = {
+    "proxy_server": None,
+    "proxy_bypass": None,
+    "additional_settings": None
+}
+
+class _ExportWriter:
+    """File-like target of COPY TO STDOUT, handing the output over in chunks."""
+
+    def __init__(self, put: Callable[[bytes], None], stopped: threading.Event, cancel: Callable[[], None]):
+        self.put = put
+        self.stopped = stopped
+        self.cancel = cancel
+        self.buffer = bytearray()
+
+    def write(self, data: bytes) -> None:
+        if self.stopped.is_set():
+            # Cancel the query, instead of reading the rest of its output
+            self.cancel()
+            raise RuntimeError("Export stopped")
+        self.buffer += data
+        if len(self.buffer) >= EXPORT_CHUNK_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.put(bytes(self.buffer))
+            self.buffer.clear()
+
+def _copy_text(value: Any) -> str:
+    """Format a value for COPY in text format."""
+    if value is None:
+        return "\\N"
+    value = str(value)
+    if "\\" in value or "\t" in value or "\n" in value or "\r" in value:
+        value = (value.replace("\\", "\\\\").replace("\t", "\\t")
+                 .replace("\n", "\\n").replace("\r", "\\r"))
+    return value
+
+class AccountImport:
+    """
+    A bulk import of accounts, creating new accounts and updating existing ones.
+
+    The accounts are copied into a staging table as they are added, on a connection kept
+    until the import is closed, and merged into the accounts in one transaction. An
+    account that cannot be imported is reported as failed without aborting the others.
+    When an account is imported by several rows, the last one is used, and the outcome
+    is reported for each of them.
+    """
+
+    def __init__(self, repository: "AccountRepository"):
+        """
+        Initialize the import.
+
+        Args:
+            repository (AccountRepository): The repository whose RLS context the import uses.
+        """
+        self.repository = repository
+        self.failed: List[Dict[str, Any]] = []
+        self._row_numbers: Dict[str, List[int]] = {}
+        self._owner_id = _copy_text(repository.user_id)
+        self._exit_stack = ExitStack()
+        self._conn = None
+        self._cursor = None
+        self._committed = False
+
+    def __enter__(self) -> "AccountImport":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _get_cursor(self):
+        """Get the cursor of the import, creating the staging table on first use."""
+        if self._cursor is None:
+            conn = self._exit_stack.enter_context(self.repository.get_connection())
+            if not conn:
+                raise RuntimeError("No database connection available")
+
+            self._conn = conn
+            self._cursor = conn.cursor()
+            self._cursor.execute(CREATE_IMPORT_STAGING_QUERY)
+        return self._cursor
+
+    def add(self, accounts: List[Tuple[int, Dict[str, Any]]]) -> None:
+        """
+        Add a batch of accounts to the import.
+
+        Args:
+            accounts (List[Tuple[int, Dict[str, Any]]]): The row number and the account, by column name, of each row.
+        """
+        lines = []
+        for row_number, account in accounts:
+            values, error = AccountRepository._prepare_import_row(account)
+            if error:
+                self.failed.append({"row_number": row_number, "acc_id": account.get("acc_id"), "error": error})
+                continue
+
+            acc_id = str(account["acc_id"])
+            lines.append(f"{row_number}\t" + "\t".join(values) + "\t" + self._owner_id + "\n")
+            self._row_numbers.setdefault(acc_id, []).append(row_number)
+
+        if lines:
+            try:
+                self._get_cursor().copy_expert(COPY_IMPORT_STAGING_QUERY, io.StringIO("".join(lines)))
+            except Exception as e:
+                logger.error(f"Error staging accounts: {e}")
+                raise
+
+    def merge(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Merge the added accounts into the accounts and commit.
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: The "created", "updated" and "failed" rows, each with
+                its row_number and acc_id, and the error of the failed rows.
+        """
+        result: Dict[str, List[Dict[str, Any]]] = {"created": [], "updated": [], "failed": list(self.failed)}
+
+        def report(outcome: str, acc_ids: List[str], error: Optional[str] = None) -> None:
+            for acc_id in acc_ids:
+                for row_number in self._row_numbers[acc_id]:
+                    entry = {"row_number": row_number, "acc_id": acc_id}
+                    if error:
+                        entry["error"] = error
+                    result[outcome].append(entry)
+
+        if self._row_numbers:
+            cursor = self._get_cursor()
+            try:
+                cursor.execute(DELETE_SUPERSEDED_IMPORT_ROWS_QUERY)
+                with query_analyzer(UPDATE_IMPORTED_ACCOUNTS_QUERY):
+                    cursor.execute(UPDATE_IMPORTED_ACCOUNTS_QUERY)
+                updated = [row[0] for row in cursor.fetchall()]
+                with query_analyzer(INSERT_IMPORTED_ACCOUNTS_QUERY):
+                    cursor.execute(INSERT_IMPORTED_ACCOUNTS_QUERY)
+                created = [row[0] for row in cursor.fetchall()]
+
+                tables = self.repository._publish_cache_invalidation(INSERT_IMPORTED_ACCOUNTS_QUERY, cursor)
+                self._conn.commit()
+                self._committed = True
+                self.repository._invalidate_cache_for_tables(tables)
+            except Exception as e:
+                logger.error(f"Error importing accounts: {e}")
+                raise
+            finally:
+                self.close()
+
+            merged = set(created) | set(updated)
+            report("created", created)
+            report("updated", updated)
+            report("failed", [acc_id for acc_id in self._row_numbers if acc_id not in merged],
+                   "Account already exists and belongs to another user")
+
+        for outcome in result.values():
+            outcome.sort(key=lambda entry: entry["row_number"])
+        logger.info(
+            f"Imported accounts: {len(result['created'])} created, {len(result['updated'])} updated, "
+            f"{len(result['failed'])} failed"
+        )
+        return result
+
+    def close(self) -> None:
+        """
+        Release the connection of the import, rolling back the accounts that were not merged.
+        """
+        try:
+            if self._cursor is not None:
+                self._cursor.close()
+                if not self._committed:
+                    self._conn.rollback()
+        finally:
+            self._cursor = None
+            self._conn = None
+            self._exit_stack.close()
+
 class AccountRepository(BaseRepository):
     """Repository for account data."""
 
@@ -31,6 +366,8 @@ class AccountRepository(BaseRepository):
         """
         self.default_order_by = "acc_id"
         self.search_columns = ["acc_id", "acc_username", "acc_email_address"]
+        self.paginator = KeysetPaginator({field: field for field in ACCOUNT_SORT_FIELDS}, "acc_id",
+                                         nullable_columns=["acc_email_address"])
 
     def get_accounts(self, limit: int = 100, offset: int = 0, search: Optional[str] = None,
                     sort_by: str = "acc_id", sort_order: str = "asc",
@@ -52,13 +389,69 @@ class AccountRepository(BaseRepository):
         Returns:
             Dict[str, Any]: A dictionary with accounts and pagination info.
         """
-        # Validate sort_by field
-        valid_sort_fields = [
-            "acc_id", "acc_username", "acc_email_address",
-            "prime", "lock", "perm_lock", "acc_created_at"
-        ]
+        condition, params, order_by = self._build_accounts_query_parts(
+            search, sort_by, sort_order, filter_prime, filter_lock, filter_perm_lock
+        )
+
+        # Get total count
+        total = self.get_count(condition, tuple(params) if params else None)
+
+        # Get accounts
+        accounts = self.get_all(condition, tuple(params) if params else None,
+                               self.default_columns, order_by, limit, offset)
+
+        # Ensure each account has all required fields
+        validated_accounts = self._validate_accounts(accounts)
 
-        if sort_by not in valid_sort_fields:
+        # If we have no accounts but total > 0, we need to fetch the accounts directly
+        if not validated_accounts and total > 0:
+            try:
+                # Fetch accounts directly with a raw query
+                query = f"""
+                SELECT {self.default_columns}
+                FROM {self.table_name}
+                WHERE {condition}
+                ORDER BY {order_by}
+                LIMIT {limit} OFFSET {offset}
+                """
+
+                raw_accounts = self.execute_query(query, tuple(params) if params else None)
+
+                for account in raw_accounts:
+                    if isinstance(account, dict) and 'acc_id' in account:
+                        # Ensure all required fields are present
+                        validated_account = {
+                            'acc_id': account.get('acc_id', ''),
+                            'acc_username': account.get('acc_username', ''),
+                            'acc_email_address': account.get('acc_email_address', ''),
+                            'prime': account.get('prime', False),
+                            'lock': account.get('lock', False),
+                            'perm_lock': account.get('perm_lock', False),
+                            'acc_created_at': account.get('acc_created_at', 0)
+                        }
+                        validated_accounts.append(validated_account)
+            except Exception as e:
+                logger.error(f"Error fetching accounts directly: {e}")
+
+        return {
+            "accounts": validated_accounts,
+            "total": total,
+            "limit": limit,
+            "offset": offset
+        }
+
+    def _build_accounts_query_parts(self, search: Optional[str] = None, sort_by: str = "acc_id",
+                                    sort_order: str = "asc", filter_prime: Optional[bool] = None,
+                                    filter_lock: Optional[bool] = None,
+                                    filter_perm_lock: Optional[bool] = None) -> Tuple[str, List[Any], str]:
+        """
+        Build the WHERE condition, parameters and ORDER BY clause used to list accounts.
+
+        Returns:
+            Tuple[str, List[Any], str]: The condition, its parameters and the ORDER BY clause.
+        """
+        # Validate sort_by field
+        if sort_by not in ACCOUNT_SORT_FIELDS:
             sort_by = "acc_id"
 
         # Validate sort_order
@@ -88,15 +481,19 @@ class AccountRepository(BaseRepository):
             search_term = f"%{search}%"
             params.extend([search_term] * len(self.search_columns))
 
-        # Get total count
-        total = self.get_count(condition, tuple(params) if params else None)
+        return condition, params, f"{sort_by} {sort_order}"
 
-        # Get accounts
-        order_by = f"{sort_by} {sort_order}"
-        accounts = self.get_all(condition, tuple(params) if params else None,
-                               self.default_columns, order_by, limit, offset)
+    @staticmethod
+    def _validate_accounts(accounts: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Ensure each account has all required list fields, dropping invalid rows.
 
-        # Ensure each account has all required fields
+        Args:
+            accounts (List[Any]): The account rows.
+
+        Returns:
+            List[Dict[str, Any]]: The validated accounts.
+        """
         validated_accounts = []
         for account in accounts:
             # Check if this is a valid account object with required fields
@@ -115,43 +512,7 @@ class AccountRepository(BaseRepository):
             else:
                 # Log invalid account object
                 logger.warning(f"Invalid account object found: {account}")
-
-        # If we have no accounts but total > 0, we need to fetch the accounts directly
-        if not validated_accounts and total > 0:
-            try:
-                # Fetch accounts directly with a raw query
-                query = f"""
-                SELECT {self.default_columns}
-                FROM {self.table_name}
-                WHERE {condition}
-                ORDER BY {order_by}
-                LIMIT {limit} OFFSET {offset}
-                """
-
-                raw_accounts = self.execute_query(query, tuple(params) if params else None)
-
-                for account in raw_accounts:
-                    if isinstance(account, dict) and 'acc_id' in account:
-                        # Ensure all required fields are present
-                        validated_account = {
-                            'acc_id': account.get('acc_id', ''),
-                            'acc_username': account.get('acc_username', ''),
-                            'acc_email_address': account.get('acc_email_address', ''),
-                            'prime': account.get('prime', False),
-                            'lock': account.get('lock', False),
-                            'perm_lock': account.get('perm_lock', False),
-                            'acc_created_at': account.get('acc_created_at', 0)
-                        }
-                        validated_accounts.append(validated_account)
-            except Exception as e:
-                logger.error(f"Error fetching accounts directly: {e}")
-
-        return {
-            "accounts": validated_accounts,
-            "total": total,
-            "limit": limit,
-            "offset": offset
-        }
+        return validated_accounts
 
     def get_account_by_username(self, username: str) -> Optional[Dict[str, Any]]:
         """
@@ -224,6 +585,66 @@ class AccountRepository(BaseRepository):
         """
         return self.delete(acc_id) > 0
 
+    @staticmethod
+    def _prepare_import_row(account: Dict[str, Any]) -> Tuple[Optional[List[str]], Optional[str]]:
+        """
+        Convert an imported account to the COPY text values of ACCOUNT_IMPORT_COLUMNS.
+
+        Args:
+            account (Dict[str, Any]): The account, by column name.
+
+        Returns:
+            Tuple[Optional[List[str]], Optional[str]]: The values, or None and the reason the account cannot be imported.
+        """
+        values = []
+        missing = []
+        for column in ACCOUNT_IMPORT_COLUMNS:
+            value = account.get(column)
+            if value is None:
+                if column in ACCOUNT_IMPORT_REQUIRED_COLUMNS:
+                    missing.append(column)
+                values.append("\\N")
+            elif column in ACCOUNT_IMPORT_INTEGER_COLUMNS:
+                try:
+                    value = int(value)
+                except (TypeError, ValueError):
+                    return None, f"{column} is not an integer: {value!r}"
+                if abs(value) > ACCOUNT_IMPORT_INTEGER_COLUMNS[column]:
+                    return None, f"{column} is out of range: {value}"
+                values.append(str(value))
+            else:
+                value = str(value)
+                if "\x00" in value:
+                    return None, f"{column} contains a NUL character"
+                values.append(_copy_text(value))
+
+        if missing:
+            return None, f"Missing required values: {', '.join(missing)}"
+        return values, None
+
+    def begin_import(self) -> "AccountImport":
+        """
+        Begin a bulk import of accounts, whose accounts can be added in batches.
+
+        Returns:
+            AccountImport: The import, to be closed after use.
+        """
+        return AccountImport(self)
+
+    def import_accounts(self, accounts: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Import accounts in bulk, creating new accounts and updating existing ones.
+
+        Args:
+            accounts (List[Tuple[int, Dict[str, Any]]]): The row number and the account, by column name, of each row.
+
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: The "created", "updated" and "failed" rows, as returned by AccountImport.merge().
+        """
+        with self.begin_import() as account_import:
+            account_import.add(accounts)
+            return account_import.merge()
+
     def get_account_info(self, acc_id: str, fields: List[str]) -> Optional[Dict[str, Any]]:
         """
         Get specific account information by field names.
@@ -235,20 +656,8 @@ class AccountRepository(BaseRepository):
         Returns:
             Optional[Dict[str, Any]]: A dictionary with the requested fields or None if not found.
         """
-        # Validate fields
-        valid_fields = [
-            "acc_id", "acc_username", "acc_password", "acc_email_address",
-            "acc_email_password", "acc_vault_address", "acc_vault_password",
-            "acc_created_at", "acc_session_start", "acc_steamguard_account_name",
-            "acc_confirm_type", "acc_device_id", "acc_identity_secret",
-            "acc_revocation_code", "acc_secret_1", "acc_serial_number",
-            "acc_server_time", "acc_shared_secret", "acc_status",
-            "acc_token_gid", "acc_uri", "id", "prime", "lock", "perm_lock",
-            "farmlabs_upload"
-        ]
-
         # Filter out invalid fields
-        valid_field_list = [field for field in fields if field in valid_fields]
+        valid_field_list = [field for field in fields if field in ACCOUNT_INFO_FIELDS]
 
         if not valid_field_list:
             return None
@@ -257,6 +666,136 @@ class AccountRepository(BaseRepository):
         columns = ", ".join(valid_field_list)
         return self.get_by_id(acc_id, columns)
 
+    def _execute_lease_command(self, query: str, params: Tuple, reclaim: bool = False) -> List[Dict[str, Any]]:
+        """
+        Execute a lease command in its own transaction and return the affected accounts.
+
+        Args:
+            query (str): The lease command, with a RETURNING clause.
+            params (Tuple): The parameters for the command.
+            reclaim (bool, optional): Whether to reclaim the expired leases first. Defaults to False.
+
+        Returns:
+            List[Dict[str, Any]]: The accounts returned by the command.
+        """
+        with self.get_connection() as conn:
+            if not conn:
+                raise RuntimeError("No database connection available")
+
+            cursor = conn.cursor()
+            try:
+                reclaimed = 0
+                if reclaim:
+                    with query_analyzer(RECLAIM_EXPIRED_LEASES_QUERY):
+                        cursor.execute(RECLAIM_EXPIRED_LEASES_QUERY)
+                    reclaimed = cursor.rowcount
+                    if reclaimed:
+                        logger.info(f"Reclaimed {reclaimed} accounts with expired leases")
+
+                with query_analyzer(query, params):
+                    cursor.execute(query, params)
+                columns = [desc[0] for desc in cursor.description]
+                accounts = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+                tables = []
+                if accounts or reclaimed:
+                    tables = self._publish_cache_invalidation(query, cursor)
+                conn.commit()
+                self._invalidate_cache_for_tables(tables)
+                return accounts
+            except Exception as e:
+                logger.error(f"Error executing lease command: {e}")
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    @staticmethod
+    def _lease_seconds(lease_seconds: Optional[int]) -> int:
+        """Get the duration of a lease, bounded by the configured maximum."""
+        if lease_seconds is None:
+            lease_seconds = Config.ACCOUNT_LEASE_SECONDS
+        return max(1, min(lease_seconds, Config.ACCOUNT_LEASE_MAX_SECONDS))
+
+    def get_fresh_accounts(self, limit: int = 1) -> List[Dict[str, Any]]:
+        """
+        Get fresh accounts without leasing them.
+
+        Args:
+            limit (int, optional): The maximum number of accounts. Defaults to 1.
+
+        Returns:
+            List[Dict[str, Any]]: The acc_id and acc_username of the accounts, in the order they would be leased.
+        """
+        query = """
+            SELECT acc_id, acc_username
+            FROM accounts
+            WHERE prime = false AND lock = false AND perm_lock = false
+            ORDER BY id ASC
+            LIMIT %s
+        """
+        return self.execute_query(query, (limit,))
+
+    def lease_fresh_accounts(self, limit: int = 1, lease_seconds: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Lease fresh accounts, locking them until the lease is released or expires.
+
+        The accounts are locked with a single UPDATE that skips the rows locked by concurrent
+        leases, so that an account is never leased twice. Expired leases are reclaimed first.
+
+        Args:
+            limit (int, optional): The maximum number of accounts. Defaults to 1.
+            lease_seconds (Optional[int], optional): The duration of the lease. Defaults to ACCOUNT_LEASE_SECONDS.
+
+        Returns:
+            Dict[str, Any]: The lease_id, the lease_expires_at and the leased accounts, with their acc_id and acc_username.
+        """
+        lease_id = str(uuid.uuid4())
+        accounts = self._execute_lease_command(
+            LEASE_FRESH_ACCOUNTS_QUERY, (lease_id, self._lease_seconds(lease_seconds), limit), reclaim=True
+        )
+        accounts.sort(key=lambda account: account["id"])
+
+        return {
+            "lease_id": lease_id if accounts else None,
+            "lease_expires_at": accounts[0]["lease_expires_at"] if accounts else None,
+            "accounts": [{"acc_id": account["acc_id"], "acc_username": account["acc_username"]} for account in accounts]
+        }
+
+    def renew_lease(self, lease_id: str, lease_seconds: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Renew a lease that has not expired yet, extending its expiry from now.
+
+        Args:
+            lease_id (str): The ID of the lease.
+            lease_seconds (Optional[int], optional): The new duration of the lease. Defaults to ACCOUNT_LEASE_SECONDS.
+
+        Returns:
+            List[Dict[str, Any]]: The acc_id and lease_expires_at of the accounts still held by the lease.
+        """
+        return self._execute_lease_command(RENEW_LEASE_QUERY, (self._lease_seconds(lease_seconds), lease_id))
+
+    def release_lease(self, lease_id: str, acc_ids: Optional[List[str]] = None, keep_locked: bool = False) -> List[str]:
+        """
+        Release the accounts of a lease.
+
+        Args:
+            lease_id (str): The ID of the lease.
+            acc_ids (Optional[List[str]], optional): The accounts to release. Defaults to None (all the accounts of the lease).
+            keep_locked (bool, optional): Whether to keep the accounts locked, without expiry. Defaults to False.
+
+        Returns:
+            List[str]: The IDs of the released accounts.
+        """
+        if acc_ids is None:
+            query = RELEASE_LEASE_QUERY.format(acc_id_condition="")
+            params = (keep_locked, lease_id)
+        else:
+            query = RELEASE_LEASE_QUERY.format(acc_id_condition="AND acc_id = ANY(%s)")
+            params = (keep_locked, lease_id, list(acc_ids))
+
+        return [account["acc_id"] for account in self._execute_lease_command(query, params)]
+
     def get_account_proxy_settings(self, account_id: str) -> Dict[str, Any]:
         """
         Get proxy settings for an account.
@@ -291,19 +830,11 @@ class AccountRepository(BaseRepository):
                 return default_settings
 
             # If no default settings either, return empty settings
-            return {
-                "proxy_server": None,
-                "proxy_bypass": None,
-                "additional_settings": None
-            }
+            return dict(EMPTY_PROXY_SETTINGS)
         except Exception as e:
             logger.error(f"Error getting account proxy settings: {e}")
             # Return empty settings on error
-            return {
-                "proxy_server": None,
-                "proxy_bypass": None,
-                "additional_settings": None
-            }
+            return dict(EMPTY_PROXY_SETTINGS)
 
     def set_account_proxy_settings(
         self,
@@ -360,130 +891,339 @@ class AccountRepository(BaseRepository):
             logger.error(f"Error setting account proxy settings: {e}")
             return False
 
-    def get_accounts_with_cursor(self, cursor_value: Optional[Any] = None, cursor_column: str = "acc_id",
-                               sort_order: str = "asc", limit: int = 100, filter_conditions: Dict[str, Any] = None) -> Dict[str, Any]:
+    def get_accounts_with_cursor(self, cursor: Optional[str] = None, limit: int = 100, search: Optional[str] = None,
+                                 sort_by: str = "acc_id", sort_order: str = "asc",
+                                 filter_prime: Optional[bool] = None, filter_lock: Optional[bool] = None,
+                                 filter_perm_lock: Optional[bool] = None, count: str = "exact") -> Dict[str, Any]:
         """
-        Get accounts using cursor-based pagination.
+        Get accounts using keyset pagination.
+
+        Accounts are ordered by the sort field and then by acc_id, so that accounts with the
+        same value of a non-unique field such as prime are neither skipped nor repeated
+        between pages.
 
         Args:
-            cursor_value (Optional[Any], optional): The cursor value. Defaults to None.
-            cursor_column (str, optional): The cursor column. Defaults to "acc_id".
-            sort_order (str, optional): Sort order (asc or desc). Defaults to "asc".
+            cursor (Optional[str], optional): The next_cursor of the previous page, or None for the first page.
+                Defaults to None.
             limit (int, optional): Maximum number of accounts to return. Defaults to 100.
-            filter_conditions (Dict[str, Any], optional): Filter conditions. Defaults to None.
+            search (Optional[str], optional): Search term to filter accounts. Defaults to None.
+            sort_by (str, optional): Field to sort by. Defaults to "acc_id".
+            sort_order (str, optional): Sort order (asc or desc). Defaults to "asc".
+            filter_prime (Optional[bool], optional): Filter by prime status. Defaults to None.
+            filter_lock (Optional[bool], optional): Filter by lock status. Defaults to None.
+            filter_perm_lock (Optional[bool], optional): Filter by permanent lock status. Defaults to None.
+            count (str, optional): How to count the total: "exact", "estimate" or "none". Defaults to "exact".
 
         Returns:
             Dict[str, Any]: A dictionary with accounts and pagination info.
+
+        Raises:
+            InvalidCursorError: If the cursor is not valid, or was issued for another ordering.
         """
-        # Validate cursor_column
-        valid_cursor_columns = [
-            "acc_id", "acc_username", "acc_email_address",
-            "prime", "lock", "perm_lock", "acc_created_at"
-        ]
+        condition, params, _ = self._build_accounts_query_parts(
+            search, sort_by, sort_order, filter_prime, filter_lock, filter_perm_lock
+        )
 
-        if cursor_column not in valid_cursor_columns:
-            cursor_column = "acc_id"
+        page = self.get_keyset_page(cursor, limit, sort_by=sort_by, sort_order=sort_order, condition=condition,
+                                    params=tuple(params) if params else None, columns=self.default_columns,
+                                    count=count)
 
-        # Validate sort_order
-        if sort_order.lower() not in ["asc", "desc"]:
-            sort_order = "asc"
+        return {
+            "accounts": self._validate_accounts(page["items"]),
+            "total": page["total"],
+            "total_estimated": page["total_estimated"],
+            "limit": limit,
+            "next_cursor": page["next_cursor"],
+            "has_more": page["has_more"]
+        }
 
-        # Build filter conditions
-        condition = "1=1"
-        params = []
+    # Async API
 
-        if filter_conditions:
-            for key, value in filter_conditions.items():
-                condition += f" AND {key} = %s"
-                params.append(value)
+    async def get_accounts_async(self, limit: int = 100, offset: int = 0, search: Optional[str] = None,
+                                 sort_by: str = "acc_id", sort_order: str = "asc",
+                                 filter_prime: Optional[bool] = None, filter_lock: Optional[bool] = None,
+                                 filter_perm_lock: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Get a list of accounts with pagination, sorting, and filtering asynchronously.
 
-        # Add cursor condition if provided
-        if cursor_value is not None:
-            operator = ">" if sort_order.lower() == "asc" else "<"
-            condition += f" AND {cursor_column} {operator} %s"
-            params.append(cursor_value)
+        See get_accounts() for the arguments.
 
-        # Get accounts
-        order_by = f"{cursor_column} {sort_order}"
-        accounts = self.get_all(condition, tuple(params) if params else None,
-                               self.default_columns, order_by, limit + 1)  # Request one more to check if there are more pages
+        Returns:
+            Dict[str, Any]: A dictionary with accounts and pagination info.
+        """
+        condition, params, order_by = self._build_accounts_query_parts(
+            search, sort_by, sort_order, filter_prime, filter_lock, filter_perm_lock
+        )
+        params = tuple(params) if params else None
 
-        # Check if there are more pages
-        has_more = len(accounts) > limit
+        total = await self.get_count_async(condition, params)
+        accounts = await self.get_all_async(condition, params, self.default_columns, order_by, limit, offset)
 
-        # Limit accounts to requested limit
-        accounts = accounts[:limit]
+        return {
+            "accounts": self._validate_accounts(accounts),
+            "total": total,
+            "limit": limit,
+            "offset": offset
+        }
 
-        # Ensure each account has all required fields
-        validated_accounts = []
-        for account in accounts:
-            # Check if this is a valid account object with required fields
-            if isinstance(account, dict) and 'acc_id' in account:
-                # Ensure all required fields are present
-                validated_account = {
-                    'acc_id': account.get('acc_id', ''),
-                    'acc_username': account.get('acc_username', ''),
-                    'acc_email_address': account.get('acc_email_address', ''),
-                    'prime': account.get('prime', False),
-                    'lock': account.get('lock', False),
-                    'perm_lock': account.get('perm_lock', False),
-                    'acc_created_at': account.get('acc_created_at', 0)
-                }
-                validated_accounts.append(validated_account)
-            else:
-                # Log invalid account object
-                logger.warning(f"Invalid account object found: {account}")
+    def _build_accounts_select(self, columns: str, limit: Optional[int] = None, search: Optional[str] = None,
+                               sort_by: str = "acc_id", sort_order: str = "asc",
+                               filter_prime: Optional[bool] = None, filter_lock: Optional[bool] = None,
+                               filter_perm_lock: Optional[bool] = None) -> Tuple[str, List[Any]]:
+        """
+        Build the query listing accounts with the filters of get_accounts(), without paging.
 
-        # Get total count
-        total_condition = "1=1"
-        total_params = []
+        Returns:
+            Tuple[str, List[Any]]: The query and its parameters.
+        """
+        condition, params, order_by = self._build_accounts_query_parts(
+            search, sort_by, sort_order, filter_prime, filter_lock, filter_perm_lock
+        )
+        # acc_id breaks ties, so that the order of the rows is stable
+        if not order_by.startswith("acc_id "):
+            order_by += ", acc_id"
+
+        query = f"SELECT {columns} FROM {self.table_name} WHERE {condition} ORDER BY {order_by}"
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+
+        return query, params
+
+    async def export_accounts_async(self, export_format: str = "csv", fields: Optional[List[str]] = None,
+                                    limit: Optional[int] = None, search: Optional[str] = None,
+                                    sort_by: str = "acc_id", sort_order: str = "asc",
+                                    filter_prime: Optional[bool] = None, filter_lock: Optional[bool] = None,
+                                    filter_perm_lock: Optional[bool] = None) -> AsyncIterator[bytes]:
+        """
+        Export accounts with COPY TO STDOUT, yielding the output as it is produced.
 
-        if filter_conditions:
-            for key, value in filter_conditions.items():
-                total_condition += f" AND {key} = %s"
-                total_params.append(value)
+        The rows are formatted by the database and passed through as bytes, with the RLS
+        context of the repository. The filters are those of get_accounts(). The COPY runs
+        on a pooled connection in a worker thread, at most EXPORT_QUEUE_SIZE chunks ahead
+        of the consumer, and is stopped if the consumer closes the generator.
 
-        total = self.get_count(total_condition, tuple(total_params) if total_params else None)
+        Args:
+            export_format (str, optional): "csv" (with a header line) or "ndjson". Defaults to "csv".
+            fields (Optional[List[str]], optional): Fields to export, from ACCOUNT_EXPORT_FIELDS.
+                Defaults to None (all of them).
+            limit (Optional[int], optional): Maximum number of accounts to export. Defaults to None (no limit).
+            search (Optional[str], optional): Search term to filter accounts. Defaults to None.
+            sort_by (str, optional): Field to sort by. Defaults to "acc_id".
+            sort_order (str, optional): Sort order (asc or desc). Defaults to "asc".
+            filter_prime (Optional[bool], optional): Filter by prime status. Defaults to None.
+            filter_lock (Optional[bool], optional): Filter by lock status. Defaults to None.
+            filter_perm_lock (Optional[bool], optional): Filter by permanent lock status. Defaults to None.
 
-        # If we have no accounts but total > 0, we need to fetch the accounts directly
-        if not validated_accounts and total > 0:
+        Yields:
+            bytes: Chunks of the export, of about EXPORT_CHUNK_SIZE bytes.
+
+        Raises:
+            ValueError: If the format is not supported.
+            RuntimeError: If no database connection is available.
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+
+        columns = [field for field in (fields or ACCOUNT_EXPORT_FIELDS) if field in ACCOUNT_EXPORT_FIELDS]
+        if not columns:
+            columns = list(ACCOUNT_EXPORT_FIELDS)
+
+        query, params = self._build_accounts_select(
+            ", ".join(columns), limit, search, sort_by, sort_order,
+            filter_prime, filter_lock, filter_perm_lock
+        )
+
+        if export_format == "csv":
+            copy_query = f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)"
+        else:
+            # JSON escapes control characters, so with control characters as quote and
+            # delimiter the CSV format writes each JSON document as it is
+            copy_query = (
+                f"COPY (SELECT row_to_json(a)::text FROM ({query}) a) TO STDOUT "
+                f"WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+            )
+
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue(maxsize=EXPORT_QUEUE_SIZE)
+        stopped = threading.Event()
+
+        def put(item: Any) -> None:
+            asyncio.run_coroutine_threadsafe(chunks.put(item), loop).result()
+
+        def run_copy() -> None:
             try:
-                # Fetch accounts directly with a raw query
-                query = f"""
-                SELECT {self.default_columns}
-                FROM {self.table_name}
-                WHERE {condition}
-                ORDER BY {order_by}
-                LIMIT {limit + 1}
-                """
+                with self.get_connection() as conn:
+                    if not conn:
+                        raise RuntimeError("No database connection available")
+
+                    with conn.cursor() as cursor:
+                        writer = _ExportWriter(put, stopped, conn.cancel)
+                        cursor.copy_expert(cursor.mogrify(copy_query, params), writer, size=EXPORT_CHUNK_SIZE)
+                        writer.flush()
+                    conn.rollback()
+                put(None)
+            except Exception as e:
+                if not stopped.is_set():
+                    put(e)
 
-                raw_accounts = self.execute_query(query, tuple(params) if params else None)
+        copy_task = loop.run_in_executor(None, run_copy)
+        try:
+            while True:
+                item = await chunks.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Stop the COPY if the consumer went away, unblocking a pending put
+            stopped.set()
+            while not copy_task.done():
+                while not chunks.empty():
+                    chunks.get_nowait()
+                await asyncio.sleep(0.01)
+
+    async def stream_accounts_async(self, limit: Optional[int] = None, search: Optional[str] = None,
+                                    sort_by: str = "acc_id", sort_order: str = "asc",
+                                    filter_prime: Optional[bool] = None, filter_lock: Optional[bool] = None,
+                                    filter_perm_lock: Optional[bool] = None,
+                                    batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream accounts through a server-side cursor, fetching batch_size rows at a time.
 
-                # Check if there are more pages
-                has_more = len(raw_accounts) > limit
+        Unlike get_accounts(), the result set is neither counted nor held in memory.
 
-                # Limit accounts to requested limit
-                raw_accounts = raw_accounts[:limit]
+        Args:
+            limit (Optional[int], optional): Maximum number of accounts to return. Defaults to None (no limit).
+            batch_size (int, optional): Number of rows fetched at a time. Defaults to STREAM_BATCH_SIZE.
 
-                for account in raw_accounts:
-                    if isinstance(account, dict) and 'acc_id' in account:
-                        # Ensure all required fields are present
-                        validated_account = {
-                            'acc_id': account.get('acc_id', ''),
-                            'acc_username': account.get('acc_username', ''),
-                            'acc_email_address': account.get('acc_email_address', ''),
-                            'prime': account.get('prime', False),
-                            'lock': account.get('lock', False),
-                            'perm_lock': account.get('perm_lock', False),
-                            'acc_created_at': account.get('acc_created_at', 0)
-                        }
-                        validated_accounts.append(validated_account)
-            except Exception as e:
-                logger.error(f"Error fetching accounts directly: {e}")
+        See get_accounts() for the other arguments.
 
-        return {
-            "accounts": validated_accounts,
-            "total": total,
-            "limit": limit,
-            "has_more": has_more
-        }
+        Yields:
+            Dict[str, Any]: The accounts, with the fields of get_accounts().
+
+        Raises:
+            RuntimeError: If no database connection is available.
+        """
+        query, params = self._build_accounts_select(
+            self.default_columns, limit, search, sort_by, sort_order,
+            filter_prime, filter_lock, filter_perm_lock
+        )
+
+        async with self.get_async_connection() as conn:
+            if not conn:
+                raise RuntimeError("No database connection available")
+
+            async with conn.cursor(name="accounts_stream", row_factory=dict_row) as cursor:
+                cursor.itersize = batch_size
+                await cursor.execute(query, params)
+                async for account in cursor:
+                    yield account
+
+    async def get_account_by_username_async(self, username: str) -> Optional[Dict[str, Any]]:
+        """
+        Get an account by its username asynchronously.
+
+        Args:
+            username (str): The username of the account.
+
+        Returns:
+            Optional[Dict[str, Any]]: A dictionary with the account or None if not found.
+        """
+        accounts = await self.get_all_async("acc_username = %s", (username,), self.default_columns)
+        return accounts[0] if accounts else None
+
+    async def get_account_by_id_async(self, acc_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get an account by its ID asynchronously.
+
+        Args:
+            acc_id (str): The ID of the account.
+
+        Returns:
+            Optional[Dict[str, Any]]: A dictionary with the account or None if not found.
+        """
+        return await self.get_by_id_async(acc_id)
+
+    async def create_account_async(self, account_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Create a new account asynchronously.
+
+        Args:
+            account_data (Dict[str, Any]): The account data.
+
+        Returns:
+            Optional[Dict[str, Any]]: A dictionary with the created account or None if creation failed.
+        """
+        # Set created_at if not provided
+        if "acc_created_at" not in account_data or not account_data["acc_created_at"]:
+            account_data["acc_created_at"] = time.time()
+
+        # Set owner_id if not provided
+        if "owner_id" not in account_data and self.user_id:
+            account_data["owner_id"] = self.user_id
+
+        return await self.create_async(account_data)
+
+    async def delete_account_async(self, acc_id: str) -> bool:
+        """
+        Delete an account asynchronously.
+
+        Args:
+            acc_id (str): The ID of the account.
+
+        Returns:
+            bool: True if the account was deleted, False otherwise.
+        """
+        return await self.delete_async(acc_id) > 0
+
+    async def get_account_info_async(self, acc_id: str, fields: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Get specific account information by field names asynchronously.
+
+        Args:
+            acc_id (str): The ID of the account.
+            fields (List[str]): The fields to retrieve.
+
+        Returns:
+            Optional[Dict[str, Any]]: A dictionary with the requested fields or None if not found.
+        """
+        valid_field_list = [field for field in fields if field in ACCOUNT_INFO_FIELDS]
+
+        if not valid_field_list:
+            return None
+
+        return await self.get_by_id_async(acc_id, ", ".join(valid_field_list))
+
+    async def get_account_proxy_settings_async(self, account_id: str) -> Dict[str, Any]:
+        """
+        Get proxy settings for an account asynchronously.
+
+        Args:
+            account_id (str): The account ID.
+
+        Returns:
+            Dict[str, Any]: The proxy settings.
+        """
+        try:
+            # Custom settings for the account take precedence over the defaults
+            proxy_settings = await self.execute_query_single_async("""
+                SELECT proxy_server, proxy_bypass, additional_settings
+                FROM account_proxy_settings
+                WHERE account_id = %s
+            """, (account_id,))
+
+            if proxy_settings:
+                return proxy_settings
+
+            default_settings = await self.execute_query_single_async("""
+                SELECT proxy_server, proxy_bypass, additional_settings
+                FROM default_proxy_settings
+                LIMIT 1
+            """)
+
+            return default_settings or dict(EMPTY_PROXY_SETTINGS)
+        except Exception as e:
+            logger.error(f"Error getting account proxy settings: {e}")
+            return dict(EMPTY_PROXY_SETTINGS)
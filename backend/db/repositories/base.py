@@ -5,9 +5,12 @@ This module provides a base repository class that extends DatabaseAccess and pro
 common methods for database operations on a specific entity.
 """
 
+import json
 import logging
 from typing import Optional, Dict, Any, List, Tuple, Union
+from config import Config
 from ..access import DatabaseAccess
+from ..pagination import COUNT_MODES, Keyset, KeysetPaginator
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -28,6 +31,7 @@ class BaseRepository(DatabaseAccess):
         self.id_column = "id"
         self.default_columns = "*"
         self.default_order_by = "id"
+        self.paginator: Optional[KeysetPaginator] = None
 
     def get_connection(self, with_rls: bool = True):
         """
@@ -323,3 +327,350 @@ class BaseRepository(DatabaseAccess):
             "page_size": page_size,
             "pages": pages
         }
+
+    def get_keyset_page(self, cursor: Optional[str] = None, limit: int = 10, offset: int = 0,
+                        sort_by: Optional[str] = None, sort_order: Optional[str] = None, condition: str = "",
+                        params: Tuple = None, columns: str = None, count: str = "exact",
+                        with_rls: bool = True) -> Dict[str, Any]:
+        """
+        Get a page of entities with keyset pagination.
+
+        Args:
+            cursor (Optional[str], optional): The cursor of the page, or None for the first page. Defaults to None.
+            limit (int, optional): The page size. Defaults to 10.
+            offset (int, optional): The number of entities to skip, only without a cursor. Defaults to 0.
+            sort_by (Optional[str], optional): The sort column. Defaults to None (use the paginator's default).
+            sort_order (Optional[str], optional): The sort order (asc or desc). Defaults to None.
+            condition (str, optional): The WHERE condition. Defaults to "".
+            params (Tuple, optional): The parameters for the condition. Defaults to None.
+            columns (str, optional): The columns to select. Defaults to None (use default_columns).
+            count (str, optional): How to count the total: "exact", "estimate" or "none". Defaults to "exact".
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            Dict[str, Any]: A dictionary with the entities, the total and the cursor of the next page.
+
+        Raises:
+            InvalidCursorError: If the cursor is not valid, or was issued for another ordering.
+        """
+        if not self.table_name or not self.paginator:
+            logger.error("Table name or paginator not set")
+            return {"items": [], "total": 0, "total_estimated": False, "limit": limit,
+                    "next_cursor": None, "has_more": False}
+
+        keyset = self.paginator.keyset(cursor, sort_by, sort_order)
+        page_condition, page_params = keyset.where(condition, params)
+        offset = 0 if cursor else offset
+        rows = self.get_all(page_condition, page_params, columns, keyset.order_by, limit + 1, offset, with_rls)
+        items, next_cursor = keyset.page(rows, limit)
+
+        count_query = self._build_select_query(self.table_name, condition, "1")
+        total, estimated = self._count_page(keyset, items, next_cursor, offset, count_query, params, count, with_rls)
+
+        return {
+            "items": items,
+            "total": total,
+            "total_estimated": estimated,
+            "limit": limit,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
+        }
+
+    def count_rows(self, query: str, params: Tuple = None, count: str = "exact",
+                   with_rls: bool = True) -> Tuple[Optional[int], bool]:
+        """
+        Count the rows of a query, exactly or from the planner's estimate.
+
+        An estimate below PAGINATION_EXACT_COUNT_THRESHOLD is replaced by an exact count,
+        which is cheap for so few rows while the estimates of small results are the least
+        accurate. The estimate is taken under the same RLS context as the query, so that
+        the row security policies are part of the plan.
+
+        Args:
+            query (str): The SELECT query, without ORDER BY or LIMIT.
+            params (Tuple, optional): The parameters for the query. Defaults to None.
+            count (str, optional): How to count: "exact", "estimate" or "none". Defaults to "exact".
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            Tuple[Optional[int], bool]: The number of rows, or None if not counted, and whether it is an estimate.
+        """
+        if count not in COUNT_MODES:
+            raise ValueError(f"Invalid count mode: {count}. Expected one of {', '.join(COUNT_MODES)}")
+        if count == "none":
+            return None, False
+
+        if count == "estimate":
+            estimate = self._plan_rows(self.execute_query_single(f"EXPLAIN (FORMAT JSON) {query}", params, with_rls))
+            if estimate is not None and estimate >= Config.PAGINATION_EXACT_COUNT_THRESHOLD:
+                return estimate, True
+
+        result = self.execute_query_single(f"SELECT COUNT(*) AS count FROM ({query}) AS counted", params, with_rls)
+        return (result["count"] if result else 0), False
+
+    def _count_page(self, keyset: Keyset, items: List[Dict[str, Any]], next_cursor: Optional[str], offset: int,
+                    query: str, params: Tuple, count: str, with_rls: bool) -> Tuple[Optional[int], bool]:
+        """Count the rows of a listing, unless its first page already holds all of them."""
+        if count in ("exact", "estimate") and keyset.is_first and next_cursor is None and (items or not offset):
+            return offset + len(items), False
+        return self.count_rows(query, params, count, with_rls)
+
+    @staticmethod
+    def _plan_rows(result: Optional[Dict[str, Any]]) -> Optional[int]:
+        """Read the estimated number of rows from the result of EXPLAIN (FORMAT JSON)."""
+        if not result:
+            return None
+        plan = result.get("QUERY PLAN")
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        try:
+            return int(plan[0]["Plan"]["Plan Rows"])
+        except (IndexError, KeyError, TypeError, ValueError):
+            logger.warning(f"Unexpected EXPLAIN result: {plan}")
+            return None
+
+    # Async API
+
+    async def get_by_id_async(self, id_value: Any, columns: str = None, with_rls: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Get an entity by its ID asynchronously.
+
+        Args:
+            id_value (Any): The ID value.
+            columns (str, optional): The columns to select. Defaults to None (use default_columns).
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            Optional[Dict[str, Any]]: A dictionary with the entity or None if not found.
+        """
+        if not self.table_name:
+            logger.error("Table name not set")
+            return None
+
+        columns = columns or self.default_columns
+        return await super().get_by_id_async(self.table_name, self.id_column, id_value, columns, with_rls)
+
+    async def get_all_async(self, condition: str = "", params: Tuple = None, columns: str = None,
+                            order_by: str = None, limit: int = 0, offset: int = 0, with_rls: bool = True) -> List[Dict[str, Any]]:
+        """
+        Get all entities asynchronously.
+
+        Args:
+            condition (str, optional): The WHERE condition. Defaults to "".
+            params (Tuple, optional): The parameters for the condition. Defaults to None.
+            columns (str, optional): The columns to select. Defaults to None (use default_columns).
+            order_by (str, optional): The ORDER BY clause. Defaults to None (use default_order_by).
+            limit (int, optional): The LIMIT clause. Defaults to 0 (no limit).
+            offset (int, optional): The OFFSET clause. Defaults to 0.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            List[Dict[str, Any]]: A list of dictionaries with the entities.
+        """
+        if not self.table_name:
+            logger.error("Table name not set")
+            return []
+
+        columns = columns or self.default_columns
+        order_by = order_by or self.default_order_by
+        return await super().get_all_async(self.table_name, condition, params, columns, order_by, limit, offset, with_rls)
+
+    async def get_count_async(self, condition: str = "", params: Tuple = None, with_rls: bool = True) -> int:
+        """
+        Get the count of entities asynchronously.
+
+        Args:
+            condition (str, optional): The WHERE condition. Defaults to "".
+            params (Tuple, optional): The parameters for the condition. Defaults to None.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            int: The count of entities.
+        """
+        if not self.table_name:
+            logger.error("Table name not set")
+            return 0
+
+        return await super().get_count_async(self.table_name, condition, params, with_rls)
+
+    async def create_async(self, data: Dict[str, Any], returning: bool = True, with_rls: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Create a new entity asynchronously.
+
+        Args:
+            data (Dict[str, Any]): The data to insert.
+            returning (bool, optional): Whether to return the inserted entity. Defaults to True.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            Optional[Dict[str, Any]]: A dictionary with the inserted entity or None if not returning.
+        """
+        if not self.table_name:
+            logger.error("Table name not set")
+            return None
+
+        # If owner_id is not set and user_id is available, set owner_id to user_id
+        if "owner_id" not in data and self.user_id:
+            data["owner_id"] = self.user_id
+
+        return await super().insert_async(self.table_name, data, returning, with_rls)
+
+    async def update_async(self, id_value: Any, data: Dict[str, Any], returning: bool = False, with_rls: bool = True) -> Union[int, Optional[Dict[str, Any]]]:
+        """
+        Update an entity asynchronously.
+
+        Args:
+            id_value (Any): The ID value.
+            data (Dict[str, Any]): The data to update.
+            returning (bool, optional): Whether to return the updated entity. Defaults to False.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            Union[int, Optional[Dict[str, Any]]]: The number of affected rows or a dictionary with the updated entity.
+        """
+        if not self.table_name:
+            logger.error("Table name not set")
+            return 0 if not returning else None
+
+        condition = f"{self.id_column} = %s"
+        return await super().update_async(self.table_name, data, condition, (id_value,), returning, with_rls)
+
+    async def delete_async(self, id_value: Any, with_rls: bool = True) -> int:
+        """
+        Delete an entity asynchronously.
+
+        Args:
+            id_value (Any): The ID value.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            int: The number of affected rows.
+        """
+        if not self.table_name:
+            logger.error("Table name not set")
+            return 0
+
+        condition = f"{self.id_column} = %s"
+        return await super().delete_async(self.table_name, condition, (id_value,), with_rls)
+
+    async def exists_async(self, id_value: Any, with_rls: bool = True) -> bool:
+        """
+        Check if an entity exists asynchronously.
+
+        Args:
+            id_value (Any): The ID value.
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            bool: True if the entity exists, False otherwise.
+        """
+        if not self.table_name:
+            logger.error("Table name not set")
+            return False
+
+        query = f"SELECT 1 FROM {self.table_name} WHERE {self.id_column} = %s"
+        result = await self.execute_query_single_async(query, (id_value,), with_rls)
+        return result is not None
+
+    async def get_paginated_async(self, page: int = 1, page_size: int = 10, condition: str = "", params: Tuple = None,
+                                  columns: str = None, order_by: str = None, with_rls: bool = True) -> Dict[str, Any]:
+        """
+        Get paginated entities asynchronously.
+
+        Args:
+            page (int, optional): The page number. Defaults to 1.
+            page_size (int, optional): The page size. Defaults to 10.
+            condition (str, optional): The WHERE condition. Defaults to "".
+            params (Tuple, optional): The parameters for the condition. Defaults to None.
+            columns (str, optional): The columns to select. Defaults to None (use default_columns).
+            order_by (str, optional): The ORDER BY clause. Defaults to None (use default_order_by).
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            Dict[str, Any]: A dictionary with the paginated entities and pagination info.
+        """
+        if not self.table_name:
+            logger.error("Table name not set")
+            return {"items": [], "total": 0, "page": page, "page_size": page_size, "pages": 0}
+
+        offset = (page - 1) * page_size
+        total = await self.get_count_async(condition, params, with_rls)
+        pages = (total + page_size - 1) // page_size if page_size > 0 else 0
+        items = await self.get_all_async(condition, params, columns, order_by, page_size, offset, with_rls)
+
+        return {
+            "items": items,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "pages": pages
+        }
+
+    async def get_keyset_page_async(self, cursor: Optional[str] = None, limit: int = 10, offset: int = 0,
+                                    sort_by: Optional[str] = None, sort_order: Optional[str] = None,
+                                    condition: str = "", params: Tuple = None, columns: str = None,
+                                    count: str = "exact", with_rls: bool = True) -> Dict[str, Any]:
+        """
+        Get a page of entities with keyset pagination asynchronously.
+
+        See get_keyset_page() for the arguments.
+
+        Returns:
+            Dict[str, Any]: A dictionary with the entities, the total and the cursor of the next page.
+        """
+        if not self.table_name or not self.paginator:
+            logger.error("Table name or paginator not set")
+            return {"items": [], "total": 0, "total_estimated": False, "limit": limit,
+                    "next_cursor": None, "has_more": False}
+
+        keyset = self.paginator.keyset(cursor, sort_by, sort_order)
+        page_condition, page_params = keyset.where(condition, params)
+        offset = 0 if cursor else offset
+        rows = await self.get_all_async(page_condition, page_params, columns, keyset.order_by, limit + 1, offset, with_rls)
+        items, next_cursor = keyset.page(rows, limit)
+
+        count_query = self._build_select_query(self.table_name, condition, "1")
+        total, estimated = await self._count_page_async(keyset, items, next_cursor, offset, count_query, params,
+                                                        count, with_rls)
+
+        return {
+            "items": items,
+            "total": total,
+            "total_estimated": estimated,
+            "limit": limit,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
+        }
+
+    async def count_rows_async(self, query: str, params: Tuple = None, count: str = "exact",
+                               with_rls: bool = True) -> Tuple[Optional[int], bool]:
+        """
+        Count the rows of a query asynchronously, exactly or from the planner's estimate.
+
+        See count_rows() for the arguments.
+
+        Returns:
+            Tuple[Optional[int], bool]: The number of rows, or None if not counted, and whether it is an estimate.
+        """
+        if count not in COUNT_MODES:
+            raise ValueError(f"Invalid count mode: {count}. Expected one of {', '.join(COUNT_MODES)}")
+        if count == "none":
+            return None, False
+
+        if count == "estimate":
+            result = await self.execute_query_single_async(f"EXPLAIN (FORMAT JSON) {query}", params, with_rls)
+            estimate = self._plan_rows(result)
+            if estimate is not None and estimate >= Config.PAGINATION_EXACT_COUNT_THRESHOLD:
+                return estimate, True
+
+        result = await self.execute_query_single_async(f"SELECT COUNT(*) AS count FROM ({query}) AS counted",
+                                                       params, with_rls)
+        return (result["count"] if result else 0), False
+
+    async def _count_page_async(self, keyset: Keyset, items: List[Dict[str, Any]], next_cursor: Optional[str],
+                                offset: int, query: str, params: Tuple, count: str,
+                                with_rls: bool) -> Tuple[Optional[int], bool]:
+        """Count the rows of a listing asynchronously, unless its first page already holds all of them."""
+        if count in ("exact", "estimate") and keyset.is_first and next_cursor is None and (items or not offset):
+            return offset + len(items), False
+        return await self.count_rows_async(query, params, count, with_rls)
@@ -7,6 +7,7 @@ This module provides a repository class for accessing hardware data in the datab
 import logging
 from typing import Optional, Dict, Any, List, Tuple, Union
 from .base import BaseRepository
+from ..pagination import KeysetPaginator
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -31,18 +32,22 @@ class HardwareRepository(BaseRepository):
         """
         self.default_order_by = "id DESC"
         self.search_columns = ["name", "type", "specs"]
+        self.paginator = KeysetPaginator({"id": "id"}, "id", default_order="desc")
     
     def get_hardware(self, limit: int = 10, offset: int = 0, search: Optional[str] = None,
-                    type: Optional[str] = None, account_id: Optional[int] = None) -> Dict[str, Any]:
+                    type: Optional[str] = None, account_id: Optional[int] = None,
+                    cursor: Optional[str] = None, count: str = "exact") -> Dict[str, Any]:
         """
         Get a list of hardware with pagination and filtering.
         
         Args:
             limit (int, optional): Maximum number of hardware items to return. Defaults to 10.
-            offset (int, optional): Number of hardware items to skip. Defaults to 0.
+            offset (int, optional): Number of hardware items to skip, ignored with a cursor. Defaults to 0.
             search (Optional[str], optional): Search term to filter hardware. Defaults to None.
             type (Optional[str], optional): Filter by type. Defaults to None.
             account_id (Optional[int], optional): Filter by account ID. Defaults to None.
+            cursor (Optional[str], optional): The next_cursor of the previous page. Defaults to None.
+            count (str, optional): How to count the total: "exact", "estimate" or "none". Defaults to "exact".
             
         Returns:
             Dict[str, Any]: A dictionary with hardware items and pagination info.
@@ -66,18 +71,17 @@ class HardwareRepository(BaseRepository):
             search_term = f"%{search}%"
             params.extend([search_term] * len(self.search_columns))
         
-        # Get total count
-        total = self.get_count(condition, tuple(params) if params else None)
-        
-        # Get hardware
-        hardware = self.get_all(condition, tuple(params) if params else None, 
-                               self.default_columns, self.default_order_by, limit, offset)
+        page = self.get_keyset_page(cursor, limit, offset, condition=condition,
+                                    params=tuple(params) if params else None,
+                                    columns=self.default_columns, count=count)
         
         return {
-            "hardware": hardware,
-            "total": total,
+            "hardware": page["items"],
+            "total": page["total"],
+            "total_estimated": page["total_estimated"],
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": page["next_cursor"]
         }
     
     def get_hardware_by_id(self, hardware_id: int) -> Optional[Dict[str, Any]]:
@@ -4,14 +4,97 @@ Log repository for database operations related to logs.
 
 import logging
 import json
-from typing import Dict, Any, List, Optional, Tuple
-from datetime import datetime
+import threading
+from typing import Dict, Any, List, Optional, Tuple, Union, Iterable
+from datetime import datetime, timezone
+
+from psycopg2.extras import execute_values
 
 from db.repositories.base import BaseRepository
+from db.pagination import Keyset, KeysetPaginator
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Lookup queries shared by the sync and async code paths
+LOG_CATEGORIES_QUERY = """
+    SELECT id, name, description, created_at, updated_at
+    FROM logs_categories
+    ORDER BY name
+"""
+
+LOG_SOURCES_QUERY = """
+    SELECT id, name, description, created_at, updated_at
+    FROM logs_sources
+    ORDER BY name
+"""
+
+LOG_LEVELS_QUERY = """
+    SELECT id, name, severity, color, created_at, updated_at
+    FROM logs_levels
+    ORDER BY severity
+"""
+
+RETENTION_POLICIES_QUERY = """
+    SELECT
+        rp.id,
+        rp.category_id,
+        lc.name as category_name,
+        rp.source_id,
+        ls.name as source_name,
+        rp.level_id,
+        ll.name as level_name,
+        rp.retention_days,
+        rp.created_at,
+        rp.updated_at
+    FROM logs_retention_policies rp
+    LEFT JOIN logs_categories lc ON rp.category_id = lc.id
+    LEFT JOIN logs_sources ls ON rp.source_id = ls.id
+    LEFT JOIN logs_levels ll ON rp.level_id = ll.id
+    ORDER BY rp.retention_days DESC
+"""
+
+CLEANUP_OLD_LOGS_QUERY = "SELECT cleanup_old_logs() as deleted_count"
+
+# Bulk insertion of log entries, with the lookup ids resolved beforehand
+BULK_LOG_COLUMNS = (
+    "timestamp, category_id, source_id, level_id, message, details, entity_type, "
+    "entity_id, user_id, owner_id, trace_id, span_id, parent_span_id"
+)
+BULK_INSERT_LOGS_QUERY = f"INSERT INTO logs ({BULK_LOG_COLUMNS}) VALUES %s"
+BULK_INSERT_LOGS_TEMPLATE = "(%s, %s, %s, %s, %s, %s::jsonb, %s, %s, %s, %s, %s, %s, %s)"
+BULK_INSERT_LOG_ROW_QUERY = f"INSERT INTO logs ({BULK_LOG_COLUMNS}) VALUES {BULK_INSERT_LOGS_TEMPLATE} RETURNING id"
+BULK_COPY_LOGS_QUERY = f"COPY logs ({BULK_LOG_COLUMNS}) FROM STDIN"
+BULK_LOGS_PAGE_SIZE = 1000
+
+# Get or create the ids of log categories and sources by name, as add_log_entry() does.
+# The no-op update returns the id of a name another session inserted concurrently, which
+# DO NOTHING would skip and the statement's snapshot would not see; xmax is 0 only for
+# rows this statement created.
+LOG_LOOKUP_CREATE_QUERY = """
+    INSERT INTO {table} (name)
+    SELECT unnest(%s::varchar[])
+    ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+    RETURNING id, name, (xmax = 0) AS created
+"""
+
+# Levels are never created; unknown levels fall back to DEFAULT_LOG_LEVEL
+LOG_LEVEL_LOOKUP_QUERY = "SELECT id, name, FALSE AS created FROM logs_levels WHERE name = ANY(%s::varchar[])"
+DEFAULT_LOG_LEVEL = "INFO"
+
+# Name to id maps of the log lookup tables, shared by all repositories.
+# Ids are only added once the transaction that resolved them is committed.
+_log_lookup_ids: Dict[str, Dict[str, int]] = {"logs_categories": {}, "logs_sources": {}, "logs_levels": {}}
+_log_lookup_lock = threading.Lock()
+
+def clear_log_lookup_cache() -> None:
+    """
+    Clear the name to id maps of the log lookup tables.
+    """
+    with _log_lookup_lock:
+        for ids in _log_lookup_ids.values():
+            ids.clear()
+
 class LogRepository(BaseRepository):
     """Repository for log operations."""
 
@@ -32,8 +115,10 @@ class LogRepository(BaseRepository):
             l.entity_id, l.user_id, l.owner_id, l.trace_id,
             l.span_id, l.parent_span_id, l.created_at
         """
-        self.default_order_by = "l.timestamp DESC"
+        self.default_order_by = "l.timestamp DESC, l.id DESC"
         self.search_columns = ["l.message", "l.entity_id", "lc.name", "ls.name"]
+        self.paginator = KeysetPaginator({"timestamp": "l.timestamp", "id": "l.id"}, "id",
+                                         default_sort="timestamp", default_order="desc")
 
         # Define joins for retrieving log data with related information
         self.default_joins = """
@@ -78,47 +163,9 @@ class LogRepository(BaseRepository):
             Optional[Dict[str, Any]]: The inserted log entry or None if insertion failed
         """
         try:
-            # Use the add_log_entry function to insert the log
-            query = """
-                SELECT add_log_entry(
-                    %s, %s, %s, %s, %s, %s::jsonb, %s, %s, %s, %s, %s, %s, %s
-                ) as log_id
-            """
-
-            # Convert details to JSON string if provided
-            details_json = json.dumps(details) if details else None
-
-            # Set owner_id to user_id if not provided
-            if owner_id is None and self.user_id:
-                owner_id = self.user_id
-
-            # Set user_id to current user if not provided
-            if user_id is None and self.user_id:
-                user_id = self.user_id
-
-            # Ensure all parameters are properly formatted
-            # Convert any string parameters to proper format
-            if isinstance(source, str):
-                source = source.strip()
-
-            if isinstance(category, str):
-                category = category.strip()
-
-            # Ensure params is a tuple
-            params = (
-                timestamp,
-                category,
-                source,
-                level,
-                message,
-                details_json,
-                entity_type,
-                entity_id,
-                user_id,
-                owner_id,
-                trace_id,
-                span_id,
-                parent_span_id
+            query, params = self._build_add_log_query(
+                message, level, category, source, details, entity_type, entity_id,
+                user_id, owner_id, trace_id, span_id, parent_span_id, timestamp
             )
 
             # Use execute_insert instead of execute_query_single to ensure the transaction is committed
@@ -131,6 +178,9 @@ class LogRepository(BaseRepository):
                 try:
                     cursor.execute(query, params)
 
+                    # The raw cursor bypasses execute_insert, so drop cached log queries here
+                    tables = self._publish_cache_invalidation(query, cursor)
+
                     if cursor.description:
                         columns = [desc[0] for desc in cursor.description]
                         result_row = cursor.fetchone()
@@ -138,10 +188,12 @@ class LogRepository(BaseRepository):
                         if result_row:
                             result = dict(zip(columns, result_row))
                             conn.commit()
+                            self._invalidate_cache_for_tables(tables)
                         else:
                             result = None
                     else:
                         conn.commit()
+                        self._invalidate_cache_for_tables(tables)
                         result = None
                 except Exception as e:
                     logger.error(f"Error executing add_log_entry: {e}")
@@ -160,6 +212,76 @@ class LogRepository(BaseRepository):
             logger.error(f"Error adding log entry: {e}")
             return None
 
+    def add_logs_bulk(self, entries: List[Dict[str, Any]], return_ids: bool = False) -> Union[int, List[int]]:
+        """
+        Add many log entries to the database in one transaction.
+
+        Category, source and level names are resolved to ids in memory, so a batch
+        costs one INSERT per BULK_LOGS_PAGE_SIZE entries and a single commit. The
+        inserted rows are not read back.
+
+        Args:
+            entries (List[Dict[str, Any]]): The log entries, with the arguments of add_log() as keys
+            return_ids (bool, optional): Whether to return the ids of the inserted entries. Defaults to False.
+
+        Returns:
+            Union[int, List[int]]: The number of inserted entries, or their ids if return_ids is True.
+            0 (or []) is returned on error.
+        """
+        failed = [] if return_ids else 0
+        if not entries:
+            return failed
+
+        try:
+            logs, names = self._prepare_bulk_logs(entries)
+
+            with self.get_connection(True) as conn:
+                if not conn:
+                    logger.error("No database connection available")
+                    return failed
+
+                cursor = conn.cursor()
+                try:
+                    lookup_ids = {}
+                    tables = []
+                    for table, table_names in names.items():
+                        query, params = self._build_log_lookup_query(table, table_names)
+                        if query is None:
+                            lookup_ids[table] = {}
+                            continue
+
+                        cursor.execute(query, params)
+                        rows = cursor.fetchall()
+                        if any(row[2] for row in rows):
+                            tables.extend(self._publish_cache_invalidation(query, cursor))
+                        lookup_ids[table] = {name: lookup_id for lookup_id, name, _ in rows}
+
+                    rows = self._build_bulk_log_rows(logs, lookup_ids)
+                    result = execute_values(
+                        cursor,
+                        BULK_INSERT_LOGS_QUERY + (" RETURNING id" if return_ids else ""),
+                        rows,
+                        template=BULK_INSERT_LOGS_TEMPLATE,
+                        page_size=BULK_LOGS_PAGE_SIZE,
+                        fetch=return_ids
+                    )
+                    tables.extend(self._publish_cache_invalidation(BULK_INSERT_LOGS_QUERY, cursor))
+
+                    conn.commit()
+                    self._invalidate_cache_for_tables(tables)
+                except Exception as e:
+                    logger.error(f"Error inserting {len(entries)} log entries: {e}")
+                    conn.rollback()
+                    return failed
+                finally:
+                    cursor.close()
+
+            self._remember_log_lookup_ids(lookup_ids)
+            return [row[0] for row in result] if return_ids else len(rows)
+        except Exception as e:
+            logger.error(f"Error adding log entries: {e}")
+            return failed
+
     def get_logs(self,
                  limit: int = 100,
                  offset: int = 0,
@@ -199,88 +321,10 @@ class LogRepository(BaseRepository):
             # Log RLS context information
             logger.info(f"Getting logs with RLS context: user_id={self.user_id}, user_role={self.user_role}, with_rls={with_rls}")
 
-            # Build the query
-            query_parts = [f"SELECT {self.default_columns}"]
-
-            # Add FROM clause with joins for the main query
-            from_clause = f"FROM {self.table_name} l {self.default_joins}"
-            query_parts.append(from_clause)
-
-            # Use a simpler count query
-            count_query = "SELECT COUNT(*) as count FROM logs"
-
-            # Initialize WHERE conditions and parameters
-            conditions = []
-            params = []
-
-            # Add time range filters
-            if start_time:
-                conditions.append("l.timestamp >= %s")
-                params.append(start_time)
-
-            if end_time:
-                conditions.append("l.timestamp <= %s")
-                params.append(end_time)
-
-            # Add level filter
-            if levels and len(levels) > 0:
-                placeholders = ", ".join(["%s"] * len(levels))
-                conditions.append(f"ll.name IN ({placeholders})")
-                params.extend(levels)
-
-            # Add category filter
-            if categories and len(categories) > 0:
-                placeholders = ", ".join(["%s"] * len(categories))
-                conditions.append(f"lc.name IN ({placeholders})")
-                params.extend(categories)
-
-            # Add source filter
-            if sources and len(sources) > 0:
-                placeholders = ", ".join(["%s"] * len(sources))
-                conditions.append(f"ls.name IN ({placeholders})")
-                params.extend(sources)
-
-            # Add entity filters
-            if entity_type:
-                conditions.append("l.entity_type = %s")
-                params.append(entity_type)
-
-            if entity_id:
-                conditions.append("l.entity_id = %s")
-                params.append(entity_id)
-
-            # Add user filter
-            if user_id:
-                conditions.append("l.user_id = %s")
-                params.append(user_id)
-
-            # Add trace filter
-            if trace_id:
-                conditions.append("l.trace_id = %s")
-                params.append(trace_id)
-
-            # Add search query
-            if search_query:
-                conditions.append("to_tsvector('english', l.message) @@ plainto_tsquery('english', %s)")
-                params.append(search_query)
-
-            # Add WHERE clause if there are conditions
-            if conditions:
-                where_clause = "WHERE " + " AND ".join(conditions)
-                query_parts.append(where_clause)
-                # Update count query with the same conditions
-                count_query += " WHERE " + " AND ".join(conditions)
-
-            # Add ORDER BY, LIMIT, and OFFSET
-            query_parts.append(f"ORDER BY {self.default_order_by}")
-            query_parts.append("LIMIT %s OFFSET %s")
-
-            # Add limit and offset parameters
-            params.append(limit)
-            params.append(offset)
-
-            # Build the final query
-            query = " ".join(query_parts)
+            query, count_query, params = self._build_logs_query(
+                limit, offset, start_time, end_time, levels, categories, sources,
+                entity_type, entity_id, user_id, trace_id, search_query
+            )
 
             # Log the queries
             logger.info(f"Logs query: {query}")
@@ -302,14 +346,7 @@ class LogRepository(BaseRepository):
 
             # Process the results
             for log in logs:
-                # Convert details from JSON string to dict if it exists
-                if log.get('details'):
-                    try:
-                        if isinstance(log['details'], str):
-                            log['details'] = json.loads(log['details'])
-                    except:
-                        # If JSON parsing fails, keep as is
-                        pass
+                self._parse_log_details(log)
 
             return logs, total_count
         except Exception as e:
@@ -317,6 +354,76 @@ class LogRepository(BaseRepository):
             logger.exception("Exception details:")
             return [], 0
 
+    def get_logs_page(self,
+                      cursor: Optional[str] = None,
+                      limit: int = 100,
+                      offset: int = 0,
+                      start_time: Optional[datetime] = None,
+                      end_time: Optional[datetime] = None,
+                      levels: Optional[List[str]] = None,
+                      categories: Optional[List[str]] = None,
+                      sources: Optional[List[str]] = None,
+                      entity_type: Optional[str] = None,
+                      entity_id: Optional[str] = None,
+                      user_id: Optional[int] = None,
+                      trace_id: Optional[str] = None,
+                      search_query: Optional[str] = None,
+                      count: str = "exact",
+                      with_rls: bool = True) -> Dict[str, Any]:
+        """
+        Get a page of logs with filtering and keyset pagination.
+
+        Logs are ordered from the newest, by timestamp and then by ID, and the next page
+        starts after the last log of this one, however many logs came before it.
+
+        Args:
+            cursor (Optional[str], optional): The next_cursor of the previous page, or None for the first page.
+                Defaults to None.
+            limit (int, optional): Maximum number of logs to return. Defaults to 100.
+            offset (int, optional): Offset for pagination, ignored with a cursor. Defaults to 0.
+            start_time (Optional[datetime], optional): Filter logs after this time. Defaults to None.
+            end_time (Optional[datetime], optional): Filter logs before this time. Defaults to None.
+            levels (Optional[List[str]], optional): Filter by log levels. Defaults to None.
+            categories (Optional[List[str]], optional): Filter by categories. Defaults to None.
+            sources (Optional[List[str]], optional): Filter by sources. Defaults to None.
+            entity_type (Optional[str], optional): Filter by entity type. Defaults to None.
+            entity_id (Optional[str], optional): Filter by entity ID. Defaults to None.
+            user_id (Optional[int], optional): Filter by user ID. Defaults to None.
+            trace_id (Optional[str], optional): Filter by trace ID. Defaults to None.
+            search_query (Optional[str], optional): Search in message text. Defaults to None.
+            count (str, optional): How to count the total: "exact", "estimate" or "none". Defaults to "exact".
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            Dict[str, Any]: A dictionary with the logs, the total and the cursor of the next page
+
+        Raises:
+            InvalidCursorError: If the cursor is not valid
+        """
+        keyset = self.paginator.keyset(cursor)
+        offset = 0 if cursor else offset
+        conditions, params = self._build_logs_conditions(
+            start_time, end_time, levels, categories, sources,
+            entity_type, entity_id, user_id, trace_id, search_query
+        )
+        query, page_params, count_query = self._build_logs_page_query(keyset, limit, offset, conditions, params)
+
+        logs, next_cursor = keyset.page(self.execute_query(query, tuple(page_params), with_rls), limit)
+        total, estimated = self._count_page(keyset, logs, next_cursor, offset, count_query, tuple(params),
+                                            count, with_rls)
+
+        for log in logs:
+            self._parse_log_details(log)
+
+        return {
+            "logs": logs,
+            "total": total,
+            "total_estimated": estimated,
+            "limit": limit,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
+        }
+
     def get_log_by_id(self, log_id: int, with_rls: bool = True) -> Optional[Dict[str, Any]]:
         """
         Get a log entry by ID.
@@ -329,22 +436,10 @@ class LogRepository(BaseRepository):
             Optional[Dict[str, Any]]: The log entry or None if not found
         """
         try:
-            query = f"""
-                SELECT {self.default_columns}
-                FROM {self.table_name} l
-                {self.default_joins}
-                WHERE l.id = %s
-            """
+            log = self.execute_query_single(self._build_log_by_id_query(), (log_id,), with_rls)
 
-            log = self.execute_query_single(query, (log_id,), with_rls)
-
-            if log and log.get('details'):
-                try:
-                    if isinstance(log['details'], str):
-                        log['details'] = json.loads(log['details'])
-                except:
-                    # If JSON parsing fails, keep as is
-                    pass
+            if log:
+                self._parse_log_details(log)
 
             return log
         except Exception as e:
@@ -359,13 +454,7 @@ class LogRepository(BaseRepository):
             List[Dict[str, Any]]: List of log categories
         """
         try:
-            query = """
-                SELECT id, name, description, created_at, updated_at
-                FROM logs_categories
-                ORDER BY name
-            """
-
-            return self.execute_query(query)
+            return self.execute_query(LOG_CATEGORIES_QUERY)
         except Exception as e:
             logger.error(f"Error getting log categories: {e}")
             return []
@@ -378,13 +467,7 @@ class LogRepository(BaseRepository):
             List[Dict[str, Any]]: List of log sources
         """
         try:
-            query = """
-                SELECT id, name, description, created_at, updated_at
-                FROM logs_sources
-                ORDER BY name
-            """
-
-            return self.execute_query(query)
+            return self.execute_query(LOG_SOURCES_QUERY)
         except Exception as e:
             logger.error(f"Error getting log sources: {e}")
             return []
@@ -397,13 +480,7 @@ class LogRepository(BaseRepository):
             List[Dict[str, Any]]: List of log levels
         """
         try:
-            query = """
-                SELECT id, name, severity, color, created_at, updated_at
-                FROM logs_levels
-                ORDER BY severity
-            """
-
-            return self.execute_query(query)
+            return self.execute_query(LOG_LEVELS_QUERY)
         except Exception as e:
             logger.error(f"Error getting log levels: {e}")
             return []
@@ -416,26 +493,7 @@ class LogRepository(BaseRepository):
             List[Dict[str, Any]]: List of retention policies
         """
         try:
-            query = """
-                SELECT
-                    rp.id,
-                    rp.category_id,
-                    lc.name as category_name,
-                    rp.source_id,
-                    ls.name as source_name,
-                    rp.level_id,
-                    ll.name as level_name,
-                    rp.retention_days,
-                    rp.created_at,
-                    rp.updated_at
-                FROM logs_retention_policies rp
-                LEFT JOIN logs_categories lc ON rp.category_id = lc.id
-                LEFT JOIN logs_sources ls ON rp.source_id = ls.id
-                LEFT JOIN logs_levels ll ON rp.level_id = ll.id
-                ORDER BY rp.retention_days DESC
-            """
-
-            return self.execute_query(query)
+            return self.execute_query(RETENTION_POLICIES_QUERY)
         except Exception as e:
             logger.error(f"Error getting retention policies: {e}")
             return []
@@ -467,24 +525,9 @@ class LogRepository(BaseRepository):
                     continue
 
                 # Build query to count logs that would be deleted
-                query = """
-                    SELECT COUNT(*) as count
-                    FROM logs
-                    WHERE timestamp < (CURRENT_TIMESTAMP - (%s || ' days')::INTERVAL)
-                """
-                params = [retention_days]
-
-                # Add conditions based on policy
-                if category_id:
-                    query += " AND category_id = %s"
-                    params.append(category_id)
-
-                if source_id:
-                    query += " AND source_id = %s"
-                    params.append(source_id)
-
-                query += " AND level_id = %s"
-                params.append(level_id)
+                query, params = self._build_logs_to_delete_count_query(
+                    retention_days, category_id, source_id, level_id
+                )
 
                 # Execute query
                 count_result = self.execute_query_single(query, params)
@@ -505,12 +548,15 @@ class LogRepository(BaseRepository):
         """
         Clean up old logs based on retention policies.
 
+        The weekly partitions past the longest retention period are dropped whole,
+        and the shorter policies delete their rows from the remaining partitions.
+
         Returns:
             int: Number of deleted log entries
         """
         try:
-            query = "SELECT cleanup_old_logs() as deleted_count"
-            result = self.execute_query_single(query)
+            # cleanup_old_logs() drops expired partitions and deletes rows, so run it as a committed write
+            result = self.execute_update(CLEANUP_OLD_LOGS_QUERY, returning=True)
 
             if result and 'deleted_count' in result:
                 return result['deleted_count']
@@ -534,32 +580,757 @@ class LogRepository(BaseRepository):
             List[Dict[str, Any]]: Log statistics
         """
         try:
-            # Determine the date trunc function based on group_by
-            if group_by == 'hour':
-                trunc_function = "date_trunc('hour', l.timestamp)"
-            elif group_by == 'day':
-                trunc_function = "date_trunc('day', l.timestamp)"
-            elif group_by == 'week':
-                trunc_function = "date_trunc('week', l.timestamp)"
-            elif group_by == 'month':
-                trunc_function = "date_trunc('month', l.timestamp)"
-            else:
-                trunc_function = "date_trunc('day', l.timestamp)"
-
-            query = f"""
-                SELECT
-                    {trunc_function} as time_period,
-                    ll.name as level,
-                    COUNT(*) as count,
-                    MAX(ll.severity) as severity
-                FROM logs l
-                JOIN logs_levels ll ON l.level_id = ll.id
-                WHERE l.timestamp >= NOW() - INTERVAL '%s days'
-                GROUP BY time_period, ll.name
-                ORDER BY time_period, severity
-            """
+            query = self._build_log_statistics_query(group_by)
 
             return self.execute_query(query, (days,))
         except Exception as e:
             logger.error(f"Error getting log statistics: {e}")
             return []
+
+    # Query builders shared by the sync and async code paths
+
+    def _prepare_bulk_logs(self, entries: Iterable[Dict[str, Any]]) -> Tuple[List[Tuple], Dict[str, set]]:
+        """
+        Normalize log entries for a bulk insert the way _build_add_log_query() does.
+
+        Returns:
+            Tuple[List[Tuple], Dict[str, set]]: The entries with lookup names instead of ids,
+            and the names to resolve per lookup table
+        """
+        now = datetime.now(timezone.utc)
+        names = {"logs_categories": set(), "logs_sources": set(), "logs_levels": {DEFAULT_LOG_LEVEL}}
+        logs = []
+
+        for entry in entries:
+            category = entry.get("category")
+            source = entry.get("source")
+            level = entry.get("level", DEFAULT_LOG_LEVEL)
+            details = entry.get("details")
+            user_id = entry.get("user_id")
+            owner_id = entry.get("owner_id")
+
+            if isinstance(category, str):
+                category = category.strip()
+            if isinstance(source, str):
+                source = source.strip()
+
+            # Set owner_id and user_id to the current user if not provided
+            if owner_id is None and self.user_id:
+                owner_id = self.user_id
+            if user_id is None and self.user_id:
+                user_id = self.user_id
+
+            if category is not None:
+                names["logs_categories"].add(category)
+            if source is not None:
+                names["logs_sources"].add(source)
+            if level is not None:
+                names["logs_levels"].add(level)
+
+            logs.append((
+                entry.get("timestamp") or now,
+                category,
+                source,
+                level,
+                entry["message"],
+                json.dumps(details) if details else None,
+                entry.get("entity_type"),
+                entry.get("entity_id"),
+                user_id,
+                owner_id,
+                entry.get("trace_id"),
+                entry.get("span_id"),
+                entry.get("parent_span_id")
+            ))
+
+        return logs, names
+
+    @staticmethod
+    def _build_log_lookup_query(table: str, names: set) -> Tuple[Optional[str], Tuple]:
+        """
+        Build the query resolving the lookup names that are not known in memory yet.
+
+        Returns:
+            Tuple[Optional[str], Tuple]: The query and its parameters, or (None, ()) if all names are known
+        """
+        with _log_lookup_lock:
+            known = _log_lookup_ids[table]
+            missing = sorted(name for name in names if name not in known)
+
+        if not missing:
+            return None, ()
+
+        if table == "logs_levels":
+            return LOG_LEVEL_LOOKUP_QUERY, (missing,)
+
+        return LOG_LOOKUP_CREATE_QUERY.format(table=table), (missing,)
+
+    @staticmethod
+    def _build_bulk_log_rows(logs: List[Tuple], lookup_ids: Dict[str, Dict[str, int]]) -> List[Tuple]:
+        """
+        Replace the lookup names of prepared log entries by their ids.
+
+        Returns:
+            List[Tuple]: The rows to insert, in BULK_LOG_COLUMNS order
+        """
+        with _log_lookup_lock:
+            categories = {**_log_lookup_ids["logs_categories"], **lookup_ids.get("logs_categories", {})}
+            sources = {**_log_lookup_ids["logs_sources"], **lookup_ids.get("logs_sources", {})}
+            levels = {**_log_lookup_ids["logs_levels"], **lookup_ids.get("logs_levels", {})}
+
+        default_level_id = levels.get(DEFAULT_LOG_LEVEL)
+
+        return [
+            (
+                timestamp,
+                categories.get(category),
+                sources.get(source),
+                levels.get(level, default_level_id) if level is not None else None,
+                message, details, entity_type, entity_id, user_id, owner_id,
+                trace_id, span_id, parent_span_id
+            )
+            for (timestamp, category, source, level, message, details, entity_type, entity_id,
+                 user_id, owner_id, trace_id, span_id, parent_span_id) in logs
+        ]
+
+    @staticmethod
+    def _remember_log_lookup_ids(lookup_ids: Dict[str, Dict[str, int]]) -> None:
+        """Add committed lookup ids to the in-memory maps."""
+        with _log_lookup_lock:
+            for table, ids in lookup_ids.items():
+                _log_lookup_ids[table].update(ids)
+
+    def _build_add_log_query(self,
+                             message: str,
+                             level: str = "INFO",
+                             category: Optional[str] = None,
+                             source: Optional[str] = None,
+                             details: Optional[Dict[str, Any]] = None,
+                             entity_type: Optional[str] = None,
+                             entity_id: Optional[str] = None,
+                             user_id: Optional[int] = None,
+                             owner_id: Optional[int] = None,
+                             trace_id: Optional[str] = None,
+                             span_id: Optional[str] = None,
+                             parent_span_id: Optional[str] = None,
+                             timestamp: Optional[datetime] = None) -> Tuple[str, Tuple]:
+        """
+        Build the add_log_entry() call and its parameters for a single log entry.
+
+        Returns:
+            Tuple[str, Tuple]: The query and its parameters
+        """
+        # Use the add_log_entry function to insert the log
+        query = """
+            SELECT add_log_entry(
+                %s, %s, %s, %s, %s, %s::jsonb, %s, %s, %s, %s, %s, %s, %s
+            ) as log_id
+        """
+
+        # Convert details to JSON string if provided
+        details_json = json.dumps(details) if details else None
+
+        # Set owner_id to user_id if not provided
+        if owner_id is None and self.user_id:
+            owner_id = self.user_id
+
+        # Set user_id to current user if not provided
+        if user_id is None and self.user_id:
+            user_id = self.user_id
+
+        # Ensure all parameters are properly formatted
+        # Convert any string parameters to proper format
+        if isinstance(source, str):
+            source = source.strip()
+
+        if isinstance(category, str):
+            category = category.strip()
+
+        # Ensure params is a tuple
+        params = (
+            timestamp,
+            category,
+            source,
+            level,
+            message,
+            details_json,
+            entity_type,
+            entity_id,
+            user_id,
+            owner_id,
+            trace_id,
+            span_id,
+            parent_span_id
+        )
+
+        return query, params
+
+    def _build_logs_query(self,
+                          limit: int = 100,
+                          offset: int = 0,
+                          start_time: Optional[datetime] = None,
+                          end_time: Optional[datetime] = None,
+                          levels: Optional[List[str]] = None,
+                          categories: Optional[List[str]] = None,
+                          sources: Optional[List[str]] = None,
+                          entity_type: Optional[str] = None,
+                          entity_id: Optional[str] = None,
+                          user_id: Optional[int] = None,
+                          trace_id: Optional[str] = None,
+                          search_query: Optional[str] = None) -> Tuple[str, str, List[Any]]:
+        """
+        Build the filtered logs query and its count query.
+
+        The last two parameters are LIMIT and OFFSET; the count query uses params[:-2].
+
+        Returns:
+            Tuple[str, str, List[Any]]: The logs query, the count query and the parameters
+        """
+        conditions, params = self._build_logs_conditions(
+            start_time, end_time, levels, categories, sources,
+            entity_type, entity_id, user_id, trace_id, search_query
+        )
+
+        # The count query needs the same alias and joins, since the filters reference them
+        from_clause = self._build_logs_from_clause(conditions)
+        query = f"SELECT {self.default_columns} {from_clause} ORDER BY {self.default_order_by} LIMIT %s OFFSET %s"
+        count_query = f"SELECT COUNT(*) as count {from_clause}"
+
+        # Add limit and offset parameters
+        params.append(limit)
+        params.append(offset)
+
+        return query, count_query, params
+
+    def _build_logs_page_query(self, keyset: Keyset, limit: int, offset: int, conditions: List[str],
+                               params: List[Any]) -> Tuple[str, List[Any], str]:
+        """
+        Build the query of a page of filtered logs, and the query of all the filtered logs to count them.
+
+        Args:
+            keyset (Keyset): The keyset of the page
+            limit (int): The page size; one more log is fetched to know whether there is a next page
+            offset (int): The number of logs to skip
+            conditions (List[str]): The filter conditions, from _build_logs_conditions()
+            params (List[Any]): The parameters of the filter conditions
+
+        Returns:
+            Tuple[str, List[Any], str]: The page query, its parameters and the query to count
+        """
+        page_conditions = conditions + [keyset.condition] if keyset.condition else conditions
+        query = (f"SELECT {self.default_columns} {self._build_logs_from_clause(page_conditions)} "
+                 f"ORDER BY {keyset.order_by} LIMIT %s OFFSET %s")
+        page_params = params + keyset.params + [limit + 1, offset]
+
+        return query, page_params, f"SELECT 1 {self._build_logs_from_clause(conditions)}"
+
+    def _build_logs_from_clause(self, conditions: List[str]) -> str:
+        """Build the FROM clause of the logs, with their joins and WHERE conditions."""
+        from_clause = f"FROM {self.table_name} l {self.default_joins}"
+        if conditions:
+            from_clause += " WHERE " + " AND ".join(conditions)
+        return from_clause
+
+    def _build_logs_conditions(self,
+                               start_time: Optional[datetime] = None,
+                               end_time: Optional[datetime] = None,
+                               levels: Optional[List[str]] = None,
+                               categories: Optional[List[str]] = None,
+                               sources: Optional[List[str]] = None,
+                               entity_type: Optional[str] = None,
+                               entity_id: Optional[str] = None,
+                               user_id: Optional[int] = None,
+                               trace_id: Optional[str] = None,
+                               search_query: Optional[str] = None) -> Tuple[List[str], List[Any]]:
+        """
+        Build the WHERE conditions of the log filters.
+
+        Returns:
+            Tuple[List[str], List[Any]]: The conditions and their parameters
+        """
+        # Initialize WHERE conditions and parameters
+        conditions = []
+        params = []
+
+        # Add time range filters, compared to the bare partition key so that the
+        # weekly partitions outside the range are pruned
+        if start_time:
+            conditions.append("l.timestamp >= %s")
+            params.append(start_time)
+
+        if end_time:
+            conditions.append("l.timestamp <= %s")
+            params.append(end_time)
+
+        # Add level filter
+        if levels and len(levels) > 0:
+            placeholders = ", ".join(["%s"] * len(levels))
+            conditions.append(f"ll.name IN ({placeholders})")
+            params.extend(levels)
+
+        # Add category filter
+        if categories and len(categories) > 0:
+            placeholders = ", ".join(["%s"] * len(categories))
+            conditions.append(f"lc.name IN ({placeholders})")
+            params.extend(categories)
+
+        # Add source filter
+        if sources and len(sources) > 0:
+            placeholders = ", ".join(["%s"] * len(sources))
+            conditions.append(f"ls.name IN ({placeholders})")
+            params.extend(sources)
+
+        # Add entity filters
+        if entity_type:
+            conditions.append("l.entity_type = %s")
+            params.append(entity_type)
+
+        if entity_id:
+            conditions.append("l.entity_id = %s")
+            params.append(entity_id)
+
+        # Add user filter
+        if user_id:
+            conditions.append("l.user_id = %s")
+            params.append(user_id)
+
+        # Add trace filter
+        if trace_id:
+            conditions.append("l.trace_id = %s")
+            params.append(trace_id)
+
+        # Add search query
+        if search_query:
+            conditions.append("to_tsvector('english', l.message) @@ plainto_tsquery('english', %s)")
+            params.append(search_query)
+
+        return conditions, params
+
+    def _build_log_by_id_query(self) -> str:
+        """Build the query that selects a single log entry by ID."""
+        return f"""
+            SELECT {self.default_columns}
+            FROM {self.table_name} l
+            {self.default_joins}
+            WHERE l.id = %s
+        """
+
+    @staticmethod
+    def _parse_log_details(log: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert the details column of a log row from a JSON string to a dict in place."""
+        if log.get('details'):
+            try:
+                if isinstance(log['details'], str):
+                    log['details'] = json.loads(log['details'])
+            except:
+                # If JSON parsing fails, keep as is
+                pass
+        return log
+
+    # Async API
+
+    async def add_log_async(self,
+                            message: str,
+                            level: str = "INFO",
+                            category: Optional[str] = None,
+                            source: Optional[str] = None,
+                            details: Optional[Dict[str, Any]] = None,
+                            entity_type: Optional[str] = None,
+                            entity_id: Optional[str] = None,
+                            user_id: Optional[int] = None,
+                            owner_id: Optional[int] = None,
+                            trace_id: Optional[str] = None,
+                            span_id: Optional[str] = None,
+                            parent_span_id: Optional[str] = None,
+                            timestamp: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """
+        Add a log entry to the database asynchronously.
+
+        See add_log() for the arguments.
+
+        Returns:
+            Optional[Dict[str, Any]]: The inserted log entry or None if insertion failed
+        """
+        try:
+            query, params = self._build_add_log_query(
+                message, level, category, source, details, entity_type, entity_id,
+                user_id, owner_id, trace_id, span_id, parent_span_id, timestamp
+            )
+
+            result = await self.execute_insert_async(query, params, True, returning=True)
+
+            if result and result.get('log_id'):
+                # Get the full log entry with RLS bypassed
+                return await self.get_log_by_id_async(result['log_id'], with_rls=False)
+
+            return None
+        except Exception as e:
+            logger.error(f"Error adding log entry: {e}")
+            return None
+
+    async def add_logs_bulk_async(self, entries: List[Dict[str, Any]], return_ids: bool = False) -> Union[int, List[int]]:
+        """
+        Add many log entries to the database in one transaction asynchronously.
+
+        The entries are streamed with COPY, or inserted in a pipeline when their ids
+        are requested. See add_logs_bulk() for the arguments.
+
+        Returns:
+            Union[int, List[int]]: The number of inserted entries, or their ids if return_ids is True.
+            0 (or []) is returned on error.
+        """
+        failed = [] if return_ids else 0
+        if not entries:
+            return failed
+
+        try:
+            logs, names = self._prepare_bulk_logs(entries)
+
+            async with self.get_async_connection(True) as conn:
+                if not conn:
+                    logger.error("No database connection available")
+                    return failed
+
+                try:
+                    async with conn.cursor() as cursor:
+                        lookup_ids = {}
+                        tables = []
+                        for table, table_names in names.items():
+                            query, params = self._build_log_lookup_query(table, table_names)
+                            if query is None:
+                                lookup_ids[table] = {}
+                                continue
+
+                            await cursor.execute(query, params)
+                            rows = await cursor.fetchall()
+                            if any(row[2] for row in rows):
+                                tables.extend(await self._publish_cache_invalidation_async(query, cursor))
+                            lookup_ids[table] = {name: lookup_id for lookup_id, name, _ in rows}
+
+                        rows = self._build_bulk_log_rows(logs, lookup_ids)
+                        ids = []
+                        if return_ids:
+                            await cursor.executemany(BULK_INSERT_LOG_ROW_QUERY, rows, returning=True)
+                            while True:
+                                ids.extend(row[0] for row in await cursor.fetchall())
+                                if not cursor.nextset():
+                                    break
+                        else:
+                            async with cursor.copy(BULK_COPY_LOGS_QUERY) as copy:
+                                for row in rows:
+                                    await copy.write_row(row)
+                        tables.extend(await self._publish_cache_invalidation_async(BULK_INSERT_LOGS_QUERY, cursor))
+
+                    await conn.commit()
+                    self._invalidate_cache_for_tables(tables)
+                except Exception as e:
+                    logger.error(f"Error inserting {len(entries)} log entries: {e}")
+                    await conn.rollback()
+                    return failed
+
+            self._remember_log_lookup_ids(lookup_ids)
+            return ids if return_ids else len(rows)
+        except Exception as e:
+            logger.error(f"Error adding log entries: {e}")
+            return failed
+
+    async def get_logs_async(self,
+                             limit: int = 100,
+                             offset: int = 0,
+                             start_time: Optional[datetime] = None,
+                             end_time: Optional[datetime] = None,
+                             levels: Optional[List[str]] = None,
+                             categories: Optional[List[str]] = None,
+                             sources: Optional[List[str]] = None,
+                             entity_type: Optional[str] = None,
+                             entity_id: Optional[str] = None,
+                             user_id: Optional[int] = None,
+                             trace_id: Optional[str] = None,
+                             search_query: Optional[str] = None,
+                             with_rls: bool = True) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Get logs with filtering and pagination asynchronously.
+
+        See get_logs() for the arguments.
+
+        Returns:
+            Tuple[List[Dict[str, Any]], int]: A tuple containing the list of logs and the total count
+        """
+        try:
+            query, count_query, params = self._build_logs_query(
+                limit, offset, start_time, end_time, levels, categories, sources,
+                entity_type, entity_id, user_id, trace_id, search_query
+            )
+
+            logs = await self.execute_query_async(query, params, with_rls)
+            count_result = await self.execute_query_single_async(count_query, params[:-2], with_rls)
+            total_count = count_result['count'] if count_result and 'count' in count_result else 0
+
+            for log in logs:
+                self._parse_log_details(log)
+
+            return logs, total_count
+        except Exception as e:
+            logger.error(f"Error getting logs: {e}")
+            logger.exception("Exception details:")
+            return [], 0
+
+    async def get_logs_page_async(self,
+                                  cursor: Optional[str] = None,
+                                  limit: int = 100,
+                                  offset: int = 0,
+                                  start_time: Optional[datetime] = None,
+                                  end_time: Optional[datetime] = None,
+                                  levels: Optional[List[str]] = None,
+                                  categories: Optional[List[str]] = None,
+                                  sources: Optional[List[str]] = None,
+                                  entity_type: Optional[str] = None,
+                                  entity_id: Optional[str] = None,
+                                  user_id: Optional[int] = None,
+                                  trace_id: Optional[str] = None,
+                                  search_query: Optional[str] = None,
+                                  count: str = "exact",
+                                  with_rls: bool = True) -> Dict[str, Any]:
+        """
+        Get a page of logs with filtering and keyset pagination asynchronously.
+
+        See get_logs_page() for the arguments.
+
+        Returns:
+            Dict[str, Any]: A dictionary with the logs, the total and the cursor of the next page
+        """
+        keyset = self.paginator.keyset(cursor)
+        offset = 0 if cursor else offset
+        conditions, params = self._build_logs_conditions(
+            start_time, end_time, levels, categories, sources,
+            entity_type, entity_id, user_id, trace_id, search_query
+        )
+        query, page_params, count_query = self._build_logs_page_query(keyset, limit, offset, conditions, params)
+
+        logs, next_cursor = keyset.page(await self.execute_query_async(query, tuple(page_params), with_rls), limit)
+        total, estimated = await self._count_page_async(keyset, logs, next_cursor, offset, count_query,
+                                                        tuple(params), count, with_rls)
+
+        for log in logs:
+            self._parse_log_details(log)
+
+        return {
+            "logs": logs,
+            "total": total,
+            "total_estimated": estimated,
+            "limit": limit,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
+        }
+
+    async def get_log_by_id_async(self, log_id: int, with_rls: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Get a log entry by ID asynchronously.
+
+        Args:
+            log_id (int): The log ID
+            with_rls (bool, optional): Whether to use RLS context. Defaults to True.
+
+        Returns:
+            Optional[Dict[str, Any]]: The log entry or None if not found
+        """
+        try:
+            log = await self.execute_query_single_async(self._build_log_by_id_query(), (log_id,), with_rls)
+
+            if log:
+                self._parse_log_details(log)
+
+            return log
+        except Exception as e:
+            logger.error(f"Error getting log by ID: {e}")
+            return None
+
+    @staticmethod
+    def _build_logs_to_delete_count_query(retention_days: int,
+                                          category_id: Optional[int],
+                                          source_id: Optional[int],
+                                          level_id: int) -> Tuple[str, List[Any]]:
+        """
+        Build the query that counts the logs a retention policy would delete.
+
+        Returns:
+            Tuple[str, List[Any]]: The query and its parameters
+        """
+        query = """
+            SELECT COUNT(*) as count
+            FROM logs
+            WHERE timestamp < (CURRENT_TIMESTAMP - (%s || ' days')::INTERVAL)
+        """
+        params = [retention_days]
+
+        # Add conditions based on policy
+        if category_id:
+            query += " AND category_id = %s"
+            params.append(category_id)
+
+        if source_id:
+            query += " AND source_id = %s"
+            params.append(source_id)
+
+        query += " AND level_id = %s"
+        params.append(level_id)
+
+        return query, params
+
+    @staticmethod
+    def _build_log_statistics_query(group_by: str = "day") -> str:
+        """
+        Build the log statistics query for the given grouping interval.
+
+        The query takes a single parameter, the number of days to include.
+        """
+        # Determine the date trunc function based on group_by
+        if group_by == 'hour':
+            trunc_function = "date_trunc('hour', l.timestamp)"
+        elif group_by == 'day':
+            trunc_function = "date_trunc('day', l.timestamp)"
+        elif group_by == 'week':
+            trunc_function = "date_trunc('week', l.timestamp)"
+        elif group_by == 'month':
+            trunc_function = "date_trunc('month', l.timestamp)"
+        else:
+            trunc_function = "date_trunc('day', l.timestamp)"
+
+        return f"""
+            SELECT
+                {trunc_function} as time_period,
+                ll.name as level,
+                COUNT(*) as count,
+                MAX(ll.severity) as severity
+            FROM logs l
+            JOIN logs_levels ll ON l.level_id = ll.id
+            WHERE l.timestamp >= NOW() - INTERVAL '%s days'
+            GROUP BY time_period, ll.name
+            ORDER BY time_period, severity
+        """
+
+    async def get_log_categories_async(self) -> List[Dict[str, Any]]:
+        """
+        Get all log categories asynchronously.
+
+        Returns:
+            List[Dict[str, Any]]: List of log categories
+        """
+        try:
+            return await self.execute_query_async(LOG_CATEGORIES_QUERY)
+        except Exception as e:
+            logger.error(f"Error getting log categories: {e}")
+            return []
+
+    async def get_log_sources_async(self) -> List[Dict[str, Any]]:
+        """
+        Get all log sources asynchronously.
+
+        Returns:
+            List[Dict[str, Any]]: List of log sources
+        """
+        try:
+            return await self.execute_query_async(LOG_SOURCES_QUERY)
+        except Exception as e:
+            logger.error(f"Error getting log sources: {e}")
+            return []
+
+    async def get_log_levels_async(self) -> List[Dict[str, Any]]:
+        """
+        Get all log levels asynchronously.
+
+        Returns:
+            List[Dict[str, Any]]: List of log levels
+        """
+        try:
+            return await self.execute_query_async(LOG_LEVELS_QUERY)
+        except Exception as e:
+            logger.error(f"Error getting log levels: {e}")
+            return []
+
+    async def get_retention_policies_async(self) -> List[Dict[str, Any]]:
+        """
+        Get all log retention policies asynchronously.
+
+        Returns:
+            List[Dict[str, Any]]: List of retention policies
+        """
+        try:
+            return await self.execute_query_async(RETENTION_POLICIES_QUERY)
+        except Exception as e:
+            logger.error(f"Error getting retention policies: {e}")
+            return []
+
+    async def get_logs_to_delete_count_async(self) -> List[Dict[str, Any]]:
+        """
+        Get count of logs that would be deleted based on retention policies asynchronously.
+
+        Returns:
+            List[Dict[str, Any]]: Count of logs to delete by level
+        """
+        try:
+            result = []
+
+            for policy in await self.get_retention_policies_async():
+                level_id = policy.get('level_id')
+                if not level_id:
+                    continue
+
+                query, params = self._build_logs_to_delete_count_query(
+                    policy.get('retention_days'), policy.get('category_id'),
+                    policy.get('source_id'), level_id
+                )
+                count_result = await self.execute_query_single_async(query, params)
+
+                if count_result and 'count' in count_result:
+                    result.append({
+                        "level": policy.get('level_name'),
+                        "retention_days": policy.get('retention_days'),
+                        "count": count_result['count']
+                    })
+
+            return result
+        except Exception as e:
+            logger.error(f"Error getting logs to delete count: {e}")
+            return []
+
+    async def cleanup_old_logs_async(self) -> int:
+        """
+        Clean up old logs based on retention policies asynchronously.
+
+        The weekly partitions past the longest retention period are dropped whole,
+        and the shorter policies delete their rows from the remaining partitions.
+
+        Returns:
+            int: Number of deleted log entries
+        """
+        try:
+            # cleanup_old_logs() drops expired partitions and deletes rows, so run it as a committed write
+            result = await self.execute_update_async(CLEANUP_OLD_LOGS_QUERY, returning=True)
+
+            if result and 'deleted_count' in result:
+                return result['deleted_count']
+
+            return 0
+        except Exception as e:
+            logger.error(f"Error cleaning up old logs: {e}")
+            return 0
+
+    async def get_log_statistics_async(self,
+                                       days: int = 7,
+                                       group_by: str = "day") -> List[Dict[str, Any]]:
+        """
+        Get log statistics for the specified time period asynchronously.
+
+        Args:
+            days (int, optional): Number of days to include. Defaults to 7.
+            group_by (str, optional): Grouping interval ('hour', 'day', 'week', 'month'). Defaults to "day".
+
+        Returns:
+            List[Dict[str, Any]]: Log statistics
+        """
+        try:
+            return await self.execute_query_async(self._build_log_statistics_query(group_by), (days,))
+        except Exception as e:
+            logger.error(f"Error getting log statistics: {e}")
+            return []
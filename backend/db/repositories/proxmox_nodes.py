@@ -7,6 +7,7 @@ This module provides a repository class for accessing Proxmox node data in the d
 import logging
 from typing import Optional, Dict, Any, List, Tuple, Union
 from .base import BaseRepository
+from ..pagination import KeysetPaginator
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -31,17 +32,20 @@ class ProxmoxNodeRepository(BaseRepository):
         """
         self.default_order_by = "id DESC"
         self.search_columns = ["name", "hostname"]
+        self.paginator = KeysetPaginator({"id": "id"}, "id", default_order="desc")
 
     def get_nodes(self, limit: int = 10, offset: int = 0, search: Optional[str] = None,
-                 status: Optional[str] = None) -> Dict[str, Any]:
+                 status: Optional[str] = None, cursor: Optional[str] = None, count: str = "exact") -> Dict[str, Any]:
         """
         Get a list of Proxmox nodes with pagination and filtering.
 
         Args:
             limit (int, optional): Maximum number of nodes to return. Defaults to 10.
-            offset (int, optional): Number of nodes to skip. Defaults to 0.
+            offset (int, optional): Number of nodes to skip, ignored with a cursor. Defaults to 0.
             search (Optional[str], optional): Search term to filter nodes. Defaults to None.
             status (Optional[str], optional): Filter by status. Defaults to None.
+            cursor (Optional[str], optional): The next_cursor of the previous page. Defaults to None.
+            count (str, optional): How to count the total: "exact", "estimate" or "none". Defaults to "exact".
 
         Returns:
             Dict[str, Any]: A dictionary with nodes and pagination info.
@@ -71,20 +75,18 @@ class ProxmoxNodeRepository(BaseRepository):
             # Disable cache for this query to avoid serialization issues
             from ..query_cache import cache_context
 
-            # Get total count and nodes with cache disabled
+            # Get nodes and total count with cache disabled
             with cache_context(enable=False):
-                # Get total count
-                total = self.get_count(condition, params_tuple)
-
-                # Get nodes
-                nodes = self.get_all(condition, params_tuple,
-                                    self.default_columns, self.default_order_by, limit, offset)
+                page = self.get_keyset_page(cursor, limit, offset, condition=condition, params=params_tuple,
+                                            columns=self.default_columns, count=count)
 
             return {
-                "nodes": nodes,
-                "total": total,
+                "nodes": page["items"],
+                "total": page["total"],
+                "total_estimated": page["total_estimated"],
                 "limit": limit,
-                "offset": offset
+                "offset": offset,
+                "next_cursor": page["next_cursor"]
             }
         except Exception as e:
             logger.error(f"Error in get_nodes: {e}")
@@ -6,15 +6,109 @@ This module provides database operations for user settings and API keys.
 import logging
 import hashlib
 from typing import Dict, Any, List, Optional, Tuple
-from datetime import datetime
+from datetime import datetime, timezone
 from psycopg2 import sql
 from psycopg2.extras import RealDictCursor
+from psycopg.rows import dict_row
 
-from db import get_user_db_connection
+from db import get_user_db_connection, get_async_user_db_connection
+from db.api_key_cache import (
+    API_KEYS_TABLE, get_cache_key, get_api_key_cache_generation, get_cached_api_key, put_api_key,
+    evict_api_key, evict_api_key_hash, evict_api_keys_for_resource, record_api_key_use
+)
+from db.cache_invalidation import publish_cache_invalidation
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Whether the api_keys table was found; it is looked up until it exists
+_api_keys_table_exists = False
+
+API_KEYS_TABLE_EXISTS_QUERY = """
+    SELECT EXISTS (
+        SELECT FROM information_schema.tables
+        WHERE table_schema = 'public'
+        AND table_name = 'api_keys'
+    )
+"""
+
+def _get_api_key_without_table(api_key: str, key_type: Optional[str], resource_id: Optional[int]) -> Optional[Dict[str, Any]]:
+    """
+    Validate an API key while the api_keys table does not exist yet.
+
+    Only the hardcoded API key of the gpu1 node passes validation.
+    This is a temporary solution until the table is created.
+    """
+    logger.warning("api_keys table does not exist yet")
+    if api_key == 'v8akQodLgRLDqMyE9-2hDyzCFvJCsSD7a1Ry3PxNPtk' and key_type == 'proxmox_node':
+        return {
+            "id": 1,
+            "user_id": 1,
+            "key_name": "Temporary API Key",
+            "api_key_prefix": "v8akQodL",
+            "scopes": ["read", "write"],
+            "expires_at": None,
+            "last_used_at": None,
+            "created_at": datetime.now(),
+            "revoked": False,
+            "key_type": key_type,
+            "resource_id": resource_id
+        }
+    return None
+
+def _build_api_key_validation_query(
+    api_key_hash: str, key_type: Optional[str], resource_id: Optional[int]
+) -> Tuple[str, List[Any]]:
+    """
+    Build the query selecting a non-revoked API key by its hash.
+
+    Args:
+        api_key_hash: The SHA-256 hash of the API key
+        key_type: Type of API key to validate (user, proxmox_node, windows_vm)
+        resource_id: ID of the associated resource (proxmox node ID or VM ID)
+
+    Returns:
+        The query and its parameters
+    """
+    # Build the WHERE clause based on parameters
+    where_clause = "api_key = %s AND revoked = FALSE"
+    where_values = [api_key_hash]
+
+    if key_type:
+        where_clause += " AND key_type = %s"
+        where_values.append(key_type)
+
+    if resource_id is not None:
+        where_clause += " AND resource_id = %s"
+        where_values.append(resource_id)
+
+    query = f"""
+        SELECT
+            id, user_id, key_name, api_key_prefix, scopes,
+            expires_at, last_used_at, created_at, revoked,
+            key_type, resource_id
+        FROM api_keys
+        WHERE {where_clause}
+    """
+    return query, where_values
+
+def _is_api_key_expired(api_key_data: Dict[str, Any]) -> bool:
+    """
+    Check if an API key has expired.
+
+    Args:
+        api_key_data: The API key information
+
+    Returns:
+        True if the key has an expiration timestamp in the past, False otherwise
+    """
+    expires_at = api_key_data["expires_at"]
+    if not expires_at:
+        return False
+
+    now = datetime.now(timezone.utc) if expires_at.tzinfo else datetime.now()
+    return expires_at < now
+
 class SettingsRepository:
     """Repository for user settings and API keys."""
 
@@ -266,8 +360,12 @@ class SettingsRepository:
                     """,
                     (user_id, key_name, api_key_hash, api_key_prefix, scopes, expires_at, key_type, resource_id)
                 )
-                conn.commit()
                 result = cursor.fetchone()
+                publish_cache_invalidation(cursor, [API_KEYS_TABLE])
+                conn.commit()
+
+                # Forget an earlier failed validation of the key
+                evict_api_key_hash(api_key_hash)
                 return dict(result)
 
     def revoke_api_key(self, key_id: int) -> Dict[str, Any]:
@@ -291,13 +389,36 @@ class SettingsRepository:
                     """,
                     (key_id,)
                 )
-                conn.commit()
                 result = cursor.fetchone()
+                publish_cache_invalidation(cursor, [API_KEYS_TABLE])
+                conn.commit()
+
+                # The key must stop validating now, not when its cache entry expires
+                evict_api_key(key_id)
                 return dict(result)
 
+    def _accept_api_key(self, api_key_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Check the expiration of a validated API key and record its use.
+
+        Args:
+            api_key_data: The API key information, or None if the key is invalid
+
+        Returns:
+            The API key information if valid, None otherwise
+        """
+        if not api_key_data or _is_api_key_expired(api_key_data):
+            return None
+
+        # last_used_at is written by the periodic flush of the API key cache
+        record_api_key_use(api_key_data["id"], self.user_id, self.user_role)
+        return api_key_data
+
     def validate_api_key(self, api_key: str, key_type: Optional[str] = None, resource_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
         """
-        Validate an API key and update last_used_at if valid.
+        Validate an API key and record its use if valid.
+
+        Validations, including failed ones, are cached; last_used_at is updated in batches.
 
         Args:
             api_key: The API key to validate
@@ -307,85 +428,81 @@ class SettingsRepository:
         Returns:
             The API key information if valid, None otherwise
         """
+        global _api_keys_table_exists
+
         # Hash the API key for comparison
         api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()
 
+        cache_key = get_cache_key(api_key_hash, key_type, resource_id, self.user_id, self.user_role)
+        generation = get_api_key_cache_generation()
+        cached, api_key_data = get_cached_api_key(cache_key)
+        if cached:
+            return self._accept_api_key(api_key_data)
+
         with get_user_db_connection(user_id=self.user_id, user_role=self.user_role) as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 # First check if the api_keys table exists
-                cursor.execute("""
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables
-                        WHERE table_schema = 'public'
-                        AND table_name = 'api_keys'
-                    )
-                """)
-                table_exists = cursor.fetchone()['exists']
-
-                if not table_exists:
-                    logger.warning("api_keys table does not exist yet")
-                    # For the specific hardcoded API key for gpu1 node, allow it to pass validation
-                    # This is a temporary solution until the table is created
-                    if api_key == 'v8akQodLgRLDqMyE9-2hDyzCFvJCsSD7a1Ry3PxNPtk' and key_type == 'proxmox_node':
-                        return {
-                            "id": 1,
-                            "user_id": 1,
-                            "key_name": "Temporary API Key",
-                            "api_key_prefix": "v8akQodL",
-                            "scopes": ["read", "write"],
-                            "expires_at": None,
-                            "last_used_at": None,
-                            "created_at": datetime.now(),
-                            "revoked": False,
-                            "key_type": key_type,
-                            "resource_id": resource_id
-                        }
-                    return None
+                if not _api_keys_table_exists:
+                    cursor.execute(API_KEYS_TABLE_EXISTS_QUERY)
+                    _api_keys_table_exists = cursor.fetchone()['exists']
 
-                # Build the WHERE clause based on parameters
-                where_clause = "api_key = %s AND revoked = FALSE"
-                where_values = [api_key_hash]
+                if not _api_keys_table_exists:
+                    return _get_api_key_without_table(api_key, key_type, resource_id)
 
-                if key_type:
-                    where_clause += " AND key_type = %s"
-                    where_values.append(key_type)
+                query, params = _build_api_key_validation_query(api_key_hash, key_type, resource_id)
+                cursor.execute(query, params)
+                result = cursor.fetchone()
 
-                if resource_id is not None:
-                    where_clause += " AND resource_id = %s"
-                    where_values.append(resource_id)
+        api_key_data = dict(result) if result else None
+        put_api_key(cache_key, api_key_data, generation)
+        return self._accept_api_key(api_key_data)
 
-                cursor.execute(
-                    f"""
-                    SELECT
-                        id, user_id, key_name, api_key_prefix, scopes,
-                        expires_at, last_used_at, created_at, revoked,
-                        key_type, resource_id
-                    FROM api_keys
-                    WHERE {where_clause}
-                    """,
-                    where_values
-                )
-                result = cursor.fetchone()
+    async def validate_api_key_async(self, api_key: str, key_type: Optional[str] = None, resource_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Validate an API key and record its use if valid, without blocking the event loop.
 
-                if not result:
-                    return None
+        Validations, including failed ones, are cached; last_used_at is updated in batches.
 
-                # Check if the key has expired
-                if result["expires_at"] and result["expires_at"] < datetime.now():
-                    return None
+        Args:
+            api_key: The API key to validate
+            key_type: Type of API key to validate (user, proxmox_node, windows_vm)
+            resource_id: ID of the associated resource (proxmox node ID or VM ID)
 
-                # Update last_used_at
-                cursor.execute(
-                    """
-                    UPDATE api_keys
-                    SET last_used_at = NOW()
-                    WHERE id = %s
-                    """,
-                    (result["id"],)
-                )
-                conn.commit()
+        Returns:
+            The API key information if valid, None otherwise
+        """
+        global _api_keys_table_exists
 
-                return dict(result)
+        # Hash the API key for comparison
+        api_key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+
+        cache_key = get_cache_key(api_key_hash, key_type, resource_id, self.user_id, self.user_role)
+        generation = get_api_key_cache_generation()
+        cached, api_key_data = get_cached_api_key(cache_key)
+        if cached:
+            return self._accept_api_key(api_key_data)
+
+        async with get_async_user_db_connection(user_id=self.user_id, user_role=self.user_role) as conn:
+            if not conn:
+                logger.error("No database connection available")
+                return None
+
+            async with conn.cursor(row_factory=dict_row) as cursor:
+                # First check if the api_keys table exists
+                if not _api_keys_table_exists:
+                    await cursor.execute(API_KEYS_TABLE_EXISTS_QUERY)
+                    _api_keys_table_exists = (await cursor.fetchone())['exists']
+
+                if not _api_keys_table_exists:
+                    return _get_api_key_without_table(api_key, key_type, resource_id)
+
+                query, params = _build_api_key_validation_query(api_key_hash, key_type, resource_id)
+                await cursor.execute(query, params)
+                result = await cursor.fetchone()
+
+        api_key_data = dict(result) if result else None
+        put_api_key(cache_key, api_key_data, generation)
+        return self._accept_api_key(api_key_data)
 
     def get_api_key_by_resource(self, key_type: str, resource_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -492,6 +609,11 @@ class SettingsRepository:
                         resource_id
                     )
                 )
-                conn.commit()
                 result = cursor.fetchone()
+                publish_cache_invalidation(cursor, [API_KEYS_TABLE])
+                conn.commit()
+
+                # The revoked keys must stop validating now, and the new one start
+                evict_api_keys_for_resource(key_type, resource_id)
+                evict_api_key_hash(api_key_hash)
                 return dict(result)
\ No newline at end of file
@@ -7,10 +7,15 @@ This module provides a repository class for accessing VM data in the database.
 import logging
 from typing import Optional, Dict, Any, List, Tuple, Union
 from .base import BaseRepository
+from ..pagination import KeysetPaginator
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Keyset pagination of the VMs listed with their Proxmox node names, with the same
+# cursors as the plain VM listing
+JOINED_VMS_PAGINATOR = KeysetPaginator({"id": "v.id"}, "id", default_order="desc")
+
 class VMRepository(BaseRepository):
     """Repository for VM data."""
 
@@ -32,18 +37,22 @@ class VMRepository(BaseRepository):
         """
         self.default_order_by = "id DESC"
         self.search_columns = ["name", "vmid", "ip_address"]
+        self.paginator = KeysetPaginator({"id": "id"}, "id", default_order="desc")
 
     def get_vms(self, limit: int = 10, offset: int = 0, search: Optional[str] = None,
-               status: Optional[str] = None, proxmox_node_id: Optional[int] = None) -> Dict[str, Any]:
+               status: Optional[str] = None, proxmox_node_id: Optional[int] = None,
+               cursor: Optional[str] = None, count: str = "exact") -> Dict[str, Any]:
         """
         Get a list of VMs with pagination and filtering.
 
         Args:
             limit (int, optional): Maximum number of VMs to return. Defaults to 10.
-            offset (int, optional): Number of VMs to skip. Defaults to 0.
+            offset (int, optional): Number of VMs to skip, ignored with a cursor. Defaults to 0.
             search (Optional[str], optional): Search term to filter VMs. Defaults to None.
             status (Optional[str], optional): Filter by status. Defaults to None.
             proxmox_node_id (Optional[int], optional): Filter by Proxmox node ID. Defaults to None.
+            cursor (Optional[str], optional): The next_cursor of the previous page. Defaults to None.
+            count (str, optional): How to count the total: "exact", "estimate" or "none". Defaults to "exact".
 
         Returns:
             Dict[str, Any]: A dictionary with VMs and pagination info.
@@ -67,18 +76,17 @@ class VMRepository(BaseRepository):
             search_term = f"%{search}%"
             params.extend([search_term] * len(self.search_columns))
 
-        # Get total count
-        total = self.get_count(condition, tuple(params) if params else None)
-
-        # Get VMs
-        vms = self.get_all(condition, tuple(params) if params else None,
-                          self.default_columns, self.default_order_by, limit, offset)
+        page = self.get_keyset_page(cursor, limit, offset, condition=condition,
+                                    params=tuple(params) if params else None,
+                                    columns=self.default_columns, count=count)
 
         return {
-            "vms": vms,
-            "total": total,
+            "vms": page["items"],
+            "total": page["total"],
+            "total_estimated": page["total_estimated"],
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "next_cursor": page["next_cursor"]
         }
 
     def get_vm_by_id(self, vm_id: int) -> Optional[Dict[str, Any]]:
@@ -104,6 +112,28 @@ class VMRepository(BaseRepository):
         Returns:
             Optional[Dict[str, Any]]: A dictionary with the VM or None if not found.
         """
+        condition, params = self._build_vmid_condition(vmid, proxmox_node_id)
+        vms = self.get_all(condition, params, self.default_columns)
+        return vms[0] if vms else None
+
+    async def get_vm_by_vmid_async(self, vmid: str, proxmox_node_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a specific VM by VMID asynchronously.
+
+        Args:
+            vmid (str): The VMID of the VM.
+            proxmox_node_id (Optional[int], optional): The ID of the Proxmox node. Defaults to None.
+
+        Returns:
+            Optional[Dict[str, Any]]: A dictionary with the VM or None if not found.
+        """
+        condition, params = self._build_vmid_condition(vmid, proxmox_node_id)
+        vms = await self.get_all_async(condition, params, self.default_columns)
+        return vms[0] if vms else None
+
+    @staticmethod
+    def _build_vmid_condition(vmid: str, proxmox_node_id: Optional[int] = None) -> Tuple[str, Tuple]:
+        """Build the condition and parameters that select a VM by VMID."""
         condition = "vmid = %s"
         params = [vmid]
 
@@ -111,8 +141,7 @@ class VMRepository(BaseRepository):
             condition += " AND proxmox_node_id = %s"
             params.append(proxmox_node_id)
 
-        vms = self.get_all(condition, tuple(params), self.default_columns)
-        return vms[0] if vms else None
+        return condition, tuple(params)
 
     def check_vm_ownership(self, vm_identifier: str, user_id: int) -> bool:
         """
@@ -277,21 +306,27 @@ class VMRepository(BaseRepository):
             raise
 
     def get_vms_with_proxmox_node_name(self, limit: int = 10, offset: int = 0, search: Optional[str] = None,
-                                      status: Optional[str] = None, proxmox_node_id: Optional[int] = None) -> Dict[str, Any]:
+                                      status: Optional[str] = None, proxmox_node_id: Optional[int] = None,
+                                      cursor: Optional[str] = None, count: str = "exact") -> Dict[str, Any]:
         """
         Get a list of VMs with Proxmox node names.
 
         Args:
             limit (int, optional): Maximum number of VMs to return. Defaults to 10.
-            offset (int, optional): Number of VMs to skip. Defaults to 0.
+            offset (int, optional): Number of VMs to skip, ignored with a cursor. Defaults to 0.
             search (Optional[str], optional): Search term to filter VMs. Defaults to None.
             status (Optional[str], optional): Filter by status. Defaults to None.
             proxmox_node_id (Optional[int], optional): Filter by Proxmox node ID. Defaults to None.
+            cursor (Optional[str], optional): The next_cursor of the previous page. Defaults to None.
+            count (str, optional): How to count the total: "exact", "estimate" or "none". Defaults to "exact".
 
         Returns:
             Dict[str, Any]: A dictionary with VMs and pagination info.
         """
         try:
+            keyset = JOINED_VMS_PAGINATOR.keyset(cursor)
+            offset = 0 if cursor else offset
+
             # Build the query
             query = """
                 SELECT
@@ -327,25 +362,24 @@ class VMRepository(BaseRepository):
 
             # Execute queries with cache disabled
             with cache_context(enable=False):
-                # Count total records
-                count_query = f"SELECT COUNT(*) FROM ({query}) AS filtered_vms"
-                total_result = self.execute_query_single(count_query, params_tuple)
-                total = total_result["count"] if total_result else 0
-
-                # Add pagination
-                paginated_query = f"{query} ORDER BY v.id DESC LIMIT %s OFFSET %s"
-                paginated_params = list(params) if params else []
-                paginated_params.extend([limit, offset])
-                paginated_params_tuple = tuple(paginated_params)
+                # Add pagination, fetching one more VM to know whether there is a next page
+                paginated_query = f"{query} AND {keyset.condition}" if keyset.condition else query
+                paginated_query += f" ORDER BY {keyset.order_by} LIMIT %s OFFSET %s"
+                paginated_params = list(params) + keyset.params + [limit + 1, offset]
 
                 # Execute the query
-                vms = self.execute_query(paginated_query, paginated_params_tuple)
+                vms, next_cursor = keyset.page(self.execute_query(paginated_query, tuple(paginated_params)), limit)
+
+                # Count total records
+                total, estimated = self._count_page(keyset, vms, next_cursor, offset, query, params_tuple, count, True)
 
             return {
                 "vms": vms,
                 "total": total,
+                "total_estimated": estimated,
                 "limit": limit,
-                "offset": offset
+                "offset": offset,
+                "next_cursor": next_cursor
             }
         except Exception as e:
             logger.error(f"Error in get_vms_with_proxmox_node_name: {e}")
@@ -4,7 +4,8 @@ Repository for Windows VM Agent data.
 This module provides database operations for Windows VM agents.
 """
 import logging
-from typing import Dict, Any, List, Optional
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
 from db.repositories.base import BaseRepository
@@ -86,25 +87,7 @@ class WindowsVMAgentRepository(BaseRepository):
             settings_repo = SettingsRepository(user_id=1, user_role="admin")  # Use admin role for verification
 
             # Convert vm_id to integer for the API key validation
-            # The resource_id in the API keys table is an integer
-            vm_id_int = None
-            try:
-                # Try to convert to integer if it's a numeric string
-                if str(vm_id).isdigit():
-                    vm_id_int = int(vm_id)
-                    logger.info(f"Converted VM ID {vm_id} to integer: {vm_id_int}")
-                else:
-                    # If not numeric, use a hash of the string as the resource_id
-                    # This allows non-numeric VM IDs to still work with the API key system
-                    import hashlib
-                    vm_id_hash = int(hashlib.md5(vm_id.encode()).hexdigest(), 16) % (10 ** 10)
-                    vm_id_int = vm_id_hash
-                    logger.info(f"Using hash for non-numeric VM ID {vm_id}: {vm_id_int}")
-            except (ValueError, TypeError) as e:
-                logger.error(f"Error converting VM ID to integer: {vm_id}, error: {e}")
-                # Use a fallback value
-                vm_id_int = abs(hash(vm_id)) % (10 ** 10)
-                logger.info(f"Using fallback hash for VM ID {vm_id}: {vm_id_int}")
+            vm_id_int = self._get_api_key_resource_id(vm_id)
 
             # Validate the API key
             api_key_data = settings_repo.validate_api_key(
@@ -125,6 +108,36 @@ class WindowsVMAgentRepository(BaseRepository):
             logger.error(f"Traceback: {traceback.format_exc()}")
             return None
 
+    @staticmethod
+    def _get_api_key_resource_id(vm_id: str) -> int:
+        """
+        Convert a VM ID to the integer resource_id used in the API keys table.
+
+        Args:
+            vm_id (str): The VM ID.
+
+        Returns:
+            int: The resource ID for API key validation.
+        """
+        # The resource_id in the API keys table is an integer
+        try:
+            # Try to convert to integer if it's a numeric string
+            if str(vm_id).isdigit():
+                vm_id_int = int(vm_id)
+                logger.info(f"Converted VM ID {vm_id} to integer: {vm_id_int}")
+            else:
+                # If not numeric, use a hash of the string as the resource_id
+                # This allows non-numeric VM IDs to still work with the API key system
+                vm_id_int = int(hashlib.md5(vm_id.encode()).hexdigest(), 16) % (10 ** 10)
+                logger.info(f"Using hash for non-numeric VM ID {vm_id}: {vm_id_int}")
+        except (ValueError, TypeError) as e:
+            logger.error(f"Error converting VM ID to integer: {vm_id}, error: {e}")
+            # Use a fallback value
+            vm_id_int = abs(hash(vm_id)) % (10 ** 10)
+            logger.info(f"Using fallback hash for VM ID {vm_id}: {vm_id_int}")
+
+        return vm_id_int
+
     def update_last_seen(self, vm_id: str) -> bool:
         """
         Update the last_seen timestamp for a Windows VM agent.
@@ -136,12 +149,7 @@ class WindowsVMAgentRepository(BaseRepository):
             bool: True if the update was successful, False otherwise.
         """
         try:
-            query = f"""
-                UPDATE {self.table_name}
-                SET last_seen = NOW()
-                WHERE vm_id = %s
-            """
-            self.execute_query(query, (vm_id,))
+            self.execute_query(self._build_update_last_seen_query(), (vm_id,))
             return True
         except Exception as e:
             logger.error(f"Error updating last_seen: {e}")
@@ -173,20 +181,8 @@ class WindowsVMAgentRepository(BaseRepository):
             bool: True if the update was successful, False otherwise.
         """
         try:
-            query = f"""
-                UPDATE {self.table_name}
-                SET status = %s,
-                    ip_address = COALESCE(%s, ip_address),
-                    cpu_usage_percent = COALESCE(%s, cpu_usage_percent),
-                    memory_usage_percent = COALESCE(%s, memory_usage_percent),
-                    disk_usage_percent = COALESCE(%s, disk_usage_percent),
-                    uptime_seconds = COALESCE(%s, uptime_seconds),
-                    last_seen = NOW(),
-                    updated_at = NOW()
-                WHERE vm_id = %s
-            """
             self.execute_query(
-                query,
+                self._build_update_status_query(),
                 (
                     status,
                     ip_address,
@@ -435,23 +431,7 @@ class WindowsVMAgentRepository(BaseRepository):
             Dict[str, Any]: A dictionary with agents and pagination info.
         """
         try:
-            # Build the condition
-            condition = "1=1"
-            params = []
-
-            # Add search filter if provided
-            if search:
-                search_conditions = []
-                for column in self.search_columns:
-                    search_conditions.append(f"{column} ILIKE %s")
-                    params.append(f"%{search}%")
-
-                condition += f" AND ({' OR '.join(search_conditions)})"
-
-            # Add status filter if provided
-            if status:
-                condition += " AND status = %s"
-                params.append(status)
+            condition, params = self._build_agents_condition(search, status)
 
             # Get total count
             total = self.get_count(condition, tuple(params) if params else None)
@@ -475,3 +455,208 @@ class WindowsVMAgentRepository(BaseRepository):
         except Exception as e:
             logger.error(f"Error getting agents: {e}")
             return {"agents": [], "total": 0, "limit": limit, "offset": offset}
+
+    def _build_update_last_seen_query(self) -> str:
+        """Build the query that touches the last_seen timestamp of an agent."""
+        return f"""
+            UPDATE {self.table_name}
+            SET last_seen = NOW()
+            WHERE vm_id = %s
+        """
+
+    def _build_update_status_query(self) -> str:
+        """Build the query that updates the status and resource usage of an agent."""
+        return f"""
+            UPDATE {self.table_name}
+            SET status = %s,
+                ip_address = COALESCE(%s, ip_address),
+                cpu_usage_percent = COALESCE(%s, cpu_usage_percent),
+                memory_usage_percent = COALESCE(%s, memory_usage_percent),
+                disk_usage_percent = COALESCE(%s, disk_usage_percent),
+                uptime_seconds = COALESCE(%s, uptime_seconds),
+                last_seen = NOW(),
+                updated_at = NOW()
+            WHERE vm_id = %s
+        """
+
+    def _build_agents_condition(self, search: Optional[str] = None, status: Optional[str] = None) -> Tuple[str, List[Any]]:
+        """
+        Build the WHERE condition used to list agents.
+
+        Args:
+            search (Optional[str], optional): Search term to filter agents. Defaults to None.
+            status (Optional[str], optional): Status to filter agents. Defaults to None.
+
+        Returns:
+            Tuple[str, List[Any]]: The condition and its parameters.
+        """
+        # Build the condition
+        condition = "1=1"
+        params = []
+
+        # Add search filter if provided
+        if search:
+            search_conditions = []
+            for column in self.search_columns:
+                search_conditions.append(f"{column} ILIKE %s")
+                params.append(f"%{search}%")
+
+            condition += f" AND ({' OR '.join(search_conditions)})"
+
+        # Add status filter if provided
+        if status:
+            condition += " AND status = %s"
+            params.append(status)
+
+        return condition, params
+
+    # Async API
+
+    async def get_agent_by_vm_id_async(self, vm_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a Windows VM agent by VM ID asynchronously.
+
+        Args:
+            vm_id (str): The VM ID.
+
+        Returns:
+            Optional[Dict[str, Any]]: The agent data or None if not found.
+        """
+        try:
+            query = f"""
+                SELECT {self.default_columns}
+                FROM {self.table_name}
+                WHERE vm_id = %s
+            """
+            return await self.execute_query_single_async(query, (vm_id,))
+        except Exception as e:
+            logger.error(f"Error getting agent by VM ID: {e}")
+            return None
+
+    async def verify_api_key_async(self, vm_id: str, api_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Verify an API key for a Windows VM agent asynchronously.
+
+        Args:
+            vm_id (str): The VM ID.
+            api_key (str): The API key to verify.
+
+        Returns:
+            Optional[Dict[str, Any]]: The agent data if the API key is valid, None otherwise.
+        """
+        try:
+            agent = await self.get_agent_by_vm_id_async(vm_id)
+
+            if not agent:
+                logger.info(f"Agent not found for VM ID: {vm_id}")
+                return None
+
+            # Verify API key using the settings repository
+            from ..repositories.settings import SettingsRepository
+            settings_repo = SettingsRepository(user_id=1, user_role="admin")  # Use admin role for verification
+
+            api_key_data = await settings_repo.validate_api_key_async(
+                api_key=api_key,
+                key_type="windows_vm",
+                resource_id=self._get_api_key_resource_id(vm_id)
+            )
+
+            if not api_key_data:
+                logger.info(f"API key validation failed for VM ID: {vm_id}")
+                return None
+
+            return agent
+        except Exception as e:
+            logger.error(f"Error verifying API key: {e}")
+            return None
+
+    async def update_last_seen_async(self, vm_id: str) -> bool:
+        """
+        Update the last_seen timestamp for a Windows VM agent asynchronously.
+
+        Args:
+            vm_id (str): The VM ID.
+
+        Returns:
+            bool: True if the update was successful, False otherwise.
+        """
+        try:
+            await self.execute_command_async(self._build_update_last_seen_query(), (vm_id,))
+            return True
+        except Exception as e:
+            logger.error(f"Error updating last_seen: {e}")
+            return False
+
+    async def update_status_async(
+        self,
+        vm_id: str,
+        status: str,
+        ip_address: Optional[str] = None,
+        cpu_usage_percent: Optional[float] = None,
+        memory_usage_percent: Optional[float] = None,
+        disk_usage_percent: Optional[float] = None,
+        uptime_seconds: Optional[int] = None
+    ) -> bool:
+        """
+        Update the status of a Windows VM agent asynchronously.
+
+        See update_status() for the arguments.
+
+        Returns:
+            bool: True if the update was successful, False otherwise.
+        """
+        try:
+            await self.execute_command_async(
+                self._build_update_status_query(),
+                (
+                    status,
+                    ip_address,
+                    cpu_usage_percent,
+                    memory_usage_percent,
+                    disk_usage_percent,
+                    uptime_seconds,
+                    vm_id
+                )
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error updating agent status: {e}")
+            return False
+
+    async def get_agents_async(
+        self,
+        limit: int = 100,
+        offset: int = 0,
+        search: Optional[str] = None,
+        status: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Get a list of Windows VM agents with pagination and filtering asynchronously.
+
+        See get_agents() for the arguments.
+
+        Returns:
+            Dict[str, Any]: A dictionary with agents and pagination info.
+        """
+        try:
+            condition, params = self._build_agents_condition(search, status)
+
+            total = await self.get_count_async(condition, tuple(params) if params else None)
+            agents = await self.get_all_async(
+                condition,
+                tuple(params) if params else None,
+                self.default_columns,
+                self.default_order_by,
+                limit,
+                offset
+            )
+
+            return {
+                "agents": agents,
+                "total": total,
+                "limit": limit,
+                "offset": offset
+            }
+        except Exception as e:
+            logger.error(f"Error getting agents: {e}")
+            return {"agents": [], "total": 0, "limit": limit, "offset": offset}
@@ -14,11 +14,14 @@ It includes enhanced security features such as:
 import logging
 import time
 import threading
+import weakref
 from contextlib import contextmanager
 from typing import Optional, Dict, Any, Generator, Union, List, Tuple
 import psycopg2
 import psycopg2.extensions
 
+from config import Config
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -28,26 +31,115 @@ _local = threading.local()
 # Constants
 DEFAULT_RLS_TIMEOUT = 300  # 5 minutes in seconds
 
-def set_rls_context(cursor, user_id: Union[int, str], user_role: str) -> bool:
+# RLS context modes
+# - session: the context is set for the session and cleared when the connection is released
+# - transaction: the context is set transaction-locally and ends with the transaction,
+#   so nothing has to be cleared; pooled connections set it again when a transaction
+#   ends while they are checked out to a user (see RlsConnection)
+RLS_MODE_SESSION = "session"
+RLS_MODE_TRANSACTION = "transaction"
+RLS_MODES = (RLS_MODE_SESSION, RLS_MODE_TRANSACTION)
+
+# Both variables are set in one statement. set_config() returns the new values,
+# so the result doubles as verification without an extra round trip.
+SET_RLS_CONTEXT_QUERY = (
+    "SELECT set_config('app.current_user_id', %s, %s), "
+    "set_config('app.current_user_role', %s, %s)"
+)
+CLEAR_RLS_CONTEXT_QUERY = (
+    "SELECT set_config('app.current_user_id', '', false), "
+    "set_config('app.current_user_role', '', false)"
+)
+
+# Per-connection RLS context cache
+# Pooled connections remember the (user_id, user_role) session context they carry, so
+# that handing a connection to the same user again needs no statement. A connection
+# whose context was changed inside a transaction (which may still be rolled back) is
+# marked RLS_CONTEXT_UNKNOWN and is never trusted.
+RLS_CONTEXT_UNKNOWN = ("", "unknown")
+_connection_contexts = weakref.WeakKeyDictionary()
+_connection_contexts_lock = threading.Lock()
+
+# RLS context cache statistics
+rls_context_stats = {
+    "hits": 0,
+    "sets": 0,
+    "resets": 0,
+    "failures": 0,
+}
+
+class RlsConnection(psycopg2.extensions.connection):
     """
-    Set RLS context in the database.
+    Connection of the pool that keeps a transaction-local RLS context across transactions.
+
+    A transaction-local context ends with every commit or rollback. While the connection
+    is checked out to a user, transaction_rls_context holds the (user_id, user_role) it is
+    scoped to, and the context is set again in the next transaction, so statements after
+    a commit inside a get_user_db_connection() block still run as the user.
+    """
+
+    transaction_rls_context: Optional[Tuple[Union[int, str], str]] = None
+
+    def commit(self) -> None:
+        super().commit()
+        self._restore_transaction_rls_context()
 
-    This function sets the app.current_user_id and app.current_user_role session variables
-    in the database, which are used by RLS policies to filter rows.
+    def rollback(self) -> None:
+        super().rollback()
+        self._restore_transaction_rls_context()
+
+    def _restore_transaction_rls_context(self) -> None:
+        """Set the transaction-local RLS context of the user again after a transaction ended."""
+        if self.transaction_rls_context is None or self.autocommit:
+            return
+
+        user_id, user_role = self.transaction_rls_context
+        cursor = self.cursor()
+        try:
+            if not set_rls_context(cursor, user_id, user_role, mode=RLS_MODE_TRANSACTION):
+                logger.error(f"Failed to restore RLS context: user_id={user_id}, role={user_role}")
+        finally:
+            cursor.close()
+
+def set_transaction_rls_context(conn, context: Optional[Tuple[Union[int, str], str]]) -> None:
+    """
+    Set the transaction-local RLS context a pooled connection restores after each transaction.
+
+    Connections that do not restore contexts (neither RlsConnection nor RlsAsyncConnection)
+    are left alone.
 
     Args:
-        cursor: Database cursor
-        user_id (Union[int, str]): User ID (must be a valid integer or string representation of an integer)
-        user_role (str): User role (must be 'admin' or 'user')
+        conn: Database connection
+        context (Optional[Tuple[Union[int, str], str]]): The (user_id, user_role), or None
+            to stop restoring a context before the connection is released
+    """
+    if hasattr(conn, 'transaction_rls_context'):
+        conn.transaction_rls_context = context
+
+def get_rls_context_mode() -> str:
+    """
+    Get the configured RLS context mode.
 
     Returns:
-        bool: True if the context was set successfully, False otherwise
+        str: RLS_MODE_SESSION or RLS_MODE_TRANSACTION
     """
-    # Validate inputs
-    if cursor is None:
-        logger.error("Cannot set RLS context: cursor is None")
-        return False
+    mode = str(getattr(Config, 'RLS_CONTEXT_MODE', RLS_MODE_SESSION)).lower()
+    if mode not in RLS_MODES:
+        logger.warning(f"Invalid RLS_CONTEXT_MODE: {mode}, using '{RLS_MODE_SESSION}'")
+        return RLS_MODE_SESSION
+    return mode
+
+def _validate_rls_context(user_id: Union[int, str], user_role: str) -> Optional[str]:
+    """
+    Validate the RLS context values.
+
+    Args:
+        user_id (Union[int, str]): User ID
+        user_role (str): User role
 
+    Returns:
+        Optional[str]: The user ID as a string, or None if the values are invalid
+    """
     # Validate user_id
     try:
         # Convert to string to ensure it's a valid representation
@@ -56,52 +148,261 @@ def set_rls_context(cursor, user_id: Union[int, str], user_role: str) -> bool:
         int(user_id_str)
     except (ValueError, TypeError):
         logger.error(f"Invalid user_id for RLS context: {user_id}")
-        return False
+        return None
 
     # Validate user_role
     if not isinstance(user_role, str) or user_role not in ['admin', 'user']:
         logger.error(f"Invalid user_role for RLS context: {user_role}")
+        return None
+
+    return user_id_str
+
+def _check_set_result(result, user_id_str: str, user_role: str) -> bool:
+    """Check the values returned by SET_RLS_CONTEXT_QUERY."""
+    if result and result[0] == user_id_str and result[1] == user_role:
+        logger.debug(f"RLS context set: user_id={result[0]}, role={result[1]}")
+        return True
+
+    logger.warning(f"RLS context verification failed: expected user_id={user_id_str}, role={user_role}, got {result}")
+    return False
+
+def _check_clear_result(result) -> bool:
+    """Check the values returned by CLEAR_RLS_CONTEXT_QUERY."""
+    if result and not result[0] and not result[1]:
+        logger.debug("RLS context cleared")
+        return True
+
+    logger.warning(f"RLS context clearing verification failed: {result}")
+    return False
+
+def is_rls_context_cache_enabled() -> bool:
+    """
+    Check whether pooled connections keep their RLS context between checkouts.
+
+    The cache only applies to the session mode; a transaction-local context ends
+    with every transaction.
+
+    Returns:
+        bool: True if the RLS context cache is enabled, False otherwise
+    """
+    return bool(getattr(Config, 'RLS_CONTEXT_CACHE', True)) and get_rls_context_mode() == RLS_MODE_SESSION
+
+def get_connection_rls_context(conn) -> Optional[Tuple[str, str]]:
+    """
+    Get the RLS context a pooled connection is known to carry.
+
+    Args:
+        conn: Database connection
+
+    Returns:
+        Optional[Tuple[str, str]]: The (user_id, user_role) of the connection, RLS_CONTEXT_UNKNOWN,
+        or None if the connection carries no context
+    """
+    with _connection_contexts_lock:
+        return _connection_contexts.get(conn)
+
+def _record_connection_rls_context(conn, context: Optional[Tuple[str, str]]) -> None:
+    """Record the RLS context a connection carries, or forget it if context is None."""
+    with _connection_contexts_lock:
+        if context is None:
+            _connection_contexts.pop(conn, None)
+        else:
+            _connection_contexts[conn] = context
+
+def _record_cursor_rls_context(cursor, context: Optional[Tuple[str, str]]) -> None:
+    """
+    Record a session context change made through a cursor.
+
+    The change is only known for certain once it is committed; a change made inside
+    a transaction is reverted if the transaction is rolled back, so it marks the
+    connection as RLS_CONTEXT_UNKNOWN.
+    """
+    conn = getattr(cursor, 'connection', None)
+    if not isinstance(conn, psycopg2.extensions.connection):
+        return
+
+    if not conn.autocommit:
+        context = RLS_CONTEXT_UNKNOWN
+
+    _record_connection_rls_context(conn, context)
+
+def _execute_committed(conn, func, *args) -> bool:
+    """
+    Run an RLS context function on a connection in autocommit mode.
+
+    The context change is then a single statement that is committed as soon as it
+    runs, so it cannot be undone by a later rollback of the caller's work.
+
+    Args:
+        conn: Database connection (must not be inside a transaction)
+        func: set_rls_context or clear_rls_context
+        *args: Additional arguments for func
+
+    Returns:
+        bool: The result of func
+    """
+    if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        return func(cursor, *args, mode=RLS_MODE_SESSION)
+    finally:
+        cursor.close()
+        conn.autocommit = autocommit
+
+def apply_connection_rls_context(conn, user_id: Union[int, str], user_role: str) -> bool:
+    """
+    Make a pooled connection carry the RLS context of a user.
+
+    If the connection already carries this context, nothing is sent to the database.
+    Otherwise the context is switched atomically with a single committed statement.
+
+    Args:
+        conn: Database connection
+        user_id (Union[int, str]): User ID
+        user_role (str): User role
+
+    Returns:
+        bool: True if the connection carries the context, False otherwise
+    """
+    if conn is None:
+        logger.error("Cannot set RLS context: connection is None")
         return False
 
+    user_id_str = _validate_rls_context(user_id, user_role)
+    if user_id_str is None:
+        reset_connection_rls_context(conn)
+        return False
+
+    if get_connection_rls_context(conn) == (user_id_str, user_role):
+        rls_context_stats["hits"] += 1
+        logger.debug(f"RLS context already set on connection: user_id={user_id_str}, role={user_role}")
+        return True
+
+    try:
+        if _execute_committed(conn, set_rls_context, user_id, user_role):
+            rls_context_stats["sets"] += 1
+            return True
+    except Exception as e:
+        logger.error(f"Error applying RLS context: {e}")
+
+    # Never hand out a connection that may still carry another user's context
+    rls_context_stats["failures"] += 1
+    _record_connection_rls_context(conn, RLS_CONTEXT_UNKNOWN)
+    reset_connection_rls_context(conn)
+    return False
+
+def reset_connection_rls_context(conn) -> bool:
+    """
+    Clear the RLS context a pooled connection carries, if any.
+
+    This is a dictionary lookup for connections without a context, so it is cheap
+    enough to run on every checkout of a plain connection.
+
+    Args:
+        conn: Database connection
+
+    Returns:
+        bool: True if the connection carries no context, False otherwise
+    """
+    if conn is None or get_connection_rls_context(conn) is None:
+        return True
+
+    try:
+        if _execute_committed(conn, clear_rls_context):
+            rls_context_stats["resets"] += 1
+            return True
+    except Exception as e:
+        logger.error(f"Error resetting RLS context: {e}")
+
+    rls_context_stats["failures"] += 1
+    return False
+
+def get_rls_context_stats() -> Dict[str, Any]:
+    """
+    Get RLS context cache statistics.
+
+    Returns:
+        Dict[str, Any]: A dictionary with RLS context cache statistics.
+    """
+    stats = rls_context_stats.copy()
+    stats["enabled"] = is_rls_context_cache_enabled()
+
+    with _connection_contexts_lock:
+        stats["connections"] = len(_connection_contexts)
+
+    lookups = stats["hits"] + stats["sets"]
+    stats["hit_rate"] = round(stats["hits"] / lookups * 100, 2) if lookups else 0
+
+    return stats
+
+def set_rls_context(cursor, user_id: Union[int, str], user_role: str, mode: Optional[str] = None) -> bool:
+    """
+    Set RLS context in the database.
+
+    This function sets the app.current_user_id and app.current_user_role variables
+    in the database, which are used by RLS policies to filter rows. Both variables are
+    set and verified in a single round trip.
+
+    Args:
+        cursor: Database cursor
+        user_id (Union[int, str]): User ID (must be a valid integer or string representation of an integer)
+        user_role (str): User role (must be 'admin' or 'user')
+        mode (Optional[str], optional): RLS context mode. Defaults to the configured RLS_CONTEXT_MODE.
+
+    Returns:
+        bool: True if the context was set successfully, False otherwise
+    """
+    # Validate inputs
+    if cursor is None:
+        logger.error("Cannot set RLS context: cursor is None")
+        return False
+
+    user_id_str = _validate_rls_context(user_id, user_role)
+    if user_id_str is None:
+        return False
+
+    is_local = (mode or get_rls_context_mode()) == RLS_MODE_TRANSACTION
+
     try:
         # Store the context in thread-local storage
         _local.current_user_id = user_id_str
         _local.current_user_role = user_role
         _local.context_set_time = time.time()
 
-        # Set the session variables for RLS using parameterized queries
-        cursor.execute("SET app.current_user_id = %s", (user_id_str,))
-        cursor.execute("SET app.current_user_role = %s", (user_role,))
+        # Set the variables for RLS using a parameterized query
+        cursor.execute(SET_RLS_CONTEXT_QUERY, (user_id_str, is_local, user_role, is_local))
 
-        # Verify the session variables were set correctly
-        cursor.execute("SELECT current_setting('app.current_user_id', TRUE), current_setting('app.current_user_role', TRUE)")
-        result = cursor.fetchone()
-
-        if result and result[0] == user_id_str and result[1] == user_role:
-            # Single log message at debug level for normal operation
-            logger.debug(f"RLS context set: user_id={result[0]}, role={result[1]}")
+        if _check_set_result(cursor.fetchone(), user_id_str, user_role):
+            if not is_local:
+                _record_cursor_rls_context(cursor, (user_id_str, user_role))
 
             # Only log at INFO level for security audit if it's not the system user (admin)
             if user_id != 1 or user_role != 'admin':
                 logger.info(f"RLS context set for user_id={user_id_str}, role={user_role}")
 
             return True
-        else:
-            logger.warning(f"RLS context verification failed: expected user_id={user_id_str}, role={user_role}, got {result}")
-            return False
+
+        _record_cursor_rls_context(cursor, RLS_CONTEXT_UNKNOWN)
+        return False
     except Exception as e:
         logger.error(f"Error setting RLS context: {e}")
         return False
 
-def clear_rls_context(cursor) -> bool:
+def clear_rls_context(cursor, mode: Optional[str] = None) -> bool:
     """
     Clear RLS context in the database.
 
-    This function resets the app.current_user_id and app.current_user_role session variables
-    in the database, which effectively disables RLS filtering.
+    This function resets the app.current_user_id and app.current_user_role variables
+    in the database, which effectively disables RLS filtering. In transaction mode the
+    context ends with the transaction, so no statement is sent.
 
     Args:
         cursor: Database cursor
+        mode (Optional[str], optional): RLS context mode. Defaults to the configured RLS_CONTEXT_MODE.
 
     Returns:
         bool: True if the context was cleared successfully, False otherwise
@@ -124,16 +425,15 @@ def clear_rls_context(cursor) -> bool:
         if hasattr(_local, 'context_set_time'):
             delattr(_local, 'context_set_time')
 
-        # Reset the session variables for RLS
-        cursor.execute("RESET app.current_user_id")
-        cursor.execute("RESET app.current_user_role")
+        if (mode or get_rls_context_mode()) == RLS_MODE_TRANSACTION:
+            logger.debug("RLS context is transaction-local, nothing to clear")
+            return True
 
-        # Verify the session variables were reset
-        cursor.execute("SELECT current_setting('app.current_user_id', TRUE), current_setting('app.current_user_role', TRUE)")
-        result = cursor.fetchone()
+        # Reset the variables for RLS
+        cursor.execute(CLEAR_RLS_CONTEXT_QUERY)
 
-        if result and (result[0] is None or result[0] == '') and (result[1] is None or result[1] == ''):
-            logger.debug("RLS context cleared")
+        if _check_clear_result(cursor.fetchone()):
+            _record_cursor_rls_context(cursor, None)
 
             # Log for security audit
             if previous_user_id and previous_user_role:
@@ -142,9 +442,67 @@ def clear_rls_context(cursor) -> bool:
                 logger.debug("RLS context cleared (no previous context)")
 
             return True
-        else:
-            logger.warning(f"RLS context clearing verification failed: {result}")
-            return False
+
+        _record_cursor_rls_context(cursor, RLS_CONTEXT_UNKNOWN)
+        return False
+    except Exception as e:
+        logger.error(f"Error clearing RLS context: {e}")
+        return False
+
+async def set_rls_context_async(cursor, user_id: Union[int, str], user_role: str, mode: Optional[str] = None) -> bool:
+    """
+    Set RLS context in the database using an async (psycopg 3) cursor.
+
+    This is the asyncio counterpart of set_rls_context() and applies the same
+    validation and variables.
+
+    Args:
+        cursor: Async database cursor
+        user_id (Union[int, str]): User ID (must be a valid integer or string representation of an integer)
+        user_role (str): User role (must be 'admin' or 'user')
+        mode (Optional[str], optional): RLS context mode. Defaults to the configured RLS_CONTEXT_MODE.
+
+    Returns:
+        bool: True if the context was set successfully, False otherwise
+    """
+    if cursor is None:
+        logger.error("Cannot set RLS context: cursor is None")
+        return False
+
+    user_id_str = _validate_rls_context(user_id, user_role)
+    if user_id_str is None:
+        return False
+
+    is_local = (mode or get_rls_context_mode()) == RLS_MODE_TRANSACTION
+
+    try:
+        await cursor.execute(SET_RLS_CONTEXT_QUERY, (user_id_str, is_local, user_role, is_local))
+        return _check_set_result(await cursor.fetchone(), user_id_str, user_role)
+    except Exception as e:
+        logger.error(f"Error setting RLS context: {e}")
+        return False
+
+async def clear_rls_context_async(cursor, mode: Optional[str] = None) -> bool:
+    """
+    Clear RLS context in the database using an async (psycopg 3) cursor.
+
+    Args:
+        cursor: Async database cursor
+        mode (Optional[str], optional): RLS context mode. Defaults to the configured RLS_CONTEXT_MODE.
+
+    Returns:
+        bool: True if the context was cleared successfully, False otherwise
+    """
+    if cursor is None:
+        logger.error("Cannot clear RLS context: cursor is None")
+        return False
+
+    if (mode or get_rls_context_mode()) == RLS_MODE_TRANSACTION:
+        return True
+
+    try:
+        await cursor.execute(CLEAR_RLS_CONTEXT_QUERY)
+        return _check_clear_result(await cursor.fetchone())
     except Exception as e:
         logger.error(f"Error clearing RLS context: {e}")
         return False
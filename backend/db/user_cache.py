@@ -0,0 +1,219 @@
+"""
+Authenticated user cache.
+
+Every authenticated request decodes its access token and looks its user up in the
+users table. Users are cached in memory by username for USER_CACHE_TTL seconds, and
+the decoded payload of a token is cached until the token expires, so an authenticated
+request only reaches the database for its own queries.
+
+Password changes, lockouts and the writes of the login path evict the user in this
+process immediately. Any other write to users through DatabaseAccess, such as a role
+change or a deactivation, invalidates the whole cache, and other worker processes evict
+it when the query cache invalidation bus notifies them of the write to users, or when
+their entries expire if the bus is disabled.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from config import Config
+from .query_cache import ALL_TABLES
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+DEFAULT_MAX_USERS = 10000
+DEFAULT_MAX_TOKENS = 10000
+
+# Table whose writes invalidate the cache
+USERS_TABLE = "users"
+
+# User cache state: username -> (user, expires_at)
+_users: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+_max_users = DEFAULT_MAX_USERS
+
+# Token cache state: token -> (payload, expires_at)
+_tokens: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+_max_tokens = DEFAULT_MAX_TOKENS
+
+_cache_lock = threading.Lock()
+
+# Cache statistics
+_cache_stats = {
+    "user_hits": 0,
+    "user_misses": 0,
+    "user_evictions": 0,
+    "token_hits": 0,
+    "token_misses": 0,
+    "token_evictions": 0
+}
+
+def _count(name: str, value: int = 1) -> None:
+    """Increment a cache counter. Must be called with _cache_lock held."""
+    _cache_stats[name] += value
+
+def _get(cache: OrderedDict, key: str, prefix: str) -> Optional[Dict[str, Any]]:
+    """Look up an entry, dropping it if expired. Must be called with _cache_lock held."""
+    entry = cache.get(key)
+    if entry is None:
+        _count(f"{prefix}_misses")
+        return None
+
+    value, expires_at = entry
+    if expires_at <= time.time():
+        del cache[key]
+        _count(f"{prefix}_misses")
+        return None
+
+    cache.move_to_end(key)
+    _count(f"{prefix}_hits")
+    return dict(value)
+
+def _put(cache: OrderedDict, key: str, value: Dict[str, Any], expires_at: float,
+         max_entries: int, prefix: str) -> None:
+    """Store an entry, evicting the least recently used ones. Must be called with _cache_lock held."""
+    cache[key] = (dict(value), expires_at)
+    cache.move_to_end(key)
+
+    while len(cache) > max_entries:
+        cache.popitem(last=False)
+        _count(f"{prefix}_evictions")
+
+def get_cached_user(username: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up a user.
+
+    Args:
+        username (str): The username of the user
+
+    Returns:
+        Optional[Dict[str, Any]]: A copy of the user, or None if the user is not cached
+    """
+    with _cache_lock:
+        return _get(_users, username, "user")
+
+def put_user(user: Dict[str, Any]) -> None:
+    """
+    Cache a user read from the users table.
+
+    Args:
+        user (Dict[str, Any]): The user
+    """
+    ttl = Config.USER_CACHE_TTL
+    if ttl <= 0:
+        return
+
+    with _cache_lock:
+        _put(_users, user["username"], user, time.time() + ttl, _max_users, "user")
+
+def evict_user(username: Optional[str] = None, user_id: Optional[int] = None) -> int:
+    """
+    Evict a user by username or ID.
+
+    Args:
+        username (Optional[str], optional): The username of the user. Defaults to None.
+        user_id (Optional[int], optional): The ID of the user. Defaults to None.
+
+    Returns:
+        int: The number of evicted entries
+    """
+    with _cache_lock:
+        keys = [
+            key for key, (user, _) in _users.items()
+            if key == username or (user_id is not None and user["id"] == user_id)
+        ]
+        for key in keys:
+            del _users[key]
+        _count("user_evictions", len(keys))
+
+    return len(keys)
+
+def invalidate_user_cache() -> None:
+    """
+    Evict all cached users.
+    """
+    with _cache_lock:
+        _count("user_evictions", len(_users))
+        _users.clear()
+
+def invalidate_user_cache_by_tables(tables: List[str]) -> bool:
+    """
+    Evict all cached users if users is among the written tables.
+
+    Args:
+        tables (List[str]): The written tables, or [ALL_TABLES]
+
+    Returns:
+        bool: True if the cache was invalidated, False otherwise
+    """
+    if USERS_TABLE not in tables and ALL_TABLES not in tables:
+        return False
+
+    invalidate_user_cache()
+    return True
+
+def get_cached_token_payload(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up the decoded payload of a token.
+
+    Args:
+        token (str): The encoded token
+
+    Returns:
+        Optional[Dict[str, Any]]: A copy of the payload, or None if the token is not cached
+    """
+    with _cache_lock:
+        return _get(_tokens, token, "token")
+
+def put_token_payload(token: str, payload: Dict[str, Any]) -> None:
+    """
+    Cache the decoded payload of a valid token until the token expires.
+
+    Args:
+        token (str): The encoded token
+        payload (Dict[str, Any]): The decoded payload
+    """
+    expires_at = payload.get("exp")
+    if not isinstance(expires_at, (int, float)) or expires_at <= time.time():
+        return
+
+    with _cache_lock:
+        _put(_tokens, token, payload, expires_at, _max_tokens, "token")
+
+def invalidate_token_cache() -> None:
+    """
+    Evict all cached token payloads.
+    """
+    with _cache_lock:
+        _count("token_evictions", len(_tokens))
+        _tokens.clear()
+
+def get_user_cache_stats() -> Dict[str, Any]:
+    """
+    Get statistics of the user cache.
+
+    Returns:
+        Dict[str, Any]: Cache statistics
+    """
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["users"] = len(_users)
+        stats["tokens"] = len(_tokens)
+
+    for prefix in ("user", "token"):
+        lookups = stats[f"{prefix}_hits"] + stats[f"{prefix}_misses"]
+        stats[f"{prefix}_hit_rate"] = stats[f"{prefix}_hits"] / lookups if lookups > 0 else 0
+    stats["ttl"] = Config.USER_CACHE_TTL
+    return stats
+
+def reset_user_cache_stats() -> None:
+    """
+    Reset the counters of the user cache.
+    """
+    with _cache_lock:
+        for name in _cache_stats:
+            _cache_stats[name] = 0
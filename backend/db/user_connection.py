@@ -6,17 +6,117 @@ including setting and clearing Row-Level Security (RLS) context.
 """
 
 import logging
-from typing import Optional, Dict, Any, Generator, Union
-from contextlib import contextmanager
+from typing import Optional, Dict, Any, Generator, AsyncGenerator, Union
+from contextlib import contextmanager, asynccontextmanager
 import psycopg2
 import psycopg2.extensions
 
 from .connection import get_connection, return_connection, get_connection_with_retries
-from .rls_context import set_rls_context, clear_rls_context
+from .rls_context import (
+    set_rls_context, clear_rls_context, set_rls_context_async, clear_rls_context_async,
+    get_rls_context_mode, RLS_MODE_TRANSACTION, is_rls_context_cache_enabled,
+    apply_connection_rls_context, reset_connection_rls_context, set_transaction_rls_context
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+def _apply_rls_context(
+    conn: psycopg2.extensions.connection,
+    user_id: Optional[Union[int, str]],
+    user_role: Optional[str]
+) -> bool:
+    """
+    Set the RLS context on a connection checked out from the pool.
+
+    With the RLS context cache enabled, the context stays on the connection after it
+    is released and is not sent again when the same user checks the connection out.
+
+    Args:
+        conn (psycopg2.extensions.connection): The database connection.
+        user_id (Optional[Union[int, str]]): The ID of the user.
+        user_role (Optional[str]): The role of the user.
+
+    Returns:
+        bool: True if an RLS context was requested and has to be released, False otherwise.
+    """
+    cache_enabled = is_rls_context_cache_enabled()
+
+    if user_id is None or user_role is None:
+        logger.warning("Missing user_id or user_role for RLS context")
+        if cache_enabled:
+            reset_connection_rls_context(conn)
+        return False
+
+    # Convert user_id to int if it's a string
+    if isinstance(user_id, str):
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            logger.warning(f"Invalid user_id: {user_id}, cannot convert to int")
+            if cache_enabled:
+                reset_connection_rls_context(conn)
+            return False
+
+    # Use debug level for system user (admin) to reduce log spam
+    if user_id == 1 and user_role == 'admin':
+        logger.debug(f"Setting RLS context: user_id={user_id}, role={user_role}")
+    else:
+        logger.info(f"Setting RLS context: user_id={user_id}, role={user_role}")
+
+    if cache_enabled:
+        if not apply_connection_rls_context(conn, user_id, user_role):
+            logger.warning(f"Failed to set RLS context: user_id={user_id}, role={user_role}")
+        return False
+
+    cursor = conn.cursor()
+    try:
+        success = set_rls_context(cursor, user_id, user_role)
+        if not success:
+            logger.warning(f"Failed to set RLS context: user_id={user_id}, role={user_role}")
+        elif get_rls_context_mode() == RLS_MODE_TRANSACTION:
+            # Set the context again when the caller commits or rolls back
+            set_transaction_rls_context(conn, (user_id, user_role))
+    finally:
+        cursor.close()
+
+    return True
+
+def _release_rls_context(
+    conn: psycopg2.extensions.connection,
+    user_id: Optional[Union[int, str]],
+    user_role: Optional[str]
+) -> None:
+    """
+    Clear the RLS context of a connection before it is returned to the pool.
+
+    Work the caller left uncommitted is rolled back first, as the pool would do on
+    putconn, so that clearing a session context is committed on its own. A
+    transaction-local context is no longer restored and ends with that rollback, so
+    it needs no statement.
+
+    Args:
+        conn (psycopg2.extensions.connection): The database connection.
+        user_id (Optional[Union[int, str]]): The ID of the user.
+        user_role (Optional[str]): The role of the user.
+    """
+    try:
+        set_transaction_rls_context(conn, None)
+
+        if conn.closed:
+            return
+
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+
+        if get_rls_context_mode() == RLS_MODE_TRANSACTION:
+            return
+
+        if not reset_connection_rls_context(conn):
+            logger.warning(f"Failed to clear RLS context: user_id={user_id}, role={user_role}")
+    except Exception as e:
+        logger.error(f"Error clearing RLS context: {e}")
+
 @contextmanager
 def get_user_db_connection(
     user_id: Optional[Union[int, str]] = None,
@@ -32,37 +132,11 @@ def get_user_db_connection(
     Yields:
         Generator[Optional[psycopg2.extensions.connection], None, None]: A database connection with RLS context set.
     """
-    conn = get_connection()
+    conn = get_connection(reset_rls_context=not is_rls_context_cache_enabled())
+    rls_requested = False
     try:
         if conn:
-            if user_id is not None and user_role is not None:
-                # Convert user_id to int if it's a string
-                if isinstance(user_id, str):
-                    try:
-                        user_id = int(user_id)
-                    except ValueError:
-                        logger.warning(f"Invalid user_id: {user_id}, cannot convert to int")
-                        user_id = None
-
-                # Set RLS context
-                if user_id is not None:
-                    # Use debug level for system user (admin) to reduce log spam
-                    if user_id == 1 and user_role == 'admin':
-                        logger.debug(f"Setting RLS context: user_id={user_id}, role={user_role}")
-                    else:
-                        logger.info(f"Setting RLS context: user_id={user_id}, role={user_role}")
-
-                    cursor = conn.cursor()
-                    try:
-                        success = set_rls_context(cursor, user_id, user_role)
-                        if not success:
-                            logger.warning(f"Failed to set RLS context: user_id={user_id}, role={user_role}")
-                    finally:
-                        cursor.close()
-                else:
-                    logger.warning("Cannot set RLS context: user_id is None")
-            else:
-                logger.warning("Missing user_id or user_role for RLS context")
+            rls_requested = _apply_rls_context(conn, user_id, user_role)
         else:
             logger.warning("No database connection available")
 
@@ -70,14 +144,8 @@ def get_user_db_connection(
     finally:
         if conn:
             # Clear RLS context
-            if user_id is not None and user_role is not None:
-                cursor = conn.cursor()
-                try:
-                    success = clear_rls_context(cursor)
-                    if not success:
-                        logger.warning(f"Failed to clear RLS context: user_id={user_id}, role={user_role}")
-                finally:
-                    cursor.close()
+            if rls_requested:
+                _release_rls_context(conn, user_id, user_role)
 
             # Return connection to pool
             return_connection(conn)
@@ -101,7 +169,49 @@ def get_user_db_connection_with_retries(
     Yields:
         Generator[Optional[psycopg2.extensions.connection], None, None]: A database connection with RLS context set.
     """
-    conn = get_connection_with_retries(max_retries, retry_interval)
+    conn = get_connection_with_retries(
+        max_retries, retry_interval, reset_rls_context=not is_rls_context_cache_enabled()
+    )
+    rls_requested = False
+    try:
+        if conn:
+            rls_requested = _apply_rls_context(conn, user_id, user_role)
+        else:
+            logger.warning("No database connection available after retries")
+
+        yield conn
+    finally:
+        if conn:
+            # Clear RLS context
+            if rls_requested:
+                _release_rls_context(conn, user_id, user_role)
+
+            # Return connection to pool
+            return_connection(conn)
+
+@asynccontextmanager
+async def get_async_user_db_connection(
+    user_id: Optional[Union[int, str]] = None,
+    user_role: Optional[str] = None
+) -> AsyncGenerator[Optional[Any], None]:
+    """
+    Async context manager for database connections with user context.
+
+    This is the asyncio counterpart of get_user_db_connection(). The connection comes
+    from the psycopg 3 async pool, so waiting on the database does not block the event loop.
+
+    Args:
+        user_id (Optional[Union[int, str]], optional): The ID of the user. Defaults to None.
+        user_role (Optional[str], optional): The role of the user. Defaults to None.
+
+    Yields:
+        AsyncGenerator[Optional[psycopg.AsyncConnection], None]: A database connection with RLS context set.
+    """
+    from psycopg.pq import TransactionStatus
+    from .async_connection import get_async_connection, return_async_connection
+
+    conn = await get_async_connection()
+    rls_set = False
     try:
         if conn:
             if user_id is not None and user_role is not None:
@@ -113,43 +223,46 @@ def get_user_db_connection_with_retries(
                         logger.warning(f"Invalid user_id: {user_id}, cannot convert to int")
                         user_id = None
 
-                # Set RLS context
                 if user_id is not None:
-                    # This is already at debug level, but let's make it consistent with the other function
                     if user_id == 1 and user_role == 'admin':
                         logger.debug(f"Setting RLS context: user_id={user_id}, role={user_role}")
                     else:
                         logger.info(f"Setting RLS context: user_id={user_id}, role={user_role}")
 
-                    cursor = conn.cursor()
-                    try:
-                        success = set_rls_context(cursor, user_id, user_role)
-                        if not success:
+                    async with conn.cursor() as cursor:
+                        rls_set = await set_rls_context_async(cursor, user_id, user_role)
+                        if not rls_set:
                             logger.warning(f"Failed to set RLS context: user_id={user_id}, role={user_role}")
-                    finally:
-                        cursor.close()
+                        elif get_rls_context_mode() == RLS_MODE_TRANSACTION:
+                            # Set the context again when the caller commits or rolls back
+                            set_transaction_rls_context(conn, (user_id, user_role))
                 else:
                     logger.warning("Cannot set RLS context: user_id is None")
             else:
                 logger.warning("Missing user_id or user_role for RLS context")
         else:
-            logger.warning("No database connection available after retries")
+            logger.warning("No database connection available")
 
         yield conn
     finally:
         if conn:
-            # Clear RLS context
-            if user_id is not None and user_role is not None:
-                cursor = conn.cursor()
-                try:
-                    success = clear_rls_context(cursor)
+            if rls_set:
+                set_transaction_rls_context(conn, None)
+
+            if rls_set and get_rls_context_mode() != RLS_MODE_TRANSACTION:
+                # Discard work the caller left uncommitted (as the sync pool does on putconn)
+                # so that clearing the context runs in its own transaction and is committed
+                if conn.info.transaction_status != TransactionStatus.IDLE:
+                    await conn.rollback()
+
+                async with conn.cursor() as cursor:
+                    success = await clear_rls_context_async(cursor)
                     if not success:
                         logger.warning(f"Failed to clear RLS context: user_id={user_id}, role={user_role}")
-                finally:
-                    cursor.close()
+                await conn.commit()
 
             # Return connection to pool
-            return_connection(conn)
+            await return_async_connection(conn)
 
 def get_user_connection_info(
     conn: psycopg2.extensions.connection,
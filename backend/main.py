@@ -78,6 +78,23 @@ async def lifespan(app: FastAPI):
             if not initialize_connection_pool():
                 logger.warning("Failed to initialize connection pool, will retry in background")
 
+            # Open the async connection pool used by the async request handlers
+            from db import open_async_connection_pool
+            if not await open_async_connection_pool():
+                logger.warning("Failed to open async connection pool, will retry on first use")
+
+        # Start the query cache invalidation bus shared by the worker processes
+        from db.cache_invalidation import init_cache_invalidation
+        init_cache_invalidation()
+
+        # Start the batched last_used_at updates of the API key cache
+        from db.api_key_cache import init_api_key_cache
+        init_api_key_cache()
+
+        # Create the upcoming partitions of timeseries_data and logs
+        from db.partitions import init_partition_maintenance
+        init_partition_maintenance()
+
         # Initialize database monitoring and health checks
         logger.info("Initializing database monitoring and health checks...")
         from db.monitoring import init_monitoring as init_db_monitoring
@@ -149,6 +166,34 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error shutting down timeseries collection and aggregation: {e}")
 
+    # Stop the query cache invalidation bus
+    try:
+        from db.cache_invalidation import shutdown_cache_invalidation
+        shutdown_cache_invalidation()
+    except Exception as e:
+        logger.error(f"Error shutting down query cache invalidation: {e}")
+
+    # Write the pending API key uses before the pools are closed
+    try:
+        from db.api_key_cache import shutdown_api_key_cache
+        shutdown_api_key_cache()
+    except Exception as e:
+        logger.error(f"Error shutting down API key cache: {e}")
+
+    # Stop the partition maintenance
+    try:
+        from db.partitions import shutdown_partition_maintenance
+        shutdown_partition_maintenance()
+    except Exception as e:
+        logger.error(f"Error shutting down partition maintenance: {e}")
+
+    # Close the async connection pool
+    try:
+        from db import close_async_connection_pool
+        await close_async_connection_pool()
+    except Exception as e:
+        logger.error(f"Error closing async connection pool: {e}")
+
     # Shutdown monitoring
     shutdown_monitoring()
 
@@ -264,7 +309,7 @@ app.add_middleware(
 app.add_middleware(
     TimeoutMiddleware,
     timeout=30,  # 30 seconds
-    exclude_paths=["/upload", "/accounts/list/stream"]
+    exclude_paths=["/upload", "/accounts/list/stream", "/accounts/export"]
 )
 
 # Add size limit middleware
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from dependencies import get_query_token
 from db import get_user_db_connection
+from db.repositories.accounts import AccountRepository
 from typing import List, Optional
-from pydantic import BaseModel
+from uuid import UUID
+from pydantic import BaseModel, Field
 from routers.auth import get_current_active_user
 
 router = APIRouter(
@@ -21,6 +23,18 @@ class BulkStatusUpdate(BaseModel):
     account_ids: List[str]
     status: bool
 
+class LeaseRenewal(BaseModel):
+    lease_id: UUID
+    lease_seconds: Optional[int] = Field(None, ge=1)
+
+class LeaseRelease(BaseModel):
+    lease_id: UUID
+    account_ids: Optional[List[str]] = None
+    keep_locked: bool = False
+
+# Maximum number of fresh accounts returned or leased at once
+MAX_FRESH_ACCOUNTS = 1000
+
 @router.post("/lock")
 async def lock_account(acc_id: str, status: bool, current_user = Depends(get_current_active_user)):
     """Lock or unlock an account"""
@@ -29,7 +43,7 @@ async def lock_account(acc_id: str, status: bool, current_user = Depends(get_cur
         cursor = user_conn.cursor()
 
         try:
-            cursor.execute("UPDATE accounts SET lock = %s WHERE acc_id = %s RETURNING acc_id", (status, acc_id))
+            cursor.execute("UPDATE accounts SET lock = %s, lease_id = NULL, lease_expires_at = NULL WHERE acc_id = %s RETURNING acc_id", (status, acc_id))
             result = cursor.fetchone()
             user_conn.commit()
 
@@ -60,12 +74,12 @@ async def lock_accounts_bulk(update: BulkStatusUpdate, current_user = Depends(ge
             if len(acc_ids_tuple) == 1:
                 # Special case for single item (needs trailing comma)
                 cursor.execute(
-                    "UPDATE accounts SET lock = %s WHERE acc_id IN (%s) RETURNING acc_id",
+                    "UPDATE accounts SET lock = %s, lease_id = NULL, lease_expires_at = NULL WHERE acc_id IN (%s) RETURNING acc_id",
                     (update.status, acc_ids_tuple[0])
                 )
             else:
                 cursor.execute(
-                    f"UPDATE accounts SET lock = %s WHERE acc_id IN %s RETURNING acc_id",
+                    f"UPDATE accounts SET lock = %s, lease_id = NULL, lease_expires_at = NULL WHERE acc_id IN %s RETURNING acc_id",
                     (update.status, acc_ids_tuple)
                 )
 
@@ -154,44 +168,73 @@ async def set_prime_status_bulk(update: BulkStatusUpdate, current_user = Depends
             cursor.close()
 
 @router.get("/fresh")
-async def get_fresh_account(limit: int = 1, lock: bool = False, current_user = Depends(get_current_active_user)):
-    """Get fresh (unused) accounts and optionally lock them"""
-    # Use user-specific database connection with RLS
-    with get_user_db_connection(user_id=current_user["id"], user_role=current_user["role"]) as user_conn:
-        cursor = user_conn.cursor()
-
-        try:
-            cursor.execute("""
-                SELECT acc_id, acc_username
-                FROM accounts
-                WHERE prime = false AND lock = false AND perm_lock = false
-                ORDER BY id ASC
-                LIMIT %s
-            """, (limit,))
-
-            results = cursor.fetchall()
-
-            if not results:
-                return {"accounts": [], "count": 0}
-
-            accounts = []
-            for row in results:
-                accounts.append({"acc_id": row[0], "acc_username": row[1]})
-
-                # If lock is requested, lock each account
-                if lock:
-                    cursor.execute("UPDATE accounts SET lock = true WHERE acc_id = %s", (row[0],))
-
-            if lock:
-                user_conn.commit()
-
+def get_fresh_account(
+    limit: int = Query(1, ge=1, le=MAX_FRESH_ACCOUNTS),
+    lock: bool = False,
+    lease_seconds: Optional[int] = Query(None, ge=1),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Get fresh (unused) accounts and optionally lease them
+
+    With lock, the accounts are locked atomically for the returned lease, which expires after
+    lease_seconds unless renewed through /lease/renew. Concurrent requests never receive the
+    same account.
+    """
+    # Use the user's RLS context
+    account_repo = AccountRepository(user_id=current_user["id"], user_role=current_user["role"])
+
+    try:
+        if not lock:
+            accounts = account_repo.get_fresh_accounts(limit)
             return {"accounts": accounts, "count": len(accounts)}
-        except Exception as e:
-            if lock:
-                user_conn.rollback()
-            print(f"Error retrieving fresh accounts: {e}")
-            if isinstance(e, HTTPException):
-                raise e
-            raise HTTPException(status_code=500, detail="Error retrieving fresh accounts")
-        finally:
-            cursor.close()
+
+        lease = account_repo.lease_fresh_accounts(limit, lease_seconds)
+        return {
+            "accounts": lease["accounts"],
+            "count": len(lease["accounts"]),
+            "lease_id": lease["lease_id"],
+            "lease_expires_at": lease["lease_expires_at"]
+        }
+    except Exception as e:
+        print(f"Error retrieving fresh accounts: {e}")
+        raise HTTPException(status_code=500, detail="Error retrieving fresh accounts")
+
+@router.post("/lease/renew")
+def renew_lease(renewal: LeaseRenewal, current_user = Depends(get_current_active_user)):
+    """Renew a lease of fresh accounts, extending its expiry from now"""
+    account_repo = AccountRepository(user_id=current_user["id"], user_role=current_user["role"])
+
+    try:
+        accounts = account_repo.renew_lease(str(renewal.lease_id), renewal.lease_seconds)
+    except Exception as e:
+        print(f"Error renewing lease: {e}")
+        raise HTTPException(status_code=500, detail="Error renewing lease")
+
+    if not accounts:
+        raise HTTPException(status_code=404, detail="Lease not found or expired")
+
+    return {
+        "lease_id": str(renewal.lease_id),
+        "lease_expires_at": accounts[0]["lease_expires_at"],
+        "acc_ids": [account["acc_id"] for account in accounts],
+        "success": True
+    }
+
+@router.post("/lease/release")
+def release_lease(release: LeaseRelease, current_user = Depends(get_current_active_user)):
+    """Release the accounts of a lease, unlocking them or keeping them locked"""
+    account_repo = AccountRepository(user_id=current_user["id"], user_role=current_user["role"])
+
+    try:
+        released_ids = account_repo.release_lease(str(release.lease_id), release.account_ids, release.keep_locked)
+    except Exception as e:
+        print(f"Error releasing lease: {e}")
+        raise HTTPException(status_code=500, detail="Error releasing lease")
+
+    return {
+        "released_count": len(released_ids),
+        "released_ids": released_ids,
+        "lock": release.keep_locked,
+        "success": True
+    }
@@ -6,15 +6,15 @@ from db import get_db_connection, get_user_db_connection
 from db.optimized_queries import (
     build_optimized_search_query,
     build_batch_fetch_query,
-    build_cursor_pagination_query,
     build_projection_query,
     build_combined_count_query
 )
-from db.repositories.accounts import AccountRepository
+from db.pagination import InvalidCursorError
+from db.repositories.accounts import AccountRepository, ACCOUNT_EXPORT_FIELDS
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any, Union
 import json
-import base64
+import zlib
 from routers.auth import get_current_active_user
 from contextlib import asynccontextmanager
 import logging
@@ -80,6 +80,58 @@ class ReceivedData(BaseModel):
     metadata: Metadata
     steamguard: Optional[Steamguard] = None
 
+def received_data_to_account(data: ReceivedData) -> Dict[str, Any]:
+    """
+    Convert received account data to the columns of the accounts table.
+
+    Args:
+        data: The received account data
+
+    Returns:
+        The account, by column name
+    """
+    account = {
+        "acc_id": data.id,
+        "acc_username": data.user.username,
+        "acc_password": data.user.password,
+        "acc_email_address": data.email.address if data.email else None,
+        "acc_email_password": data.email.password if data.email else None,
+        "acc_vault_address": data.vault.address,
+        "acc_vault_password": data.vault.password,
+        "acc_created_at": data.metadata.createdAt,
+        "acc_session_start": data.metadata.sessionStart
+    }
+
+    if data.steamguard:
+        account.update({
+            "acc_steamguard_account_name": data.steamguard.account_name,
+            "acc_confirm_type": data.steamguard.confirm_type,
+            "acc_device_id": data.steamguard.deviceId,
+            "acc_identity_secret": data.steamguard.identity_secret,
+            "acc_revocation_code": data.steamguard.revocation_code,
+            "acc_secret_1": data.steamguard.secret_1,
+            "acc_serial_number": data.steamguard.serial_number,
+            "acc_server_time": data.steamguard.server_time,
+            "acc_shared_secret": data.steamguard.shared_secret,
+            "acc_status": data.steamguard.status,
+            "acc_token_gid": data.steamguard.token_gid,
+            "acc_uri": data.steamguard.uri
+        })
+
+    return account
+
+def is_test_account(data: ReceivedData) -> bool:
+    """
+    Check whether received account data uses a test email address.
+
+    Args:
+        data: The received account data
+
+    Returns:
+        True if the account is a test account, which is not imported
+    """
+    return data.email is not None and "@demoemail.com" in data.email.address
+
 class AccountResponse(BaseModel):
     acc_id: str
     acc_username: str
@@ -123,7 +175,8 @@ class CursorPaginationParams(BaseModel):
 
 class AccountListResponse(BaseModel):
     accounts: List[AccountResponse]
-    total: int
+    total: Optional[int] = None
+    total_estimated: bool = False
     limit: int
     offset: Optional[int] = None
     cursor: Optional[str] = None
@@ -285,9 +338,10 @@ async def list_accounts_get(
                                  }
                              ],
                              "total": 1,
+                             "total_estimated": False,
                              "limit": 100,
                              "cursor": None,
-                             "next_cursor": "eyJhY2NfaWQiOiI3NjU2MTE5OTEyMzQ1Njc4OSJ9"
+                             "next_cursor": "eyJzIjoiYWNjX2lkIiwibyI6ImFzYyIsInYiOlsiNzY1NjExOTkxMjM0NTY3ODkiXX0"
                          }
                      }
                  }
@@ -305,6 +359,8 @@ async def list_accounts_cursor(
     filter_prime: Optional[bool] = Query(None, description="Filter by prime status"),
     filter_lock: Optional[bool] = Query(None, description="Filter by lock status"),
     filter_perm_lock: Optional[bool] = Query(None, description="Filter by permanent lock status"),
+    count: str = Query("exact", description="How to count the total: exact, estimate or none",
+                       pattern="^(exact|estimate|none)$"),
     current_user: Dict[str, Any] = Depends(get_current_active_user),
     response: Response = None
 ):
@@ -318,13 +374,17 @@ async def list_accounts_cursor(
     - The total number of accounts matching the filter criteria
     - The limit parameter used for pagination
     - The cursor used for this request
-    - The next cursor to use for the next page
+    - The next cursor to use for the next page, or null on the last page
+
+    Accounts are ordered by the sort field and then by account ID, so that accounts with the
+    same value of the sort field are neither skipped nor repeated between pages. A cursor is
+    only valid with the sort field and order it was returned for.
 
     Regular users can only see their own accounts, while administrators can see all accounts.
 
     ## Query Parameters
 
-    - **cursor**: Cursor for pagination (optional)
+    - **cursor**: The next_cursor of the previous page (optional)
     - **limit**: Maximum number of accounts to return (default: 100)
     - **search**: Search term to filter accounts by username or email
     - **sort_by**: Field to sort by (default: acc_id)
@@ -332,46 +392,25 @@ async def list_accounts_cursor(
     - **filter_prime**: Filter by prime status (true/false)
     - **filter_lock**: Filter by lock status (true/false)
     - **filter_perm_lock**: Filter by permanent lock status (true/false)
+    - **count**: How to count the total: exact, estimate (from the query planner, for large
+      results) or none (default: exact)
     """
     # Use the repository pattern with RLS context
     account_repo = AccountRepository(user_id=current_user["id"], user_role=current_user["role"])
 
     try:
-        # Decode cursor if provided
-        cursor_value = None
-        if cursor:
-            try:
-                cursor_data = json.loads(base64.b64decode(cursor).decode('utf-8'))
-                cursor_value = cursor_data.get(sort_by)
-            except Exception as e:
-                logger.error(f"Error decoding cursor: {e}", exc_info=True)
-                raise HTTPException(status_code=400, detail="Invalid cursor format")
-
-        # Build filter conditions
-        filter_conditions = {}
-        if filter_prime is not None:
-            filter_conditions["prime"] = filter_prime
-        if filter_lock is not None:
-            filter_conditions["lock"] = filter_lock
-        if filter_perm_lock is not None:
-            filter_conditions["perm_lock"] = filter_perm_lock
-
-        # Get accounts with cursor-based pagination
         result = account_repo.get_accounts_with_cursor(
-            cursor_value=cursor_value,
-            cursor_column=sort_by,
-            sort_order=sort_order,
+            cursor=cursor,
             limit=limit,
-            filter_conditions=filter_conditions
+            search=search,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            filter_prime=filter_prime,
+            filter_lock=filter_lock,
+            filter_perm_lock=filter_perm_lock,
+            count=count
         )
 
-        # Generate next cursor if there are more results
-        next_cursor = None
-        if result["has_more"] and result["accounts"]:
-            last_item = result["accounts"][-1]
-            cursor_data = {sort_by: last_item[sort_by.replace("acc_", "") if sort_by.startswith("acc_") else sort_by]}
-            next_cursor = base64.b64encode(json.dumps(cursor_data).encode('utf-8')).decode('utf-8')
-
         # Set cache headers if response is provided
         if response:
             response.headers["Cache-Control"] = "max-age=60, public"
@@ -379,11 +418,14 @@ async def list_accounts_cursor(
         return {
             "accounts": result["accounts"],
             "total": result["total"],
+            "total_estimated": result["total_estimated"],
             "limit": limit,
             "cursor": cursor,
-            "next_cursor": next_cursor
+            "next_cursor": result["next_cursor"]
         }
 
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing accounts with cursor: {e}", exc_info=True)
         if isinstance(e, HTTPException):
@@ -473,7 +515,7 @@ async def list_accounts_fields(
 
     try:
         # Get accounts with pagination, sorting, and filtering
-        result = account_repo.get_accounts(
+        result = await account_repo.get_accounts_async(
             limit=limit,
             offset=offset,
             search=search,
@@ -512,32 +554,35 @@ async def list_accounts_fields(
 
 @router.get("/list/stream")
 async def list_accounts_stream(
-    limit: int = Query(1000, description="Maximum number of accounts to return", ge=1, le=10000),
+    limit: Optional[int] = Query(1000, description="Maximum number of accounts to return", ge=1),
     search: Optional[str] = Query(None, description="Search term to filter accounts by username or email"),
     sort_by: str = Query("acc_id", description="Field to sort by"),
     sort_order: str = Query("asc", description="Sort order (asc or desc)"),
     filter_prime: Optional[bool] = Query(None, description="Filter by prime status"),
     filter_lock: Optional[bool] = Query(None, description="Filter by lock status"),
     filter_perm_lock: Optional[bool] = Query(None, description="Filter by permanent lock status"),
+    format: str = Query("json", description="Output format (json or ndjson)", pattern="^(json|ndjson)$"),
     current_user: Dict[str, Any] = Depends(get_current_active_user)
 ):
     """
-    Stream a list of accounts as JSON.
+    Stream a list of accounts as JSON or NDJSON.
 
-    This endpoint streams the results as they are fetched from the database,
-    which is more efficient for large datasets.
+    This endpoint streams the results as they are fetched from the database through
+    a server-side cursor, without counting them first, so memory use does not grow
+    with the number of accounts.
 
     Regular users can only see their own accounts, while administrators can see all accounts.
 
     ## Query Parameters
 
-    - **limit**: Maximum number of accounts to return (default: 1000, max: 10000)
+    - **limit**: Maximum number of accounts to return (default: 1000)
     - **search**: Search term to filter accounts by username or email
     - **sort_by**: Field to sort by (default: acc_id)
     - **sort_order**: Sort order (asc or desc) (default: asc)
     - **filter_prime**: Filter by prime status (true/false)
     - **filter_lock**: Filter by lock status (true/false)
     - **filter_perm_lock**: Filter by permanent lock status (true/false)
+    - **format**: json for a single {"accounts": [...]} document, ndjson for one account per line (default: json)
     """
     return StreamingResponse(
         stream_accounts(
@@ -548,67 +593,189 @@ async def list_accounts_stream(
             filter_prime=filter_prime,
             filter_lock=filter_lock,
             filter_perm_lock=filter_perm_lock,
-            current_user=current_user
+            current_user=current_user,
+            output_format=format
         ),
-        media_type="application/json"
+        media_type="application/x-ndjson" if format == "ndjson" else "application/json"
     )
 
 async def stream_accounts(
-    limit: int,
+    limit: Optional[int],
     search: Optional[str],
     sort_by: str,
     sort_order: str,
     filter_prime: Optional[bool],
     filter_lock: Optional[bool],
     filter_perm_lock: Optional[bool],
-    current_user: Dict[str, Any]
+    current_user: Dict[str, Any],
+    output_format: str = "json"
 ):
-    """Stream accounts as JSON"""
+    """Stream accounts as JSON or NDJSON"""
     # Use the repository pattern with RLS context
     account_repo = AccountRepository(user_id=current_user["id"], user_role=current_user["role"])
+    ndjson = output_format == "ndjson"
 
-    try:
-        # Build filter conditions
-        filter_conditions = {}
-        if filter_prime is not None:
-            filter_conditions["prime"] = filter_prime
-        if filter_lock is not None:
-            filter_conditions["lock"] = filter_lock
-        if filter_perm_lock is not None:
-            filter_conditions["perm_lock"] = filter_perm_lock
+    # Accounts are written in groups, instead of one write per account
+    parts = []
+    first = True
 
-        # Get accounts with pagination, sorting, and filtering
-        result = account_repo.get_accounts(
+    if not ndjson:
+        # Yield opening bracket
+        yield '{"accounts": ['
+
+    try:
+        async for account in account_repo.stream_accounts_async(
             limit=limit,
-            offset=0,  # Start from the beginning
             search=search,
             sort_by=sort_by,
             sort_order=sort_order,
             filter_prime=filter_prime,
             filter_lock=filter_lock,
             filter_perm_lock=filter_perm_lock
-        )
-
-        # Yield opening bracket
-        yield "{"
-        yield '"accounts": ['
-
-        # Yield accounts
-        first = True
-        for account in result["accounts"]:
-            if not first:
-                yield ","
+        ):
+            if ndjson:
+                parts.append(json.dumps(account) + "\n")
+            else:
+                parts.append(json.dumps(account) if first else "," + json.dumps(account))
             first = False
 
-            yield json.dumps(account)
+            if len(parts) >= 500:
+                yield "".join(parts)
+                parts.clear()
+
+        yield "".join(parts)
 
-        # Yield closing brackets
-        yield "]"
-        yield "}"
+        if not ndjson:
+            # Yield closing brackets
+            yield "]}"
 
     except Exception as e:
         logger.error(f"Error streaming accounts: {e}", exc_info=True)
-        yield json.dumps({"error": str(e)})
+        if ndjson:
+            yield json.dumps({"error": str(e)}) + "\n"
+        else:
+            yield f'], "error": {json.dumps(str(e))}}}'
+
+@router.get("/export",
+         summary="Export accounts",
+         description="Export accounts as CSV or NDJSON, formatted by the database and streamed as it is produced",
+         responses={
+             200: {
+                 "description": "The exported accounts",
+                 "content": {
+                     "text/csv": {},
+                     "application/x-ndjson": {},
+                     "application/gzip": {}
+                 }
+             },
+             400: {"description": "Invalid export parameters"},
+             401: {"description": "Unauthorized"},
+             403: {"description": "Forbidden"},
+             422: {"description": "Validation Error"}
+         })
+async def export_accounts(
+    format: str = Query("csv", description="Export format (csv or ndjson)", pattern="^(csv|ndjson)$"),
+    compress: bool = Query(False, description="Compress the export with gzip"),
+    fields: Optional[str] = Query(None, description="Comma-separated list of fields to export (default: all list fields)"),
+    limit: Optional[int] = Query(None, description="Maximum number of accounts to export", ge=1),
+    search: Optional[str] = Query(None, description="Search term to filter accounts by username or email"),
+    sort_by: str = Query("acc_id", description="Field to sort by"),
+    sort_order: str = Query("asc", description="Sort order (asc or desc)"),
+    filter_prime: Optional[bool] = Query(None, description="Filter by prime status"),
+    filter_lock: Optional[bool] = Query(None, description="Filter by lock status"),
+    filter_perm_lock: Optional[bool] = Query(None, description="Filter by permanent lock status"),
+    current_user: Dict[str, Any] = Depends(get_current_active_user)
+):
+    """
+    Export accounts as CSV or NDJSON.
+
+    The export is produced by COPY TO STDOUT with the RLS context of the user and sent
+    as it is produced, without building the accounts in Python, so exports of any size
+    use constant memory.
+
+    Regular users can only export their own accounts, while administrators can export all accounts.
+
+    ## Query Parameters
+
+    - **format**: csv (with a header line) or ndjson (default: csv)
+    - **compress**: Compress the export with gzip (default: false)
+    - **fields**: Comma-separated list of fields to export (default: acc_id,acc_username,acc_email_address,prime,lock,perm_lock,acc_created_at)
+    - **limit**: Maximum number of accounts to export (default: no limit)
+    - **search**: Search term to filter accounts by username or email
+    - **sort_by**: Field to sort by (default: acc_id)
+    - **sort_order**: Sort order (asc or desc) (default: asc)
+    - **filter_prime**: Filter by prime status (true/false)
+    - **filter_lock**: Filter by lock status (true/false)
+    - **filter_perm_lock**: Filter by permanent lock status (true/false)
+    """
+    field_list = None
+    if fields:
+        field_list = [field.strip() for field in fields.split(",") if field.strip()]
+        invalid_fields = [field for field in field_list if field not in ACCOUNT_EXPORT_FIELDS]
+        if invalid_fields:
+            raise HTTPException(status_code=400, detail=f"Invalid export fields: {', '.join(invalid_fields)}")
+
+    # Use the repository pattern with RLS context
+    account_repo = AccountRepository(user_id=current_user["id"], user_role=current_user["role"])
+
+    chunks = account_repo.export_accounts_async(
+        export_format=format,
+        fields=field_list,
+        limit=limit,
+        search=search,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        filter_prime=filter_prime,
+        filter_lock=filter_lock,
+        filter_perm_lock=filter_perm_lock
+    )
+
+    # Start the export before responding, so that a failing query is reported as an
+    # error instead of an empty download
+    try:
+        first_chunk = await chunks.__anext__()
+    except StopAsyncIteration:
+        first_chunk = b""
+    except Exception as e:
+        logger.error(f"Error exporting accounts: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error exporting accounts: {str(e)}")
+
+    body = _export_chunks(first_chunk, chunks)
+    filename = f"accounts.{format}"
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    if compress:
+        body = _gzip_chunks(body)
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+async def _export_chunks(first_chunk: bytes, chunks):
+    """Yield the chunks of an export started by export_accounts()"""
+    try:
+        if first_chunk:
+            yield first_chunk
+        async for chunk in chunks:
+            yield chunk
+    except Exception as e:
+        # The response has started, so the download is cut short
+        logger.error(f"Error exporting accounts: {e}", exc_info=True)
+        raise
+    finally:
+        await chunks.aclose()
+
+async def _gzip_chunks(chunks):
+    """Compress a stream of chunks into a gzip stream"""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
 
 @router.post("/", response_model=AccountResponse, status_code=201,
          summary="Create a new account",
@@ -686,7 +853,7 @@ async def create_account(
 
     try:
         # Check if account already exists
-        existing_account = account_repo.get_account_by_id(account.acc_id)
+        existing_account = await account_repo.get_account_by_id_async(account.acc_id)
         if existing_account:
             raise HTTPException(status_code=400, detail="Account with this ID already exists")
 
@@ -705,7 +872,7 @@ async def create_account(
         }
 
         # Create the account
-        created_account = account_repo.create_account(account_data)
+        created_account = await account_repo.create_account_async(account_data)
 
         if not created_account:
             raise HTTPException(status_code=500, detail="Failed to create account")
@@ -780,7 +947,7 @@ async def get_account(
 
     try:
         # Get the account by username
-        account = account_repo.get_account_by_username(acc_username)
+        account = await account_repo.get_account_by_username_async(acc_username)
 
         if not account:
             raise HTTPException(status_code=404, detail="Account not found")
@@ -801,7 +968,7 @@ async def get_account_info(acc_id: str, datatypes: List[str], current_user = Dep
 
     try:
         # Get account info with specific fields
-        account_info = account_repo.get_account_info(acc_id, datatypes)
+        account_info = await account_repo.get_account_info_async(acc_id, datatypes)
 
         if not account_info:
             raise HTTPException(status_code=404, detail="Account not found")
@@ -970,155 +1137,43 @@ async def new_account(request: Request, debug: bool = False, current_user = Depe
         raise HTTPException(status_code=400, detail=f"Error processing account data: {str(e)}")
 
 @router.post("/new/bulk")
-async def new_bulk_accounts(accounts: List[ReceivedData], debug: bool = False, current_user = Depends(get_current_active_user)):
+def new_bulk_accounts(accounts: List[ReceivedData], debug: bool = False, current_user = Depends(get_current_active_user)):
     """Create multiple accounts at once"""
     if debug:
         print(f"Debug mode: {len(accounts)} accounts received")
         return {"status": "debug", "message": "Debug mode, no accounts created"}
 
-    created_accounts = []
     skipped_accounts = []
-    total_accounts = len(accounts)
-
-    # Use user-specific database connection with RLS
-    with get_user_db_connection(user_id=current_user["id"], user_role=current_user["role"]) as user_conn:
-        cursor = user_conn.cursor()
-
-        try:
-            for accObject in accounts:
-                # Skip test emails
-                try:
-                    if "@demoemail.com" in accObject.email.address:
-                        skipped_accounts.append(accObject.id)
-                        continue
-
-                    # Extract account data
-                    accId = accObject.id
-                    accUsername = accObject.user.username
-                    accPassword = accObject.user.password
-                    accEmailAddress = accObject.email.address
-                    accEmailPassword = accObject.email.password
-                    accVaultAddress = accObject.vault.address
-                    accVaultPassword = accObject.vault.password
-                    accCreatedAt = accObject.metadata.createdAt
-                    accSessionStart = accObject.metadata.sessionStart
-
-                    # Initialize Steam Guard fields
-                    accSteamguardAccountName = None
-                    accConfirmType = None
-                    accDeviceId = None
-                    accIdentitySecret = None
-                    accRevocationCode = None
-                    accSecret1 = None
-                    accSerialNumber = None
-                    accServerTime = None
-                    accSharedSecret = None
-                    accStatus = None
-                    accTokenGid = None
-                    accUri = None
-
-                    # Extract Steam Guard information if available
-                    if accObject.steamguard:
-                        accSteamguardAccountName = accObject.steamguard.account_name
-                        accConfirmType = accObject.steamguard.confirm_type
-                        accDeviceId = accObject.steamguard.deviceId
-                        accIdentitySecret = accObject.steamguard.identity_secret
-                        accRevocationCode = accObject.steamguard.revocation_code
-                        accSecret1 = accObject.steamguard.secret_1
-                        accSerialNumber = accObject.steamguard.serial_number
-                        accServerTime = accObject.steamguard.server_time
-                        accSharedSecret = accObject.steamguard.shared_secret
-                        accStatus = accObject.steamguard.status
-                        accTokenGid = accObject.steamguard.token_gid
-                        accUri = accObject.steamguard.uri
-
-                    # Insert the account into the database
-                    sql = """
-                    INSERT INTO accounts (
-                        acc_id,
-                        acc_username,
-                        acc_password,
-                        acc_email_address,
-                        acc_email_password,
-                        acc_vault_address,
-                        acc_vault_password,
-                        acc_created_at,
-                        acc_session_start,
-                        acc_steamguard_account_name,
-                        acc_confirm_type,
-                        acc_device_id,
-                        acc_identity_secret,
-                        acc_revocation_code,
-                        acc_secret_1,
-                        acc_serial_number,
-                        acc_server_time,
-                        acc_shared_secret,
-                        acc_status,
-                        acc_token_gid,
-                        acc_uri,
-                        owner_id
-                    ) VALUES (
-                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                    )
-                    ON CONFLICT (acc_id) DO UPDATE SET
-                        acc_username = EXCLUDED.acc_username,
-                        acc_password = EXCLUDED.acc_password,
-                        acc_email_address = EXCLUDED.acc_email_address,
-                        acc_email_password = EXCLUDED.acc_email_password,
-                        acc_vault_address = EXCLUDED.acc_vault_address,
-                        acc_vault_password = EXCLUDED.acc_vault_password
-                    RETURNING acc_id;
-                    """
-
-                    params = (
-                        accId,
-                        accUsername,
-                        accPassword,
-                        accEmailAddress,
-                        accEmailPassword,
-                        accVaultAddress,
-                        accVaultPassword,
-                        accCreatedAt,
-                        accSessionStart,
-                        accSteamguardAccountName,
-                        accConfirmType,
-                        accDeviceId,
-                        accIdentitySecret,
-                        accRevocationCode,
-                        accSecret1,
-                        accSerialNumber,
-                        accServerTime,
-                        accSharedSecret,
-                        accStatus,
-                        accTokenGid,
-                        accUri,
-                        current_user["id"]  # Set the owner_id to the current user's ID
-                    )
-
-                    cursor.execute(sql, params)
-                    result = cursor.fetchone()
-
-                    if result:
-                        created_accounts.append(accId)
-                except Exception as e:
-                    print(f"Error processing account data: {e}")
-                    skipped_accounts.append(accObject.id)
-
-            user_conn.commit()
-            return {
-                "status": "success",
-                "created_count": len(created_accounts),
-                "created_accounts": created_accounts,
-                "skipped_count": len(skipped_accounts),
-                "skipped_accounts": skipped_accounts
-            }
-
-        except Exception as e:
-            user_conn.rollback()
-            print(f"Error creating accounts: {e}")
-            raise HTTPException(status_code=500, detail=f"Error creating accounts: {str(e)}")
-        finally:
-            cursor.close()
+    rows = []
+
+    for index, accObject in enumerate(accounts):
+        # Skip test emails
+        if is_test_account(accObject):
+            skipped_accounts.append((index, accObject.id))
+        else:
+            rows.append((index, received_data_to_account(accObject)))
+
+    # Import the accounts in one transaction, with the RLS context of the user
+    account_repo = AccountRepository(user_id=current_user["id"], user_role=current_user["role"])
+    try:
+        result = account_repo.import_accounts(rows)
+    except Exception as e:
+        logger.error(f"Error creating accounts: {e}")
+        raise HTTPException(status_code=500, detail=f"Error creating accounts: {str(e)}")
+
+    imported = sorted(result["created"] + result["updated"], key=lambda entry: entry["row_number"])
+    created_accounts = [entry["acc_id"] for entry in imported]
+    skipped_accounts = [acc_id for _, acc_id in sorted(
+        skipped_accounts + [(entry["row_number"], entry["acc_id"]) for entry in result["failed"]]
+    )]
+
+    return {
+        "status": "success",
+        "created_count": len(created_accounts),
+        "created_accounts": created_accounts,
+        "skipped_count": len(skipped_accounts),
+        "skipped_accounts": skipped_accounts
+    }
 
 @router.delete("/{acc_id}")
 async def delete_account(acc_id: str, current_user = Depends(get_current_active_user)):
@@ -1128,13 +1183,13 @@ async def delete_account(acc_id: str, current_user = Depends(get_current_active_
 
     try:
         # Check if the account exists and belongs to the current user
-        existing_account = account_repo.get_account_by_id(acc_id)
+        existing_account = await account_repo.get_account_by_id_async(acc_id)
 
         if not existing_account:
             raise HTTPException(status_code=404, detail="Account not found or you don't have permission to delete it")
 
         # Delete the account
-        success = account_repo.delete_account(acc_id)
+        success = await account_repo.delete_account_async(acc_id)
 
         if not success:
             raise HTTPException(status_code=500, detail="Failed to delete account")
@@ -1160,7 +1215,7 @@ async def _list_accounts(params: AccountListParams, current_user):
 
     try:
         # Get accounts with pagination, sorting, and filtering
-        result = account_repo.get_accounts(
+        result = await account_repo.get_accounts_async(
             limit=params.limit,
             offset=params.offset,
             search=params.search,
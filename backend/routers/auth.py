@@ -21,8 +21,10 @@ logger = logging.getLogger(__name__)
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Now import the db module and config
-from db import get_db_connection
+from db import get_db_connection, get_async_db_connection
 from db.token_blacklist import add_to_blacklist, is_blacklisted, get_blacklist_stats
+from db.user_cache import USERS_TABLE, get_cached_user, put_user, evict_user, get_cached_token_payload, put_token_payload
+from db.cache_invalidation import publish_cache_invalidation
 from db.secure_access import get_secure_db
 from config import Config
 from utils.password_validator import validate_password_strength, get_password_strength_feedback, get_password_requirements
@@ -168,37 +170,56 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+USER_QUERY = """
+    SELECT id, username, email, password_hash, full_name, role, is_active, created_at, last_login, avatar_url
+    FROM users
+    WHERE username = %s
+"""
+
+def _mock_admin_user():
+    # Mock user for development/testing
+    return {
+        "id": 1,
+        "username": "admin",
+        "email": "admin@example.com",
+        "password_hash": "$2b$12$EixZaYVK1fsbw1ZfbX3OXePaWxn96p36WQoeG6Lruj3vjPGga31lW",  # password: admin123
+        "full_name": "Admin User",
+        "role": "admin",
+        "is_active": True,
+        "created_at": datetime.utcnow(),
+        "last_login": None,
+        "avatar_url": None
+    }
+
+def _user_row_to_dict(user):
+    return {
+        "id": user[0],
+        "username": user[1],
+        "email": user[2],
+        "password_hash": user[3],
+        "full_name": user[4],
+        "role": user[5],
+        "is_active": user[6],
+        "created_at": user[7],
+        "last_login": user[8],
+        "avatar_url": user[9]
+    }
+
 def get_user(username: str):
     # Try to get a database connection
     try:
         # Use a regular connection since this is for the users table, not subject to RLS
         with get_db_connection() as db_conn:
             if db_conn is None:
-                # Mock user for development/testing
                 if username == "admin":
                     logger.warning("Database connection not available, using mock admin user")
-                    return {
-                        "id": 1,
-                        "username": "admin",
-                        "email": "admin@example.com",
-                        "password_hash": "$2b$12$EixZaYVK1fsbw1ZfbX3OXePaWxn96p36WQoeG6Lruj3vjPGga31lW",  # password: admin123
-                        "full_name": "Admin User",
-                        "role": "admin",
-                        "is_active": True,
-                        "created_at": datetime.utcnow(),
-                        "last_login": None,
-                        "avatar_url": None
-                    }
+                    return _mock_admin_user()
                 logger.warning(f"Database connection not available and user {username} not found")
                 return None
 
             cursor = db_conn.cursor()
             try:
-                cursor.execute("""
-                    SELECT id, username, email, password_hash, full_name, role, is_active, created_at, last_login, avatar_url
-                    FROM users
-                    WHERE username = %s
-                """, (username,))
+                cursor.execute(USER_QUERY, (username,))
 
                 user = cursor.fetchone()
                 if not user:
@@ -206,18 +227,7 @@ def get_user(username: str):
                     return None
 
                 logger.debug(f"User found: {username}")
-                return {
-                    "id": user[0],
-                    "username": user[1],
-                    "email": user[2],
-                    "password_hash": user[3],
-                    "full_name": user[4],
-                    "role": user[5],
-                    "is_active": user[6],
-                    "created_at": user[7],
-                    "last_login": user[8],
-                    "avatar_url": user[9]
-                }
+                return _user_row_to_dict(user)
             except Exception as e:
                 logger.error(f"Error retrieving user: {e}")
                 return None
@@ -228,18 +238,49 @@ def get_user(username: str):
         # Fall back to mock user for development/testing
         if username == "admin":
             logger.warning("Using mock admin user due to database connection error")
-            return {
-                "id": 1,
-                "username": "admin",
-                "email": "admin@example.com",
-                "password_hash": "$2b$12$EixZaYVK1fsbw1ZfbX3OXePaWxn96p36WQoeG6Lruj3vjPGga31lW",  # password: admin123
-                "full_name": "Admin User",
-                "role": "admin",
-                "is_active": True,
-                "created_at": datetime.utcnow(),
-                "last_login": None,
-                "avatar_url": None
-            }
+            return _mock_admin_user()
+        return None
+
+async def get_user_async(username: str):
+    """Async variant of get_user() used on the request path, so the lookup does not block the event loop.
+
+    Users read from the database are cached, so most requests do not reach the users table.
+    """
+    user = get_cached_user(username)
+    if user is not None:
+        return user
+
+    try:
+        # Use a regular connection since this is for the users table, not subject to RLS
+        async with get_async_db_connection() as db_conn:
+            if db_conn is None:
+                if username == "admin":
+                    logger.warning("Database connection not available, using mock admin user")
+                    return _mock_admin_user()
+                logger.warning(f"Database connection not available and user {username} not found")
+                return None
+
+            try:
+                async with db_conn.cursor() as cursor:
+                    await cursor.execute(USER_QUERY, (username,))
+                    user = await cursor.fetchone()
+
+                if not user:
+                    logger.debug(f"User not found: {username}")
+                    return None
+
+                user = _user_row_to_dict(user)
+                put_user(user)
+                return user
+            except Exception as e:
+                logger.error(f"Error retrieving user: {e}")
+                return None
+    except Exception as e:
+        logger.error(f"Error with database connection: {e}")
+        # Fall back to mock user for development/testing
+        if username == "admin":
+            logger.warning("Using mock admin user due to database connection error")
+            return _mock_admin_user()
         return None
 
 def authenticate_user(username: str, password: str):
@@ -341,6 +382,25 @@ def create_refresh_token(data: dict, user_id: int = None, user_role: str = None)
 
     return encoded_jwt, expires_at, token_jti
 
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """
+    Decode a token, reusing the payload of a token already decoded until it expires.
+
+    Args:
+        token (str): The encoded token
+
+    Returns:
+        Dict[str, Any]: The decoded payload
+
+    Raises:
+        JWTError: If the token is invalid or expired
+    """
+    payload = get_cached_token_payload(token)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        put_token_payload(token, payload)
+    return payload
+
 def create_csrf_token() -> str:
     """
     Create a CSRF token.
@@ -380,7 +440,7 @@ async def get_current_user(request: Request, token: Optional[str] = Depends(get_
         logger.debug(f"Validating token: {token_preview}")
 
         # Decode the token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
 
         # Extract token data
         username: str = payload.get("sub")
@@ -429,7 +489,7 @@ async def get_current_user(request: Request, token: Optional[str] = Depends(get_
         raise credentials_exception
 
     # Get user from database
-    user = get_user(username=token_data.username)
+    user = await get_user_async(username=token_data.username)
     if user is None:
         logger.warning(f"User not found: {token_data.username}")
         raise credentials_exception
@@ -588,7 +648,9 @@ async def login_for_access_token(response: Response, request: Request, form_data
                             WHERE username = %s
                         """, (failed_attempts, failed_attempts, MAX_LOGIN_ATTEMPTS, user["username"]))
 
+                        publish_cache_invalidation(cursor, [USERS_TABLE])
                         db_conn.commit()
+                        evict_user(username=user["username"])
 
                         logger.info(f"Updated failed login attempts for user {user['username']}: {failed_attempts}")
 
@@ -649,7 +711,9 @@ async def login_for_access_token(response: Response, request: Request, form_data
                         WHERE username = %s
                     """, (user["username"],))
 
+                    publish_cache_invalidation(cursor, [USERS_TABLE])
                     db_conn.commit()
+                    evict_user(username=user["username"])
 
                     logger.debug(f"Updated last login time and reset failed login attempts for user: {user['username']}")
                 except Exception as column_error:
@@ -662,7 +726,9 @@ async def login_for_access_token(response: Response, request: Request, form_data
                             WHERE username = %s
                         """, (user["username"],))
 
+                        publish_cache_invalidation(cursor, [USERS_TABLE])
                         db_conn.commit()
+                        evict_user(username=user["username"])
 
                         logger.debug(f"Updated last login time for user: {user['username']}")
                     else:
@@ -1385,6 +1451,38 @@ async def logout(
 
     return {"message": "Logged out successfully"}
 
+def _update_user(user_id: int, query: str, params: tuple) -> None:
+    """
+    Update a row of the users table and evict it from the user caches of all workers.
+
+    The invalidation is published on the transaction of the update, so that other workers
+    do not keep serving the old password hash or lockout state until the cache expires.
+
+    Args:
+        user_id (int): The ID of the updated user
+        query (str): The UPDATE statement
+        params (tuple): The parameters of the statement
+
+    Raises:
+        Exception: If the update fails
+    """
+    with get_db_connection() as db_conn:
+        if db_conn is None:
+            raise RuntimeError("Database connection not available")
+
+        cursor = db_conn.cursor()
+        try:
+            cursor.execute(query, params)
+            publish_cache_invalidation(cursor, [USERS_TABLE])
+            db_conn.commit()
+        except Exception:
+            db_conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    evict_user(user_id=user_id)
+
 @router.post("/change-password")
 async def change_password(
     old_password: str,
@@ -1424,31 +1522,30 @@ async def change_password(
 
         # Increment failed login attempts
         try:
-            with get_secure_db() as db:
-                # Get current failed login attempts
-                failed_attempts = current_user.get("failed_login_attempts", 0) + 1
+            # Get current failed login attempts
+            failed_attempts = (current_user.get("failed_login_attempts") or 0) + 1
 
-                # Update failed login attempts
-                try:
-                    db.execute_command("""
-                        UPDATE users
-                        SET failed_login_attempts = %s,
-                            lockout_time = CASE WHEN %s >= %s THEN now() ELSE lockout_time END
-                        WHERE id = %s
-                    """, (failed_attempts, failed_attempts, MAX_LOGIN_ATTEMPTS, current_user["id"]))
+            # Update failed login attempts
+            try:
+                _update_user(current_user["id"], """
+                    UPDATE users
+                    SET failed_login_attempts = %s,
+                        lockout_time = CASE WHEN %s >= %s THEN now() ELSE lockout_time END
+                    WHERE id = %s
+                """, (failed_attempts, failed_attempts, MAX_LOGIN_ATTEMPTS, current_user["id"]))
 
-                    logger.info(f"Updated failed login attempts for user {current_user['username']}: {failed_attempts}")
+                logger.info(f"Updated failed login attempts for user {current_user['username']}: {failed_attempts}")
 
-                    # Check if user is now locked out
-                    if failed_attempts >= MAX_LOGIN_ATTEMPTS:
-                        logger.warning(f"User {current_user['username']} is now locked out")
-                except Exception as column_error:
-                    # If the column doesn't exist, log a warning but continue
-                    if "column" in str(column_error) and "failed_login_attempts" in str(column_error):
-                        logger.warning(f"failed_login_attempts column doesn't exist, skipping update: {column_error}")
-                    else:
-                        # Re-raise if it's a different error
-                        raise column_error
+                # Check if user is now locked out
+                if failed_attempts >= MAX_LOGIN_ATTEMPTS:
+                    logger.warning(f"User {current_user['username']} is now locked out")
+            except Exception as column_error:
+                # If the column doesn't exist, log a warning but continue
+                if "column" in str(column_error) and "failed_login_attempts" in str(column_error):
+                    logger.warning(f"failed_login_attempts column doesn't exist, skipping update: {column_error}")
+                else:
+                    # Re-raise if it's a different error
+                    raise column_error
         except Exception as e:
             logger.error(f"Error updating failed login attempts: {e}")
 
@@ -1471,60 +1568,59 @@ async def change_password(
 
     # Update password
     try:
-        with get_secure_db() as db:
-            # Update password and reset failed login attempts
-            try:
-                db.execute_command("""
+        # Update password and reset failed login attempts
+        try:
+            _update_user(current_user["id"], """
+                UPDATE users
+                SET password_hash = %s,
+                    failed_login_attempts = 0,
+                    lockout_time = NULL
+                WHERE id = %s
+            """, (hashed_password, current_user["id"]))
+        except Exception as column_error:
+            # If the column doesn't exist, just update the password
+            if "column" in str(column_error) and "failed_login_attempts" in str(column_error):
+                logger.warning(f"failed_login_attempts column doesn't exist, updating only password: {column_error}")
+                _update_user(current_user["id"], """
                     UPDATE users
-                    SET password_hash = %s,
-                        failed_login_attempts = 0,
-                        lockout_time = NULL
+                    SET password_hash = %s
                     WHERE id = %s
                 """, (hashed_password, current_user["id"]))
-            except Exception as column_error:
-                # If the column doesn't exist, just update the password
-                if "column" in str(column_error) and "failed_login_attempts" in str(column_error):
-                    logger.warning(f"failed_login_attempts column doesn't exist, updating only password: {column_error}")
-                    db.execute_command("""
-                        UPDATE users
-                        SET password_hash = %s
-                        WHERE id = %s
-                    """, (hashed_password, current_user["id"]))
-                else:
-                    # Re-raise if it's a different error
-                    raise column_error
+            else:
+                # Re-raise if it's a different error
+                raise column_error
 
-            logger.info(f"Password changed successfully for user: {current_user['username']}")
-
-            # Log password change
-            log_audit(
-                action="Password changed",
-                user_id=current_user["id"],
-                owner_id=current_user["id"],
-                details={
-                    "username": current_user["username"],
-                    "ip_address": request.client.host if hasattr(request, "client") else None,
-                    "user_agent": request.headers.get("user-agent")
-                },
-                source="auth"
-            )
+        logger.info(f"Password changed successfully for user: {current_user['username']}")
 
-            # Revoke all tokens for this user
-            # This is a security measure to ensure that all sessions are invalidated when the password is changed
-            try:
-                # Get all active tokens for this user
-                # This is a simplified implementation that doesn't actually revoke all tokens
-                # In a production environment, you would need to store tokens in a database and revoke them there
-
-                # Revoke the current token
-                if "token_jti" in current_user:
-                    token_exp = current_user.get("token_exp", time.time() + 3600)  # Default to 1 hour from now
-                    add_to_blacklist(current_user["token_jti"], token_exp)
-                    logger.info(f"Token {current_user['token_jti'][:8]}... revoked during password change")
-            except Exception as e:
-                logger.error(f"Error revoking tokens during password change: {e}")
+        # Log password change
+        log_audit(
+            action="Password changed",
+            user_id=current_user["id"],
+            owner_id=current_user["id"],
+            details={
+                "username": current_user["username"],
+                "ip_address": request.client.host if hasattr(request, "client") else None,
+                "user_agent": request.headers.get("user-agent")
+            },
+            source="auth"
+        )
+
+        # Revoke all tokens for this user
+        # This is a security measure to ensure that all sessions are invalidated when the password is changed
+        try:
+            # Get all active tokens for this user
+            # This is a simplified implementation that doesn't actually revoke all tokens
+            # In a production environment, you would need to store tokens in a database and revoke them there
+
+            # Revoke the current token
+            if "token_jti" in current_user:
+                token_exp = current_user.get("token_exp", time.time() + 3600)  # Default to 1 hour from now
+                add_to_blacklist(current_user["token_jti"], token_exp)
+                logger.info(f"Token {current_user['token_jti'][:8]}... revoked during password change")
+        except Exception as e:
+            logger.error(f"Error revoking tokens during password change: {e}")
 
-            return {"message": "Password updated successfully"}
+        return {"message": "Password updated successfully"}
     except Exception as e:
         logger.error(f"Error changing password: {e}")
         raise HTTPException(
@@ -11,6 +11,7 @@ from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, validator
 from datetime import datetime, timedelta
 
+from db.pagination import InvalidCursorError
 from db.repositories.logs import LogRepository
 from routers.auth import get_current_user
 
@@ -97,13 +98,20 @@ class LogEntryCreate(BaseModel):
     parent_span_id: Optional[str] = Field(None, description="The parent span ID")
     timestamp: Optional[datetime] = Field(None, description="The timestamp")
 
+class LogBatchResponse(BaseModel):
+    """Model for batch log creation response."""
+    inserted: int
+    log_ids: Optional[List[int]] = None
+
 class LogsResponse(BaseModel):
     """Model for logs response."""
     logs: List[LogEntry]
-    total: int
+    total: Optional[int] = None
+    total_estimated: bool = False
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 class LogStatistic(BaseModel):
     """Model for log statistic."""
@@ -112,6 +120,9 @@ class LogStatistic(BaseModel):
     count: int
     severity: Optional[int] = None
 
+# Maximum number of log entries accepted by POST /logs/batch
+MAX_LOG_BATCH_SIZE = 10000
+
 # Endpoints
 @router.post("/", response_model=None)
 async def create_log(
@@ -136,7 +147,7 @@ async def create_log(
             log_data.owner_id = current_user["id"]
 
         # Add log entry
-        log = log_repo.add_log(
+        log = await log_repo.add_log_async(
             message=log_data.message,
             level=log_data.level,
             category=log_data.category,
@@ -166,6 +177,48 @@ async def create_log(
         logger.error(f"Error creating log entry: {e}")
         raise HTTPException(status_code=500, detail=f"Error creating log entry: {str(e)}")
 
+@router.post("/batch", response_model=LogBatchResponse)
+async def create_logs_batch(
+    logs_data: List[LogEntryCreate] = Body(..., description="The log entries to create"),
+    return_ids: bool = Query(False, description="Whether to return the IDs of the created log entries"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Create many log entries at once.
+
+    The entries are inserted in a single transaction: either all of them are created or none.
+    """
+    if len(logs_data) > MAX_LOG_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many log entries: {len(logs_data)} (maximum {MAX_LOG_BATCH_SIZE})"
+        )
+
+    if not logs_data:
+        return {"inserted": 0, "log_ids": [] if return_ids else None}
+
+    try:
+        # Create log repository
+        log_repo = LogRepository(user_id=current_user["id"], user_role=current_user["role"])
+
+        # user_id and owner_id default to the current user in the repository
+        entries = [log_data.dict() for log_data in logs_data]
+
+        result = await log_repo.add_logs_bulk_async(entries, return_ids=return_ids)
+
+        if not result:
+            raise HTTPException(status_code=500, detail="Failed to create log entries")
+
+        if return_ids:
+            return {"inserted": len(result), "log_ids": result}
+
+        return {"inserted": result}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating log entries: {e}")
+        raise HTTPException(status_code=500, detail=f"Error creating log entries: {str(e)}")
+
 @router.get("/", response_model=LogsResponse)
 async def get_logs(
     page: int = Query(1, ge=1, description="Page number"),
@@ -180,12 +233,17 @@ async def get_logs(
     user_id: Optional[int] = Query(None, description="Filter by user ID"),
     trace_id: Optional[str] = Query(None, description="Filter by trace ID"),
     search: Optional[str] = Query(None, description="Search in message text"),
+    cursor: Optional[str] = Query(None, description="The next_cursor of the previous page, instead of a page number"),
+    count: str = Query("exact", description="How to count the total: exact, estimate or none",
+                       pattern="^(exact|estimate|none)$"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
     Get logs with filtering and pagination.
 
     This endpoint allows retrieving logs with various filters and pagination.
+    Following next_cursor reads each page in the same time however deep it is,
+    whereas a page number skips the logs before it.
     """
     try:
         # Create log repository
@@ -195,7 +253,8 @@ async def get_logs(
         offset = (page - 1) * page_size
 
         # Get logs
-        logs, total = log_repo.get_logs(
+        result = await log_repo.get_logs_page_async(
+            cursor=cursor,
             limit=page_size,
             offset=offset,
             start_time=start_time,
@@ -207,19 +266,25 @@ async def get_logs(
             entity_id=entity_id,
             user_id=user_id,
             trace_id=trace_id,
-            search_query=search
+            search_query=search,
+            count=count
         )
 
         # Calculate total pages
-        total_pages = (total + page_size - 1) // page_size
+        total = result["total"]
+        total_pages = (total + page_size - 1) // page_size if total is not None else None
 
         return {
-            "logs": logs,
+            "logs": result["logs"],
             "total": total,
+            "total_estimated": result["total_estimated"],
             "page": page,
             "page_size": page_size,
-            "total_pages": total_pages
+            "total_pages": total_pages,
+            "next_cursor": result["next_cursor"]
         }
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting logs: {e}")
         raise HTTPException(status_code=500, detail=f"Error getting logs: {str(e)}")
@@ -238,7 +303,7 @@ async def get_log_categories(
         log_repo = LogRepository(user_id=current_user["id"], user_role=current_user["role"])
 
         # Get categories
-        categories = log_repo.get_log_categories()
+        categories = await log_repo.get_log_categories_async()
 
         return categories
     except Exception as e:
@@ -259,7 +324,7 @@ async def get_log_sources(
         log_repo = LogRepository(user_id=current_user["id"], user_role=current_user["role"])
 
         # Get sources
-        sources = log_repo.get_log_sources()
+        sources = await log_repo.get_log_sources_async()
 
         return sources
     except Exception as e:
@@ -280,7 +345,7 @@ async def get_log_levels(
         log_repo = LogRepository(user_id=current_user["id"], user_role=current_user["role"])
 
         # Get levels
-        levels = log_repo.get_log_levels()
+        levels = await log_repo.get_log_levels_async()
 
         return levels
     except Exception as e:
@@ -301,7 +366,7 @@ async def get_retention_policies(
         log_repo = LogRepository(user_id=current_user["id"], user_role=current_user["role"])
 
         # Get retention policies
-        policies = log_repo.get_retention_policies()
+        policies = await log_repo.get_retention_policies_async()
 
         return policies
     except Exception as e:
@@ -329,7 +394,7 @@ async def get_log_statistics(
         log_repo = LogRepository(user_id=current_user["id"], user_role=current_user["role"])
 
         # Get statistics
-        statistics = log_repo.get_log_statistics(days=days, group_by=group_by)
+        statistics = await log_repo.get_log_statistics_async(days=days, group_by=group_by)
 
         return statistics
     except HTTPException:
@@ -353,7 +418,7 @@ async def get_log(
         log_repo = LogRepository(user_id=current_user["id"], user_role=current_user["role"])
 
         # Get log
-        log = log_repo.get_log_by_id(log_id)
+        log = await log_repo.get_log_by_id_async(log_id)
 
         if not log:
             raise HTTPException(status_code=404, detail="Log entry not found")
@@ -389,7 +454,7 @@ async def cleanup_logs(
 
         if dry_run:
             # Get count of logs that would be deleted
-            count_by_level = log_repo.get_logs_to_delete_count()
+            count_by_level = await log_repo.get_logs_to_delete_count_async()
             total_count = sum(count["count"] for count in count_by_level)
 
             return {
@@ -399,7 +464,7 @@ async def cleanup_logs(
             }
         else:
             # Clean up logs
-            deleted_count = log_repo.cleanup_old_logs()
+            deleted_count = await log_repo.cleanup_old_logs_async()
 
             return {
                 "dry_run": False,
@@ -14,6 +14,7 @@ from pydantic import BaseModel, Field
 from psycopg2.extras import RealDictCursor
 from db import get_user_db_connection
 from db.connection import get_db_connection
+from db.pagination import InvalidCursorError
 from db.repositories.proxmox_nodes import ProxmoxNodeRepository
 from db.repositories.vms import VMRepository
 from routers.auth import get_current_user
@@ -53,9 +54,11 @@ class ProxmoxNodeResponse(ProxmoxNodeBase):
 class ProxmoxNodeListResponse(BaseModel):
     """Response model for listing Proxmox nodes."""
     nodes: List[ProxmoxNodeResponse]
-    total: int
+    total: Optional[int] = None
+    total_estimated: bool = False
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
 
 class ProxmoxNodeVerifyResponse(BaseModel):
     """Response model for verifying a Proxmox node connection."""
@@ -96,6 +99,9 @@ async def get_proxmox_nodes(
     offset: int = Query(0, ge=0),
     search: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="The next_cursor of the previous page, instead of an offset"),
+    count: str = Query("exact", description="How to count the total: exact, estimate or none",
+                       pattern="^(exact|estimate|none)$"),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -107,10 +113,12 @@ async def get_proxmox_nodes(
 
     try:
         # Get nodes with pagination and filtering
-        result = proxmox_node_repo.get_nodes(limit, offset, search, status)
+        result = proxmox_node_repo.get_nodes(limit, offset, search, status, cursor=cursor, count=count)
 
         return result
 
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error retrieving Proxmox nodes: {e}")
         raise HTTPException(status_code=500, detail=f"Error retrieving Proxmox nodes: {str(e)}")
@@ -5,16 +5,18 @@ This module provides endpoints for accessing timeseries data.
 """
 
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
 from datetime import datetime, timedelta
 
 from routers.auth import get_current_active_user, get_current_admin_user
 from timeseries.storage import (
-    get_metric_data, get_metric_aggregates, get_latest_metric_value, get_metric_statistics
+    get_metric_data, get_metric_aggregates, get_downsampled_metric_data,
+    get_latest_metric_value, get_latest_metric_values, get_metric_statistics, get_metrics_batch
 )
 from db.connection import get_db_connection
+from db.metrics_registry import get_metric_definitions, get_metric_categories
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -34,56 +36,30 @@ async def list_metrics(current_user = Depends(get_current_active_user)):
     Returns a list of available metrics with their definitions.
     """
     try:
-        # Get database connection
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Get all metric categories
-        cursor.execute(
-            """
-            SELECT id, name, description
-            FROM public.metrics_categories
-            ORDER BY name
-            """
-        )
+        # Get the active metrics of every category from the registry
+        metrics_by_category = {}
+        for metric in sorted(get_metric_definitions().values(), key=lambda metric: metric["name"]):
+            if not metric["is_active"]:
+                continue
+
+            metrics_by_category.setdefault(metric["category_id"], []).append({
+                "id": metric["id"],
+                "name": metric["name"],
+                "display_name": metric["display_name"],
+                "description": metric["description"],
+                "unit": metric["unit"],
+                "data_type": metric["data_type"]
+            })
 
         categories = []
-        for row in cursor.fetchall():
-            category_id, name, description = row
-
-            # Get metrics for this category
-            cursor.execute(
-                """
-                SELECT id, name, display_name, description, unit, data_type
-                FROM public.metrics_definitions
-                WHERE category_id = %s AND is_active = TRUE
-                ORDER BY name
-                """,
-                (category_id,)
-            )
-
-            metrics = []
-            for metric_row in cursor.fetchall():
-                metric_id, metric_name, display_name, metric_description, unit, data_type = metric_row
-
-                metrics.append({
-                    "id": metric_id,
-                    "name": metric_name,
-                    "display_name": display_name,
-                    "description": metric_description,
-                    "unit": unit,
-                    "data_type": data_type
-                })
-
+        for category in get_metric_categories():
             categories.append({
-                "id": category_id,
-                "name": name,
-                "description": description,
-                "metrics": metrics
+                "id": category["id"],
+                "name": category["name"],
+                "description": category["description"],
+                "metrics": metrics_by_category.get(category["id"], [])
             })
 
-        cursor.close()
-
         return {"categories": categories}
     except Exception as e:
         logger.error(f"Error listing metrics: {e}")
@@ -99,11 +75,18 @@ async def get_metric_data_endpoint(
     period: Optional[str] = None,
     limit: int = Query(1000, ge=1, le=10000),
     offset: int = Query(0, ge=0),
+    max_points: Optional[int] = Query(None, ge=2, le=10000),
+    resolution: Optional[int] = Query(None, ge=1),
+    downsample: str = Query("avg", pattern="^(avg|lttb)$"),
     current_user = Depends(get_current_active_user)
 ):
     """
     Get metric data for a specific time range.
 
+    With max_points or resolution, and no period, the data is bucketed on the database
+    side from raw data or the coarsest rollup that resolves the buckets, so the number
+    of points per series stays bounded however wide the range is.
+
     Args:
         metric_name: The name of the metric
         start_time: The start time of the range (defaults to 24 hours ago)
@@ -113,6 +96,9 @@ async def get_metric_data_endpoint(
         period: The aggregation period (raw, hourly, daily, weekly, monthly)
         limit: The maximum number of data points to return
         offset: The offset for pagination
+        max_points: The maximum number of points per series to downsample to (defaults to limit with a resolution)
+        resolution: The minimum length of the downsampling buckets in seconds (optional)
+        downsample: The downsampling method, bucket averages ('avg') or LTTB ('lttb')
     """
     try:
         # Set default time range if not provided
@@ -135,6 +121,30 @@ async def get_metric_data_endpoint(
         # Get owner ID for RLS
         owner_id = current_user["id"] if current_user["role"] != "admin" else None
 
+        # Downsample on the database side when the caller bounds the number of points
+        if (max_points or resolution) and period not in ["hourly", "daily", "weekly", "monthly"]:
+            downsampled = get_downsampled_metric_data(
+                metric_name=metric_name,
+                start_time=start_time,
+                end_time=end_time,
+                max_points=max_points or limit,
+                resolution=resolution,
+                method=downsample,
+                entity_type=entity_type,
+                entity_id=entity_id,
+                owner_id=owner_id
+            )
+
+            return {
+                "metric": metric_name,
+                "period": downsampled["source"],
+                "resolution": downsampled["resolution"],
+                "start_time": start_time,
+                "end_time": end_time,
+                "data": downsampled["data"],
+                "count": len(downsampled["data"])
+            }
+
         # Get data based on period
         if period in ["hourly", "daily", "weekly", "monthly"]:
             data = get_metric_aggregates(
@@ -254,6 +264,42 @@ async def get_latest_metric_value_endpoint(
         logger.error(f"Error getting latest metric value for '{metric_name}': {e}")
         raise HTTPException(status_code=500, detail=f"Error getting latest metric value: {str(e)}")
 
+@router.get("/latest")
+async def get_latest_metric_values_endpoint(
+    metric_name: List[str] = Query(..., description="Metric names, repeated for several metrics"),
+    entity_type: Optional[str] = None,
+    entity_id: Optional[List[str]] = Query(None, description="Entity IDs, repeated for several entities"),
+    current_user = Depends(get_current_active_user)
+):
+    """
+    Get the latest values of several metrics for many entities at once.
+
+    Args:
+        metric_name: The names of the metrics
+        entity_type: The entity type to filter by (optional)
+        entity_id: The entity IDs to filter by (optional)
+    """
+    try:
+        # Get owner ID for RLS
+        owner_id = current_user["id"] if current_user["role"] != "admin" else None
+
+        # Get latest values
+        values = get_latest_metric_values(
+            metric_names=metric_name,
+            entity_type=entity_type,
+            entity_ids=entity_id,
+            owner_id=owner_id
+        )
+
+        return {
+            "metrics": metric_name,
+            "entity_type": entity_type,
+            "values": values
+        }
+    except Exception as e:
+        logger.error(f"Error getting latest metric values for {metric_name}: {e}")
+        raise HTTPException(status_code=500, detail=f"Error getting latest metric values: {str(e)}")
+
 @router.get("/statistics/{metric_name}")
 async def get_metric_statistics_endpoint(
     metric_name: str,
@@ -306,6 +352,88 @@ async def get_metric_statistics_endpoint(
         logger.error(f"Error getting metric statistics for '{metric_name}': {e}")
         raise HTTPException(status_code=500, detail=f"Error getting metric statistics: {str(e)}")
 
+def _get_time_range(duration: Optional[str]) -> Tuple[datetime, datetime]:
+    """
+    Get the time range of an overview.
+
+    Args:
+        duration: The time duration (hour, day, week, month, year)
+
+    Returns:
+        Tuple[datetime, datetime]: The start and end time of the range
+    """
+    end_time = datetime.now()
+
+    if duration == "hour":
+        start_time = end_time - timedelta(hours=1)
+    elif duration == "week":
+        start_time = end_time - timedelta(days=7)
+    elif duration == "month":
+        start_time = end_time - timedelta(days=30)
+    elif duration == "year":
+        start_time = end_time - timedelta(days=365)
+    else:  # default to day
+        start_time = end_time - timedelta(days=1)
+
+    return start_time, end_time
+
+def _get_overview_metrics(
+    metric_names: List[str],
+    period: Optional[str],
+    start_time: datetime,
+    end_time: datetime,
+    entity_type: str,
+    entity_ids: List[str],
+    owner_id: Optional[int]
+) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Get the latest value, statistics and time series of the metrics of an overview.
+
+    All the metrics and entities are fetched together by get_metrics_batch.
+
+    Args:
+        metric_names: The names of the metrics
+        period: The aggregation period (raw, hourly, daily, weekly, monthly)
+        start_time: The start time of the range
+        end_time: The end time of the range
+        entity_type: The entity type of the metrics
+        entity_ids: The IDs of the entities
+        owner_id: The owner ID to filter by (optional)
+
+    Returns:
+        Dict[str, Dict[str, Dict[str, Any]]]: The metrics per entity ID and metric name
+    """
+    batch = get_metrics_batch(
+        metric_names=metric_names,
+        start_time=start_time,
+        end_time=end_time,
+        period_type=period,
+        entity_type=entity_type,
+        entity_ids=entity_ids,
+        owner_id=owner_id,
+        limit=1000
+    )
+
+    # Metrics that are not defined are reported without data
+    metrics = {}
+    for entity_id in entity_ids:
+        metrics[entity_id] = {}
+        for metric_name in metric_names:
+            metrics[entity_id][metric_name] = batch.get(metric_name, {}).get(entity_id) or {
+                "latest": None,
+                "timestamp": None,
+                "statistics": {
+                    "min": None,
+                    "max": None,
+                    "avg": None,
+                    "sum": None,
+                    "count": 0
+                },
+                "data": []
+            }
+
+    return metrics
+
 @router.get("/system/overview")
 async def get_system_overview(
     period: Optional[str] = "hourly",
@@ -324,100 +452,19 @@ async def get_system_overview(
         logger.info(f"System overview request: user={current_user['username']}, id={current_user['id']}, role={current_user['role']}")
         logger.info(f"Request parameters: period={period}, duration={duration}")
         # Set time range based on duration
-        end_time = datetime.now()
-
-        if duration == "hour":
-            start_time = end_time - timedelta(hours=1)
-        elif duration == "week":
-            start_time = end_time - timedelta(days=7)
-        elif duration == "month":
-            start_time = end_time - timedelta(days=30)
-        elif duration == "year":
-            start_time = end_time - timedelta(days=365)
-        else:  # default to day
-            start_time = end_time - timedelta(days=1)
+        start_time, end_time = _get_time_range(duration)
 
         logger.info(f"Time range: {start_time} to {end_time}")
 
         # Get owner ID for RLS
         owner_id = current_user["id"] if current_user["role"] != "admin" else None
 
-        # Get system metrics
-        system_metrics = [
-            "cpu_usage", "memory_usage", "disk_usage",
-            "vm_count", "vm_running_count", "vm_stopped_count", "vm_error_count",
-            "account_count", "account_active_count", "account_locked_count"
-        ]
-
-        metrics_data = {}
-
-        for metric_name in system_metrics:
-            # Get latest value
-            latest = get_latest_metric_value(
-                metric_name=metric_name,
-                entity_type="system",
-                entity_id="system",
-                owner_id=owner_id
-            )
-
-            # Get statistics
-            stats = get_metric_statistics(
-                metric_name=metric_name,
-                start_time=start_time,
-                end_time=end_time,
-                entity_type="system",
-                entity_id="system",
-                owner_id=owner_id
-            )
-
-            # Get time series data
-            if period in ["hourly", "daily", "weekly", "monthly"]:
-                data = get_metric_aggregates(
-                    metric_name=metric_name,
-                    period_type=period,
-                    start_time=start_time,
-                    end_time=end_time,
-                    entity_type="system",
-                    entity_id="system",
-                    owner_id=owner_id,
-                    limit=1000,
-                    offset=0
-                )
-
-                # Format data for response
-                formatted_data = []
-                for point in data:
-                    formatted_data.append({
-                        "timestamp": point["period_start"],
-                        "value": point["avg"]  # Use average for time series
-                    })
-            else:
-                # Get raw data
-                data = get_metric_data(
-                    metric_name=metric_name,
-                    start_time=start_time,
-                    end_time=end_time,
-                    entity_type="system",
-                    entity_id="system",
-                    owner_id=owner_id,
-                    limit=1000,
-                    offset=0
-                )
-
-                # Format data for response
-                formatted_data = []
-                for point in data:
-                    formatted_data.append({
-                        "timestamp": point["timestamp"],
-                        "value": point["value"]
-                    })
+        # Get the system metrics shown by the overview
+        system_metrics = ["cpu_usage", "memory_usage", "disk_usage", "vm_count", "account_count"]
 
-            metrics_data[metric_name] = {
-                "latest": latest["value"] if latest else None,
-                "timestamp": latest["timestamp"] if latest else None,
-                "statistics": stats,
-                "data": formatted_data
-            }
+        metrics_data = _get_overview_metrics(
+            system_metrics, period, start_time, end_time, "system", ["system"], owner_id
+        )["system"]
 
         # Format data for frontend
         cpu_usage = metrics_data.get('cpu_usage', {}).get('data', [])
@@ -458,18 +505,7 @@ async def get_vm_overview(
     """
     try:
         # Set time range based on duration
-        end_time = datetime.now()
-
-        if duration == "hour":
-            start_time = end_time - timedelta(hours=1)
-        elif duration == "week":
-            start_time = end_time - timedelta(days=7)
-        elif duration == "month":
-            start_time = end_time - timedelta(days=30)
-        elif duration == "year":
-            start_time = end_time - timedelta(days=365)
-        else:  # default to day
-            start_time = end_time - timedelta(days=1)
+        start_time, end_time = _get_time_range(duration)
 
         # Get owner ID for RLS
         owner_id = current_user["id"] if current_user["role"] != "admin" else None
@@ -478,121 +514,55 @@ async def get_vm_overview(
         vm_metrics = ["vm_cpu_usage", "vm_memory_usage", "vm_disk_usage", "vm_uptime"]
 
         # Get database connection to fetch VM list
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Build query to get VMs
-        if vm_id:
-            cursor.execute(
-                """
-                SELECT id, vmid, name, status, owner_id
-                FROM public.vms
-                WHERE id = %s OR vmid::text = %s
-                """,
-                (vm_id, vm_id)
-            )
-        else:
-            # Get all VMs for the user or all VMs for admin
-            if current_user["role"] == "admin":
-                cursor.execute(
-                    """
-                    SELECT id, vmid, name, status, owner_id
-                    FROM public.vms
-                    """
-                )
-            else:
-                cursor.execute(
-                    """
-                    SELECT id, vmid, name, status, owner_id
-                    FROM public.vms
-                    WHERE owner_id = %s
-                    """,
-                    (current_user["id"],)
-                )
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                # Build query to get VMs
+                if vm_id:
+                    cursor.execute(
+                        """
+                        SELECT id, vmid, name, status, owner_id
+                        FROM public.vms
+                        WHERE id = %s OR vmid::text = %s
+                        """,
+                        (vm_id, vm_id)
+                    )
+                else:
+                    # Get all VMs for the user or all VMs for admin
+                    if current_user["role"] == "admin":
+                        cursor.execute(
+                            """
+                            SELECT id, vmid, name, status, owner_id
+                            FROM public.vms
+                            """
+                        )
+                    else:
+                        cursor.execute(
+                            """
+                            SELECT id, vmid, name, status, owner_id
+                            FROM public.vms
+                            WHERE owner_id = %s
+                            """,
+                            (current_user["id"],)
+                        )
+
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+
+        # Get the metrics of all the VMs at once
+        vm_ids = [str(row[0]) for row in rows]
+        metrics = _get_overview_metrics(vm_metrics, period, start_time, end_time, "vm", vm_ids, owner_id)
 
         vms = []
-        for row in cursor.fetchall():
-            vm_id, vmid, name, status, vm_owner_id = row
-
-            vm_data = {
+        for vm_id, vmid, name, status, vm_owner_id in rows:
+            vms.append({
                 "id": vm_id,
                 "vmid": vmid,
                 "name": name,
                 "status": status,
-                "metrics": {}
-            }
-
-            for metric_name in vm_metrics:
-                # Get latest value
-                latest = get_latest_metric_value(
-                    metric_name=metric_name,
-                    entity_type="vm",
-                    entity_id=str(vm_id),
-                    owner_id=owner_id
-                )
-
-                # Get statistics
-                stats = get_metric_statistics(
-                    metric_name=metric_name,
-                    start_time=start_time,
-                    end_time=end_time,
-                    entity_type="vm",
-                    entity_id=str(vm_id),
-                    owner_id=owner_id
-                )
-
-                # Get time series data
-                if period in ["hourly", "daily", "weekly", "monthly"]:
-                    data = get_metric_aggregates(
-                        metric_name=metric_name,
-                        period_type=period,
-                        start_time=start_time,
-                        end_time=end_time,
-                        entity_type="vm",
-                        entity_id=str(vm_id),
-                        owner_id=owner_id,
-                        limit=1000,
-                        offset=0
-                    )
-
-                    # Format data for response
-                    formatted_data = []
-                    for point in data:
-                        formatted_data.append({
-                            "timestamp": point["period_start"],
-                            "value": point["avg"]  # Use average for time series
-                        })
-                else:
-                    # Get raw data
-                    data = get_metric_data(
-                        metric_name=metric_name,
-                        start_time=start_time,
-                        end_time=end_time,
-                        entity_type="vm",
-                        entity_id=str(vm_id),
-                        owner_id=owner_id,
-                        limit=1000,
-                        offset=0
-                    )
-
-                    # Format data for response
-                    formatted_data = []
-                    for point in data:
-                        formatted_data.append({
-                            "timestamp": point["timestamp"],
-                            "value": point["value"]
-                        })
-
-                vm_data["metrics"][metric_name] = {
-                    "latest": latest["value"] if latest else None,
-                    "timestamp": latest["timestamp"] if latest else None,
-                    "statistics": stats,
-                    "data": formatted_data
-                }
-
-            vms.append(vm_data)
-
-        cursor.close()
+                "metrics": metrics[str(vm_id)]
+            })
 
         return {
             "period": period,
@@ -620,18 +590,7 @@ async def get_account_overview(
     """
     try:
         # Set time range based on duration
-        end_time = datetime.now()
-
-        if duration == "hour":
-            start_time = end_time - timedelta(hours=1)
-        elif duration == "week":
-            start_time = end_time - timedelta(days=7)
-        elif duration == "month":
-            start_time = end_time - timedelta(days=30)
-        elif duration == "year":
-            start_time = end_time - timedelta(days=365)
-        else:  # default to day
-            start_time = end_time - timedelta(days=1)
+        start_time, end_time = _get_time_range(duration)
 
         # Get owner ID for RLS
         owner_id = current_user["id"] if current_user["role"] != "admin" else None
@@ -639,75 +598,9 @@ async def get_account_overview(
         # Get account metrics
         account_metrics = ["account_count", "account_active_count", "account_locked_count"]
 
-        metrics_data = {}
-
-        for metric_name in account_metrics:
-            # Get latest value
-            latest = get_latest_metric_value(
-                metric_name=metric_name,
-                entity_type="system",
-                entity_id="system",
-                owner_id=owner_id
-            )
-
-            # Get statistics
-            stats = get_metric_statistics(
-                metric_name=metric_name,
-                start_time=start_time,
-                end_time=end_time,
-                entity_type="system",
-                entity_id="system",
-                owner_id=owner_id
-            )
-
-            # Get time series data
-            if period in ["hourly", "daily", "weekly", "monthly"]:
-                data = get_metric_aggregates(
-                    metric_name=metric_name,
-                    period_type=period,
-                    start_time=start_time,
-                    end_time=end_time,
-                    entity_type="system",
-                    entity_id="system",
-                    owner_id=owner_id,
-                    limit=1000,
-                    offset=0
-                )
-
-                # Format data for response
-                formatted_data = []
-                for point in data:
-                    formatted_data.append({
-                        "timestamp": point["period_start"],
-                        "value": point["avg"]  # Use average for time series
-                    })
-            else:
-                # Get raw data
-                data = get_metric_data(
-                    metric_name=metric_name,
-                    start_time=start_time,
-                    end_time=end_time,
-                    entity_type="system",
-                    entity_id="system",
-                    owner_id=owner_id,
-                    limit=1000,
-                    offset=0
-                )
-
-                # Format data for response
-                formatted_data = []
-                for point in data:
-                    formatted_data.append({
-                        "timestamp": point["timestamp"],
-                        "value": point["value"]
-                    })
-
-            metrics_data[metric_name] = {
-                "latest": latest["value"] if latest else None,
-                "timestamp": latest["timestamp"] if latest else None,
-                "statistics": stats,
-                "data": formatted_data
-            }
+        metrics_data = _get_overview_metrics(
+            account_metrics, period, start_time, end_time, "system", ["system"], owner_id
+        )["system"]
 
         return {
             "period": period,
@@ -735,18 +628,7 @@ async def get_job_overview(
     """
     try:
         # Set time range based on duration
-        end_time = datetime.now()
-
-        if duration == "hour":
-            start_time = end_time - timedelta(hours=1)
-        elif duration == "week":
-            start_time = end_time - timedelta(days=7)
-        elif duration == "month":
-            start_time = end_time - timedelta(days=30)
-        elif duration == "year":
-            start_time = end_time - timedelta(days=365)
-        else:  # default to day
-            start_time = end_time - timedelta(days=1)
+        start_time, end_time = _get_time_range(duration)
 
         # Get owner ID for RLS
         owner_id = current_user["id"] if current_user["role"] != "admin" else None
@@ -754,75 +636,9 @@ async def get_job_overview(
         # Get job metrics
         job_metrics = ["job_count", "job_active_count", "job_completed_count", "job_failed_count", "job_execution_time"]
 
-        metrics_data = {}
-
-        for metric_name in job_metrics:
-            # Get latest value
-            latest = get_latest_metric_value(
-                metric_name=metric_name,
-                entity_type="system",
-                entity_id="system",
-                owner_id=owner_id
-            )
-
-            # Get statistics
-            stats = get_metric_statistics(
-                metric_name=metric_name,
-                start_time=start_time,
-                end_time=end_time,
-                entity_type="system",
-                entity_id="system",
-                owner_id=owner_id
-            )
-
-            # Get time series data
-            if period in ["hourly", "daily", "weekly", "monthly"]:
-                data = get_metric_aggregates(
-                    metric_name=metric_name,
-                    period_type=period,
-                    start_time=start_time,
-                    end_time=end_time,
-                    entity_type="system",
-                    entity_id="system",
-                    owner_id=owner_id,
-                    limit=1000,
-                    offset=0
-                )
-
-                # Format data for response
-                formatted_data = []
-                for point in data:
-                    formatted_data.append({
-                        "timestamp": point["period_start"],
-                        "value": point["avg"]  # Use average for time series
-                    })
-            else:
-                # Get raw data
-                data = get_metric_data(
-                    metric_name=metric_name,
-                    start_time=start_time,
-                    end_time=end_time,
-                    entity_type="system",
-                    entity_id="system",
-                    owner_id=owner_id,
-                    limit=1000,
-                    offset=0
-                )
-
-                # Format data for response
-                formatted_data = []
-                for point in data:
-                    formatted_data.append({
-                        "timestamp": point["timestamp"],
-                        "value": point["value"]
-                    })
-
-            metrics_data[metric_name] = {
-                "latest": latest["value"] if latest else None,
-                "timestamp": latest["timestamp"] if latest else None,
-                "statistics": stats,
-                "data": formatted_data
-            }
+        metrics_data = _get_overview_metrics(
+            job_metrics, period, start_time, end_time, "system", ["system"], owner_id
+        )["system"]
 
         return {
             "period": period,
@@ -1126,11 +942,15 @@ async def generate_sample_data(
         raise HTTPException(status_code=500, detail=f"Error generating sample data: {str(e)}")
 
 @router.post("/collect-metrics")
-async def collect_metrics(
+def collect_metrics(
     current_user = Depends(get_current_active_user)
 ):
     """
     Manually trigger metrics collection.
+
+    Every enabled source is collected, concurrently, whether it is due or not. The
+    endpoint is synchronous, so the collection runs in the threadpool instead of
+    blocking the event loop.
     """
     try:
         # Only allow admins to trigger collection
@@ -1139,66 +959,23 @@ async def collect_metrics(
 
         logger.info(f"Manually triggering metrics collection for user {current_user['username']} (id={current_user['id']})")
 
-        # Import the collector functions
-        from timeseries.collector import collect_system_metrics, collect_vm_metrics, collect_account_metrics
-        from timeseries.storage import store_metrics_batch
-        from timeseries.vm_status import collect_vm_status_distribution
-
-        all_metrics = []
-
-        # Collect system metrics
-        logger.info("Collecting system metrics...")
-        system_metrics = collect_system_metrics()
-
-        # Add owner_id to system metrics
-        for metric in system_metrics:
-            metric['owner_id'] = current_user['id']
-
-        all_metrics.extend(system_metrics)
-
-        # Collect VM metrics
-        logger.info("Collecting VM metrics...")
-        vm_metrics = collect_vm_metrics()
-
-        # Add owner_id to VM metrics if not present
-        for metric in vm_metrics:
-            if 'owner_id' not in metric:
-                metric['owner_id'] = current_user['id']
+        from timeseries.collector import collect_all_metrics
 
-        all_metrics.extend(vm_metrics)
-
-        # Collect VM status distribution
-        logger.info("Collecting VM status distribution...")
-        vm_status_metrics = collect_vm_status_distribution()
-        all_metrics.extend(vm_status_metrics)
-
-        # Collect account metrics
-        logger.info("Collecting account metrics...")
-        account_metrics = collect_account_metrics()
-
-        # Add owner_id to account metrics
-        for metric in account_metrics:
-            metric['owner_id'] = current_user['id']
-
-        all_metrics.extend(account_metrics)
-
-        # Store metrics
-        logger.info(f"Storing {len(all_metrics)} metrics...")
-        success_count, failure_count = store_metrics_batch(
-            metrics=all_metrics,
+        metrics_count, success_count, failure_count = collect_all_metrics(
+            force=True,
             user_id=current_user['id'],
             user_role=current_user['role']
         )
 
-        logger.info(f"Stored {success_count} metrics, {failure_count} failures")
-
         return {
             "status": "success",
             "message": f"Metrics collection triggered successfully. Stored {success_count} metrics, {failure_count} failures",
-            "metrics_count": len(all_metrics),
+            "metrics_count": metrics_count,
             "success_count": success_count,
             "failure_count": failure_count
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error triggering metrics collection: {e}")
         raise HTTPException(status_code=500, detail=f"Error triggering metrics collection: {str(e)}")
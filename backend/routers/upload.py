@@ -1,24 +1,31 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
+from fastapi import APIRouter, Depends, HTTPException, Form, Request
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from dependencies import get_query_token
-from db import get_user_db_connection
-from typing import List, Dict, Any, Optional
+from db.repositories.accounts import AccountRepository
+from typing import List, Dict, Any, Optional, Tuple, Union, AsyncIterator, Callable
+import asyncio
 import json
 import csv
-import io
-from pydantic import BaseModel, Field, ValidationError
+from pydantic import BaseModel, Field, ValidationError, TypeAdapter
 import traceback
 import logging
 from routers.auth import get_current_active_user
 
 # Import models from accounts router
-from routers.accounts import User, Email, Vault, Metadata, Steamguard, ReceivedData
+from routers.accounts import (
+    User, Email, Vault, Metadata, Steamguard, ReceivedData, received_data_to_account, is_test_account
+)
 
 # Import validation functions
 from validation import (
-    validate_file, validate_account_data, MAX_FILE_SIZE, ALLOWED_FILE_TYPES
+    validate_file, validate_account_data_batch, MAX_FILE_SIZE, MAX_IMPORT_FILE_SIZE,
+    MAX_IMPORT_ROWS, ALLOWED_FILE_TYPES
 )
 from middleware.validation import validate_file_upload
+from utils.stream_utils import (
+    MultipartFileReader, IncrementalCsvReader, IncrementalJsonArrayParser, decode_chunks
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -31,6 +38,19 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Number of accounts validated at a time
+VALIDATION_CHUNK_SIZE = 5000
+
+# Number of parsed batches waiting to be imported while the upload is received
+IMPORT_QUEUE_SIZE = 2
+
+REQUIRED_CSV_HEADERS = [
+    'id', 'user.username', 'user.password', 'email.address', 'email.password',
+    'vault.address', 'vault.password', 'metadata.createdAt', 'metadata.sessionStart', 'metadata.guard'
+]
+
+_received_data_list = TypeAdapter(List[ReceivedData])
+
 class ValidationErrorDetail(BaseModel):
     """Model for validation error details"""
     loc: List[str]
@@ -53,323 +73,452 @@ class UploadResponse(BaseModel):
     successful_accounts: List[str]
     failed_accounts: List[AccountValidationError]
 
-def process_account_data(account_data: Dict[Any, Any], row_number: Optional[int] = None, current_user: dict = None) -> Dict[str, Any]:
+def _upload_request_body(file_type: str) -> Dict[str, Any]:
+    """OpenAPI description of a multipart/form-data body with a file, which the endpoints read as a stream"""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["file"],
+                        "properties": {
+                            "file": {"type": "string", "format": "binary", "description": f"The {file_type} file"}
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+def _error_details(errors: List[Dict[str, Any]]) -> List[ValidationErrorDetail]:
+    """Convert Pydantic validation errors to our format"""
+    return [
+        ValidationErrorDetail(
+            loc=[str(loc) for loc in error["loc"]],
+            msg=error["msg"],
+            type=error["type"]
+        ) for error in errors
+    ]
+
+def validate_account_chunk(accounts_data: List[Any]) -> List[Union[ReceivedData, List[ValidationErrorDetail]]]:
     """
-    Process and validate account data
+    Validate a chunk of account data
+
+    The whole chunk is validated in one pass, first with the upload validation rules,
+    then with the ReceivedData model.
 
     Args:
-        account_data: Dictionary containing account data
-        row_number: Row number in CSV file (if applicable)
-        current_user: The current authenticated user
+        accounts_data: List of account data
 
     Returns:
-        Dictionary with validation result
+        For each account, the validated data or its validation errors
     """
-    account_id = account_data.get("id", None)
-    row_info = f" (row {row_number})" if row_number is not None else ""
+    results: List[Any] = [None] * len(accounts_data)
 
-    logger.info(f"Processing account data for account ID: {account_id}{row_info}")
+    for index, validation_result in enumerate(validate_account_data_batch(accounts_data)):
+        if not validation_result.valid:
+            results[index] = [
+                ValidationErrorDetail(
+                    loc=error["field"].split("."),
+                    msg=error["message"],
+                    type="validation_error"
+                ) for error in validation_result.errors
+            ]
 
+    pending = [index for index, result in enumerate(results) if result is None]
     try:
-        # Validate the data using Pydantic model
-        try:
-            validated_data = ReceivedData(**account_data)
-        except ValidationError as e:
-            logger.warning(f"Validation error for account ID: {account_id}{row_info}: {e}")
-            raise
+        validated = _received_data_list.validate_python([accounts_data[index] for index in pending])
+    except ValidationError as e:
+        # Group the errors by account, and validate the other accounts again
+        errors: Dict[int, List[Dict[str, Any]]] = {}
+        for error in e.errors():
+            errors.setdefault(pending[error["loc"][0]], []).append(dict(error, loc=error["loc"][1:]))
+        for index, account_errors in errors.items():
+            results[index] = _error_details(account_errors)
+
+        pending = [index for index in pending if index not in errors]
+        validated = _received_data_list.validate_python([accounts_data[index] for index in pending])
 
-        logger.debug(f"Account data validated successfully for account ID: {account_id}{row_info}")
+    for index, data in zip(pending, validated):
+        results[index] = data
+    return results
 
-        # Use user-specific database connection with RLS
-        with get_user_db_connection(user_id=current_user["id"], user_role=current_user["role"]) as user_conn:
-            if not user_conn:
-                logger.error(f"Failed to get database connection for account ID: {account_id}{row_info}")
-                raise Exception("Database connection failed")
+class AccountUpload:
+    """
+    Import of the accounts of an upload, added in batches as the file is parsed
+
+    Each batch is validated and staged in the database as soon as it is added, and
+    the staged accounts are merged in one transaction by finish(). An account that
+    fails is reported without aborting the others.
+    """
 
-            cursor = user_conn.cursor()
+    def __init__(self, current_user: dict, convert: Optional[Callable[[Any], Any]] = None):
+        """
+        Initialize the import
+
+        Args:
+            current_user: The current authenticated user
+            convert: Conversion of each row to account data, whose failures are reported as CSV errors
+        """
+        # Use the user's RLS context
+        account_repo = AccountRepository(user_id=current_user["id"], user_role=current_user["role"])
+        self.account_import = account_repo.begin_import()
+        self.convert = convert
+        self.row_count = 0
+        self.failed_accounts: List[AccountValidationError] = []
+        self.rows: List[Tuple[int, str]] = []
+        self.error: Optional[Exception] = None
+
+    def add(self, batch: List[Tuple[int, Any]]) -> None:
+        """
+        Validate a batch of rows and stage the valid accounts
+
+        Args:
+            batch: The row number and the data of each row
+        """
+        self.row_count += len(batch)
+
+        accounts = []
+        for row_number, data in batch:
+            if self.convert is None:
+                accounts.append((row_number, data))
+                continue
 
             try:
-                # Extract account data
-                accId = validated_data.id
-                accUsername = validated_data.user.username
-                accPassword = validated_data.user.password
-
-                # Email might be optional in some cases
-                accEmailAddress = None
-                accEmailPassword = None
-                if validated_data.email:
-                    accEmailAddress = validated_data.email.address
-                    accEmailPassword = validated_data.email.password
-
-                accVaultAddress = validated_data.vault.address
-                accVaultPassword = validated_data.vault.password
-                accCreatedAt = validated_data.metadata.createdAt
-                accSessionStart = validated_data.metadata.sessionStart
-
-                # Initialize Steam Guard fields
-                accSteamguardAccountName = None
-                accConfirmType = None
-                accDeviceId = None
-                accIdentitySecret = None
-                accRevocationCode = None
-                accSecret1 = None
-                accSerialNumber = None
-                accServerTime = None
-                accSharedSecret = None
-                accStatus = None
-                accTokenGid = None
-                accUri = None
-
-                # Extract Steam Guard information if available
-                if validated_data.steamguard:
-                    accSteamguardAccountName = validated_data.steamguard.account_name
-                    accConfirmType = validated_data.steamguard.confirm_type
-                    accDeviceId = validated_data.steamguard.deviceId
-                    accIdentitySecret = validated_data.steamguard.identity_secret
-                    accRevocationCode = validated_data.steamguard.revocation_code
-                    accSecret1 = validated_data.steamguard.secret_1
-                    accSerialNumber = validated_data.steamguard.serial_number
-                    accServerTime = validated_data.steamguard.server_time
-                    accSharedSecret = validated_data.steamguard.shared_secret
-                    accStatus = validated_data.steamguard.status
-                    accTokenGid = validated_data.steamguard.token_gid
-                    accUri = validated_data.steamguard.uri
-
-                # Skip test emails
-                if accEmailAddress and "@demoemail.com" in accEmailAddress:
-                    return {
-                        "success": False,
-                        "account_id": accId,
-                        "row_number": row_number,
-                        "errors": [
+                accounts.append((row_number, self.convert(data)))
+            except Exception as e:
+                logger.error(f"Error processing CSV row {row_number}: {e}")
+                self.failed_accounts.append(
+                    AccountValidationError(
+                        row_number=row_number,
+                        errors=[
                             ValidationErrorDetail(
-                                loc=["email", "address"],
-                                msg="Test email detected, account skipped",
-                                type="value_error"
+                                loc=["csv_row"],
+                                msg=f"Error processing CSV row: {str(e)}",
+                                type="csv_error"
                             )
                         ]
-                    }
-
-                # Insert the account into the database
-                sql = """
-                INSERT INTO accounts (
-                    acc_id,
-                    acc_username,
-                    acc_password,
-                    acc_email_address,
-                    acc_email_password,
-                    acc_vault_address,
-                    acc_vault_password,
-                    acc_created_at,
-                    acc_session_start,
-                    acc_steamguard_account_name,
-                    acc_confirm_type,
-                    acc_device_id,
-                    acc_identity_secret,
-                    acc_revocation_code,
-                    acc_secret_1,
-                    acc_serial_number,
-                    acc_server_time,
-                    acc_shared_secret,
-                    acc_status,
-                    acc_token_gid,
-                    acc_uri,
-                    owner_id
-                ) VALUES (
-                    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                )
-                ON CONFLICT (acc_id) DO UPDATE SET
-                    acc_username = EXCLUDED.acc_username,
-                    acc_password = EXCLUDED.acc_password,
-                    acc_email_address = EXCLUDED.acc_email_address,
-                    acc_email_password = EXCLUDED.acc_email_password,
-                    acc_vault_address = EXCLUDED.acc_vault_address,
-                    acc_vault_password = EXCLUDED.acc_vault_password
-                RETURNING acc_id;
-                """
-
-                params = (
-                    accId,
-                    accUsername,
-                    accPassword,
-                    accEmailAddress,
-                    accEmailPassword,
-                    accVaultAddress,
-                    accVaultPassword,
-                    accCreatedAt,
-                    accSessionStart,
-                    accSteamguardAccountName,
-                    accConfirmType,
-                    accDeviceId,
-                    accIdentitySecret,
-                    accRevocationCode,
-                    accSecret1,
-                    accSerialNumber,
-                    accServerTime,
-                    accSharedSecret,
-                    accStatus,
-                    accTokenGid,
-                    accUri,
-                    current_user["id"]  # Set the owner_id to the current user's ID
+                    )
                 )
 
-                cursor.execute(sql, params)
-                result = cursor.fetchone()
-                user_conn.commit()
-
-                return {
-                    "success": True,
-                    "account_id": accId
-                }
+        rows = []
+        for start in range(0, len(accounts), VALIDATION_CHUNK_SIZE):
+            chunk = accounts[start:start + VALIDATION_CHUNK_SIZE]
+            results = validate_account_chunk([account_data for _, account_data in chunk])
+
+            for (row_number, account_data), result in zip(chunk, results):
+                if isinstance(result, list):
+                    account_id = account_data.get("id") if isinstance(account_data, dict) else None
+                    logger.debug(f"Invalid account data for account ID: {account_id} (row {row_number})")
+                    self.failed_accounts.append(AccountValidationError(account_id=account_id, row_number=row_number, errors=result))
+                elif is_test_account(result):
+                    # Skip test emails
+                    self.failed_accounts.append(
+                        AccountValidationError(
+                            account_id=result.id,
+                            row_number=row_number,
+                            errors=[
+                                ValidationErrorDetail(
+                                    loc=["email", "address"],
+                                    msg="Test email detected, account skipped",
+                                    type="value_error"
+                                )
+                            ]
+                        )
+                    )
+                else:
+                    rows.append((row_number, received_data_to_account(result)))
 
+        self.rows.extend((row_number, account["acc_id"]) for row_number, account in rows)
+        if self.error is None:
+            try:
+                self.account_import.add(rows)
             except Exception as e:
-                user_conn.rollback()
-                logger.error(f"Error creating account {account_id}{row_info}: {e}")
+                logger.error(f"Error staging accounts: {e}")
                 logger.error(traceback.format_exc())
+                self.error = e
 
-                return {
-                    "success": False,
-                    "account_id": account_id,
-                    "row_number": row_number,
-                    "errors": [
+    def finish(self) -> Tuple[List[str], List[AccountValidationError]]:
+        """
+        Merge the staged accounts
+
+        Returns:
+            The IDs of the imported accounts, and the failed accounts
+        """
+        logger.info(f"Importing {len(self.rows)} accounts, {len(self.failed_accounts)} failed validation")
+
+        result = None
+        if self.error is None:
+            try:
+                result = self.account_import.merge()
+            except Exception as e:
+                logger.error(f"Error importing accounts: {e}")
+                logger.error(traceback.format_exc())
+                self.error = e
+
+        if result is None:
+            result = {
+                "created": [],
+                "updated": [],
+                "failed": [
+                    {"row_number": row_number, "acc_id": acc_id, "error": str(self.error)}
+                    for row_number, acc_id in self.rows
+                ]
+            }
+
+        failed_accounts = list(self.failed_accounts)
+        for entry in result["failed"]:
+            failed_accounts.append(
+                AccountValidationError(
+                    account_id=entry["acc_id"],
+                    row_number=entry["row_number"],
+                    errors=[
                         ValidationErrorDetail(
                             loc=["database"],
-                            msg=f"Database error: {str(e)}",
+                            msg=f"Database error: {entry['error']}",
                             type="db_error"
                         )
                     ]
-                }
-            finally:
-                cursor.close()
-
-    except ValidationError as e:
-        # Convert Pydantic validation errors to our format
-        errors = []
-        for error in e.errors():
-            errors.append(
-                ValidationErrorDetail(
-                    loc=[str(loc) for loc in error["loc"]],
-                    msg=error["msg"],
-                    type=error["type"]
                 )
             )
 
-        return {
-            "success": False,
-            "account_id": account_id,
-            "row_number": row_number,
-            "errors": errors
-        }
-    except Exception as e:
-        logger.error(f"Error processing account data {account_id}{row_info}: {e}")
-        logger.error(traceback.format_exc())
+        imported = sorted(result["created"] + result["updated"], key=lambda entry: entry["row_number"])
+        failed_accounts.sort(key=lambda failed: failed.row_number)
+        return [entry["acc_id"] for entry in imported], failed_accounts
 
-        return {
-            "success": False,
-            "account_id": account_id,
-            "row_number": row_number,
-            "errors": [
-                ValidationErrorDetail(
-                    loc=["unknown"],
-                    msg=f"Unexpected error: {str(e)}",
-                    type="unknown_error"
-                )
-            ]
-        }
+    def close(self) -> None:
+        """Release the database connection, discarding the accounts that were not merged"""
+        self.account_import.close()
 
-@router.post("/json", response_model=UploadResponse)
-async def upload_json_file(file: UploadFile = File(...), current_user = Depends(get_current_active_user)):
+def import_account_data(accounts: List[Tuple[int, Any]], current_user: dict) -> Tuple[List[str], List[AccountValidationError]]:
     """
-    Upload a JSON file containing account data
+    Validate account data and import the valid accounts
 
-    The JSON file should contain an array of account objects or a single account object.
-    Each account object should follow the structure defined in the ReceivedData model.
+    Args:
+        accounts: The row number and the account data of each account
+        current_user: The current authenticated user
+
+    Returns:
+        The IDs of the imported accounts, and the failed accounts
+    """
+    upload = AccountUpload(current_user)
+    try:
+        upload.add(accounts)
+        return upload.finish()
+    finally:
+        upload.close()
+
+async def import_batches(batches: AsyncIterator[List[Tuple[int, Any]]],
+                         upload: AccountUpload) -> Tuple[List[str], List[AccountValidationError]]:
     """
+    Import batches of rows while the next ones are read
+
+    The batches are handed to a worker thread through a bounded queue, so that at most
+    IMPORT_QUEUE_SIZE batches wait in memory while the upload is received.
+
+    Args:
+        batches: The batches of rows, with their row numbers
+        upload: The import to add the batches to
+
+    Returns:
+        The IDs of the imported accounts, and the failed accounts
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=IMPORT_QUEUE_SIZE)
+    errors: List[Exception] = []
+
+    async def importer() -> None:
+        # Keep draining the queue after a failure, so that the reader never blocks
+        while True:
+            batch = await queue.get()
+            if batch is None:
+                return
+            if not errors:
+                try:
+                    await run_in_threadpool(upload.add, batch)
+                except Exception as e:
+                    errors.append(e)
+
+    task = asyncio.create_task(importer())
+    try:
+        async for batch in batches:
+            if errors:
+                break
+            await queue.put(batch)
+    finally:
+        await queue.put(None)
+        await task
+
+    if errors:
+        raise errors[0]
+    return await run_in_threadpool(upload.finish)
+
+async def open_upload(request: Request, file_type: str) -> MultipartFileReader:
+    """
+    Start reading the uploaded file of a multipart/form-data request
+
+    Args:
+        request: The request
+        file_type: The expected type of the file, "json" or "csv"
+
+    Returns:
+        The reader of the file, whose headers have been read
+
+    Raises:
+        HTTPException: If the request has no file, or the file has the wrong type or is too large
+    """
+    try:
+        reader = MultipartFileReader(
+            request.stream(), request.headers.get("content-type", ""), max_size=MAX_IMPORT_FILE_SIZE
+        )
+        await reader.open()
+    except ValueError as e:
+        logger.warning(f"Invalid upload: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
     # Validate file type
-    if not file.filename.endswith('.json'):
-        logger.warning(f"Invalid file format: {file.filename}")
-        raise HTTPException(status_code=400, detail="Invalid file format. Please upload a JSON file.")
+    if not reader.filename.endswith(f".{file_type}"):
+        logger.warning(f"Invalid file format: {reader.filename}")
+        raise HTTPException(status_code=400, detail=f"Invalid file format. Please upload a {file_type.upper()} file.")
 
     # Validate content type
-    content_type = file.content_type
-    if content_type not in ALLOWED_FILE_TYPES['json']:
+    content_type = reader.content_type
+    if content_type not in ALLOWED_FILE_TYPES[file_type]:
         logger.warning(f"Invalid content type: {content_type}")
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid content type: {content_type}. Allowed types: {', '.join(ALLOWED_FILE_TYPES['json'])}"
+            detail=f"Invalid content type: {content_type}. Allowed types: {', '.join(ALLOWED_FILE_TYPES[file_type])}"
         )
 
-    try:
-        # Read the file
-        contents = await file.read()
-
-        # Validate file size
-        if len(contents) > MAX_FILE_SIZE:
-            logger.warning(f"File too large: {len(contents)} bytes")
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Maximum size: {MAX_FILE_SIZE / 1024 / 1024} MB"
-            )
+    logger.info(f"Processing {file_type.upper()} file: {reader.filename}, Content-Type: {content_type}")
+    return reader
 
-        # Parse JSON
-        try:
-            json_data = json.loads(contents.decode('utf-8'))
-        except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON: {e}")
-            raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
-
-        # Handle both single account and array of accounts
-        accounts_data = json_data if isinstance(json_data, list) else [json_data]
-
-        # Validate number of accounts
-        if len(accounts_data) > 1000:
-            logger.warning(f"Too many accounts: {len(accounts_data)}")
-            raise HTTPException(
-                status_code=400,
-                detail=f"Too many accounts. Maximum: 1000, got {len(accounts_data)}"
-            )
+async def batch_rows(rows: AsyncIterator[Any], too_many_message: str) -> AsyncIterator[List[Tuple[int, Any]]]:
+    """
+    Number rows and group them in batches of VALIDATION_CHUNK_SIZE
 
-        successful_accounts = []
-        failed_accounts = []
+    Args:
+        rows: The rows
+        too_many_message: The error message when there are more than MAX_IMPORT_ROWS rows
 
-        # Process each account
-        for account_data in accounts_data:
-            # Validate account data
-            validation_result = validate_account_data(account_data)
-            if not validation_result.valid:
-                logger.warning(f"Invalid account data: {validation_result.errors}")
-                failed_accounts.append(
-                    AccountValidationError(
-                        account_id=account_data.get("id"),
-                        errors=[
-                            ValidationErrorDetail(
-                                loc=error["field"].split("."),
-                                msg=error["message"],
-                                type="validation_error"
-                            ) for error in validation_result.errors
-                        ]
-                    )
-                )
-                continue
+    Yields:
+        The batches of rows, with their row numbers starting at 1
+    """
+    batch = []
+    row_number = 0
+    async for row in rows:
+        row_number += 1
 
-            # Process valid account data
-            result = process_account_data(account_data, current_user=current_user)
+        # Validate row count
+        if row_number > MAX_IMPORT_ROWS:
+            logger.warning(f"More than {MAX_IMPORT_ROWS} rows uploaded")
+            raise HTTPException(status_code=400, detail=too_many_message)
 
-            if result["success"]:
-                successful_accounts.append(result["account_id"])
-            else:
-                failed_accounts.append(
-                    AccountValidationError(
-                        account_id=result.get("account_id"),
-                        errors=result["errors"]
-                    )
-                )
+        batch.append((row_number, row))
+        if len(batch) >= VALIDATION_CHUNK_SIZE:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+async def read_json_accounts(reader: MultipartFileReader) -> AsyncIterator[Any]:
+    """
+    Parse the accounts of a JSON file as it is received
+
+    Args:
+        reader: The reader of the file
+
+    Yields:
+        The items of the array of accounts, or the single account
+    """
+    parser = IncrementalJsonArrayParser()
+    async for text in decode_chunks(reader.chunks()):
+        for account_data in parser.feed(text):
+            yield account_data
+
+    for account_data in parser.close():
+        yield account_data
+
+def check_csv_headers(headers: Optional[List[str]]) -> None:
+    """
+    Check that the CSV headers include the required fields
+
+    Args:
+        headers: The headers of the CSV file
+
+    Raises:
+        HTTPException: If the headers are missing or incomplete
+    """
+    logger.info(f"CSV headers found: {headers}")
+
+    if not headers:
+        logger.error("CSV file has no headers")
+        raise HTTPException(status_code=400, detail="CSV file has no headers")
+
+    missing_headers = [header for header in REQUIRED_CSV_HEADERS if header not in headers]
+    if missing_headers:
+        logger.warning(f"Missing required CSV headers: {missing_headers}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Missing required CSV headers: {', '.join(missing_headers)}"
+        )
+
+async def read_csv_rows(reader: MultipartFileReader) -> AsyncIterator[Dict[str, str]]:
+    """
+    Parse the rows of a CSV file as it is received, checking its headers first
+
+    Args:
+        reader: The reader of the file
+
+    Yields:
+        The rows, by column name
+    """
+    csv_reader = IncrementalCsvReader()
+    headers_checked = False
+
+    async for text in decode_chunks(reader.chunks()):
+        rows = csv_reader.feed(text)
+        if csv_reader.fieldnames is not None and not headers_checked:
+            check_csv_headers(csv_reader.fieldnames)
+            headers_checked = True
+        for row in rows:
+            yield row
+
+    rows = csv_reader.close()
+    if not headers_checked:
+        check_csv_headers(csv_reader.fieldnames)
+    for row in rows:
+        yield row
+
+@router.post("/json", response_model=UploadResponse, openapi_extra=_upload_request_body("JSON"))
+async def upload_json_file(request: Request, current_user = Depends(get_current_active_user)):
+    """
+    Upload a JSON file containing account data
+
+    The JSON file should contain an array of account objects or a single account object.
+    Each account object should follow the structure defined in the ReceivedData model.
+    The accounts are validated and imported while the file is received.
+    """
+    reader = await open_upload(request, "json")
+    upload = AccountUpload(current_user)
+
+    try:
+        # Validate and import the accounts
+        successful_accounts, failed_accounts = await import_batches(
+            batch_rows(
+                read_json_accounts(reader),
+                f"Too many accounts. Maximum: {MAX_IMPORT_ROWS}, got more than {MAX_IMPORT_ROWS}"
+            ),
+            upload
+        )
 
         # Prepare the response
         return UploadResponse(
             status="success",
             message="JSON file processed",
-            total_processed=len(accounts_data),
+            total_processed=upload.row_count,
             successful_count=len(successful_accounts),
             failed_count=len(failed_accounts),
             successful_accounts=successful_accounts,
@@ -377,11 +526,18 @@ async def upload_json_file(file: UploadFile = File(...), current_user = Depends(
         )
 
     except json.JSONDecodeError as e:
-        logger.error(f"Invalid JSON format: {e}")
+        logger.error(f"Invalid JSON: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {str(e)}")
+    except UnicodeDecodeError as e:
+        logger.error(f"Error decoding JSON file: {e}")
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid JSON format: {str(e)}"
+            detail="Error decoding JSON file. Please ensure the file is UTF-8 encoded."
         )
+    except ValueError as e:
+        # The upload is too large or malformed
+        logger.warning(f"Invalid upload: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
@@ -392,9 +548,11 @@ async def upload_json_file(file: UploadFile = File(...), current_user = Depends(
             status_code=500,
             detail=f"Error processing file: {str(e)}"
         )
+    finally:
+        await run_in_threadpool(upload.close)
 
-@router.post("/csv", response_model=UploadResponse)
-async def upload_csv_file(file: UploadFile = File(...), current_user = Depends(get_current_active_user)):
+@router.post("/csv", response_model=UploadResponse, openapi_extra=_upload_request_body("CSV"))
+async def upload_csv_file(request: Request, current_user = Depends(get_current_active_user)):
     """
     Upload a CSV file containing account data
 
@@ -403,150 +561,26 @@ async def upload_csv_file(file: UploadFile = File(...), current_user = Depends(g
     vault.address, vault.password, metadata.createdAt, metadata.sessionStart, metadata.guard
 
     Optional columns for steamguard: steamguard.deviceId, steamguard.shared_secret, etc.
+    The rows are validated and imported while the file is received.
     """
-    # Validate file type
-    if not file.filename.endswith('.csv'):
-        logger.warning(f"Invalid file format: {file.filename}")
-        raise HTTPException(status_code=400, detail="Invalid file format. Please upload a CSV file.")
-
-    # Validate content type
-    content_type = file.content_type
-    if content_type not in ALLOWED_FILE_TYPES['csv']:
-        logger.warning(f"Invalid content type: {content_type}")
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid content type: {content_type}. Allowed types: {', '.join(ALLOWED_FILE_TYPES['csv'])}"
-        )
+    reader = await open_upload(request, "csv")
+    upload = AccountUpload(current_user, convert=convert_csv_row_to_account_data)
 
     try:
-        # Log file information for debugging
-        logger.info(f"Processing CSV file: {file.filename}, Content-Type: {file.content_type}")
-
-        # Read the file
-        contents = await file.read()
-
-        # Validate file size
-        if len(contents) > MAX_FILE_SIZE:
-            logger.warning(f"File too large: {len(contents)} bytes")
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Maximum size: {MAX_FILE_SIZE / 1024 / 1024} MB"
-            )
-
-        # Parse CSV
-        try:
-            csv_text = contents.decode('utf-8')
-            logger.debug(f"CSV content preview: {csv_text[:200]}...")
-
-            csv_file = io.StringIO(csv_text)
-            csv_reader = csv.DictReader(csv_file)
-
-            # Validate CSV headers
-            required_headers = [
-                'id', 'user.username', 'user.password', 'email.address', 'email.password',
-                'vault.address', 'vault.password', 'metadata.createdAt', 'metadata.sessionStart', 'metadata.guard'
-            ]
-
-            headers = csv_reader.fieldnames
-            logger.info(f"CSV headers found: {headers}")
-
-            if not headers:
-                logger.error("CSV file has no headers")
-                raise HTTPException(status_code=400, detail="CSV file has no headers")
-
-            missing_headers = [header for header in required_headers if header not in headers]
-            if missing_headers:
-                logger.warning(f"Missing required CSV headers: {missing_headers}")
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Missing required CSV headers: {', '.join(missing_headers)}"
-                )
-        except UnicodeDecodeError as e:
-            logger.error(f"Error decoding CSV file: {e}")
-            raise HTTPException(status_code=400, detail="Error decoding CSV file. Please ensure the file is UTF-8 encoded.")
-
-        successful_accounts = []
-        failed_accounts = []
-        row_number = 0
-
-        # Process each row in the CSV
-        for row in csv_reader:
-            row_number += 1
-
-            # Validate row count
-            if row_number > 1000:
-                logger.warning(f"Too many rows in CSV file: {row_number}")
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Too many rows in CSV file. Maximum: 1000, got more than {row_number}"
-                )
-
-            # Convert CSV row to account data structure
-            try:
-                # Log the row data for debugging
-                logger.debug(f"Processing row {row_number}: {row}")
-
-                account_data = convert_csv_row_to_account_data(row)
-                logger.debug(f"Converted account data: {account_data}")
-
-                # Validate account data
-                validation_result = validate_account_data(account_data)
-                if not validation_result.valid:
-                    logger.warning(f"Invalid account data in row {row_number}: {validation_result.errors}")
-                    # Log more detailed validation errors
-                    for error in validation_result.errors:
-                        logger.warning(f"Validation error in field {error['field']}: {error['message']}")
-
-                    failed_accounts.append(
-                        AccountValidationError(
-                            account_id=account_data.get("id"),
-                            row_number=row_number,
-                            errors=[
-                                ValidationErrorDetail(
-                                    loc=error["field"].split("."),
-                                    msg=error["message"],
-                                    type="validation_error"
-                                ) for error in validation_result.errors
-                            ]
-                        )
-                    )
-                    continue
-
-                # Process valid account data
-                result = process_account_data(account_data, row_number, current_user=current_user)
-
-                if result["success"]:
-                    successful_accounts.append(result["account_id"])
-                else:
-                    failed_accounts.append(
-                        AccountValidationError(
-                            account_id=result.get("account_id"),
-                            row_number=row_number,
-                            errors=result["errors"]
-                        )
-                    )
-            except Exception as e:
-                logger.error(f"Error processing CSV row {row_number}: {e}")
-                logger.error(traceback.format_exc())
-
-                failed_accounts.append(
-                    AccountValidationError(
-                        row_number=row_number,
-                        errors=[
-                            ValidationErrorDetail(
-                                loc=["csv_row"],
-                                msg=f"Error processing CSV row: {str(e)}",
-                                type="csv_error"
-                            )
-                        ]
-                    )
-                )
+        # Validate and import the accounts
+        successful_accounts, failed_accounts = await import_batches(
+            batch_rows(
+                read_csv_rows(reader),
+                f"Too many rows in CSV file. Maximum: {MAX_IMPORT_ROWS}, got more than {MAX_IMPORT_ROWS}"
+            ),
+            upload
+        )
 
         # Prepare the response
         return UploadResponse(
             status="success",
             message="CSV file processed",
-            total_processed=row_number,
+            total_processed=upload.row_count,
             successful_count=len(successful_accounts),
             failed_count=len(failed_accounts),
             successful_accounts=successful_accounts,
@@ -565,6 +599,10 @@ async def upload_csv_file(file: UploadFile = File(...), current_user = Depends(g
             status_code=400,
             detail=f"CSV parsing error: {str(e)}"
         )
+    except ValueError as e:
+        # The upload is too large or malformed
+        logger.warning(f"Invalid upload: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
@@ -575,6 +613,8 @@ async def upload_csv_file(file: UploadFile = File(...), current_user = Depends(g
             status_code=500,
             detail=f"Error processing file: {str(e)}"
         )
+    finally:
+        await run_in_threadpool(upload.close)
 
 def convert_csv_row_to_account_data(row: Dict[str, str]) -> Dict[str, Any]:
     """
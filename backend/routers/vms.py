@@ -11,6 +11,7 @@ from pydantic import BaseModel
 from datetime import datetime
 from db import get_db_connection, get_user_db_connection
 from db.rls_context import rls_context
+from db.pagination import InvalidCursorError
 from db.repositories.vms import VMRepository
 from db.repositories.proxmox_nodes import ProxmoxNodeRepository
 from routers.auth import get_current_user
@@ -52,9 +53,11 @@ class VMResponse(VMBase):
 
 class VMListResponse(BaseModel):
     vms: List[VMResponse]
-    total: int
+    total: Optional[int] = None
+    total_estimated: bool = False
     limit: int
     offset: int
+    next_cursor: Optional[str] = None
 
 @router.get("/", response_model=VMListResponse)
 async def get_vms(
@@ -62,21 +65,30 @@ async def get_vms(
     offset: int = Query(0, ge=0),
     search: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="The next_cursor of the previous page, instead of an offset"),
+    count: str = Query("exact", description="How to count the total: exact, estimate or none",
+                       pattern="^(exact|estimate|none)$"),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Get a list of virtual machines with pagination and filtering.
     Uses Row-Level Security to ensure users can only see their own VMs.
+
+    Pages are fetched from the next_cursor of the previous page in constant time,
+    while an offset is kept for the clients that jump to a page.
     """
     # Use the repository pattern with RLS context
     vm_repo = VMRepository(user_id=current_user["id"], user_role=current_user["role"])
 
     try:
         # Get VMs with Proxmox node names
-        result = vm_repo.get_vms_with_proxmox_node_name(limit, offset, search, status)
+        result = vm_repo.get_vms_with_proxmox_node_name(limit, offset, search, status,
+                                                       cursor=cursor, count=count)
 
         return result
 
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error retrieving VMs: {e}")
         raise HTTPException(status_code=500, detail=f"Error retrieving VMs: {str(e)}")
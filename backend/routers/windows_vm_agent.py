@@ -4,9 +4,11 @@ Windows VM Agent API endpoints.
 This module provides API endpoints for Windows VM agents to retrieve configuration
 and report status.
 """
+import json
 import logging
+import zlib
 from typing import Dict, Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Request
 from pydantic import BaseModel
 import secrets
 
@@ -63,6 +65,11 @@ class AgentInfoResponse(BaseModel):
     created_at: str
     updated_at: str
 
+# Limits of POST /windows-vm-agent/logs/batch
+MAX_AGENT_LOG_BATCH_SIZE = 5000
+MAX_AGENT_LOG_BATCH_BYTES = 16 * 1024 * 1024  # after decompression
+MAX_AGENT_LOG_BATCH_BODY_BYTES = 16 * 1024 * 1024  # as received
+
 # Helper functions
 def generate_api_key() -> str:
     """Generate a random API key."""
@@ -98,18 +105,18 @@ async def get_account_config(
 
     try:
         # Verify API key
-        agent = agent_repo.verify_api_key(vm_id, api_key)
+        agent = await agent_repo.verify_api_key_async(vm_id, api_key)
 
         if not agent:
             logger.warning(f"Invalid API key for VM: {vm_id}")
             raise HTTPException(status_code=401, detail="Invalid API key")
 
         # Update last_seen timestamp
-        agent_repo.update_last_seen(vm_id)
+        await agent_repo.update_last_seen_async(vm_id)
 
         # Get the VM to check ownership
         vm_repo = VMRepository(user_id=agent["owner_id"], user_role="user")
-        vm = vm_repo.get_vm_by_vmid(vm_id)
+        vm = await vm_repo.get_vm_by_vmid_async(vm_id)
 
         if not vm:
             logger.warning(f"VM not found: {vm_id}")
@@ -118,7 +125,7 @@ async def get_account_config(
         # Check if the account belongs to the agent's owner
         # Use the agent's owner context to get the account
         account_repo = AccountRepository(user_id=agent["owner_id"], user_role="user")
-        account = account_repo.get_account_by_id(account_id)
+        account = await account_repo.get_account_by_id_async(account_id)
 
         if not account:
             logger.warning(f"Account not found: {account_id}")
@@ -126,7 +133,7 @@ async def get_account_config(
 
         # Get proxy settings for the account
         # This is a placeholder - implement actual logic to get proxy settings
-        proxy_settings = account_repo.get_account_proxy_settings(account_id)
+        proxy_settings = await account_repo.get_account_proxy_settings_async(account_id)
 
         # Return the configuration
         return {
@@ -167,7 +174,7 @@ async def update_agent_status(
 
     try:
         # Verify API key
-        agent = agent_repo.verify_api_key(status_update.vm_id, api_key)
+        agent = await agent_repo.verify_api_key_async(status_update.vm_id, api_key)
 
         if not agent:
             logger.warning(f"Invalid API key for VM: {status_update.vm_id}")
@@ -177,7 +184,7 @@ async def update_agent_status(
         owner_agent_repo = WindowsVMAgentRepository(user_id=agent["owner_id"], user_role="user")
 
         # Update agent status
-        success = owner_agent_repo.update_status(
+        success = await owner_agent_repo.update_status_async(
             status_update.vm_id,
             status_update.status,
             status_update.ip_address,
@@ -311,6 +318,120 @@ async def register_agent(
         logger.error(f"Error registering agent: {e}")
         raise HTTPException(status_code=500, detail=f"Error registering agent: {str(e)}")
 
+def _get_log_vm_id(log_data: Dict[str, Any]) -> str:
+    """Get the VM identifier an agent log entry was sent from."""
+    return ((log_data.get("details") or {}).get("vm_info") or {}).get("vm_identifier", "unknown")
+
+def _build_agent_log_entry(log_data: Dict[str, Any], vm_id: str, owner_id: int) -> Dict[str, Any]:
+    """
+    Build the LogRepository arguments of a log entry sent by an agent.
+
+    Args:
+        log_data (Dict[str, Any]): The log entry sent by the agent
+        vm_id (str): The VM identifier of the agent
+        owner_id (int): The owner of the agent
+
+    Returns:
+        Dict[str, Any]: The arguments of LogRepository.add_log()
+    """
+    return {
+        "message": log_data.get("message", "No message provided"),
+        "level": log_data.get("level", "INFO"),
+        "category": log_data.get("category", "windows_vm_agent"),
+        "source": log_data.get("source", "windows_vm_agent"),
+        "details": log_data.get("details", {}),
+        "entity_type": log_data.get("entity_type", "vm"),
+        "entity_id": log_data.get("entity_id", vm_id),
+        "user_id": owner_id,
+        "owner_id": owner_id,
+        "timestamp": log_data.get("timestamp")
+    }
+
+async def _read_request_body(request: Request, limit: int) -> bytes:
+    """
+    Read the body of a request without buffering more than the limit.
+
+    Bodies announcing a larger Content-Length are rejected before anything is read.
+
+    Args:
+        request (Request): The request
+        limit (int): The maximum size of the body in bytes, as received
+
+    Returns:
+        bytes: The body
+
+    Raises:
+        HTTPException: If the body exceeds the limit
+    """
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            announced = int(content_length)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+        if announced > limit:
+            raise HTTPException(status_code=413, detail="Log batch is too large")
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > limit:
+            raise HTTPException(status_code=413, detail="Log batch is too large")
+
+    return bytes(body)
+
+def _read_log_batch(body: bytes, content_encoding: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Decode the body of a batch of agent log entries.
+
+    The body is a JSON array of log entries, optionally gzip-compressed.
+
+    Args:
+        body (bytes): The request body
+        content_encoding (Optional[str]): The Content-Encoding header of the request
+
+    Returns:
+        List[Dict[str, Any]]: The log entries
+
+    Raises:
+        HTTPException: If the body cannot be decoded or exceeds the batch limits
+    """
+    content_encoding = (content_encoding or "identity").lower()
+
+    if content_encoding == "gzip":
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            data = decompressor.decompress(body, MAX_AGENT_LOG_BATCH_BYTES)
+        except zlib.error as e:
+            raise HTTPException(status_code=400, detail=f"Invalid gzip body: {e}")
+
+        if decompressor.unconsumed_tail:
+            raise HTTPException(status_code=413, detail="Log batch is too large")
+        if not decompressor.eof:
+            raise HTTPException(status_code=400, detail="Invalid gzip body: truncated")
+    elif content_encoding == "identity":
+        if len(body) > MAX_AGENT_LOG_BATCH_BYTES:
+            raise HTTPException(status_code=413, detail="Log batch is too large")
+        data = body
+    else:
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {content_encoding}")
+
+    try:
+        logs = json.loads(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+
+    if not isinstance(logs, list) or not all(isinstance(log_data, dict) for log_data in logs):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of log entries")
+
+    if len(logs) > MAX_AGENT_LOG_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many log entries: {len(logs)} (maximum {MAX_AGENT_LOG_BATCH_SIZE})"
+        )
+
+    return logs
+
 @router.post("/logs", response_model=Dict[str, Any])
 async def create_log(
     log_data: dict = Body(..., description="Log data"),
@@ -330,17 +451,17 @@ async def create_log(
         agent_repo = WindowsVMAgentRepository(user_id=1, user_role="admin")
 
         # Extract VM ID from log data if available, otherwise use a placeholder
-        vm_id = log_data.get("details", {}).get("vm_info", {}).get("vm_identifier", "unknown")
+        vm_id = _get_log_vm_id(log_data)
 
         # Verify API key
-        agent = agent_repo.verify_api_key(vm_id, api_key)
+        agent = await agent_repo.verify_api_key_async(vm_id, api_key)
 
         if not agent:
             logger.warning(f"Invalid API key for VM: {vm_id}")
             raise HTTPException(status_code=401, detail="Invalid API key")
 
         # Update last_seen timestamp
-        agent_repo.update_last_seen(vm_id)
+        await agent_repo.update_last_seen_async(vm_id)
 
         # Import the log repository
         from db.repositories.logs import LogRepository
@@ -348,29 +469,8 @@ async def create_log(
         # Create log repository with the agent's owner context
         log_repo = LogRepository(user_id=agent["owner_id"], user_role="user")
 
-        # Extract log data
-        message = log_data.get("message", "No message provided")
-        level = log_data.get("level", "INFO")
-        category = log_data.get("category", "windows_vm_agent")
-        source = log_data.get("source", "windows_vm_agent")
-        details = log_data.get("details", {})
-        entity_type = log_data.get("entity_type", "vm")
-        entity_id = log_data.get("entity_id", vm_id)
-        timestamp = log_data.get("timestamp")
-
         # Add log entry
-        log = log_repo.add_log(
-            message=message,
-            level=level,
-            category=category,
-            source=source,
-            details=details,
-            entity_type=entity_type,
-            entity_id=entity_id,
-            user_id=agent["owner_id"],
-            owner_id=agent["owner_id"],
-            timestamp=timestamp
-        )
+        log = await log_repo.add_log_async(**_build_agent_log_entry(log_data, vm_id, agent["owner_id"]))
 
         if not log:
             raise HTTPException(status_code=500, detail="Failed to create log entry")
@@ -383,6 +483,65 @@ async def create_log(
         logger.error(f"Error creating log entry: {e}")
         raise HTTPException(status_code=500, detail=f"Error creating log entry: {str(e)}")
 
+@router.post("/logs/batch", response_model=Dict[str, Any])
+async def create_logs_batch(
+    request: Request,
+    api_key: str = Query(..., description="API key for authentication"),
+    vm_id: Optional[str] = Query(None, description="VM identifier of the agent (defaults to the one of the first entry)")
+):
+    """
+    Create many log entries from a Windows VM agent.
+
+    The body is a JSON array of log entries, optionally sent with Content-Encoding: gzip.
+    The agent is authenticated once for the batch and the entries are inserted in one transaction.
+    """
+    try:
+        # Validate input parameters
+        if not api_key:
+            raise HTTPException(status_code=400, detail="Missing required parameter: api_key")
+
+        body = await _read_request_body(request, MAX_AGENT_LOG_BATCH_BODY_BYTES)
+        logs = _read_log_batch(body, request.headers.get("content-encoding"))
+
+        if vm_id is None:
+            vm_id = _get_log_vm_id(logs[0]) if logs else "unknown"
+
+        # Use the repository pattern with admin role to verify API key
+        agent_repo = WindowsVMAgentRepository(user_id=1, user_role="admin")
+
+        # Verify API key once for the whole batch
+        agent = await agent_repo.verify_api_key_async(vm_id, api_key)
+
+        if not agent:
+            logger.warning(f"Invalid API key for VM: {vm_id}")
+            raise HTTPException(status_code=401, detail="Invalid API key")
+
+        # Update last_seen timestamp
+        await agent_repo.update_last_seen_async(vm_id)
+
+        if not logs:
+            return {"success": True, "inserted": 0, "message": "No log entries to create"}
+
+        # Import the log repository
+        from db.repositories.logs import LogRepository
+
+        # Create log repository with the agent's owner context
+        log_repo = LogRepository(user_id=agent["owner_id"], user_role="user")
+
+        entries = [_build_agent_log_entry(log_data, vm_id, agent["owner_id"]) for log_data in logs]
+        inserted = await log_repo.add_logs_bulk_async(entries)
+
+        if not inserted:
+            raise HTTPException(status_code=500, detail="Failed to create log entries")
+
+        return {"success": True, "inserted": inserted, "message": f"{inserted} log entries created successfully"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating log entries: {e}")
+        raise HTTPException(status_code=500, detail=f"Error creating log entries: {str(e)}")
+
 @router.get("/status/{vm_id}", response_model=AgentInfoResponse)
 async def get_agent_status(
     vm_id: str,
@@ -401,7 +560,7 @@ async def get_agent_status(
 
     try:
         # Get the agent
-        agent = agent_repo.get_agent_by_vm_id(vm_id)
+        agent = await agent_repo.get_agent_by_vm_id_async(vm_id)
 
         if not agent:
             logger.warning(f"Agent not found for VM: {vm_id}")
@@ -435,7 +594,7 @@ async def get_agents(
 
     try:
         # Get agents with pagination and filtering
-        result = agent_repo.get_agents(limit, offset, search, status)
+        result = await agent_repo.get_agents_async(limit, offset, search, status)
         return result
 
     except Exception as e:
@@ -47,11 +47,11 @@ def check_metrics():
             # Get sample of metrics
             if data_count > 0:
                 cursor.execute("""
-                    SELECT m.name, t.timestamp, 
-                        COALESCE(t.value_float, t.value_int::float, t.value_bool::int::float, 0) as value,
-                        t.entity_type, t.entity_id, t.owner_id
+                    SELECT m.name, t.timestamp, t.value,
+                        s.entity_type, s.entity_id, s.owner_id
                     FROM public.timeseries_data t
-                    JOIN public.metrics_definitions m ON t.metric_id = m.id
+                    JOIN public.timeseries_series s ON t.series_id = s.id
+                    JOIN public.metrics_definitions m ON s.metric_id = m.id
                     ORDER BY t.timestamp DESC
                     LIMIT 10
                 """)
@@ -78,11 +78,13 @@ def mock_db_connection():
     mock_conn = MagicMock()
     mock_cursor = MagicMock()
     mock_conn.cursor.return_value = mock_cursor
+    # get_db_connection() is used as a context manager yielding the connection
+    mock_conn.__enter__.return_value = mock_conn
 
     # Mock the get_db_connection function
     with patch("db.connection.get_db_connection", return_value=mock_conn):
         # Mock the get_secure_db function
-        with patch("db.connection.get_secure_db", return_value=mock_conn):
+        with patch("db.secure_access.get_secure_db", return_value=mock_conn):
             yield mock_conn
 
 # Test database connection
@@ -0,0 +1,146 @@
+"""
+Integration tests for the bulk insert path of LogRepository.
+"""
+
+import threading
+import time
+import uuid
+import pytest
+import pytest_asyncio
+from db.connection import get_db_connection
+from db.async_connection import close_async_connection_pool
+from db.repositories import logs as logs_repository
+from db.repositories.logs import LogRepository, clear_log_lookup_cache
+
+def _count_logs(trace_id):
+    """Count the log entries of a test run by level name."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT ll.name, lc.name, count(*)
+            FROM logs l
+            LEFT JOIN logs_levels ll ON l.level_id = ll.id
+            LEFT JOIN logs_categories lc ON l.category_id = lc.id
+            WHERE l.trace_id = %s
+            GROUP BY ll.name, lc.name
+        """, (trace_id,))
+        rows = cursor.fetchall()
+        cursor.close()
+    return {(level, category): count for level, category, count in rows}
+
+@pytest.fixture
+def trace_id():
+    """Mark the log entries and lookup names of a test, and delete them afterwards."""
+    trace_id = f"bulk-{uuid.uuid4().hex}"
+    clear_log_lookup_cache()
+
+    yield trace_id
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM logs WHERE trace_id = %s", (trace_id,))
+        cursor.execute("DELETE FROM logs_categories WHERE name LIKE %s", (f"{trace_id}%",))
+        conn.commit()
+        cursor.close()
+    clear_log_lookup_cache()
+
+@pytest_asyncio.fixture
+async def async_pool():
+    """Close the async pool after each test so it is not shared across event loops."""
+    yield
+    await close_async_connection_pool()
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestLogRepositoryBulk:
+    """Tests for LogRepository.add_logs_bulk."""
+
+    def test_add_logs_bulk(self, trace_id):
+        """Test that entries are inserted with their lookups resolved like add_log_entry()."""
+        repo = LogRepository(user_id=1, user_role="admin")
+        entries = [
+            {"message": f"bulk {i}", "level": "WARNING" if i % 2 else "NO_SUCH_LEVEL",
+             "category": f" {trace_id} ", "source": "backend", "details": {"i": i}, "trace_id": trace_id}
+            for i in range(10)
+        ]
+
+        assert repo.add_logs_bulk(entries) == 10
+
+        # New categories are created, unknown levels fall back to INFO
+        assert _count_logs(trace_id) == {("WARNING", trace_id): 5, ("INFO", trace_id): 5}
+        assert logs_repository._log_lookup_ids["logs_categories"][trace_id] > 0
+
+    def test_add_logs_bulk_return_ids(self, trace_id):
+        """Test that the ids of the inserted entries can be returned."""
+        repo = LogRepository(user_id=1, user_role="admin")
+
+        ids = repo.add_logs_bulk([{"message": "first", "trace_id": trace_id},
+                                  {"message": "second", "trace_id": trace_id}], return_ids=True)
+
+        assert len(ids) == 2
+        assert repo.get_log_by_id(ids[1], with_rls=False)["message"] == "second"
+
+    def test_add_logs_bulk_is_atomic(self, trace_id):
+        """Test that a failing entry rolls back the batch and the lookups it created."""
+        repo = LogRepository(user_id=1, user_role="admin")
+        entries = [{"message": "valid", "category": trace_id, "trace_id": trace_id},
+                   {"message": None, "category": trace_id, "trace_id": trace_id}]
+
+        assert repo.add_logs_bulk(entries) == 0
+        assert _count_logs(trace_id) == {}
+        assert trace_id not in logs_repository._log_lookup_ids["logs_categories"]
+
+        # The category is created again by the next batch
+        assert repo.add_logs_bulk(entries[:1]) == 1
+        assert _count_logs(trace_id) == {("INFO", trace_id): 1}
+
+    def test_add_logs_bulk_concurrent_lookup(self, trace_id):
+        """Test that a lookup name inserted concurrently by another session is resolved."""
+        repo = LogRepository(user_id=1, user_role="admin")
+        result = {}
+
+        def add_logs():
+            result["count"] = repo.add_logs_bulk([{"message": "raced", "category": trace_id, "trace_id": trace_id}])
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO logs_categories (name) VALUES (%s) RETURNING id", (trace_id,))
+            category_id = cursor.fetchone()[0]
+
+            # The bulk insert waits for this transaction on the conflicting name
+            thread = threading.Thread(target=add_logs)
+            thread.start()
+            time.sleep(0.5)
+            conn.commit()
+            cursor.close()
+            thread.join()
+
+        assert result["count"] == 1
+        assert _count_logs(trace_id) == {("INFO", trace_id): 1}
+        assert logs_repository._log_lookup_ids["logs_categories"][trace_id] == category_id
+
+@pytest.mark.integration
+@pytest.mark.db
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("async_pool")
+class TestLogRepositoryBulkAsync:
+    """Tests for LogRepository.add_logs_bulk_async."""
+
+    async def test_add_logs_bulk_async(self, trace_id):
+        """Test that entries are copied in with their lookups resolved."""
+        repo = LogRepository(user_id=1, user_role="admin")
+        entries = [{"message": f"copy {i}", "level": "ERROR", "category": trace_id,
+                    "details": {"i": i}, "trace_id": trace_id} for i in range(10)]
+
+        assert await repo.add_logs_bulk_async(entries) == 10
+        assert _count_logs(trace_id) == {("ERROR", trace_id): 10}
+
+    async def test_add_logs_bulk_async_return_ids(self, trace_id):
+        """Test that the ids of the inserted entries can be returned."""
+        repo = LogRepository(user_id=1, user_role="admin")
+
+        ids = await repo.add_logs_bulk_async([{"message": f"row {i}", "trace_id": trace_id} for i in range(3)],
+                                             return_ids=True)
+
+        assert len(ids) == 3
+        assert (await repo.get_log_by_id_async(ids[2], with_rls=False))["message"] == "row 2"
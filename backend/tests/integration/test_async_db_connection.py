@@ -0,0 +1,125 @@
+"""
+Integration tests for the async database connection pool.
+"""
+
+import pytest
+import pytest_asyncio
+import psycopg
+from db.async_connection import (
+    get_async_connection, return_async_connection, get_async_db_connection,
+    get_async_pool_stats, check_async_database_health, close_async_connection_pool
+)
+from db.user_connection import get_async_user_db_connection
+from db.rls_context import RLS_MODE_TRANSACTION
+from db.access import DatabaseAccess
+from config import Config
+
+@pytest_asyncio.fixture
+async def async_pool():
+    """Close the async pool after each test so it is not shared across event loops."""
+    yield
+    await close_async_connection_pool()
+
+@pytest.mark.integration
+@pytest.mark.db
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("async_pool")
+class TestAsyncDbConnection:
+    """Tests for async database connection."""
+
+    async def test_get_async_connection(self):
+        """Test get_async_connection function."""
+        conn = await get_async_connection()
+
+        assert conn is not None
+        assert isinstance(conn, psycopg.AsyncConnection)
+        assert not conn.closed
+
+        await return_async_connection(conn)
+
+    async def test_get_async_db_connection(self):
+        """Test get_async_db_connection context manager."""
+        async with get_async_db_connection() as conn:
+            assert conn is not None
+
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT 1")
+                result = await cursor.fetchone()
+
+            assert result == (1,)
+
+    async def test_client_side_binding(self):
+        """Test that psycopg2-style placeholders inside literals still work."""
+        async with get_async_db_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT NOW() - INTERVAL '%s days' < NOW()", (1,))
+                result = await cursor.fetchone()
+
+            assert result == (True,)
+
+    async def test_async_user_db_connection_sets_rls_context(self):
+        """Test get_async_user_db_connection sets and clears the RLS context."""
+        async with get_async_user_db_connection(user_id=1, user_role="admin") as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT current_setting('app.current_user_id', TRUE), current_setting('app.current_user_role', TRUE)"
+                )
+                result = await cursor.fetchone()
+
+            assert result == ("1", "admin")
+
+        async with get_async_db_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT current_setting('app.current_user_id', TRUE)")
+                result = await cursor.fetchone()
+
+            assert result[0] in (None, "")
+
+    async def test_transaction_mode_context_survives_commit(self, monkeypatch):
+        """Test that a transaction-local context is set again after a commit in the block."""
+        monkeypatch.setattr(Config, "RLS_CONTEXT_MODE", RLS_MODE_TRANSACTION)
+
+        async with get_async_user_db_connection(user_id=2, user_role="user") as conn:
+            await conn.commit()
+
+            async with conn.cursor() as cursor:
+                await cursor.execute(
+                    "SELECT current_setting('app.current_user_id', TRUE), current_setting('app.current_user_role', TRUE)"
+                )
+                result = await cursor.fetchone()
+
+            assert result == ("2", "user")
+
+        async with get_async_db_connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT current_setting('app.current_user_id', TRUE)")
+                result = await cursor.fetchone()
+
+            assert result[0] in (None, "")
+
+    async def test_database_access_async(self):
+        """Test the async DatabaseAccess query methods."""
+        db_access = DatabaseAccess(user_id=1, user_role="admin")
+
+        rows = await db_access.execute_query_async("SELECT 1 AS value")
+        assert rows == [{"value": 1}]
+
+        row = await db_access.execute_query_single_async("SELECT %s::int AS value", (2,))
+        assert row == {"value": 2}
+
+    async def test_get_async_pool_stats(self):
+        """Test get_async_pool_stats function."""
+        async with get_async_db_connection():
+            stats = get_async_pool_stats()
+
+            assert stats["pool_size"] >= 1
+            assert stats["used_connections"] >= 1
+            assert stats["max_connections"] >= stats["min_connections"]
+
+    async def test_check_async_database_health(self):
+        """Test check_async_database_health function."""
+        health = await check_async_database_health()
+
+        assert health["healthy"] is True
+        assert health["connection_health"]["can_connect"] is True
+        assert "simple_query_time" in health["query_performance"]
@@ -0,0 +1,137 @@
+"""
+Integration tests for the cross-process query cache invalidation bus.
+"""
+
+import json
+import select
+import time
+import pytest
+import psycopg2
+import psycopg2.extensions
+from db import cache_invalidation
+from db.access import DatabaseAccess
+from db.connection import get_db_connection
+from db.cache_invalidation import (
+    get_origin, publish_cache_invalidation, start_cache_invalidation_listener,
+    stop_cache_invalidation_listener, get_cache_invalidation_stats
+)
+from db.query_cache import generate_cache_key, get_from_cache, put_in_cache, invalidate_cache
+from config import Config
+
+TEST_CHANNEL = "query_cache_invalidation_test"
+
+def _wait_until(predicate, timeout=5.0):
+    """Wait until a predicate is true, returning its last value."""
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.05)
+    return predicate()
+
+def _listen():
+    """Open a connection listening on the test channel."""
+    conn = psycopg2.connect(
+        host=Config.DB_HOST, port=Config.DB_PORT, dbname=Config.DB_NAME,
+        user=Config.DB_USER, password=Config.DB_PASS
+    )
+    conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    conn.cursor().execute(f"LISTEN {TEST_CHANNEL}")
+    return conn
+
+def _receive(conn, timeout=2.0):
+    """Receive the payloads notified to a listening connection."""
+    payloads = []
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if select.select([conn], [], [], 0.1) != ([], [], []):
+            conn.poll()
+            while conn.notifies:
+                payloads.append(json.loads(conn.notifies.pop(0).payload))
+            if payloads:
+                break
+    return payloads
+
+def _notify(payload):
+    """Send a notification on the test channel from another connection."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_notify(%s, %s)", (TEST_CHANNEL, json.dumps(payload)))
+        conn.commit()
+        cursor.close()
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestCacheInvalidation:
+    """Tests for the query cache invalidation bus."""
+
+    @pytest.fixture(autouse=True)
+    def bus(self, monkeypatch):
+        """Use a test channel and a scratch table."""
+        monkeypatch.setattr(Config, "QUERY_CACHE_NOTIFY_CHANNEL", TEST_CHANNEL)
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("CREATE TABLE IF NOT EXISTS cache_bus_test (id integer)")
+            conn.commit()
+            cursor.close()
+        invalidate_cache()
+
+        yield
+
+        if cache_invalidation.is_cache_invalidation_enabled():
+            stop_cache_invalidation_listener()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DROP TABLE IF EXISTS cache_bus_test")
+            conn.commit()
+            cursor.close()
+        invalidate_cache()
+
+    def test_write_publishes_written_tables(self, monkeypatch):
+        """Test that a committed write notifies the tables it wrote."""
+        monkeypatch.setattr(cache_invalidation, "_bus_enabled", True)
+        listener = _listen()
+        try:
+            access = DatabaseAccess()
+            assert access.execute_command("INSERT INTO cache_bus_test (id) VALUES (%s)", (1,), with_rls=False) == 1
+
+            assert _receive(listener) == [{"origin": get_origin(), "tables": ["cache_bus_test"]}]
+        finally:
+            listener.close()
+
+    def test_rolled_back_write_publishes_nothing(self, monkeypatch):
+        """Test that notifications are only delivered with the write they belong to."""
+        monkeypatch.setattr(cache_invalidation, "_bus_enabled", True)
+        listener = _listen()
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("INSERT INTO cache_bus_test (id) VALUES (1)")
+                publish_cache_invalidation(cursor, ["cache_bus_test"])
+                conn.rollback()
+                cursor.close()
+
+            assert _receive(listener, timeout=0.5) == []
+        finally:
+            listener.close()
+
+    def test_listener_evicts_tables_written_by_other_processes(self):
+        """Test that the listener applies the invalidations of other processes only."""
+        start_cache_invalidation_listener()
+        assert _wait_until(lambda: get_cache_invalidation_stats()["connected"])
+
+        written_key = generate_cache_key("SELECT * FROM cache_bus_test", None, ("1", "admin"))
+        other_key = generate_cache_key("SELECT * FROM accounts", None, ("1", "admin"))
+        put_in_cache(written_key, "value")
+        put_in_cache(other_key, "value")
+
+        # Our own messages were applied by the write already
+        received = get_cache_invalidation_stats()["received"]
+        _notify({"origin": get_origin(), "tables": ["cache_bus_test"]})
+        assert _wait_until(lambda: get_cache_invalidation_stats()["received"] > received)
+        assert get_from_cache(written_key) is not None
+
+        _notify({"origin": "other-host:1:worker", "tables": ["cache_bus_test"]})
+        assert _wait_until(lambda: get_from_cache(written_key) is None)
+        assert get_from_cache(other_key) is not None
+
+        stop_cache_invalidation_listener()
+        assert not cache_invalidation.is_cache_invalidation_enabled()
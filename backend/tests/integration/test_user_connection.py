@@ -4,10 +4,18 @@ Integration tests for user database connection.
 
 import pytest
 import psycopg2
+import threading
 from db.user_connection import (
     get_user_db_connection, get_user_db_connection_with_retries,
     get_user_connection_info, set_rls_context, clear_rls_context
 )
+from db.connection import get_db_connection
+from db.rls_context import (
+    RLS_MODE_SESSION, RLS_MODE_TRANSACTION, RLS_MODES, RLS_CONTEXT_UNKNOWN,
+    apply_connection_rls_context, reset_connection_rls_context,
+    get_connection_rls_context, rls_context_stats
+)
+from config import Config
 
 @pytest.mark.integration
 @pytest.mark.db
@@ -119,3 +127,231 @@ class TestUserConnection:
         finally:
             # Close the connection
             conn.close()
+
+class CountingCursor:
+    """Cursor wrapper that counts the statements sent to the server."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.statements = 0
+
+    def execute(self, query, params=None):
+        self.statements += 1
+        return self.cursor.execute(query, params)
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+def _get_rls_settings(conn):
+    """Read the RLS variables of a connection."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT current_setting('app.current_user_id', TRUE), current_setting('app.current_user_role', TRUE)")
+    result = cursor.fetchone()
+    cursor.close()
+    conn.rollback()
+    return result
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestRlsContextModes:
+    """Tests for the session and transaction RLS context modes."""
+
+    @pytest.fixture
+    def transaction_mode(self, monkeypatch):
+        """Switch the RLS context to transaction mode."""
+        monkeypatch.setattr(Config, "RLS_CONTEXT_MODE", RLS_MODE_TRANSACTION)
+
+    def test_set_rls_context_single_round_trip(self):
+        """Test that setting and clearing the context take one statement each."""
+        with get_db_connection() as conn:
+            cursor = CountingCursor(conn.cursor())
+
+            assert set_rls_context(cursor, 2, "user", mode=RLS_MODE_SESSION) is True
+            assert cursor.statements == 1
+            assert _get_rls_settings(conn) == ("2", "user")
+
+            assert clear_rls_context(cursor, mode=RLS_MODE_SESSION) is True
+            assert cursor.statements == 2
+            assert _get_rls_settings(conn) == ("", "")
+
+    def test_clear_rls_context_transaction_mode_sends_nothing(self):
+        """Test that a transaction-local context needs no clearing statement."""
+        with get_db_connection() as conn:
+            cursor = CountingCursor(conn.cursor())
+
+            assert set_rls_context(cursor, 2, "user", mode=RLS_MODE_TRANSACTION) is True
+            assert clear_rls_context(cursor, mode=RLS_MODE_TRANSACTION) is True
+            assert cursor.statements == 1
+            conn.rollback()
+
+    def test_session_mode_clears_context_after_commit(self, monkeypatch):
+        """Test that a session context does not survive a caller's commit."""
+        monkeypatch.setattr(Config, "RLS_CONTEXT_CACHE", False)
+
+        with get_user_db_connection(user_id=2, user_role="user") as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.commit()
+
+            assert _get_rls_settings(conn) == ("2", "user")
+
+        # The connection is back in the pool but still open
+        assert _get_rls_settings(conn) == ("", "")
+
+    def test_transaction_mode_context_survives_commit(self, transaction_mode):
+        """Test that a transaction-local context is set again after a commit or rollback in the block."""
+        with get_user_db_connection(user_id=2, user_role="user") as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT current_setting('app.current_user_id', TRUE)")
+            assert cursor.fetchone()[0] == "2"
+            cursor.close()
+            conn.commit()
+
+            assert _get_rls_settings(conn) == ("2", "user")
+
+            conn.rollback()
+
+            assert _get_rls_settings(conn) == ("2", "user")
+
+        # The context ends with the connection's last transaction
+        assert _get_rls_settings(conn) in ((None, None), ("", ""))
+        conn.commit()
+        assert _get_rls_settings(conn) in ((None, None), ("", ""))
+
+    @pytest.mark.parametrize("mode", RLS_MODES)
+    def test_rls_context_does_not_leak_to_next_checkout(self, mode, monkeypatch):
+        """Test that a plain connection never sees a previous user's context."""
+        monkeypatch.setattr(Config, "RLS_CONTEXT_MODE", mode)
+
+        for _ in range(5):
+            with get_user_db_connection(user_id=2, user_role="user") as conn:
+                conn.commit()
+
+            with get_db_connection() as conn:
+                assert _get_rls_settings(conn) in ((None, None), ("", ""))
+
+@pytest.mark.integration
+@pytest.mark.db
+class TestRlsContextCache:
+    """Tests for the per-connection RLS context cache."""
+
+    @pytest.fixture(autouse=True)
+    def cache_enabled(self, monkeypatch):
+        """Enable the RLS context cache in session mode."""
+        monkeypatch.setattr(Config, "RLS_CONTEXT_MODE", RLS_MODE_SESSION)
+        monkeypatch.setattr(Config, "RLS_CONTEXT_CACHE", True)
+
+    def test_same_context_is_not_sent_again(self):
+        """Test that re-applying the context a connection carries is free."""
+        with get_db_connection() as conn:
+            try:
+                sets = rls_context_stats["sets"]
+                hits = rls_context_stats["hits"]
+
+                assert apply_connection_rls_context(conn, 1, "admin") is True
+                assert apply_connection_rls_context(conn, "1", "admin") is True
+
+                assert rls_context_stats["sets"] == sets + 1
+                assert rls_context_stats["hits"] == hits + 1
+                assert get_connection_rls_context(conn) == ("1", "admin")
+                assert _get_rls_settings(conn) == ("1", "admin")
+            finally:
+                reset_connection_rls_context(conn)
+
+    def test_context_switch_is_committed(self):
+        """Test that switching users is committed and survives the caller's rollback."""
+        with get_db_connection() as conn:
+            try:
+                assert apply_connection_rls_context(conn, 2, "user") is True
+                assert apply_connection_rls_context(conn, 3, "user") is True
+                conn.rollback()
+
+                assert _get_rls_settings(conn) == ("3", "user")
+            finally:
+                reset_connection_rls_context(conn)
+
+            assert get_connection_rls_context(conn) is None
+            assert _get_rls_settings(conn) == ("", "")
+
+    def test_context_changed_in_transaction_is_not_trusted(self):
+        """Test that a context set inside a caller's transaction is re-applied."""
+        with get_db_connection() as conn:
+            try:
+                assert apply_connection_rls_context(conn, 2, "user") is True
+
+                # Rolled back: the server is back at user 2 but the cache can't know
+                cursor = conn.cursor()
+                set_rls_context(cursor, 3, "user", mode=RLS_MODE_SESSION)
+                cursor.close()
+                conn.rollback()
+                assert get_connection_rls_context(conn) == RLS_CONTEXT_UNKNOWN
+
+                # Committed: the server carries user 3
+                cursor = conn.cursor()
+                set_rls_context(cursor, 3, "user", mode=RLS_MODE_SESSION)
+                cursor.close()
+                conn.commit()
+                assert get_connection_rls_context(conn) == RLS_CONTEXT_UNKNOWN
+
+                sets = rls_context_stats["sets"]
+                assert apply_connection_rls_context(conn, 2, "user") is True
+                assert rls_context_stats["sets"] == sets + 1
+                assert _get_rls_settings(conn) == ("2", "user")
+            finally:
+                reset_connection_rls_context(conn)
+
+    def test_user_checkouts_reuse_context(self):
+        """Test that the same user checking out a connection again skips setting the context."""
+        with get_user_db_connection(user_id=1, user_role="admin") as first:
+            assert _get_rls_settings(first) == ("1", "admin")
+
+        hits = rls_context_stats["hits"]
+        with get_user_db_connection(user_id=1, user_role="admin") as second:
+            assert _get_rls_settings(second) == ("1", "admin")
+
+        if second is first:
+            assert rls_context_stats["hits"] == hits + 1
+
+    def test_alternating_users_see_own_context(self):
+        """Test that users, admins and plain connections never see another context."""
+        checkouts = [(2, "user"), (2, "user"), (3, "user"), (1, "admin"), (None, None), (3, "user"), ("x", "user")]
+
+        for _ in range(3):
+            for user_id, user_role in checkouts:
+                with get_user_db_connection(user_id=user_id, user_role=user_role) as conn:
+                    if user_id in (None, "x"):
+                        assert _get_rls_settings(conn) in ((None, None), ("", ""))
+                    else:
+                        assert _get_rls_settings(conn) == (str(user_id), user_role)
+
+                with get_db_connection() as conn:
+                    assert _get_rls_settings(conn) in ((None, None), ("", ""))
+
+    def test_concurrent_users_see_own_context(self):
+        """Test that concurrent checkouts by different users never leak contexts."""
+        errors = []
+
+        def worker(user_id):
+            user_role = "admin" if user_id == 1 else "user"
+            try:
+                for _ in range(50):
+                    with get_user_db_connection(user_id=user_id, user_role=user_role) as conn:
+                        settings = _get_rls_settings(conn)
+                        if settings != (str(user_id), user_role):
+                            errors.append((user_id, settings))
+
+                    with get_db_connection() as conn:
+                        settings = _get_rls_settings(conn)
+                        if settings not in ((None, None), ("", "")):
+                            errors.append((None, settings))
+            except Exception as e:
+                errors.append((user_id, e))
+
+        threads = [threading.Thread(target=worker, args=(user_id,)) for user_id in range(1, 7)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
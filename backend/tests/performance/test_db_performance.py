@@ -9,6 +9,13 @@ import time
 import statistics
 from db.repositories.proxmox_nodes import ProxmoxNodeRepository
 from db.repositories.vms import VMRepository
+from db.user_connection import get_user_db_connection
+from db.rls_context import RLS_MODE_SESSION, RLS_MODE_TRANSACTION, get_rls_context_stats
+from db.query_cache import (
+    generate_cache_key, get_from_cache, put_in_cache, invalidate_cache,
+    set_cache_size, get_cache_stats
+)
+from config import Config
 
 @pytest.mark.performance
 class TestDatabasePerformance:
@@ -91,3 +98,238 @@ class TestDatabasePerformance:
         # Assert performance requirements
         assert avg_execution_time < 50, f"Average execution time ({avg_execution_time:.2f} ms) exceeds 50 ms"
         assert p95_execution_time < 100, f"95th percentile execution time ({p95_execution_time:.2f} ms) exceeds 100 ms"
+    
+    def test_rls_context_mode_performance(self, monkeypatch):
+        """Compare the per-request RLS overhead of the session and transaction modes."""
+        # Number of requests to make per mode
+        num_queries = 200
+        
+        avg_execution_times = {}
+        monkeypatch.setattr(Config, "RLS_CONTEXT_CACHE", False)
+        for mode in (RLS_MODE_SESSION, RLS_MODE_TRANSACTION):
+            monkeypatch.setattr(Config, "RLS_CONTEXT_MODE", mode)
+            
+            # Store execution times
+            execution_times = []
+            
+            # Check out a user connection and run one query, as a request handler does
+            for _ in range(num_queries):
+                start_time = time.time()
+                with get_user_db_connection(user_id=2, user_role="user") as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+                    cursor.close()
+                end_time = time.time()
+                
+                # Calculate execution time in milliseconds
+                execution_time = (end_time - start_time) * 1000
+                execution_times.append(execution_time)
+            
+            avg_execution_times[mode] = statistics.mean(execution_times)
+        
+        saved_time = avg_execution_times[RLS_MODE_SESSION] - avg_execution_times[RLS_MODE_TRANSACTION]
+        
+        # Log performance metrics
+        print(f"\nRLS context mode performance metrics:")
+        print(f"  Session mode average request time: {avg_execution_times[RLS_MODE_SESSION]:.2f} ms")
+        print(f"  Transaction mode average request time: {avg_execution_times[RLS_MODE_TRANSACTION]:.2f} ms")
+        print(f"  Saved per request: {saved_time:.2f} ms")
+        
+        # Assert performance requirements
+        assert avg_execution_times[RLS_MODE_SESSION] < 20, f"Session mode average request time ({avg_execution_times[RLS_MODE_SESSION]:.2f} ms) exceeds 20 ms"
+        assert avg_execution_times[RLS_MODE_TRANSACTION] < 20, f"Transaction mode average request time ({avg_execution_times[RLS_MODE_TRANSACTION]:.2f} ms) exceeds 20 ms"
+    
+    def test_rls_context_cache_performance(self, monkeypatch):
+        """Measure the RLS overhead of an admin-heavy workload with and without the context cache."""
+        monkeypatch.setattr(Config, "RLS_CONTEXT_MODE", RLS_MODE_SESSION)
+        
+        # Number of requests to make per configuration
+        num_queries = 200
+        
+        avg_execution_times = {}
+        for cache_enabled in (False, True):
+            monkeypatch.setattr(Config, "RLS_CONTEXT_CACHE", cache_enabled)
+            
+            # Store execution times
+            execution_times = []
+            
+            # The collectors, the aggregator and the log thread all run as the system user
+            for _ in range(num_queries):
+                start_time = time.time()
+                with get_user_db_connection(user_id=1, user_role="admin") as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+                    cursor.close()
+                end_time = time.time()
+                
+                # Calculate execution time in milliseconds
+                execution_time = (end_time - start_time) * 1000
+                execution_times.append(execution_time)
+            
+            avg_execution_times[cache_enabled] = statistics.mean(execution_times)
+        
+        saved_time = avg_execution_times[False] - avg_execution_times[True]
+        stats = get_rls_context_stats()
+        
+        # Log performance metrics
+        print(f"\nRLS context cache performance metrics:")
+        print(f"  Without cache average request time: {avg_execution_times[False]:.2f} ms")
+        print(f"  With cache average request time: {avg_execution_times[True]:.2f} ms")
+        print(f"  Saved per request: {saved_time:.2f} ms")
+        print(f"  Cache hit rate: {stats['hit_rate']}%")
+        
+        # Assert performance requirements
+        assert avg_execution_times[True] < 20, f"Average request time with cache ({avg_execution_times[True]:.2f} ms) exceeds 20 ms"
+        assert stats["hits"] > 0, "RLS context cache was never hit"
+    
+    def test_query_cache_performance(self):
+        """Test that query cache inserts and lookups stay constant-time on a full cache."""
+        from db import query_cache
+        
+        original_size = query_cache.DEFAULT_CACHE_SIZE
+        set_cache_size(10000)
+        invalidate_cache()
+        
+        try:
+            # Number of operations to make
+            num_operations = 50000
+            row = [{"id": 1, "name": "account", "owner_id": 1}]
+            keys = [generate_cache_key("SELECT * FROM accounts WHERE id = %s", (i,), ("1", "admin"))
+                    for i in range(num_operations)]
+            
+            # Inserts beyond the cache size evict on every call
+            start_time = time.time()
+            for key in keys:
+                put_in_cache(key, row)
+            insert_time = (time.time() - start_time) * 1000000 / num_operations
+            
+            # Lookups of the most recent keys are hits
+            start_time = time.time()
+            for key in keys[-10000:]:
+                get_from_cache(key)
+            lookup_time = (time.time() - start_time) * 1000000 / 10000
+            
+            stats = get_cache_stats()
+            
+            # Log performance metrics
+            print(f"\nQuery cache performance metrics:")
+            print(f"  Average insert time: {insert_time:.2f} us")
+            print(f"  Average lookup time: {lookup_time:.2f} us")
+            print(f"  Evictions: {stats['evictions']}")
+            
+            # Assert performance requirements
+            assert insert_time < 100, f"Average insert time ({insert_time:.2f} us) exceeds 100 us"
+            assert lookup_time < 50, f"Average lookup time ({lookup_time:.2f} us) exceeds 50 us"
+            assert stats["size"] <= 10000
+        finally:
+            set_cache_size(original_size)
+            invalidate_cache()
+    
+    def test_add_logs_bulk_performance(self):
+        """Test the throughput of bulk log insertion against one add_log() call per entry."""
+        from db.connection import get_db_connection
+        from db.repositories.logs import LogRepository
+        
+        repo = LogRepository(user_id=1, user_role="admin")
+        trace_id = "bulk-log-performance"
+        entries = [
+            {"message": f"Performance test log entry {i}", "level": "INFO", "category": "system",
+             "source": "backend", "details": {"index": i}, "entity_type": "vm", "entity_id": str(i),
+             "trace_id": trace_id}
+            for i in range(1000)
+        ]
+        
+        try:
+            # Warm up the lookup ids
+            repo.add_logs_bulk(entries[:1])
+            
+            # Number of batches to insert
+            num_batches = 10
+            
+            start_time = time.time()
+            for _ in range(num_batches):
+                assert repo.add_logs_bulk(entries) == len(entries)
+            bulk_rate = num_batches * len(entries) / (time.time() - start_time)
+            
+            start_time = time.time()
+            for entry in entries[:100]:
+                repo.add_log(**entry)
+            single_rate = 100 / (time.time() - start_time)
+            
+            # Log performance metrics
+            print(f"\nLogRepository bulk insert performance metrics:")
+            print(f"  add_logs_bulk(): {bulk_rate:.0f} rows/s")
+            print(f"  add_log(): {single_rate:.0f} rows/s")
+            
+            # Assert performance requirements
+            assert bulk_rate > 5000, f"Bulk insert rate ({bulk_rate:.0f} rows/s) is below 5000 rows/s"
+            assert bulk_rate > 10 * single_rate, "Bulk insert is less than 10x faster than add_log()"
+        finally:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM logs WHERE trace_id = %s", (trace_id,))
+                conn.commit()
+                cursor.close()
+    
+    def test_lease_fresh_accounts_concurrency(self):
+        """Test that concurrent leases of fresh accounts never hand out an account twice."""
+        from concurrent.futures import ThreadPoolExecutor
+        from db.repositories.accounts import AccountRepository
+        
+        prefix = "lease-performance-"
+        num_accounts = 3000
+        with get_user_db_connection(user_id=1, user_role="admin") as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO accounts (
+                    acc_id, acc_username, acc_password, acc_vault_address, acc_vault_password,
+                    acc_created_at, acc_session_start, acc_steamguard_account_name, acc_confirm_type,
+                    acc_device_id, acc_identity_secret, acc_revocation_code, acc_secret_1,
+                    acc_serial_number, acc_server_time, acc_shared_secret, acc_status,
+                    acc_token_gid, acc_uri, owner_id
+                )
+                SELECT %s || n, 'user' || n, 'password', 'vault', 'password', 0, 0, 'name', 0,
+                       'device', 'identity', 'R0', 'secret', '0', 0, 'shared', 0, 'gid', 'uri', 1
+                FROM generate_series(1, %s) AS n
+            """, (prefix, num_accounts))
+            conn.commit()
+            cursor.close()
+        
+        repo = AccountRepository(user_id=1, user_role="admin")
+        leases = []
+        
+        def lease(index):
+            return repo.lease_fresh_accounts(limit=1 + index % 3, lease_seconds=60)
+        
+        try:
+            # Number of concurrent workers and lease requests
+            num_workers = 16
+            num_requests = 1000
+            
+            start_time = time.time()
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                leases = list(executor.map(lease, range(num_requests)))
+            lease_rate = num_requests / (time.time() - start_time)
+            
+            leased_ids = [account["acc_id"] for result in leases for account in result["accounts"]]
+            
+            # Log performance metrics
+            print(f"\nAccountRepository.lease_fresh_accounts() concurrency metrics:")
+            print(f"  {lease_rate:.0f} leases/s with {num_workers} workers")
+            print(f"  {len(leased_ids)} accounts leased, {len(leased_ids) - len(set(leased_ids))} leased twice")
+            
+            # Assert correctness and performance requirements
+            assert len(leased_ids) == sum(1 + index % 3 for index in range(num_requests))
+            assert len(leased_ids) == len(set(leased_ids)), "An account was leased more than once"
+            assert lease_rate > 200, f"Lease rate ({lease_rate:.0f} leases/s) is below 200 leases/s"
+        finally:
+            for result in leases:
+                if result["lease_id"]:
+                    repo.release_lease(result["lease_id"])
+            with get_user_db_connection(user_id=1, user_role="admin") as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM accounts WHERE acc_id LIKE %s", (prefix + "%",))
+                conn.commit()
+                cursor.close()
@@ -0,0 +1,105 @@
+"""
+Unit tests for the account export.
+"""
+
+import asyncio
+import gzip
+import pytest
+from db.repositories import accounts
+from db.repositories.accounts import AccountRepository
+from routers.accounts import _gzip_chunks
+from tests.utils.fake_db import FakeConnection, FakeCursor, fake_connection_factory
+
+@pytest.fixture
+def copy_connection(monkeypatch):
+    """Route the repository's connections to a fake connection whose COPY writes scripted output."""
+    connection = FakeConnection()
+    connection.copy_output = []
+    monkeypatch.setattr(AccountRepository, "get_connection", fake_connection_factory(connection))
+    return connection
+
+async def _collect(chunks):
+    return [chunk async for chunk in chunks]
+
+class TestAccountExport:
+    """Tests for the account export."""
+
+    @pytest.mark.unit
+    def test_export_query_uses_filters(self, copy_connection):
+        """Test that the export runs one COPY with the filters of the list, without paging."""
+        repository = AccountRepository(user_id=3, user_role="user")
+
+        asyncio.run(_collect(repository.export_accounts_async(
+            "csv", fields=["acc_id", "prime", "acc_password"], limit=5,
+            search="bob", sort_by="acc_username", filter_lock=True
+        )))
+
+        query, params = copy_connection.executed[0]
+        assert query.startswith("COPY (SELECT acc_id, prime FROM accounts WHERE 1=1 AND lock = %s")
+        assert "ORDER BY acc_username asc, acc_id LIMIT %s) TO STDOUT WITH (FORMAT csv, HEADER)" in query
+        assert params == [True, "%bob%", "%bob%", "%bob%", 5]
+
+    @pytest.mark.unit
+    def test_ndjson_export_writes_json_unquoted(self, copy_connection):
+        """Test that the NDJSON export writes each row as a JSON document."""
+        repository = AccountRepository(user_id=1, user_role="admin")
+
+        asyncio.run(_collect(repository.export_accounts_async("ndjson")))
+
+        query, _ = copy_connection.executed[0]
+        assert query.startswith("COPY (SELECT row_to_json(a)::text FROM (SELECT acc_id, acc_username")
+        assert "QUOTE E'\\x01', DELIMITER E'\\x02'" in query
+
+    @pytest.mark.unit
+    def test_output_gathered_into_chunks(self, copy_connection, monkeypatch):
+        """Test that the rows of the COPY are yielded in chunks of about EXPORT_CHUNK_SIZE bytes."""
+        monkeypatch.setattr(accounts, "EXPORT_CHUNK_SIZE", 10)
+        copy_connection.copy_output = [b"header\n", b"row 1\n", b"row 2\n", b"row 3\n"]
+        repository = AccountRepository(user_id=1, user_role="admin")
+
+        chunks = asyncio.run(_collect(repository.export_accounts_async("csv")))
+
+        assert chunks == [b"header\nrow 1\n", b"row 2\nrow 3\n"]
+
+    @pytest.mark.unit
+    def test_closing_export_cancels_copy(self, copy_connection, monkeypatch):
+        """Test that the COPY is cancelled when the consumer stops reading."""
+        monkeypatch.setattr(accounts, "EXPORT_CHUNK_SIZE", 1)
+        monkeypatch.setattr(accounts, "EXPORT_QUEUE_SIZE", 1)
+        copy_connection.copy_output = [b"row\n"] * 100
+        repository = AccountRepository(user_id=1, user_role="admin")
+
+        async def read_one():
+            chunks = repository.export_accounts_async("csv")
+            first = await chunks.__anext__()
+            await chunks.aclose()
+            return first
+
+        assert asyncio.run(read_one()) == b"row\n"
+        assert copy_connection.cancelled
+
+    @pytest.mark.unit
+    def test_export_errors_raised(self, copy_connection, monkeypatch):
+        """Test that an unsupported format and a failing COPY are raised to the consumer."""
+        repository = AccountRepository(user_id=1, user_role="admin")
+
+        with pytest.raises(ValueError):
+            asyncio.run(_collect(repository.export_accounts_async("xml")))
+
+        def fail(cursor, sql, file, size=8192):
+            raise RuntimeError("permission denied")
+
+        monkeypatch.setattr(FakeCursor, "copy_expert", fail)
+        with pytest.raises(RuntimeError, match="permission denied"):
+            asyncio.run(_collect(repository.export_accounts_async("csv")))
+
+    @pytest.mark.unit
+    def test_gzip_chunks(self):
+        """Test that compressed exports are a single gzip stream."""
+        async def chunks():
+            for chunk in (b"a,b\n", b"1,2\n", b"3,4\n"):
+                yield chunk
+
+        compressed = b"".join(asyncio.run(_collect(_gzip_chunks(chunks()))))
+
+        assert gzip.decompress(compressed) == b"a,b\n1,2\n3,4\n"
@@ -0,0 +1,283 @@
+"""
+Unit tests for the bulk account import.
+"""
+
+import asyncio
+import json
+import pytest
+from fastapi import HTTPException
+from db.repositories import accounts
+from db.repositories.accounts import AccountRepository, ACCOUNT_IMPORT_COLUMNS
+from routers import upload
+from routers.upload import validate_account_chunk, import_account_data
+from validation import check_email_address, validate_account_data_batch
+from tests.utils.fake_db import FakeConnection, fake_connection_factory
+
+class FakeAccountImport:
+    """Stand-in for an AccountImport that creates every added account."""
+
+    def __init__(self, result=None):
+        self.result = result
+        self.added = []
+        self.batches = []
+        self.merged = False
+        self.closed = False
+
+    def add(self, rows):
+        self.added.extend(rows)
+        self.batches.append([row_number for row_number, _ in rows])
+
+    def merge(self):
+        self.merged = True
+        if self.result is not None:
+            return self.result
+        return {
+            "created": [{"row_number": row_number, "acc_id": account["acc_id"]} for row_number, account in self.added],
+            "updated": [],
+            "failed": []
+        }
+
+    def close(self):
+        self.closed = True
+
+class FakeFileReader:
+    """Stand-in for a MultipartFileReader that yields a file in small chunks."""
+
+    def __init__(self, content, chunk_size):
+        self.content = content
+        self.chunk_size = chunk_size
+
+    async def chunks(self):
+        for start in range(0, len(self.content), self.chunk_size):
+            yield self.content[start:start + self.chunk_size]
+
+@pytest.fixture
+def import_connection(monkeypatch):
+    """Route the repository's connections to a fake connection that returns the merged accounts."""
+    connection = FakeConnection()
+    connection.existing = []
+    connection.new = []
+
+    def return_merged(cursor, query, params):
+        if query == accounts.UPDATE_IMPORTED_ACCOUNTS_QUERY:
+            cursor.rows = [(acc_id,) for acc_id in connection.existing]
+        elif query == accounts.INSERT_IMPORTED_ACCOUNTS_QUERY:
+            cursor.rows = [(acc_id,) for acc_id in connection.new]
+
+    connection.on_execute = return_merged
+    monkeypatch.setattr(AccountRepository, "get_connection", fake_connection_factory(connection))
+    monkeypatch.setattr(AccountRepository, "_publish_cache_invalidation", staticmethod(lambda query, cursor: ["accounts"]))
+    return connection
+
+def _statements(connection):
+    return [query for query, _ in connection.executed]
+
+def _account(acc_id, **values):
+    account = {column: f"{column}-{acc_id}" for column in ACCOUNT_IMPORT_COLUMNS}
+    account.update(acc_id=acc_id, acc_created_at=1, acc_session_start=2, acc_server_time="3", acc_confirm_type=1, acc_status=0)
+    account.update(values)
+    return account
+
+def _received_data(acc_id, **values):
+    data = {
+        "id": acc_id,
+        "user": {"username": "steam_user", "password": "password123"},
+        "email": {"address": "user@example.com", "password": "password123"},
+        "vault": {"address": "vault", "password": "password123"},
+        "metadata": {"createdAt": 1, "sessionStart": 2, "guard": "guard"},
+        "steamguard": {
+            "deviceId": "device", "shared_secret": "shared", "serial_number": "1", "revocation_code": "R1",
+            "uri": "otpauth://", "server_time": "3", "account_name": "steam_user", "token_gid": "gid",
+            "identity_secret": "identity", "secret_1": "secret", "status": 1, "confirm_type": 1
+        }
+    }
+    data.update(values)
+    return data
+
+class TestAccountImport:
+    """Tests for the bulk account import."""
+
+    @pytest.mark.unit
+    def test_accounts_copied_and_merged_in_one_transaction(self, import_connection):
+        """Test that the accounts are loaded with one COPY and merged before a single commit."""
+        import_connection.existing = ["2"]
+        import_connection.new = ["1"]
+        repository = AccountRepository(user_id=3, user_role="user")
+
+        result = repository.import_accounts([
+            (1, _account("1", acc_username="tab\there", acc_email_address=None)),
+            (2, _account("2", acc_password="back\\slash\nnewline"))
+        ])
+
+        assert result["created"] == [{"row_number": 1, "acc_id": "1"}]
+        assert result["updated"] == [{"row_number": 2, "acc_id": "2"}]
+        assert result["failed"] == []
+
+        assert _statements(import_connection) == [
+            accounts.CREATE_IMPORT_STAGING_QUERY,
+            accounts.COPY_IMPORT_STAGING_QUERY,
+            accounts.DELETE_SUPERSEDED_IMPORT_ROWS_QUERY,
+            accounts.UPDATE_IMPORTED_ACCOUNTS_QUERY,
+            accounts.INSERT_IMPORTED_ACCOUNTS_QUERY
+        ]
+        assert import_connection.commits == 1
+        lines = import_connection.copied.splitlines()
+        assert len(lines) == 2
+        first = lines[0].split("\t")
+        assert len(first) == len(ACCOUNT_IMPORT_COLUMNS) + 2
+        assert first[0] == "1"
+        assert first[2] == "tab\\there"
+        assert first[4] == "\\N"
+        assert first[-1] == "3"
+        assert "back\\\\slash\\nnewline" in lines[1]
+
+    @pytest.mark.unit
+    def test_invalid_rows_reported_without_aborting(self, import_connection):
+        """Test that invalid rows and accounts of other users fail alone, and a repeated account uses its last row."""
+        import_connection.new = ["1"]
+        repository = AccountRepository(user_id=3, user_role="user")
+
+        result = repository.import_accounts([
+            (1, _account("1", acc_password="first")),
+            (2, _account("2", acc_status="active")),
+            (3, _account("3", acc_uri=None, acc_token_gid=None)),
+            (4, _account("4", acc_server_time=2 ** 63)),
+            (5, _account("1", acc_password="last")),
+            (6, _account("6"))
+        ])
+
+        assert result["created"] == [{"row_number": 1, "acc_id": "1"}, {"row_number": 5, "acc_id": "1"}]
+        assert [(entry["row_number"], entry["error"]) for entry in result["failed"]] == [
+            (2, "acc_status is not an integer: 'active'"),
+            (3, "Missing required values: acc_token_gid, acc_uri"),
+            (4, f"acc_server_time is out of range: {2 ** 63}"),
+            (6, "Account already exists and belongs to another user")
+        ]
+
+        lines = import_connection.copied.splitlines()
+        assert [line.split("\t")[:2] for line in lines] == [["1", "1"], ["5", "1"], ["6", "6"]]
+
+    @pytest.mark.unit
+    def test_batches_staged_on_one_connection(self, import_connection):
+        """Test that batches added to an import are copied into one staging table and merged once."""
+        import_connection.new = ["1", "2"]
+        repository = AccountRepository(user_id=3, user_role="user")
+
+        with repository.begin_import() as account_import:
+            account_import.add([(1, _account("1"))])
+            account_import.add([(2, _account("2"))])
+            result = account_import.merge()
+
+        assert [entry["row_number"] for entry in result["created"]] == [1, 2]
+        assert _statements(import_connection).count(accounts.CREATE_IMPORT_STAGING_QUERY) == 1
+        assert _statements(import_connection).count(accounts.COPY_IMPORT_STAGING_QUERY) == 2
+        assert import_connection.commits == 1
+
+    @pytest.mark.unit
+    def test_failed_merge_rolled_back(self, import_connection):
+        """Test that a failing merge rolls the whole import back and raises."""
+        import_connection.error = RuntimeError("deadlock detected")
+        repository = AccountRepository(user_id=3, user_role="user")
+
+        with pytest.raises(RuntimeError, match="deadlock detected"):
+            repository.import_accounts([(1, _account("1"))])
+
+        assert import_connection.executed == []
+        assert import_connection.commits == 0
+        assert import_connection.rollbacks == 1
+
+    @pytest.mark.unit
+    def test_chunk_validated_per_account(self):
+        """Test that a chunk is validated in one pass, with the errors of each account kept apart."""
+        results = validate_account_chunk([
+            _received_data("1"),
+            _received_data("not-a-number"),
+            _received_data("3", metadata={"createdAt": 1}),
+            "not an account"
+        ])
+
+        assert results[0].id == "1"
+        assert [error.loc for error in results[1]] == [["id"]]
+        assert [error.loc for error in results[2]] == [["metadata", "sessionStart"], ["metadata", "guard"]]
+        assert len(results[3]) == 1
+
+    @pytest.mark.unit
+    def test_upload_reports_rows_in_order(self, monkeypatch):
+        """Test that the valid accounts are imported at once and the failures are reported in row order."""
+        account_import = FakeAccountImport({
+            "created": [{"row_number": 4, "acc_id": "4"}],
+            "updated": [{"row_number": 1, "acc_id": "1"}],
+            "failed": [{"row_number": 3, "acc_id": "3", "error": "Account already exists and belongs to another user"}]
+        })
+        monkeypatch.setattr(upload.AccountRepository, "begin_import", lambda self: account_import)
+        monkeypatch.setattr(upload, "VALIDATION_CHUNK_SIZE", 2)
+
+        successful, failed = import_account_data([
+            (1, _received_data("1")),
+            (2, _received_data("2", email={"address": "test@demoemail.com", "password": "password123"})),
+            (3, _received_data("3")),
+            (4, _received_data("4")),
+            (5, _received_data("bad"))
+        ], {"id": 3, "role": "user"})
+
+        assert [row_number for row_number, _ in account_import.added] == [1, 3, 4]
+        assert account_import.added[0][1]["acc_server_time"] == "3"
+        assert successful == ["1", "4"]
+        assert [(account.row_number, account.errors[0].type) for account in failed] == [
+            (2, "value_error"), (3, "db_error"), (5, "validation_error")
+        ]
+        assert account_import.closed
+
+    @pytest.mark.unit
+    def test_csv_upload_imported_while_read(self, monkeypatch):
+        """Test that a streamed CSV file is imported in batches, with the conversion failures reported."""
+        account_import = FakeAccountImport()
+        monkeypatch.setattr(upload.AccountRepository, "begin_import", lambda self: account_import)
+        monkeypatch.setattr(upload, "VALIDATION_CHUNK_SIZE", 2)
+
+        rows = [",".join(upload.REQUIRED_CSV_HEADERS)]
+        for acc_id in ("1", "2", "3", "4", "5"):
+            created_at = "not-a-number" if acc_id == "3" else "1"
+            rows.append(f"{acc_id},steam_user,password123,user@example.com,password123,vault,password123,{created_at},2,guard")
+        reader = FakeFileReader(("\n".join(rows) + "\n").encode(), chunk_size=7)
+        account_upload = upload.AccountUpload({"id": 3, "role": "user"}, convert=upload.convert_csv_row_to_account_data)
+
+        successful, failed = asyncio.run(upload.import_batches(
+            upload.batch_rows(upload.read_csv_rows(reader), "Too many rows"), account_upload
+        ))
+
+        assert account_import.batches == [[1, 2], [4], [5]]
+        assert successful == ["1", "2", "4", "5"]
+        assert [(account.row_number, account.errors[0].type) for account in failed] == [(3, "csv_error")]
+        assert account_upload.row_count == 5
+
+    @pytest.mark.unit
+    def test_upload_stopped_at_row_limit(self, monkeypatch):
+        """Test that an upload with too many rows is rejected while it is read, before anything is merged."""
+        account_import = FakeAccountImport()
+        monkeypatch.setattr(upload.AccountRepository, "begin_import", lambda self: account_import)
+        monkeypatch.setattr(upload, "MAX_IMPORT_ROWS", 2)
+        reader = FakeFileReader(json.dumps([_received_data(str(acc_id)) for acc_id in range(1, 5)]).encode(), chunk_size=50)
+        account_upload = upload.AccountUpload({"id": 3, "role": "user"})
+
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(upload.import_batches(
+                upload.batch_rows(upload.read_json_accounts(reader), "Too many accounts"), account_upload
+            ))
+
+        assert error.value.status_code == 400
+        assert not account_import.merged
+
+    @pytest.mark.unit
+    def test_email_addresses_checked_like_email_str(self):
+        """Test that the cached email check accepts and rejects the addresses the full validation does."""
+        for address in ("user@example.com", "first.last+tag@mail.example.org", "Joe <joe@example.com>"):
+            assert check_email_address(address) == address
+
+        results = validate_account_data_batch([
+            _received_data(str(index), email={"address": address, "password": "password123"})
+            for index, address in enumerate(("a..b@example.com", "user@localhost", "user@example.test"))
+        ])
+
+        assert [result.valid for result in results] == [False, False, False]
+        assert all(result.errors[0]["field"] == "email.address" for result in results)
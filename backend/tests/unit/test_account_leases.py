@@ -0,0 +1,108 @@
+"""
+Unit tests for the leasing of fresh accounts.
+"""
+
+import uuid
+import pytest
+from config import Config
+from db.repositories import accounts
+from db.repositories.accounts import AccountRepository
+from tests.utils.fake_db import FakeConnection, fake_connection_factory
+
+@pytest.fixture
+def lease_connection(monkeypatch):
+    """Route the repository's connections to a fake connection that returns scripted rows for the lease commands."""
+    connection = FakeConnection()
+    connection.columns = []
+    connection.rows = []
+    connection.reclaimed = 0
+    invalidated = []
+
+    def return_rows(cursor, query, params):
+        if query == accounts.RECLAIM_EXPIRED_LEASES_QUERY:
+            cursor.rowcount = connection.reclaimed
+            return
+        cursor.description = [(column,) for column in connection.columns]
+        cursor.rows = connection.rows
+
+    connection.on_execute = return_rows
+    monkeypatch.setattr(AccountRepository, "get_connection", fake_connection_factory(connection))
+    monkeypatch.setattr(AccountRepository, "_publish_cache_invalidation",
+                        staticmethod(lambda query, cursor: invalidated.append(query) or ["accounts"]))
+    connection.invalidated = invalidated
+    return connection
+
+class TestAccountLeases:
+    """Tests for the leasing of fresh accounts."""
+
+    @pytest.mark.unit
+    def test_lease_reclaims_expired_leases_first(self, lease_connection):
+        """Test that a lease reclaims the expired leases and locks the accounts in one transaction."""
+        lease_connection.reclaimed = 2
+        lease_connection.columns = ["id", "acc_id", "acc_username", "lease_expires_at"]
+        lease_connection.rows = [(7, "b", "user_b", "later"), (3, "a", "user_a", "later")]
+        repository = AccountRepository(user_id=3, user_role="user")
+
+        lease = repository.lease_fresh_accounts(limit=2, lease_seconds=60)
+
+        assert [query for query, _ in lease_connection.executed] == [
+            accounts.RECLAIM_EXPIRED_LEASES_QUERY, accounts.LEASE_FRESH_ACCOUNTS_QUERY
+        ]
+        lease_id, lease_seconds, limit = lease_connection.executed[1][1]
+        assert str(uuid.UUID(lease_id)) == lease["lease_id"]
+        assert (lease_seconds, limit) == (60, 2)
+        assert lease["accounts"] == [{"acc_id": "a", "acc_username": "user_a"}, {"acc_id": "b", "acc_username": "user_b"}]
+        assert lease["lease_expires_at"] == "later"
+        assert lease_connection.commits == 1
+        assert lease_connection.invalidated == [accounts.LEASE_FRESH_ACCOUNTS_QUERY]
+
+    @pytest.mark.unit
+    def test_empty_lease_has_no_id(self, lease_connection):
+        """Test that a lease without fresh accounts returns no lease and invalidates nothing."""
+        lease_connection.columns = ["id", "acc_id", "acc_username", "lease_expires_at"]
+        repository = AccountRepository(user_id=3, user_role="user")
+
+        lease = repository.lease_fresh_accounts()
+
+        assert lease == {"lease_id": None, "lease_expires_at": None, "accounts": []}
+        assert lease_connection.executed[1][1][1] == Config.ACCOUNT_LEASE_SECONDS
+        assert lease_connection.invalidated == []
+
+    @pytest.mark.unit
+    def test_lease_duration_bounded(self, lease_connection, monkeypatch):
+        """Test that renewals are bounded by the configured maximum duration."""
+        monkeypatch.setattr(Config, "ACCOUNT_LEASE_MAX_SECONDS", 600)
+        lease_connection.columns = ["acc_id", "lease_expires_at"]
+        lease_connection.rows = [("a", "later")]
+        repository = AccountRepository(user_id=3, user_role="user")
+
+        assert repository.renew_lease("lease", 3600) == [{"acc_id": "a", "lease_expires_at": "later"}]
+        assert lease_connection.executed == [(accounts.RENEW_LEASE_QUERY, (600, "lease"))]
+
+    @pytest.mark.unit
+    def test_release_some_or_all_accounts(self, lease_connection):
+        """Test that a release applies to the given accounts of the lease, or all of them."""
+        lease_connection.columns = ["acc_id"]
+        lease_connection.rows = [("a",)]
+        repository = AccountRepository(user_id=3, user_role="user")
+
+        assert repository.release_lease("lease", ["a"]) == ["a"]
+        assert repository.release_lease("lease", keep_locked=True) == ["a"]
+
+        (some_query, some_params), (all_query, all_params) = lease_connection.executed
+        assert "AND acc_id = ANY(%s)" in some_query
+        assert some_params == (False, "lease", ["a"])
+        assert "ANY" not in all_query
+        assert all_params == (True, "lease")
+
+    @pytest.mark.unit
+    def test_failed_lease_rolled_back(self, lease_connection):
+        """Test that a failing lease rolls back and raises."""
+        lease_connection.error = RuntimeError("could not serialize access")
+        repository = AccountRepository(user_id=3, user_role="user")
+
+        with pytest.raises(RuntimeError):
+            repository.lease_fresh_accounts()
+
+        assert lease_connection.rollbacks == 1
+        assert lease_connection.commits == 0
@@ -0,0 +1,192 @@
+"""
+Unit tests for the API key verification cache.
+"""
+
+import time
+import pytest
+from config import Config
+from db import api_key_cache
+from db.api_key_cache import (
+    get_cache_key, get_api_key_cache_generation, get_cached_api_key, put_api_key, evict_api_key, evict_api_key_hash,
+    evict_api_keys_for_resource, invalidate_api_key_cache, invalidate_api_key_cache_by_tables,
+    record_api_key_use, get_pending_api_key_uses, flush_api_key_last_used,
+    get_api_key_cache_stats, reset_api_key_cache_stats
+)
+from db.query_cache import ALL_TABLES
+
+def make_api_key(key_id=1, key_type="windows_vm", resource_id=7):
+    """Build the API key data returned by a validation."""
+    return {
+        "id": key_id,
+        "user_id": 1,
+        "key_name": "agent",
+        "api_key_prefix": "abcd",
+        "scopes": ["read", "write"],
+        "expires_at": None,
+        "last_used_at": None,
+        "created_at": None,
+        "revoked": False,
+        "key_type": key_type,
+        "resource_id": resource_id
+    }
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    """Start every test with an empty cache and no pending uses."""
+    invalidate_api_key_cache()
+    reset_api_key_cache_stats()
+    api_key_cache._pending_uses.clear()
+    yield
+    invalidate_api_key_cache()
+    reset_api_key_cache_stats()
+    api_key_cache._pending_uses.clear()
+
+class TestApiKeyCache:
+    """Tests for the API key verification cache."""
+
+    @pytest.mark.unit
+    def test_positive_entry(self):
+        """Test that validated keys are served from the cache."""
+        cache_key = get_cache_key("hash", "windows_vm", 7, 1, "admin")
+        assert get_cached_api_key(cache_key) == (False, None)
+
+        put_api_key(cache_key, make_api_key())
+        cached, api_key_data = get_cached_api_key(cache_key)
+        assert cached
+        assert api_key_data["id"] == 1
+
+        # Callers get a copy of the cached data
+        api_key_data["id"] = 2
+        assert get_cached_api_key(cache_key)[1]["id"] == 1
+
+        stats = get_api_key_cache_stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+
+    @pytest.mark.unit
+    def test_negative_entry(self, monkeypatch):
+        """Test that failed validations are cached for the negative TTL."""
+        monkeypatch.setattr(Config, "API_KEY_NEGATIVE_CACHE_TTL", 1)
+        cache_key = get_cache_key("bad", None, None, 1, "admin")
+
+        put_api_key(cache_key, None)
+        assert get_cached_api_key(cache_key) == (True, None)
+        assert get_api_key_cache_stats()["negative_entries"] == 1
+
+        time.sleep(1.1)
+        assert get_cached_api_key(cache_key) == (False, None)
+
+    @pytest.mark.unit
+    def test_disabled_ttl(self, monkeypatch):
+        """Test that a TTL of zero disables caching."""
+        monkeypatch.setattr(Config, "API_KEY_CACHE_TTL", 0)
+        cache_key = get_cache_key("hash", None, None, 1, "admin")
+
+        put_api_key(cache_key, make_api_key())
+        assert get_cached_api_key(cache_key) == (False, None)
+
+    @pytest.mark.unit
+    def test_identity_is_part_of_key(self):
+        """Test that a validation is not shared between RLS identities."""
+        put_api_key(get_cache_key("hash", None, None, 1, "admin"), make_api_key())
+        assert get_cached_api_key(get_cache_key("hash", None, None, 2, "user")) == (False, None)
+
+    @pytest.mark.unit
+    def test_evictions(self):
+        """Test evicting entries by key ID, hash and resource."""
+        first = get_cache_key("first", "windows_vm", 7, 1, "admin")
+        second = get_cache_key("second", "proxmox_node", 3, 1, "admin")
+        missing = get_cache_key("missing", "windows_vm", 7, 1, "admin")
+        put_api_key(first, make_api_key(1, "windows_vm", 7))
+        put_api_key(second, make_api_key(2, "proxmox_node", 3))
+        put_api_key(missing, None)
+
+        assert evict_api_key(1) == 1
+        assert not get_cached_api_key(first)[0]
+        assert get_cached_api_key(second)[0]
+
+        # Failed validations of a resource are evicted with its keys
+        put_api_key(first, make_api_key(1, "windows_vm", 7))
+        assert evict_api_keys_for_resource("windows_vm", 7) == 2
+        assert get_cached_api_key(second)[0]
+
+        assert evict_api_key_hash("second") == 1
+        assert get_api_key_cache_stats()["entries"] == 0
+
+    @pytest.mark.unit
+    def test_eviction_during_lookup(self):
+        """Test that a lookup racing an eviction does not cache the row it read before."""
+        cache_key = get_cache_key("hash", "windows_vm", 7, 1, "admin")
+
+        # The revocation happens while the validation is reading the key
+        generation = get_api_key_cache_generation()
+        assert not get_cached_api_key(cache_key)[0]
+        evict_api_key(1)
+        put_api_key(cache_key, make_api_key(), generation)
+
+        assert not get_cached_api_key(cache_key)[0]
+        assert get_api_key_cache_stats()["stale_puts"] == 1
+
+        # Invalidations from other processes count as evictions
+        generation = get_api_key_cache_generation()
+        invalidate_api_key_cache_by_tables(["api_keys"])
+        put_api_key(cache_key, make_api_key(), generation)
+        assert not get_cached_api_key(cache_key)[0]
+
+        generation = get_api_key_cache_generation()
+        put_api_key(cache_key, make_api_key(), generation)
+        assert get_cached_api_key(cache_key)[0]
+
+    @pytest.mark.unit
+    def test_invalidate_by_tables(self):
+        """Test that only writes to api_keys invalidate the cache."""
+        cache_key = get_cache_key("hash", None, None, 1, "admin")
+        put_api_key(cache_key, make_api_key())
+
+        assert not invalidate_api_key_cache_by_tables(["accounts"])
+        assert get_cached_api_key(cache_key)[0]
+
+        assert invalidate_api_key_cache_by_tables(["api_keys"])
+        assert not get_cached_api_key(cache_key)[0]
+
+        put_api_key(cache_key, make_api_key())
+        assert invalidate_api_key_cache_by_tables([ALL_TABLES])
+        assert not get_cached_api_key(cache_key)[0]
+
+    @pytest.mark.unit
+    def test_lru_eviction(self, monkeypatch):
+        """Test that the least recently used entries are evicted."""
+        monkeypatch.setattr(api_key_cache, "_max_entries", 2)
+        keys = [get_cache_key(f"hash{i}", None, None, 1, "admin") for i in range(3)]
+
+        put_api_key(keys[0], make_api_key(0))
+        put_api_key(keys[1], make_api_key(1))
+        get_cached_api_key(keys[0])
+        put_api_key(keys[2], make_api_key(2))
+
+        assert get_cached_api_key(keys[0])[0]
+        assert not get_cached_api_key(keys[1])[0]
+        assert get_cached_api_key(keys[2])[0]
+
+    @pytest.mark.unit
+    def test_uses_are_coalesced(self):
+        """Test that repeated uses of a key are written once."""
+        for _ in range(100):
+            record_api_key_use(1, 1, "admin")
+        record_api_key_use(2, 1, "admin")
+        record_api_key_use(1, 2, "user")
+
+        assert get_pending_api_key_uses() == 3
+
+    @pytest.mark.unit
+    def test_failed_flush_keeps_uses(self, monkeypatch):
+        """Test that the uses of a failed flush are written by the next one."""
+        def failing_connection(**kwargs):
+            raise RuntimeError("database unavailable")
+
+        monkeypatch.setattr(api_key_cache, "get_user_db_connection", failing_connection)
+        record_api_key_use(1, 1, "admin")
+
+        assert flush_api_key_last_used() == 0
+        assert get_pending_api_key_uses() == 1
+        assert get_api_key_cache_stats()["flush_errors"] == 1
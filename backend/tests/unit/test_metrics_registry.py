@@ -0,0 +1,150 @@
+"""
+Unit tests for the metric definitions registry.
+"""
+
+import pytest
+from config import Config
+from db import metrics_registry
+from db.metrics_registry import (
+    get_metric_definition, get_metric_definitions, get_metric_categories,
+    invalidate_metrics_registry, invalidate_metrics_registry_by_tables,
+    get_metrics_registry_stats, reset_metrics_registry_stats,
+    LOAD_METRICS_QUERY
+)
+from db.query_cache import ALL_TABLES
+from tests.utils.fake_db import FakeConnection, fake_connection_factory
+
+def make_metric(metric_id, name, data_type="float", is_active=True, category_id=1, category="system"):
+    """Build a row of the definitions query."""
+    return (metric_id, name, name.title(), None, "%", data_type, is_active, category_id, category)
+
+@pytest.fixture
+def database(monkeypatch):
+    """Route the registry's connections to a fake database of metric definitions and start with an empty registry."""
+    database = FakeConnection()
+    database.metrics = [make_metric(1, "cpu_usage"), make_metric(2, "vm_count", "integer")]
+    database.on_load = None
+
+    def return_rows(cursor, query, params):
+        if query == LOAD_METRICS_QUERY:
+            if database.on_load:
+                database.on_load()
+            cursor.rows = list(database.metrics)
+        else:
+            cursor.rows = [(1, "system", "System metrics")]
+
+    database.on_execute = return_rows
+    monkeypatch.setattr(metrics_registry, "get_db_connection", fake_connection_factory(database))
+    monkeypatch.setattr(metrics_registry, "_last_miss_reload", 0.0)
+    invalidate_metrics_registry()
+    reset_metrics_registry_stats()
+    yield database
+    invalidate_metrics_registry()
+    reset_metrics_registry_stats()
+
+def loads(database):
+    """Get the number of times the definitions were loaded."""
+    return len(database.executions(LOAD_METRICS_QUERY))
+
+class TestMetricsRegistry:
+    """Tests for the metric definitions registry."""
+
+    @pytest.mark.unit
+    def test_loaded_once(self, database):
+        """Test that lookups are served from memory after the first load."""
+        assert get_metric_definition("cpu_usage")["id"] == 1
+        assert get_metric_definition("vm_count")["data_type"] == "integer"
+        assert set(get_metric_definitions()) == {("system", "cpu_usage"), ("system", "vm_count")}
+        assert get_metric_categories() == [{"id": 1, "name": "system", "description": "System metrics"}]
+
+        assert loads(database) == 1
+        stats = get_metrics_registry_stats()
+        assert stats["hits"] == 2
+        assert stats["metrics"] == 2
+
+    @pytest.mark.unit
+    def test_definitions_are_copies(self, database):
+        """Test that callers cannot alter the registry."""
+        get_metric_definition("cpu_usage")["data_type"] = "string"
+        get_metric_definitions()[("system", "cpu_usage")]["id"] = 99
+
+        assert get_metric_definition("cpu_usage") == {
+            "id": 1, "name": "cpu_usage", "display_name": "Cpu_Usage", "description": None, "unit": "%",
+            "data_type": "float", "is_active": True, "category_id": 1, "category": "system"
+        }
+
+    @pytest.mark.unit
+    def test_unknown_metric_reloads_once(self, database, monkeypatch):
+        """Test that an unknown metric is looked up again, at most once per interval."""
+        monkeypatch.setattr(Config, "METRICS_REGISTRY_MISS_INTERVAL", 60)
+        get_metric_definition("cpu_usage")
+
+        database.metrics.append(make_metric(3, "job_count", "integer"))
+        assert get_metric_definition("job_count")["id"] == 3
+        assert loads(database) == 2
+
+        # The reload for job_count was within the interval
+        assert get_metric_definition("missing") is None
+        assert loads(database) == 2
+
+        monkeypatch.setattr(Config, "METRICS_REGISTRY_MISS_INTERVAL", 0)
+        assert get_metric_definition("missing") is None
+        assert loads(database) == 3
+        assert get_metrics_registry_stats()["misses"] == 2
+
+    @pytest.mark.unit
+    def test_invalidated_by_tables(self, database):
+        """Test that writes to the metric tables bump the version and reload the registry."""
+        get_metric_definition("cpu_usage")
+
+        assert not invalidate_metrics_registry_by_tables(["accounts"])
+        assert invalidate_metrics_registry_by_tables(["metrics_definitions"])
+        assert invalidate_metrics_registry_by_tables([ALL_TABLES])
+
+        database.metrics[0] = make_metric(1, "cpu_usage", "integer")
+        assert get_metric_definition("cpu_usage")["data_type"] == "integer"
+        assert loads(database) == 2
+
+    @pytest.mark.unit
+    def test_stale_load_not_installed(self, database):
+        """Test that a load racing with an invalidation is used but not kept."""
+        database.on_load = invalidate_metrics_registry
+
+        assert get_metric_definition("cpu_usage")["id"] == 1
+        assert not get_metrics_registry_stats()["loaded"]
+
+        database.on_load = None
+        get_metric_definition("cpu_usage")
+        get_metric_definition("cpu_usage")
+        assert loads(database) == 2
+
+    @pytest.mark.unit
+    def test_expired_registry_survives_errors(self, database, monkeypatch):
+        """Test that the previous definitions are served when a reload fails."""
+        get_metric_definition("cpu_usage")
+        monkeypatch.setattr(Config, "METRICS_REGISTRY_TTL", 0)
+        database.error = RuntimeError("connection refused")
+
+        assert get_metric_definition("cpu_usage")["id"] == 1
+        assert get_metrics_registry_stats()["load_errors"] == 1
+
+        invalidate_metrics_registry()
+        with pytest.raises(RuntimeError):
+            get_metric_definition("cpu_usage")
+
+    @pytest.mark.unit
+    def test_names_resolved_per_category(self, database):
+        """Test that a name defined in several categories is only resolved with its category."""
+        database.metrics.append(make_metric(3, "cpu_usage", category_id=2, category="vm"))
+        database.metrics.extend([make_metric(4, "uptime", category_id=None, category=None)] * 2)
+
+        assert get_metric_definition("cpu_usage") is None
+        assert get_metric_definition("cpu_usage", category="system")["id"] == 1
+        assert get_metric_definition("cpu_usage", category="vm")["id"] == 3
+        assert get_metric_definition("vm_count")["id"] == 2
+        assert get_metric_definition("vm_count", category="vm") is None
+
+        # Definitions that cannot be told apart are not loaded
+        assert get_metric_definition("uptime") is None
+        assert set(get_metric_definitions()) == {("system", "cpu_usage"), ("vm", "cpu_usage"), ("system", "vm_count")}
+        assert get_metrics_registry_stats()["ambiguous"] == 1
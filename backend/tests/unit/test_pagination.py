@@ -0,0 +1,195 @@
+"""
+Unit tests for the keyset pagination.
+"""
+
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+import pytest
+from config import Config
+from db.pagination import InvalidCursorError, KeysetPaginator, encode_cursor, decode_cursor
+from db.repositories.accounts import AccountRepository
+
+ACCOUNT_COLUMNS = ["acc_id", "acc_username", "acc_email_address", "prime"]
+
+@pytest.fixture
+def paginator():
+    """A paginator of accounts by acc_id, username, email address or prime status."""
+    return KeysetPaginator({column: f"a.{column}" for column in ACCOUNT_COLUMNS}, "acc_id",
+                           nullable_columns=["acc_email_address"])
+
+class FakeQueries(list):
+    """The executed queries, with the results scripted by query prefix, the longest matching first."""
+
+    def __init__(self):
+        super().__init__()
+        self.results = {}
+
+    def execute(self, query, params=None):
+        self.append((query, params))
+        for prefix in sorted(self.results, key=len, reverse=True):
+            if query.startswith(prefix):
+                return self.results[prefix]
+        return []
+
+@pytest.fixture
+def queries(monkeypatch):
+    """Route the repository's queries to scripted results."""
+    fake_queries = FakeQueries()
+    monkeypatch.setattr(AccountRepository, "execute_query",
+                        lambda self, query, params=None, with_rls=True: fake_queries.execute(query, params))
+    return fake_queries
+
+def _accounts(*acc_ids):
+    return [{"acc_id": acc_id, "acc_username": f"user_{acc_id}", "acc_email_address": None,
+             "prime": False, "lock": False, "perm_lock": False, "acc_created_at": 1} for acc_id in acc_ids]
+
+class TestCursors:
+    """Tests for the encoding of the cursors."""
+
+    @pytest.mark.unit
+    def test_cursor_values_round_trip(self):
+        """Test that the values JSON does not represent are restored with their types."""
+        values = [datetime(2026, 10, 16, 12, 30, 1, 5, tzinfo=timezone.utc), Decimal("1.10"), uuid.uuid4(),
+                  None, True, 42, "76561199123456789"]
+
+        cursor = encode_cursor("timestamp", "desc", values)
+
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == ("timestamp", "desc", values)
+
+    @pytest.mark.unit
+    def test_invalid_cursors_rejected(self):
+        """Test that cursors that are not encoded by encode_cursor raise InvalidCursorError."""
+        for cursor in ("not a cursor!", "eyJhY2NfaWQiOiI3In0", encode_cursor("acc_id", "up", [1])[:-2], "é"):
+            with pytest.raises(InvalidCursorError):
+                decode_cursor(cursor)
+
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(encode_cursor("acc_id", "asc", [{"datetime": "yesterday"}]))
+
+class TestKeysetPaginator:
+    """Tests for the keyset conditions and ordering."""
+
+    @pytest.mark.unit
+    def test_first_page_has_no_condition(self, paginator):
+        """Test that the first page is ordered by the sort column and the key, with unknown sorts defaulted."""
+        keyset = paginator.keyset(None, "prime", "DESC")
+
+        assert (keyset.condition, keyset.params) == ("", [])
+        assert keyset.order_by == "a.prime DESC, a.acc_id DESC"
+        assert keyset.where("a.lock = %s", (False,)) == ("a.lock = %s", (False,))
+        assert paginator.keyset(None, "acc_password; --", "sideways").order_by == "a.acc_id ASC"
+
+    @pytest.mark.unit
+    def test_ties_broken_by_key(self, paginator):
+        """Test that a non-unique sort column is compared together with the key column."""
+        cursor = paginator.keyset(None, "prime", "asc").cursor_for({"acc_id": "b", "prime": True})
+        keyset = paginator.keyset(cursor, "prime", "asc")
+
+        assert keyset.condition == "a.prime >= %s AND (a.prime, a.acc_id) > (%s, %s)"
+        assert keyset.params == [True, True, "b"]
+        assert keyset.where("a.lock = %s", (False,)) == (
+            "(a.lock = %s) AND a.prime >= %s AND (a.prime, a.acc_id) > (%s, %s)", (False, True, True, "b")
+        )
+
+        keyset = paginator.keyset(paginator.keyset(None, "acc_id", "desc").cursor_for({"acc_id": "b"}), "acc_id", "desc")
+        assert (keyset.condition, keyset.params) == ("a.acc_id < %s", ["b"])
+
+    @pytest.mark.unit
+    def test_null_sort_values(self, paginator):
+        """Test that NULL sort values are placed last in ascending order and first in descending order."""
+        def condition(email, sort_order):
+            cursor = encode_cursor("acc_email_address", sort_order, [email, "b"])
+            keyset = paginator.keyset(cursor, "acc_email_address", sort_order)
+            return keyset.condition, keyset.params
+
+        assert condition("x@example.com", "asc") == (
+            "((a.acc_email_address, a.acc_id) > (%s, %s) OR a.acc_email_address IS NULL)", ["x@example.com", "b"]
+        )
+        assert condition(None, "asc") == ("(a.acc_email_address IS NULL AND a.acc_id > %s)", ["b"])
+        assert condition("x@example.com", "desc") == (
+            "(a.acc_email_address, a.acc_id) < (%s, %s)", ["x@example.com", "b"]
+        )
+        assert condition(None, "desc") == ("(a.acc_email_address IS NOT NULL OR a.acc_id < %s)", ["b"])
+
+    @pytest.mark.unit
+    def test_cursor_of_another_ordering_rejected(self, paginator):
+        """Test that a cursor is only accepted with the sort column and order it was issued for."""
+        cursor = encode_cursor("acc_username", "asc", ["user", "b"])
+
+        with pytest.raises(InvalidCursorError, match="sort_by=acc_username"):
+            paginator.keyset(cursor, "acc_username", "desc")
+        with pytest.raises(InvalidCursorError):
+            paginator.keyset(encode_cursor("acc_username", "asc", ["user"]), "acc_username", "asc")
+        with pytest.raises(InvalidCursorError):
+            paginator.keyset(encode_cursor("acc_username", "asc", ["user", None]), "acc_username", "asc")
+
+    @pytest.mark.unit
+    def test_page_split_from_extra_row(self, paginator):
+        """Test that the row after the page only tells that there is a next page."""
+        keyset = paginator.keyset(None, "acc_username", "asc")
+        rows = _accounts("a", "b", "c")
+
+        assert keyset.page(rows, 3) == (rows, None)
+
+        page, cursor = keyset.page(rows, 2)
+        assert page == rows[:2]
+        assert decode_cursor(cursor) == ("acc_username", "asc", ["user_b", "b"])
+
+class TestKeysetPages:
+    """Tests for the pages of the repositories."""
+
+    @pytest.mark.unit
+    def test_account_pages_follow_cursor(self, queries):
+        """Test that the account pages are filtered, fetch one more row, and follow the cursor."""
+        queries.results["SELECT"] = _accounts("a", "b", "c")
+        queries.results["SELECT COUNT(*)"] = [{"count": 7}]
+        repository = AccountRepository(user_id=3, user_role="user")
+
+        first = repository.get_accounts_with_cursor(limit=2, search="user", sort_by="prime", filter_lock=False)
+
+        (page_query, page_params), (count_query, count_params) = queries
+        assert "ORDER BY prime ASC, acc_id ASC LIMIT 3" in page_query
+        assert "ILIKE" in page_query and page_params == count_params == (False, "%user%", "%user%", "%user%")
+        assert count_query.startswith("SELECT COUNT(*) AS count FROM (SELECT 1 FROM accounts WHERE")
+        assert [account["acc_id"] for account in first["accounts"]] == ["a", "b"]
+        assert (first["total"], first["total_estimated"], first["has_more"]) == (7, False, True)
+
+        queries.clear()
+        queries.results["SELECT"] = _accounts("c")
+        last = repository.get_accounts_with_cursor(first["next_cursor"], limit=2, search="user", sort_by="prime",
+                                                   filter_lock=False, count="none")
+
+        (page_query, page_params), = queries
+        assert page_query.count("(prime, acc_id) > (%s, %s)") == 1
+        assert page_params[-3:] == (False, False, "b")
+        assert (last["total"], last["next_cursor"], last["has_more"]) == (None, None, False)
+
+    @pytest.mark.unit
+    def test_complete_first_page_not_counted(self, queries):
+        """Test that a first page holding all the rows gives the total without a count query."""
+        queries.results["SELECT"] = _accounts("a", "b")
+        repository = AccountRepository(user_id=3, user_role="user")
+
+        result = repository.get_accounts_with_cursor(limit=5, count="estimate")
+
+        assert len(queries) == 1
+        assert (result["total"], result["total_estimated"], result["next_cursor"]) == (2, False, None)
+
+    @pytest.mark.unit
+    def test_estimated_total(self, queries, monkeypatch):
+        """Test that large totals are estimated by the planner, and small ones counted exactly."""
+        monkeypatch.setattr(Config, "PAGINATION_EXACT_COUNT_THRESHOLD", 1000)
+        queries.results["EXPLAIN"] = [{"QUERY PLAN": [{"Plan": {"Node Type": "Seq Scan", "Plan Rows": 250000}}]}]
+        queries.results["SELECT COUNT(*)"] = [{"count": 999}]
+        repository = AccountRepository(user_id=3, user_role="user")
+
+        assert repository.count_rows("SELECT 1 FROM accounts", count="estimate") == (250000, True)
+        assert queries[-1][0] == "EXPLAIN (FORMAT JSON) SELECT 1 FROM accounts"
+
+        queries.results["EXPLAIN"] = [{"QUERY PLAN": '[{"Plan": {"Plan Rows": 12}}]'}]
+        assert repository.count_rows("SELECT 1 FROM accounts", count="estimate") == (999, False)
+
+        with pytest.raises(ValueError):
+            repository.count_rows("SELECT 1 FROM accounts", count="approximately")
@@ -0,0 +1,74 @@
+"""
+Unit tests for the time partition maintenance.
+"""
+
+from datetime import datetime, timezone
+import pytest
+from db import partitions
+from db.partitions import (
+    create_time_partitions, drop_time_partitions, ensure_time_partitions,
+    CREATE_TIME_PARTITIONS_QUERY, DROP_TIME_PARTITIONS_QUERY
+)
+from timeseries import aggregator
+from tests.utils.fake_db import FakeConnection, fake_connection_factory
+
+@pytest.fixture
+def fake_connection(monkeypatch):
+    """Route the connections of the partition maintenance and the aggregator to a fake connection."""
+    connection = FakeConnection()
+    monkeypatch.setattr(partitions, "get_db_connection", fake_connection_factory(connection))
+    monkeypatch.setattr(aggregator, "get_user_db_connection", fake_connection_factory(connection))
+    return connection
+
+class TestPartitions:
+    """Tests for the time partition maintenance."""
+
+    @pytest.mark.unit
+    def test_create_partitions(self, fake_connection):
+        """Test that partitions are created with the range of their table."""
+        fake_connection.results = [(3,)]
+        cursor = fake_connection.cursor()
+
+        assert create_time_partitions(cursor, "logs", 7) == 3
+        assert fake_connection.executed == [(CREATE_TIME_PARTITIONS_QUERY, ("logs", "1 week", 7))]
+
+    @pytest.mark.unit
+    def test_drop_partitions(self, fake_connection):
+        """Test that only time-partitioned tables have their partitions dropped."""
+        fake_connection.results = [(1200,)]
+        cursor = fake_connection.cursor()
+        cutoff = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+        assert drop_time_partitions(cursor, "timeseries_data", cutoff) == 1200
+        assert fake_connection.executed == [(DROP_TIME_PARTITIONS_QUERY, ("timeseries_data", cutoff))]
+
+        with pytest.raises(ValueError):
+            drop_time_partitions(cursor, "accounts", cutoff)
+
+    @pytest.mark.unit
+    def test_ensure_partitions_per_table(self, fake_connection):
+        """Test that a failure on one table does not prevent the others from being maintained."""
+        def fail_timeseries_data(cursor, query, params):
+            if params[0] == "timeseries_data":
+                raise RuntimeError("permission denied")
+
+        fake_connection.results = [(2,)]
+        fake_connection.on_execute = fail_timeseries_data
+
+        assert ensure_time_partitions(days_ahead=14) == {"logs": 2}
+        assert fake_connection.executed == [(CREATE_TIME_PARTITIONS_QUERY, ("logs", "1 week", 14))]
+        assert fake_connection.commits == 1
+        assert fake_connection.rollbacks == 1
+
+    @pytest.mark.unit
+    def test_raw_retention_drops_partitions(self, fake_connection):
+        """Test that the raw data retention drops partitions instead of deleting rows."""
+        fake_connection.results = [(0,)]
+        aggregator.clean_old_data()
+
+        drops = fake_connection.executions(DROP_TIME_PARTITIONS_QUERY)
+        assert len(drops) == 1
+        assert drops[0][0] == "timeseries_data"
+        assert drops[0][1].tzinfo is not None
+        assert not any("DELETE FROM public.timeseries_data" in query for query, _ in fake_connection.executed)
+        assert fake_connection.commits == 1
@@ -0,0 +1,55 @@
+"""
+Unit tests for the table extraction of the query analyzer.
+"""
+
+import pytest
+from db.query_analyzer import get_tables_from_query, get_write_tables_from_query
+
+class TestQueryAnalyzer:
+    """Tests for the table extraction of the query analyzer."""
+
+    @pytest.mark.unit
+    def test_get_tables_from_query(self):
+        """Test get_tables_from_query function."""
+        # Aliases, joins and schema-qualified names
+        assert get_tables_from_query(
+            "SELECT a.id FROM public.accounts a JOIN vms v ON v.id = a.vm_id LEFT JOIN \"Hardware\" h ON true"
+        ) == ["accounts", "hardware", "vms"]
+
+        # Comma-separated FROM lists and subqueries
+        assert get_tables_from_query("SELECT * FROM a x, b y WHERE x.id IN (SELECT id FROM c)") == ["a", "b", "c"]
+
+        # Function calls are not tables
+        assert get_tables_from_query("SELECT * FROM a x, generate_series(1, 2) s, b") == ["a", "b"]
+        assert get_tables_from_query("SELECT * FROM unnest(%s) AS ids") == []
+
+        # Keywords and string literals are ignored
+        assert get_tables_from_query("SELECT 'FROM users' AS text -- FROM logs") == []
+        assert get_tables_from_query("SELECT EXTRACT(epoch FROM now())") == []
+
+        # Writes are included
+        assert get_tables_from_query("INSERT INTO logs (message) SELECT message FROM logs_archive") == ["logs", "logs_archive"]
+
+    @pytest.mark.unit
+    def test_get_write_tables_from_query(self):
+        """Test get_write_tables_from_query function."""
+        assert get_write_tables_from_query("INSERT INTO accounts (id) VALUES (%s)") == ["accounts"]
+        assert get_write_tables_from_query("UPDATE vms SET name = %s WHERE id = %s") == ["vms"]
+        assert get_write_tables_from_query("DELETE FROM logs WHERE id = %s") == ["logs"]
+        assert get_write_tables_from_query("TRUNCATE a, b") == ["a", "b"]
+        assert get_write_tables_from_query(
+            "WITH old AS (DELETE FROM logs RETURNING id) SELECT count(*) FROM old"
+        ) == ["logs"]
+
+        # Upserts write only their target table
+        assert get_write_tables_from_query(
+            "INSERT INTO accounts (id) VALUES (%s) ON CONFLICT (id) DO UPDATE SET id = EXCLUDED.id"
+        ) == ["accounts"]
+
+        # Functions known to write
+        assert get_write_tables_from_query("SELECT add_log_entry(%s, %s)") == ["logs"]
+        assert get_write_tables_from_query("SELECT cleanup_old_logs() as deleted_count") == ["logs"]
+
+        # Reads and locking reads write nothing
+        assert get_write_tables_from_query("SELECT * FROM accounts") == []
+        assert get_write_tables_from_query("SELECT * FROM accounts FOR UPDATE SKIP LOCKED") == []
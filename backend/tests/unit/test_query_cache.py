@@ -0,0 +1,368 @@
+"""
+Unit tests for the query cache.
+"""
+
+import threading
+import time
+import pytest
+from db import query_cache
+from db.query_cache import (
+    generate_cache_key, get_rls_identity, get_from_cache, put_in_cache,
+    invalidate_cache, invalidate_cache_by_prefix, invalidate_cache_by_identity,
+    invalidate_cache_by_table, invalidate_cache_for_query, evict_expired_entries, get_cache_stats, reset_cache_stats, set_cache_size,
+    set_cache_max_bytes, cached_query, cache_context
+)
+from db.access import DatabaseAccess
+from tests.utils.fake_db import FakeConnection, fake_connection_factory
+
+class FakeAccess:
+    """Stand-in for DatabaseAccess that counts executed queries."""
+
+    def __init__(self, user_id=None, user_role=None):
+        self.user_id = user_id
+        self.user_role = user_role
+        self.calls = 0
+
+    @cached_query()
+    def execute_query(self, query, params=None, with_rls=True):
+        self.calls += 1
+        return [{"user_id": self.user_id, "params": params}]
+
+    @cached_query(ttl=1)
+    def execute_short_lived_query(self, query, params=None, with_rls=True):
+        self.calls += 1
+        return [{"calls": self.calls}]
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    """Start every test with an empty cache and the default limits."""
+    size = query_cache.DEFAULT_CACHE_SIZE
+    max_bytes = query_cache.DEFAULT_CACHE_MAX_BYTES
+    invalidate_cache()
+    reset_cache_stats()
+    yield
+    set_cache_size(size)
+    set_cache_max_bytes(max_bytes)
+    invalidate_cache()
+    reset_cache_stats()
+
+class TestQueryCache:
+    """Tests for the query cache."""
+
+    @pytest.mark.unit
+    def test_generate_cache_key(self):
+        """Test generate_cache_key function."""
+        query = "SELECT * FROM accounts WHERE id = %s"
+
+        # Keys are stable for equal inputs
+        assert generate_cache_key(query, (1,)) == generate_cache_key(query, [1])
+        assert generate_cache_key(query, {"id": 1}) == generate_cache_key(query, {"id": 1})
+
+        # Single values and mappings are part of the key
+        assert generate_cache_key(query, 1) != generate_cache_key(query, 2)
+        assert generate_cache_key(query, {"id": 1}) != generate_cache_key(query, {"id": 2})
+
+        # Values that compare equal in Python but not in SQL get different keys
+        assert generate_cache_key(query, (1,)) != generate_cache_key(query, (True,))
+        assert generate_cache_key(query, (1,)) != generate_cache_key(query, (1.0,))
+
+        # The RLS identity is part of the key
+        assert generate_cache_key(query, (1,), ("1", "admin")) != generate_cache_key(query, (1,), ("2", "user"))
+
+    @pytest.mark.unit
+    def test_get_rls_identity(self):
+        """Test get_rls_identity function."""
+        assert get_rls_identity(1, "admin") == ("1", "admin")
+        assert get_rls_identity("1", "admin") == ("1", "admin")
+        assert get_rls_identity(1, "admin", with_rls=False) is None
+        assert get_rls_identity(None, "admin") is None
+        assert get_rls_identity(1, None) is None
+
+    @pytest.mark.unit
+    def test_lru_eviction(self):
+        """Test that the least recently used entries are evicted first."""
+        set_cache_size(len(query_cache._stripes))  # one item per stripe
+
+        # Find three keys that land in the same stripe
+        stripe = query_cache._get_stripe(generate_cache_key("SELECT 0"))
+        keys = [key for key in (generate_cache_key(f"SELECT {i}") for i in range(1000))
+                if query_cache._get_stripe(key) is stripe][:2]
+
+        put_in_cache(keys[0], "first")
+        put_in_cache(keys[1], "second")
+
+        assert get_from_cache(keys[0]) is None
+        assert get_from_cache(keys[1])[0] == "second"
+        assert get_cache_stats()["evictions"] == 1
+
+    @pytest.mark.unit
+    def test_lru_order_follows_access(self):
+        """Test that reading an entry protects it from eviction."""
+        set_cache_size(2 * len(query_cache._stripes))  # two items per stripe
+
+        stripe = query_cache._get_stripe(generate_cache_key("SELECT 0"))
+        keys = [key for key in (generate_cache_key(f"SELECT {i}") for i in range(1000))
+                if query_cache._get_stripe(key) is stripe][:3]
+
+        put_in_cache(keys[0], "first")
+        put_in_cache(keys[1], "second")
+        assert get_from_cache(keys[0])[0] == "first"
+        put_in_cache(keys[2], "third")
+
+        assert get_from_cache(keys[0])[0] == "first"
+        assert get_from_cache(keys[1]) is None
+        assert get_from_cache(keys[2])[0] == "third"
+
+    @pytest.mark.unit
+    def test_per_entry_ttl(self):
+        """Test that every entry expires after its own TTL."""
+        short_key = generate_cache_key("SELECT 1")
+        long_key = generate_cache_key("SELECT 2")
+
+        put_in_cache(short_key, "short", ttl=0)
+        put_in_cache(long_key, "long", ttl=60)
+
+        assert get_from_cache(short_key) is None
+        assert get_from_cache(long_key)[0] == "long"
+        assert get_cache_stats()["expirations"] == 1
+
+    @pytest.mark.unit
+    def test_evict_expired_entries(self):
+        """Test evict_expired_entries function."""
+        for i in range(10):
+            put_in_cache(generate_cache_key(f"SELECT {i}"), i, ttl=0 if i % 2 else 60)
+
+        assert evict_expired_entries() == 5
+        assert get_cache_stats()["size"] == 5
+
+    @pytest.mark.unit
+    def test_byte_limit(self):
+        """Test that the cache stays within its byte limit."""
+        set_cache_max_bytes(64 * 1024)
+        value = [{"name": "x" * 100} for _ in range(10)]
+
+        for i in range(1000):
+            put_in_cache(generate_cache_key(f"SELECT {i}"), value)
+
+        stats = get_cache_stats()
+        assert 0 < stats["bytes"] <= 64 * 1024
+        assert stats["evictions"] > 0
+
+        # A value larger than a whole stripe is not cached
+        huge_key = generate_cache_key("SELECT huge")
+        assert put_in_cache(huge_key, ["x" * 64 * 1024]) is False
+        assert get_from_cache(huge_key) is None
+
+    @pytest.mark.unit
+    def test_invalidate_cache(self):
+        """Test invalidating single keys, prefixes, identities and the whole cache."""
+        admin_key = generate_cache_key("SELECT * FROM accounts", None, ("1", "admin"))
+        user_key = generate_cache_key("SELECT * FROM accounts", None, ("2", "user"))
+        vms_key = generate_cache_key("SELECT * FROM vms", None, ("2", "user"))
+
+        for key in (admin_key, user_key, vms_key):
+            put_in_cache(key, "value")
+
+        invalidate_cache(admin_key)
+        assert get_from_cache(admin_key) is None
+        assert get_from_cache(user_key) is not None
+
+        invalidate_cache_by_prefix("SELECT * FROM vms")
+        assert get_from_cache(vms_key) is None
+        assert get_from_cache(user_key) is not None
+
+        put_in_cache(admin_key, "value")
+        invalidate_cache_by_identity(("2", "user"))
+        assert get_from_cache(user_key) is None
+        assert get_from_cache(admin_key) is not None
+
+        invalidate_cache()
+        assert get_cache_stats()["size"] == 0
+
+    @pytest.mark.unit
+    def test_invalidate_cache_by_table(self):
+        """Test that a write only invalidates the entries reading the written tables."""
+        accounts_key = generate_cache_key("SELECT * FROM accounts_with_rls", None, ("1", "admin"))
+        join_key = generate_cache_key("SELECT * FROM vms v JOIN accounts a ON a.vm_id = v.id", None, ("2", "user"))
+        logs_key = generate_cache_key("SELECT * FROM logs", None, ("1", "admin"))
+        unknown_key = generate_cache_key("SELECT 1")
+
+        for key in (accounts_key, join_key, logs_key, unknown_key):
+            put_in_cache(key, "value")
+
+        # Writing logs keeps the account entries, but drops entries with unknown tables
+        invalidate_cache_for_query("SELECT add_log_entry(%s, %s)")
+        assert get_from_cache(logs_key) is None
+        assert get_from_cache(unknown_key) is None
+        assert get_from_cache(accounts_key) is not None
+        assert get_from_cache(join_key) is not None
+
+        # RLS views are invalidated with their table, for every identity
+        invalidate_cache_by_table("accounts")
+        assert get_from_cache(accounts_key) is None
+        assert get_from_cache(join_key) is None
+        assert get_cache_stats()["size"] == 0
+
+        # Statements whose tables are unknown invalidate everything
+        put_in_cache(accounts_key, "value")
+        invalidate_cache_for_query("CREATE INDEX idx ON accounts (id)")
+        assert get_from_cache(accounts_key) is None
+
+    @pytest.mark.unit
+    def test_per_table_stats(self):
+        """Test that the cache reports hit rates per table."""
+        access = FakeAccess(1, "admin")
+
+        access.execute_query("SELECT * FROM accounts")
+        access.execute_query("SELECT * FROM accounts")
+        access.execute_query("SELECT * FROM accounts")
+        access.execute_query("SELECT * FROM vms")
+        invalidate_cache_by_table("vms")
+
+        tables = get_cache_stats()["tables"]
+        assert tables["accounts"] == {"hits": 2, "misses": 1, "invalidations": 0, "entries": 1, "hit_rate": 66.67}
+        assert tables["vms"] == {"hits": 0, "misses": 1, "invalidations": 1, "entries": 0, "hit_rate": 0}
+
+        reset_cache_stats()
+        assert get_cache_stats()["tables"]["accounts"]["hits"] == 0
+
+    @pytest.mark.unit
+    def test_cached_query_does_not_cache_writes(self):
+        """Test that decorated calls running a write are not cached and invalidate the written tables."""
+        access = FakeAccess(1, "admin")
+
+        access.execute_query("SELECT * FROM logs")
+        access.execute_query("SELECT * FROM accounts")
+        access.execute_query("SELECT cleanup_old_logs() as deleted_count")
+        access.execute_query("SELECT cleanup_old_logs() as deleted_count")
+        assert access.calls == 4
+
+        access.execute_query("SELECT * FROM logs")
+        access.execute_query("SELECT * FROM accounts")
+        assert access.calls == 5
+
+    @pytest.mark.unit
+    def test_writes_invalidate_after_commit(self, monkeypatch):
+        """Test that a result cached by a read running before the commit of a write is invalidated."""
+        key = generate_cache_key("SELECT * FROM accounts", None, ("1", "admin"))
+        connection = FakeConnection()
+        commit = connection.commit
+
+        def read_then_commit():
+            # A read in this process caches the rows the write is replacing before it commits
+            put_in_cache(key, ["old"])
+            commit()
+
+        connection.commit = read_then_commit
+        monkeypatch.setattr(DatabaseAccess, "get_connection", fake_connection_factory(connection))
+
+        DatabaseAccess(1, "admin").execute_command("UPDATE accounts SET lock = true")
+
+        assert connection.commits == 1
+        assert get_from_cache(key) is None
+
+    @pytest.mark.unit
+    def test_transactions_invalidate_written_tables(self, monkeypatch):
+        """Test that a committed transaction invalidates the tables written by its statements."""
+        accounts_key = generate_cache_key("SELECT * FROM accounts", None, ("1", "admin"))
+        logs_key = generate_cache_key("SELECT * FROM logs", None, ("1", "admin"))
+        put_in_cache(accounts_key, ["old"])
+        put_in_cache(logs_key, ["kept"])
+        connection = FakeConnection()
+        monkeypatch.setattr(DatabaseAccess, "get_connection", fake_connection_factory(connection))
+
+        assert DatabaseAccess(1, "admin").execute_transaction([
+            ("SELECT id FROM logs WHERE id = %s", (1,)),
+            ("UPDATE accounts SET lock = true WHERE id = %s", (2,))
+        ])
+
+        assert connection.commits == 1
+        assert get_from_cache(accounts_key) is None
+        assert get_from_cache(logs_key) is not None
+
+    @pytest.mark.unit
+    def test_cached_query_is_keyed_per_rls_identity(self):
+        """Test that results are shared per RLS identity and never across identities."""
+        query = "SELECT * FROM accounts"
+
+        admin = FakeAccess(1, "admin")
+        other_admin = FakeAccess(1, "admin")
+        user = FakeAccess(2, "user")
+
+        assert admin.execute_query(query) == [{"user_id": 1, "params": None}]
+        assert other_admin.execute_query(query) == [{"user_id": 1, "params": None}]
+        assert user.execute_query(query) == [{"user_id": 2, "params": None}]
+
+        # Instances with the same identity share entries
+        assert admin.calls == 1
+        assert other_admin.calls == 0
+        assert user.calls == 1
+
+        # Without RLS context every caller sees the same rows
+        admin.execute_query(query, None, False)
+        user.execute_query(query, with_rls=False)
+        assert admin.calls + user.calls == 3
+
+    @pytest.mark.unit
+    def test_cached_query_params(self):
+        """Test that parameters are part of the key of decorated calls."""
+        access = FakeAccess(1, "admin")
+
+        access.execute_query("SELECT %s", (1,))
+        access.execute_query("SELECT %s", (2,))
+        access.execute_query("SELECT %s", params=(1,))
+
+        assert access.calls == 2
+
+    @pytest.mark.unit
+    def test_cached_query_ttl(self):
+        """Test that the TTL of the decorator is applied to its entries."""
+        access = FakeAccess(1, "admin")
+
+        assert access.execute_short_lived_query("SELECT 1") == [{"calls": 1}]
+        assert access.execute_short_lived_query("SELECT 1") == [{"calls": 1}]
+
+        time.sleep(1.1)
+        assert access.execute_short_lived_query("SELECT 1") == [{"calls": 2}]
+
+    @pytest.mark.unit
+    def test_cache_context(self):
+        """Test that the cache can be disabled for a block."""
+        access = FakeAccess(1, "admin")
+
+        with cache_context(enable=False):
+            access.execute_query("SELECT 1")
+            access.execute_query("SELECT 1")
+
+        assert access.calls == 2
+        assert get_cache_stats()["size"] == 0
+
+    @pytest.mark.unit
+    def test_concurrent_access(self):
+        """Test that concurrent readers and writers keep the cache consistent."""
+        set_cache_size(256)
+        errors = []
+
+        def worker(worker_id):
+            try:
+                for i in range(2000):
+                    key = generate_cache_key(f"SELECT {i % 512}", (worker_id,))
+                    cached = get_from_cache(key)
+                    if cached is not None and cached[0] != (worker_id, i % 512):
+                        errors.append((worker_id, cached[0]))
+                    put_in_cache(key, (worker_id, i % 512))
+            except Exception as e:
+                errors.append((worker_id, e))
+
+        threads = [threading.Thread(target=worker, args=(worker_id,)) for worker_id in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = get_cache_stats()
+        assert errors == []
+        assert stats["size"] <= 256 + len(query_cache._stripes)
+        assert stats["bytes"] == sum(entry[2] for stripe in query_cache._stripes for entry in stripe.entries.values())
+        assert all(key in stripe.entries for stripe in query_cache._stripes
+                   for keys in stripe.tables.values() for key in keys)
@@ -0,0 +1,162 @@
+"""
+Unit tests for the streaming utilities.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import pytest
+from utils.stream_utils import (
+    UploadTooLargeError, MultipartFileReader, decode_chunks,
+    IncrementalCsvReader, IncrementalJsonArrayParser
+)
+
+BOUNDARY = "upload-boundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+def _multipart_body(content, filename="accounts.csv", field_name="file", content_type="text/csv"):
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="note"\r\n\r\n'
+        f"not the file\r\n"
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+async def _stream(data, chunk_size):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+async def _read_file(reader):
+    return b"".join([chunk async for chunk in reader.chunks()])
+
+def _split(text, size):
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+class TestMultipartFileReader:
+    """Tests for the multipart file reader."""
+
+    @pytest.mark.unit
+    def test_file_read_across_chunks(self):
+        """Test that the file field is read with its headers, whatever the chunks of the body."""
+        content = b"id,name\r\n1,\xc3\xa9\r\n" * 50
+        for chunk_size in (1, 7, 4096):
+            reader = MultipartFileReader(_stream(_multipart_body(content), chunk_size), CONTENT_TYPE)
+
+            assert asyncio.run(_read_file(reader)) == content
+            assert reader.filename == "accounts.csv"
+            assert reader.content_type == "text/csv"
+            assert reader.size == len(content)
+
+    @pytest.mark.unit
+    def test_size_limit_enforced_while_reading(self):
+        """Test that a file over the limit is rejected before the rest of the body is read."""
+        received = []
+
+        async def stream():
+            for chunk in _split(_multipart_body(b"x" * 1000), 100):
+                received.append(chunk)
+                yield chunk
+
+        reader = MultipartFileReader(stream(), CONTENT_TYPE, max_size=300)
+
+        with pytest.raises(UploadTooLargeError, match="File too large"):
+            asyncio.run(_read_file(reader))
+        assert len(received) < 10
+
+    @pytest.mark.unit
+    def test_invalid_bodies_rejected(self):
+        """Test that bodies that are not multipart, have no file or end early are rejected."""
+        with pytest.raises(ValueError):
+            MultipartFileReader(_stream(b"{}", 10), "application/json")
+
+        reader = MultipartFileReader(_stream(_multipart_body(b"1", field_name="other"), 10), CONTENT_TYPE)
+        with pytest.raises(ValueError, match="No 'file' file"):
+            asyncio.run(reader.open())
+
+        body = _multipart_body(b"id\n1\n")
+        reader = MultipartFileReader(_stream(body[:-30], 10), CONTENT_TYPE)
+        with pytest.raises(ValueError):
+            asyncio.run(_read_file(reader))
+
+class TestIncrementalParsers:
+    """Tests for the incremental decoding and parsers."""
+
+    @pytest.mark.unit
+    def test_characters_split_between_chunks_decoded(self):
+        """Test that multi-byte characters split between chunks and a byte order mark are decoded."""
+        async def decode(data):
+            return "".join([text async for text in decode_chunks(_stream(data, 1))])
+
+        assert asyncio.run(decode("﻿é€😀".encode())) == "é€😀"
+        with pytest.raises(UnicodeDecodeError):
+            asyncio.run(decode(b"ok\xff"))
+
+    @pytest.mark.unit
+    def test_csv_rows_match_dict_reader(self):
+        """Test that rows fed in any chunks, including quoted fields with newlines, match csv.DictReader."""
+        text = 'id,note,"quoted ""header"""\n1,"multi\nline, with comma",a\n2,"",b\r\n3,plain,"x""y"\n4,last,z'
+        expected = list(csv.DictReader(io.StringIO(text, newline="")))
+
+        for size in (1, 2, 5, 13, len(text)):
+            reader = IncrementalCsvReader()
+            rows = []
+            for chunk in _split(text, size):
+                rows.extend(reader.feed(chunk))
+            rows.extend(reader.close())
+
+            assert rows == expected
+            assert reader.fieldnames == ["id", "note", 'quoted "header"']
+
+    @pytest.mark.unit
+    def test_json_items_returned_when_complete(self):
+        """Test that array items are returned once complete, and any document matches json.loads."""
+        parser = IncrementalJsonArrayParser()
+        assert parser.feed('[{"id": 1}, {"id"') == [{"id": 1}]
+        assert parser.feed(': 2}, 12') == [{"id": 2}]
+        assert parser.feed('3]') == [123]
+        assert parser.close() == []
+
+        for text in ('[]', ' [1, "a,]", [2, [3]], {"b": null}, true] ', '{"id": "single"}', '42', '[1.5e-3, -20, "\\"]"]'):
+            for size in (1, 3, len(text)):
+                parser = IncrementalJsonArrayParser()
+                items = []
+                for chunk in _split(text, size):
+                    items.extend(parser.feed(chunk))
+                items.extend(parser.close())
+
+                document = json.loads(text)
+                assert items == (document if isinstance(document, list) else [document])
+
+    @pytest.mark.unit
+    def test_json_errors_located_in_document(self):
+        """Test that invalid JSON raises an error at its position in the whole document."""
+        for text in ('[1, 2\n, {"a": }]', '[1, 2', '[1] 2', '[1 2]', ''):
+            with pytest.raises(json.JSONDecodeError) as expected:
+                json.loads(text)
+
+            parser = IncrementalJsonArrayParser()
+            with pytest.raises(json.JSONDecodeError) as error:
+                for chunk in _split(text, 2):
+                    parser.feed(chunk)
+                parser.close()
+
+            assert (error.value.msg, error.value.pos, error.value.lineno, error.value.colno) == (
+                expected.value.msg, expected.value.pos, expected.value.lineno, expected.value.colno
+            )
+
+    @pytest.mark.unit
+    def test_invalid_json_item_rejected_once_received(self):
+        """Test that an invalid item is rejected when its end is received, not at the end of the document."""
+        for item in ('{"a": }', '[1, 2,]', 'nul', '"a\\x"'):
+            parser = IncrementalJsonArrayParser()
+            assert parser.feed('[1, ') == [1]
+            assert parser.feed(item[:-1]) == []
+            with pytest.raises(json.JSONDecodeError):
+                parser.feed(item[-1] + ', 2')
+
+        parser = IncrementalJsonArrayParser()
+        with pytest.raises(json.JSONDecodeError):
+            parser.feed('[{"a": }, ' + '{"b": 1}, ' * 1000)
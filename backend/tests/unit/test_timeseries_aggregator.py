@@ -0,0 +1,145 @@
+"""
+Unit tests for the set-based timeseries aggregation and the rollup cascade.
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from timeseries import aggregator
+from timeseries.aggregator import (
+    aggregate_metrics, get_aggregation_stats, get_rollup_source, rollup_period, rollup_metrics,
+    AGGREGATE_PERIOD_QUERY, ROLLUP_FROM_RAW_QUERY, ROLLUP_FROM_AGGREGATES_QUERY
+)
+from tests.utils.fake_db import FakeConnection, fake_connection_factory
+
+@pytest.fixture
+def fake_connection(monkeypatch):
+    """Route the aggregator's connections to a fake connection."""
+    connection = FakeConnection()
+    monkeypatch.setattr(aggregator, "get_user_db_connection", fake_connection_factory(connection))
+    monkeypatch.setattr(aggregator, "_aggregation_stats", {})
+    return connection
+
+@pytest.fixture
+def all_periods(monkeypatch):
+    """Enable every aggregation period."""
+    periods = {"hourly": True, "daily": True, "weekly": True, "monthly": True}
+    monkeypatch.setitem(aggregator.timeseries_config["aggregation"], "periods", periods)
+    return periods
+
+class TestAggregator:
+    """Tests for the timeseries aggregator."""
+
+    @pytest.mark.unit
+    def test_one_statement_per_period(self, fake_connection):
+        """Test that a period is aggregated by a single statement and commit."""
+        fake_connection.rowcount = 1500
+        start_time = datetime(2026, 1, 1, 10)
+        end_time = start_time + timedelta(hours=1)
+
+        assert aggregate_metrics("hourly", start_time, end_time) == (1500, 0)
+
+        assert len(fake_connection.executed) == 1
+        query, params = fake_connection.executed[0]
+        assert query == AGGREGATE_PERIOD_QUERY
+        assert params == {"period_type": "hourly", "start_time": start_time, "end_time": end_time}
+        assert fake_connection.commits == 1
+
+    @pytest.mark.unit
+    def test_query_groups_and_upserts(self):
+        """Test that the statement groups by series and upserts on the bucket index."""
+        assert "GROUP BY td.series_id" in AGGREGATE_PERIOD_QUERY
+        assert "JOIN public.timeseries_series s ON s.id = d.series_id" in AGGREGATE_PERIOD_QUERY
+        assert "ON CONFLICT (metric_id, period_type, period_start, entity_type, entity_id, owner_id)" in AGGREGATE_PERIOD_QUERY
+
+    @pytest.mark.unit
+    def test_runtime_is_reported_per_period(self, fake_connection):
+        """Test that runs and failures are recorded per period type."""
+        start_time = datetime(2026, 1, 1)
+        fake_connection.rowcount = 10
+        aggregate_metrics("hourly", start_time, start_time + timedelta(hours=1))
+        aggregate_metrics("daily", start_time, start_time + timedelta(days=1))
+
+        fake_connection.error = RuntimeError("database unavailable")
+        assert aggregate_metrics("daily", start_time, start_time + timedelta(days=1)) == (0, 1)
+        assert fake_connection.rollbacks == 1
+
+        stats = get_aggregation_stats()
+        assert stats["hourly"]["runs"] == 1
+        assert stats["hourly"]["last_rows"] == 10
+        assert stats["hourly"]["last_duration"] >= 0
+        assert stats["daily"]["runs"] == 2
+        assert stats["daily"]["failures"] == 1
+        assert stats["daily"]["last_rows"] == 0
+
+class TestRollupCascade:
+    """Tests for the incremental rollup cascade."""
+
+    @pytest.mark.unit
+    def test_rollup_sources(self, all_periods):
+        """Test that each period type is built from the finest enabled one."""
+        assert get_rollup_source("hourly") is None
+        assert get_rollup_source("daily") == "hourly"
+        assert get_rollup_source("weekly") == "daily"
+        assert get_rollup_source("monthly") == "daily"
+
+        all_periods["daily"] = False
+        assert get_rollup_source("weekly") == "hourly"
+
+        all_periods["hourly"] = False
+        assert get_rollup_source("daily") is None
+        assert get_rollup_source("monthly") is None
+
+    @pytest.mark.unit
+    def test_newly_closed_buckets(self, fake_connection, all_periods):
+        """Test that the buckets between the watermark and the last closed one are rolled up once."""
+        watermark = datetime(2026, 1, 1, 10)
+        limit = watermark + timedelta(hours=3)
+        fake_connection.rowcount = 30
+        fake_connection.results = [(watermark,), (limit,), []]
+
+        assert rollup_period("hourly") == (30, 0)
+
+        rollups = fake_connection.executions(ROLLUP_FROM_RAW_QUERY)
+        assert len(rollups) == 1
+        assert rollups[0]["start_time"] == watermark
+        assert rollups[0]["end_time"] == limit
+        assert rollups[0]["unit"] == "hour"
+        assert any("SET rolled_up_to" in query and params == (limit, "hourly") for query, params in fake_connection.executed)
+        assert fake_connection.commits == 1
+
+    @pytest.mark.unit
+    def test_nothing_closed(self, fake_connection, all_periods):
+        """Test that nothing is rolled up before a bucket closes."""
+        watermark = datetime(2026, 1, 1)
+        fake_connection.results = [(watermark,), (watermark,), []]
+
+        assert rollup_period("daily") == (0, 0)
+        assert fake_connection.executions(ROLLUP_FROM_AGGREGATES_QUERY) == []
+        assert not any("SET rolled_up_to" in query for query, _ in fake_connection.executed)
+
+    @pytest.mark.unit
+    def test_dirty_buckets(self, fake_connection, all_periods):
+        """Test that dirty buckets are rolled up again and mark their coarser buckets."""
+        watermark = datetime(2026, 1, 5)
+        bucket = datetime(2026, 1, 3)
+        fake_connection.results = [(watermark,), (watermark,), [(bucket, bucket + timedelta(days=1))]]
+
+        rollup_period("daily")
+
+        rollups = fake_connection.executions(ROLLUP_FROM_AGGREGATES_QUERY)
+        assert len(rollups) == 1
+        assert rollups[0]["source"] == "hourly"
+        assert rollups[0]["start_time"] == bucket
+
+        marked = [params[0] for query, params in fake_connection.executed if "INSERT INTO public.timeseries_rollup_dirty" in query]
+        assert marked == ["weekly", "monthly"]
+
+    @pytest.mark.unit
+    def test_cascade_order(self, monkeypatch, all_periods):
+        """Test that the cascade runs the enabled period types finest first."""
+        calls = []
+        monkeypatch.setattr(aggregator, "rollup_period", lambda period_type, **kwargs: calls.append(period_type) or (0, 0))
+        all_periods["weekly"] = False
+
+        assert list(rollup_metrics()) == ["hourly", "daily", "monthly"]
+        assert calls == ["hourly", "daily", "monthly"]
@@ -0,0 +1,97 @@
+"""
+Unit tests for the timeseries collector.
+"""
+
+import pytest
+from timeseries import scheduler, collector, vm_status
+from timeseries.collector import collect_account_metrics, collect_vm_metrics, sample_cpu_usage
+from timeseries.scheduler import CollectionCycle
+from timeseries.storage import GLOBAL_SCOPE
+from timeseries.vm_status import collect_vm_status_distribution, INSERT_VM_STATUS_DISTRIBUTION_QUERY
+from tests.utils.fake_db import FakeConnection, fake_connection_factory
+
+@pytest.fixture
+def fake_connection(monkeypatch):
+    """Route the collection cycles' connections to a fake connection returning scripted results."""
+    connection = FakeConnection()
+    monkeypatch.setattr(scheduler, "get_user_db_connection", fake_connection_factory(connection))
+    return connection
+
+class TestCollector:
+    """Tests for the timeseries collector."""
+
+    @pytest.mark.unit
+    def test_account_metrics_are_global(self, fake_connection):
+        """Test that system-wide account metrics are collected once, without an owner."""
+        fake_connection.results.append((10, 3))
+
+        metrics = collect_account_metrics()
+
+        assert {metric["metric_name"]: metric["value"] for metric in metrics} == {
+            "account_count": 10,
+            "account_locked_count": 3,
+            "account_active_count": 7
+        }
+        for metric in metrics:
+            assert metric["scope"] == GLOBAL_SCOPE
+            assert "owner_id" not in metric
+
+    @pytest.mark.unit
+    def test_vm_metrics_keep_owners(self, fake_connection):
+        """Test that VM counts are global while per-VM metrics keep their owner."""
+        fake_connection.results.extend([
+            [(5, "running", 12.5, 3600, 7), (6, "running", None, None, 7), (8, "stopped", None, None, 9)],
+            []
+        ])
+
+        metrics = collect_vm_metrics()
+
+        counts = {metric["metric_name"]: metric["value"] for metric in metrics if metric["entity_type"] == "system"}
+        assert counts == {"vm_count": 3, "vm_running_count": 2, "vm_stopped_count": 1, "vm_error_count": 0}
+        assert all(metric["scope"] == GLOBAL_SCOPE for metric in metrics if metric["entity_type"] == "system")
+
+        vm_metrics = [metric for metric in metrics if metric["entity_type"] == "vm"]
+        assert {metric["metric_name"] for metric in vm_metrics} == {"vm_cpu_usage", "vm_uptime"}
+        assert all(metric["owner_id"] == 7 and "scope" not in metric for metric in vm_metrics)
+
+    @pytest.mark.unit
+    def test_cycle_shares_vms(self, fake_connection, monkeypatch):
+        """Test that the VM sources of a cycle query the VMs once, and commit every cursor's transaction."""
+        inserted = []
+        monkeypatch.setattr(vm_status, "execute_values", lambda cursor, query, rows: inserted.append((query, rows)))
+        fake_connection.results.extend([
+            [(5, "running", 12.5, 3600, 7), (8, "error", None, None, 9), (9, "stopped", None, None, None)],
+            []
+        ])
+
+        cycle = CollectionCycle()
+        collect_vm_metrics(cycle)
+        data_points = collect_vm_status_distribution(cycle)
+        cycle.close()
+
+        # The VMs, the agents and the distribution, each on a connection of its own
+        assert fake_connection.opened == 3
+        assert sum(scheduler.CYCLE_VMS_QUERY in query for query, _ in fake_connection.executed) == 1
+        assert fake_connection.commits == 3
+
+        query, rows = inserted[0]
+        assert query == INSERT_VM_STATUS_DISTRIBUTION_QUERY
+        assert [row[1:] for row in rows] == [(1, 0, 0, 7), (0, 0, 1, 9)]
+        assert len(data_points) == 6
+        assert all(point["timestamp"] == cycle.timestamp for point in data_points)
+
+    @pytest.mark.unit
+    def test_cpu_usage_since_previous_sample(self, monkeypatch):
+        """Test that the CPU usage is measured between two samples instead of blocking."""
+        class Times(tuple):
+            @property
+            def idle(self):
+                return self[1]
+
+        samples = iter([Times((100.0, 100.0)), Times((130.0, 170.0))])
+        monkeypatch.setattr(collector.psutil, "cpu_times", lambda: next(samples))
+        monkeypatch.setattr(collector.psutil, "cpu_percent", None)
+
+        sample_cpu_usage()
+
+        assert sample_cpu_usage() == 30.0
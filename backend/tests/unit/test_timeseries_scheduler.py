@@ -0,0 +1,116 @@
+"""
+Unit tests for the timeseries collection scheduler.
+"""
+
+import threading
+from contextlib import contextmanager
+import pytest
+from timeseries import scheduler
+from timeseries.scheduler import (
+    register_collector_source, run_collection_cycle, get_collection_stats, reset_collection_stats,
+    get_next_collection_delay
+)
+
+@pytest.fixture
+def sources(monkeypatch):
+    """Start with no registered sources and no statistics."""
+    monkeypatch.setattr(scheduler, "_sources", {})
+    reset_collection_stats()
+    yield
+    reset_collection_stats()
+
+def _metric(name):
+    return {"metric_name": name, "value": 1}
+
+class TestScheduler:
+    """Tests for the collection scheduler."""
+
+    @pytest.mark.unit
+    def test_sources_run_concurrently(self, sources):
+        """Test that the sources of a cycle run at the same time and share the cycle."""
+        barrier = threading.Barrier(2, timeout=5)
+        cycles = []
+
+        def collect(name):
+            def collect_source(cycle):
+                cycles.append(cycle)
+                barrier.wait()
+                return [_metric(name)]
+            return collect_source
+
+        register_collector_source("first", collect("first"), interval=30)
+        register_collector_source("second", collect("second"), interval=30)
+
+        metrics = run_collection_cycle()
+
+        assert [metric["metric_name"] for metric in metrics] == ["first", "second"]
+        assert cycles[0] is cycles[1]
+
+    @pytest.mark.unit
+    def test_sources_run_at_their_interval(self, sources, monkeypatch):
+        """Test that a source is only collected once its own interval has elapsed."""
+        now = [1000.0]
+        monkeypatch.setattr(scheduler.time, "monotonic", lambda: now[0])
+        register_collector_source("fast", lambda cycle: [_metric("fast")], interval=10)
+        register_collector_source("slow", lambda cycle: [_metric("slow")], interval=60)
+        register_collector_source("disabled", lambda cycle: [_metric("disabled")], interval=10, enabled=False)
+
+        assert [metric["metric_name"] for metric in run_collection_cycle()] == ["fast", "slow"]
+        assert get_next_collection_delay(30) == 10
+
+        now[0] += 10
+        assert [metric["metric_name"] for metric in run_collection_cycle()] == ["fast"]
+
+        assert [metric["metric_name"] for metric in run_collection_cycle(force=True)] == ["fast", "slow"]
+
+    @pytest.mark.unit
+    def test_source_durations_recorded(self, sources):
+        """Test that the duration and outcome of every source are recorded, and a failure does not stop the others."""
+        def fail(cycle):
+            raise RuntimeError("unavailable")
+
+        register_collector_source("broken", fail, interval=30)
+        register_collector_source("working", lambda cycle: [_metric("a"), _metric("b")], interval=30)
+
+        metrics = run_collection_cycle()
+
+        assert len(metrics) == 2
+        stats = get_collection_stats()
+        assert stats["broken"]["failures"] == 1
+        assert stats["working"]["failures"] == 0
+        assert stats["working"]["last_metrics"] == 2
+        assert stats["working"]["runs"] == 1
+        assert stats["working"]["avg_duration"] == stats["working"]["last_duration"] >= 0
+
+    @pytest.mark.unit
+    def test_sources_use_own_connections(self, sources, monkeypatch):
+        """Test that the sources hold connections of the caller's RLS context at the same time."""
+        barrier = threading.Barrier(2, timeout=5)
+        contexts = []
+
+        class Connection:
+            def cursor(self):
+                return self
+
+            def commit(self):
+                pass
+
+            def close(self):
+                pass
+
+        @contextmanager
+        def get_user_db_connection(user_id=None, user_role=None):
+            contexts.append((user_id, user_role))
+            yield Connection()
+
+        def collect(cycle):
+            with cycle.cursor():
+                barrier.wait()
+            return [_metric("metric")]
+
+        monkeypatch.setattr(scheduler, "get_user_db_connection", get_user_db_connection)
+        register_collector_source("first", collect, interval=30)
+        register_collector_source("second", collect, interval=30)
+
+        assert len(run_collection_cycle(user_id=7, user_role="user")) == 2
+        assert contexts == [(7, "user"), (7, "user")]
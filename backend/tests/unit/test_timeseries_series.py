@@ -0,0 +1,110 @@
+"""
+Unit tests for the timeseries series ID cache.
+"""
+
+import pytest
+from timeseries import series
+from timeseries.series import (
+    resolve_series_ids, remember_series_ids, invalidate_series_cache, get_series_cache_stats, reset_series_cache_stats,
+    CREATE_SERIES_QUERY, GET_SERIES_QUERY
+)
+
+class FakeSeriesTable:
+    """Stand-in for timeseries_series, reached through execute_values."""
+
+    def __init__(self):
+        self.ids = {}
+        self.statements = []
+        self.hidden = set()
+
+    def execute_values(self, cursor, query, rows, template=None, fetch=False):
+        self.statements.append((query, list(rows)))
+        if query == CREATE_SERIES_QUERY:
+            for key in rows:
+                self.ids.setdefault(key, len(self.ids) + 1)
+            return None
+        return [(self.ids[key],) + key for key in rows if key not in self.hidden]
+
+@pytest.fixture
+def series_table(monkeypatch):
+    """Route the series statements to a fake table and start with an empty cache."""
+    table = FakeSeriesTable()
+    monkeypatch.setattr(series, "execute_values", table.execute_values)
+    invalidate_series_cache()
+    reset_series_cache_stats()
+    yield table
+    invalidate_series_cache()
+    reset_series_cache_stats()
+
+class TestSeriesCache:
+    """Tests for the series ID cache."""
+
+    @pytest.mark.unit
+    def test_series_created_once(self, series_table):
+        """Test that missing series are created and resolved by two statements, then served from memory."""
+        keys = [(4, "vm", "1", 7), (4, "vm", "2", 7), (1, "system", "system", None)]
+
+        ids = resolve_series_ids(None, keys + keys[:1])
+        remember_series_ids(ids)
+
+        assert set(ids) == set(keys)
+        assert [query for query, _ in series_table.statements] == [CREATE_SERIES_QUERY, GET_SERIES_QUERY]
+        assert sorted(series_table.statements[0][1], key=str) == sorted(keys, key=str)
+
+        assert resolve_series_ids(None, keys) == ids
+        assert len(series_table.statements) == 2
+
+        stats = get_series_cache_stats()
+        assert stats["misses"] == 3
+        assert stats["hits"] == 3
+        assert stats["size"] == 3
+
+    @pytest.mark.unit
+    def test_only_missing_series_looked_up(self, series_table):
+        """Test that cached series are not sent to the database."""
+        remember_series_ids(resolve_series_ids(None, [(4, "vm", "1", 7)]))
+
+        resolve_series_ids(None, [(4, "vm", "1", 7), (4, "vm", "2", 7)])
+
+        assert series_table.statements[-1] == (GET_SERIES_QUERY, [(4, "vm", "2", 7)])
+
+    @pytest.mark.unit
+    def test_uncommitted_series_not_cached(self, series_table):
+        """Test that series IDs are only shared once the transaction that resolved them is committed."""
+        key = (4, "vm", "1", 7)
+
+        ids = resolve_series_ids(None, [key])
+        assert get_series_cache_stats()["size"] == 0
+
+        # Another writer resolves the series again until the IDs are remembered
+        assert resolve_series_ids(None, [key]) == ids
+        assert len(series_table.statements) == 4
+
+        remember_series_ids(ids)
+        assert resolve_series_ids(None, [key]) == ids
+        assert len(series_table.statements) == 4
+
+    @pytest.mark.unit
+    def test_hidden_series_missing(self, series_table):
+        """Test that series the RLS context cannot see are neither returned nor cached."""
+        series_table.hidden.add((4, "vm", "1", 8))
+
+        assert resolve_series_ids(None, [(4, "vm", "1", 8)]) == {}
+        assert get_series_cache_stats()["size"] == 0
+
+    @pytest.mark.unit
+    def test_least_recently_used_evicted(self, series_table, monkeypatch):
+        """Test that the cache is bounded."""
+        monkeypatch.setattr(series, "_max_series", 2)
+
+        remember_series_ids(resolve_series_ids(None, [(1, "vm", "1", None)]))
+        remember_series_ids(resolve_series_ids(None, [(1, "vm", "2", None)]))
+        remember_series_ids(resolve_series_ids(None, [(1, "vm", "1", None)]))
+        remember_series_ids(resolve_series_ids(None, [(1, "vm", "3", None)]))
+
+        stats = get_series_cache_stats()
+        assert stats["size"] == 2
+        assert stats["evictions"] == 1
+
+        resolve_series_ids(None, [(1, "vm", "1", None)])
+        assert get_series_cache_stats()["hits"] == 2
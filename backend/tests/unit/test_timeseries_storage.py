@@ -0,0 +1,282 @@
+"""
+Unit tests for the timeseries storage and its downsampled, batched and latest-value queries.
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from timeseries import storage
+from timeseries.storage import (
+    get_downsample_source, get_downsampled_metric_data, get_metrics_batch, get_latest_metric_values,
+    lttb_downsample, upsert_latest_values, insert_points, to_point_value,
+    DOWNSAMPLE_QUERY, METRICS_BATCH_AGGREGATES_QUERY, LATEST_VALUES_QUERY, INSERT_POINTS_QUERY, UPSERT_LATEST_QUERY
+)
+from tests.utils.fake_db import FakeConnection, fake_connection_factory
+
+@pytest.fixture
+def fake_connection(monkeypatch):
+    """Route the storage connections to a fake connection."""
+    connection = FakeConnection()
+    monkeypatch.setattr(storage, "get_user_db_connection", fake_connection_factory(connection))
+    monkeypatch.setattr(storage, "get_metric_definition", lambda name, category=None: {"id": 4, "name": name, "data_type": "float"})
+    return connection
+
+@pytest.fixture
+def all_periods(monkeypatch):
+    """Enable every aggregation period."""
+    periods = {"hourly": True, "daily": True, "weekly": True, "monthly": True}
+    monkeypatch.setitem(storage.timeseries_config["aggregation"], "periods", periods)
+    return periods
+
+def make_series(values, start=datetime(2026, 1, 1)):
+    """Build the points of a series, one per minute."""
+    return [{"timestamp": start + timedelta(minutes=i), "value": value} for i, value in enumerate(values)]
+
+class TestStoring:
+    """Tests for the compact storage of points."""
+
+    @pytest.mark.unit
+    def test_values_are_numbers(self):
+        """Test that values of every numeric data type are stored as numbers."""
+        assert to_point_value("float", "1.5") == 1.5
+        assert to_point_value("integer", 7) == 7.0
+        assert to_point_value("boolean", True) == 1.0
+        assert to_point_value("boolean", False) == 0.0
+
+        with pytest.raises(ValueError):
+            to_point_value("string", "running")
+        with pytest.raises(ValueError):
+            to_point_value("integer", "many")
+
+    @pytest.mark.unit
+    def test_points_reference_series(self, monkeypatch):
+        """Test that points are inserted as their series ID, timestamp and value."""
+        statements = []
+        monkeypatch.setattr(storage, "execute_values", lambda cursor, query, rows: statements.append((query, rows)))
+        monkeypatch.setattr(storage, "resolve_series_ids", lambda cursor, keys: {key: 10 + key[0] for key in keys})
+        now = datetime(2026, 1, 1)
+
+        series_ids = insert_points(None, [
+            (1, "vm", "1", 7, now, 2.0),
+            (2, "system", "system", None, now, 3.0)
+        ])
+
+        assert series_ids == {(1, "vm", "1", 7): 11, (2, "system", "system", None): 12}
+        assert statements[0] == (INSERT_POINTS_QUERY, [(11, now, 2.0), (12, now, 3.0)])
+        assert statements[1] == (UPSERT_LATEST_QUERY, [(11, now, 2.0), (12, now, 3.0)])
+
+    @pytest.mark.unit
+    def test_hidden_series_rejected(self, monkeypatch):
+        """Test that points of a series the RLS context cannot see are not inserted."""
+        statements = []
+        monkeypatch.setattr(storage, "execute_values", lambda cursor, query, rows: statements.append((query, rows)))
+        monkeypatch.setattr(storage, "resolve_series_ids", lambda cursor, keys: {})
+
+        with pytest.raises(ValueError):
+            insert_points(None, [(1, "vm", "1", 8, datetime(2026, 1, 1), 2.0)])
+        assert statements == []
+
+class TestDownsampling:
+    """Tests for the downsampled timeseries queries."""
+
+    @pytest.mark.unit
+    def test_source_follows_resolution(self, all_periods):
+        """Test that the coarsest source resolving the buckets is read."""
+        start_time = datetime.now() - timedelta(days=1)
+
+        assert get_downsample_source(start_time, 60) is None
+        assert get_downsample_source(start_time, 3600) == "hourly"
+        assert get_downsample_source(start_time, 3 * 86400) == "daily"
+        assert get_downsample_source(start_time, 40 * 86400) == "monthly"
+
+        all_periods["daily"] = False
+        assert get_downsample_source(start_time, 3 * 86400) == "hourly"
+
+    @pytest.mark.unit
+    def test_source_follows_retention(self, all_periods):
+        """Test that a coarser source is read when the finer ones no longer retain the range."""
+        raw_days = storage.timeseries_config["retention"]["raw_data_days"]
+        start_time = datetime.now() - timedelta(days=raw_days + 1)
+
+        assert get_downsample_source(start_time, 60) == "hourly"
+
+    @pytest.mark.unit
+    def test_points_are_bounded(self, fake_connection, all_periods):
+        """Test that the bucket length bounds the number of points whatever the range."""
+        end_time = datetime.now()
+        start_time = end_time - timedelta(days=90)
+        fake_connection.results = [[]]
+
+        result = get_downsampled_metric_data("cpu_usage", start_time, end_time, max_points=200, entity_id="vm-1", owner_id=7)
+
+        query, params = fake_connection.executed[-1]
+        assert query == DOWNSAMPLE_QUERY.format(
+            filters=" AND entity_id = %(entity_id)s AND (owner_id = %(owner_id)s OR owner_id IS NULL)"
+        )
+        assert params["resolution"] == pytest.approx(90 * 86400 / 200)
+        assert params["period_type"] == "daily"
+        assert result["source"] == "daily"
+
+    @pytest.mark.unit
+    def test_series_are_grouped(self, fake_connection):
+        """Test that the buckets of each entity form their own series."""
+        bucket = datetime(2026, 1, 1)
+        fake_connection.results = [[
+            (bucket, "vm", "1", 1.0, 3.0, 2.0, 10),
+            (bucket, "vm", "2", 5.0, 5.0, 5.0, 1)
+        ]]
+
+        result = get_downsampled_metric_data("vm_cpu_usage", bucket, bucket + timedelta(hours=1), resolution=3600)
+
+        assert [(point["entity_id"], point["value"], point["min"], point["max"]) for point in result["data"]] == [
+            ("1", 2.0, 1.0, 3.0), ("2", 5.0, 5.0, 5.0)
+        ]
+
+    @pytest.mark.unit
+    def test_unknown_method(self):
+        """Test that unknown downsampling methods are rejected."""
+        with pytest.raises(ValueError):
+            get_downsampled_metric_data("cpu_usage", datetime(2026, 1, 1), datetime(2026, 1, 2), method="median")
+
+class TestLttb:
+    """Tests for LTTB downsampling."""
+
+    @pytest.mark.unit
+    def test_keeps_ends_and_peaks(self):
+        """Test that the first, last and extreme points are kept."""
+        values = [0.0] * 100
+        values[37] = 50.0
+        values[71] = -50.0
+        points = make_series(values)
+
+        selected = lttb_downsample(points, 10)
+
+        assert len(selected) == 10
+        assert selected[0] is points[0]
+        assert selected[-1] is points[-1]
+        assert points[37] in selected
+        assert points[71] in selected
+
+    @pytest.mark.unit
+    def test_small_series(self):
+        """Test that short series and missing values are handled."""
+        points = make_series([1.0, None, 2.0])
+
+        assert lttb_downsample(points, 10) == [points[0], points[2]]
+
+        points = make_series(range(50))
+        assert lttb_downsample(points, 2) == [points[0], points[-1]]
+
+class TestMetricsBatch:
+    """Tests for the batched metric queries."""
+
+    @pytest.fixture(autouse=True)
+    def metric_ids(self, fake_connection, monkeypatch):
+        """Define the metrics of the tests, with their own IDs."""
+        metric_ids = {"cpu_usage": 1, "vm_cpu_usage": 2, "vm_uptime": 3}
+        monkeypatch.setattr(storage, "get_metric_definition", lambda name, category=None: (
+            {"id": metric_ids[name], "name": name, "data_type": "float"} if name in metric_ids else None
+        ))
+        return metric_ids
+
+    @pytest.mark.unit
+    def test_metrics_are_grouped(self, fake_connection):
+        """Test that the metrics of several entities are read by ID with two statements, and grouped by name."""
+        start_time = datetime(2026, 1, 1)
+        fake_connection.results = [
+            [
+                (2, "1", 1.0, 3.0, 2.0, 4.0, 2, start_time + timedelta(hours=1), 3.0),
+                (2, "2", None, None, None, None, 0, None, None)
+            ],
+            [
+                (2, "1", start_time, 1.0),
+                (2, "1", start_time + timedelta(hours=1), 3.0)
+            ]
+        ]
+
+        result = get_metrics_batch(
+            ["vm_cpu_usage", "vm_uptime", "missing"], start_time, start_time + timedelta(days=1),
+            period_type="hourly", entity_type="vm", entity_ids=["1", "2"], owner_id=7
+        )
+
+        assert len(fake_connection.executed) == 2
+        query, params = fake_connection.executed[1]
+        assert query == METRICS_BATCH_AGGREGATES_QUERY.format(
+            filters=" AND td.entity_type = %(entity_type)s AND (td.owner_id = %(owner_id)s OR td.owner_id IS NULL)"
+            " AND td.entity_id = ANY(%(entity_ids)s)"
+        )
+        assert params["metric_ids"] == [2, 3]
+        assert "metrics_definitions" not in query and "metrics_definitions" not in fake_connection.executed[0][0]
+        assert list(result) == ["vm_cpu_usage"]
+        assert result["vm_cpu_usage"]["1"]["latest"] == 3.0
+        assert result["vm_cpu_usage"]["1"]["statistics"]["avg"] == 2.0
+        assert [point["value"] for point in result["vm_cpu_usage"]["1"]["data"]] == [1.0, 3.0]
+        assert result["vm_cpu_usage"]["2"]["data"] == []
+
+    @pytest.mark.unit
+    def test_entities_together(self, fake_connection):
+        """Test that the points of all entities form one series when no entity is requested."""
+        start_time = datetime(2026, 1, 1)
+        fake_connection.results = [
+            [(1, None, 1.0, 2.0, 1.5, 3.0, 2, start_time, 2.0)],
+            [(1, "a", start_time, 1.0), (1, "b", start_time, 2.0)]
+        ]
+
+        result = get_metrics_batch(["cpu_usage"], start_time, start_time + timedelta(days=1))
+
+        assert fake_connection.executed[0][1]["entity_ids"] == [None]
+        assert len(result["cpu_usage"][None]["data"]) == 2
+
+    @pytest.mark.unit
+    def test_nothing_requested(self, fake_connection):
+        """Test that no statement is executed when there is nothing to read."""
+        assert get_metrics_batch([], datetime(2026, 1, 1), datetime(2026, 1, 2)) == {}
+        assert get_metrics_batch(["cpu_usage"], datetime(2026, 1, 1), datetime(2026, 1, 2), entity_ids=[]) == {}
+        assert get_metrics_batch(["missing"], datetime(2026, 1, 1), datetime(2026, 1, 2)) == {}
+        assert fake_connection.executed == []
+
+class TestLatestValues:
+    """Tests for the latest value of every series."""
+
+    @pytest.mark.unit
+    def test_upsert_keeps_latest_point(self, monkeypatch):
+        """Test that one row per series is upserted, with its latest point."""
+        upserts = []
+        monkeypatch.setattr(storage, "execute_values", lambda cursor, query, rows: upserts.append((query, rows)))
+        now = datetime(2026, 1, 1)
+        rows = [
+            (1, now, 2.0),
+            (1, now - timedelta(minutes=1), 1.0),
+            (2, now, 3.0),
+            (3, now, 4.0)
+        ]
+
+        upsert_latest_values(None, rows)
+
+        assert upserts == [(UPSERT_LATEST_QUERY, [rows[0], rows[2], rows[3]])]
+
+    @pytest.mark.unit
+    def test_values_of_many_entities(self, fake_connection):
+        """Test that the latest values of several entities are read by one statement."""
+        now = datetime(2026, 1, 1)
+        fake_connection.results = [[
+            ("vm_cpu_usage", "vm", "1", now, 2.0),
+            ("vm_cpu_usage", "vm", "2", now, 3.0)
+        ]]
+
+        values = get_latest_metric_values(["vm_cpu_usage"], entity_type="vm", entity_ids=["1", "2"], owner_id=7)
+
+        query, params = fake_connection.executed[0]
+        assert query == LATEST_VALUES_QUERY.format(
+            filters=" AND s.entity_type = %(entity_type)s AND s.entity_id = ANY(%(entity_ids)s)"
+            " AND (s.owner_id = %(owner_id)s OR s.owner_id IS NULL)"
+        )
+        assert params["metric_ids"] == [4]
+        assert [(value["entity_id"], value["value"]) for value in values] == [("1", 2.0), ("2", 3.0)]
+
+    @pytest.mark.unit
+    def test_unknown_metrics_skipped(self, fake_connection, monkeypatch):
+        """Test that nothing is read when no requested metric is defined."""
+        monkeypatch.setattr(storage, "get_metric_definition", lambda name, category=None: None)
+
+        assert get_latest_metric_values(["missing"]) == []
+        assert fake_connection.executed == []
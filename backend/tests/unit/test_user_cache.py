@@ -0,0 +1,156 @@
+"""
+Unit tests for the authenticated user cache.
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import MagicMock, call
+import pytest
+from config import Config
+from db import cache_invalidation, user_cache
+from db.user_cache import (
+    get_cached_user, put_user, evict_user, invalidate_user_cache, invalidate_user_cache_by_tables,
+    get_cached_token_payload, put_token_payload, invalidate_token_cache,
+    get_user_cache_stats, reset_user_cache_stats
+)
+from db.query_cache import ALL_TABLES
+from routers import auth
+
+def make_user(user_id=1, username="alice", role="user"):
+    """Build a user as read from the users table."""
+    return {
+        "id": user_id,
+        "username": username,
+        "email": f"{username}@example.com",
+        "password_hash": "hash",
+        "full_name": username.title(),
+        "role": role,
+        "is_active": True,
+        "created_at": None,
+        "last_login": None,
+        "avatar_url": None
+    }
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    """Start every test with an empty cache."""
+    invalidate_user_cache()
+    invalidate_token_cache()
+    reset_user_cache_stats()
+    yield
+    invalidate_user_cache()
+    invalidate_token_cache()
+    reset_user_cache_stats()
+
+class TestUserCache:
+    """Tests for the authenticated user cache."""
+
+    @pytest.mark.unit
+    def test_put_and_get_user(self):
+        """Test that cached users are returned as copies."""
+        assert get_cached_user("alice") is None
+
+        put_user(make_user())
+        user = get_cached_user("alice")
+        assert user["id"] == 1
+
+        # Request handlers add token data to the user they get
+        user["token_jti"] = "jti"
+        assert "token_jti" not in get_cached_user("alice")
+
+        stats = get_user_cache_stats()
+        assert stats["user_hits"] == 2
+        assert stats["user_misses"] == 1
+
+    @pytest.mark.unit
+    def test_user_expiry(self, monkeypatch):
+        """Test that users expire after the TTL, and are not cached with a TTL of zero."""
+        monkeypatch.setattr(Config, "USER_CACHE_TTL", 1)
+        put_user(make_user())
+        time.sleep(1.1)
+        assert get_cached_user("alice") is None
+
+        monkeypatch.setattr(Config, "USER_CACHE_TTL", 0)
+        put_user(make_user())
+        assert get_cached_user("alice") is None
+
+    @pytest.mark.unit
+    def test_evict_user(self):
+        """Test evicting a user by username or ID."""
+        put_user(make_user(1, "alice"))
+        put_user(make_user(2, "bob"))
+
+        assert evict_user(username="alice") == 1
+        assert get_cached_user("alice") is None
+
+        assert evict_user(user_id=2) == 1
+        assert get_cached_user("bob") is None
+
+    @pytest.mark.unit
+    def test_invalidate_by_tables(self):
+        """Test that only writes to users invalidate the cache."""
+        put_user(make_user())
+
+        assert not invalidate_user_cache_by_tables(["accounts"])
+        assert get_cached_user("alice") is not None
+
+        assert invalidate_user_cache_by_tables(["users"])
+        assert get_cached_user("alice") is None
+
+        put_user(make_user())
+        assert invalidate_user_cache_by_tables([ALL_TABLES])
+        assert get_cached_user("alice") is None
+
+    @pytest.mark.unit
+    def test_lru_eviction(self, monkeypatch):
+        """Test that the least recently used users are evicted."""
+        monkeypatch.setattr(user_cache, "_max_users", 2)
+
+        put_user(make_user(1, "alice"))
+        put_user(make_user(2, "bob"))
+        get_cached_user("alice")
+        put_user(make_user(3, "carol"))
+
+        assert get_cached_user("alice") is not None
+        assert get_cached_user("bob") is None
+        assert get_cached_user("carol") is not None
+
+    @pytest.mark.unit
+    def test_token_payload_lifetime(self):
+        """Test that token payloads are cached until the token expires."""
+        put_token_payload("valid", {"sub": "alice", "exp": time.time() + 1})
+        put_token_payload("expired", {"sub": "alice", "exp": time.time() - 1})
+        put_token_payload("no-exp", {"sub": "alice"})
+
+        assert get_cached_token_payload("valid")["sub"] == "alice"
+        assert get_cached_token_payload("expired") is None
+        assert get_cached_token_payload("no-exp") is None
+
+        time.sleep(1.1)
+        assert get_cached_token_payload("valid") is None
+
+class TestUserCacheInvalidation:
+    """Tests for the invalidation of the cached users by the writes of the auth router."""
+
+    @pytest.mark.unit
+    def test_password_change_published(self, mock_db_connection, monkeypatch):
+        """Test that a password change notifies the other workers on the transaction of the update."""
+        monkeypatch.setattr(cache_invalidation, "_bus_enabled", True)
+        monkeypatch.setattr(auth, "get_db_connection", lambda: mock_db_connection)
+        monkeypatch.setattr(auth, "verify_password", lambda plain, hashed: True)
+        monkeypatch.setattr(auth, "get_password_hash", lambda password: "new-hash")
+        monkeypatch.setattr(auth, "validate_password_strength", lambda password: (True, 4, []))
+        monkeypatch.setattr(auth, "log_audit", lambda **kwargs: None)
+        put_user(make_user())
+
+        result = asyncio.run(auth.change_password("old", "new", MagicMock(), make_user(), True))
+
+        assert result == {"message": "Password updated successfully"}
+        cursor = mock_db_connection.cursor.return_value
+        (update_query, update_params), (notify_query, notify_params) = [c.args for c in cursor.execute.call_args_list]
+        assert "UPDATE users" in update_query and update_params == ("new-hash", 1)
+        assert notify_query == "SELECT pg_notify(%s, %s)"
+        assert json.loads(notify_params[1])["tables"] == ["users"]
+        assert mock_db_connection.mock_calls.index(call.commit()) > mock_db_connection.mock_calls.index(call.cursor())
+        assert get_cached_user("alice") is None
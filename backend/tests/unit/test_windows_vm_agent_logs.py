@@ -0,0 +1,109 @@
+"""
+Unit tests for the decoding of Windows VM agent log batches.
+"""
+
+import asyncio
+import gzip
+import json
+import pytest
+from fastapi import HTTPException
+from routers import windows_vm_agent
+from routers.windows_vm_agent import _read_request_body, _read_log_batch, _build_agent_log_entry, _get_log_vm_id
+
+class TestAgentLogBatch:
+    """Tests for the decoding of agent log batches."""
+
+    @pytest.mark.unit
+    def test_read_log_batch(self):
+        """Test that plain and gzip-compressed JSON arrays are decoded."""
+        logs = [{"message": "first"}, {"message": "second", "level": "ERROR"}]
+        body = json.dumps(logs).encode("utf-8")
+
+        assert _read_log_batch(body, None) == logs
+        assert _read_log_batch(body, "identity") == logs
+        assert _read_log_batch(gzip.compress(body), "gzip") == logs
+        assert _read_log_batch(gzip.compress(b"[]"), "GZIP") == []
+
+    @pytest.mark.unit
+    def test_read_log_batch_rejects_invalid_bodies(self):
+        """Test that invalid bodies are rejected with the matching status code."""
+        cases = [
+            (b"not json", None, 400),
+            (b'{"message": "not an array"}', None, 400),
+            (b"[1, 2]", None, 400),
+            (b"[]", "gzip", 400),
+            (gzip.compress(b"[]")[:-4], "gzip", 400),
+            (b"[]", "br", 415),
+        ]
+
+        for body, content_encoding, status_code in cases:
+            with pytest.raises(HTTPException) as exc_info:
+                _read_log_batch(body, content_encoding)
+            assert exc_info.value.status_code == status_code, body
+
+    @pytest.mark.unit
+    def test_read_log_batch_limits(self, monkeypatch):
+        """Test that batches over the entry or (decompressed) size limit are rejected."""
+        monkeypatch.setattr(windows_vm_agent, "MAX_AGENT_LOG_BATCH_SIZE", 2)
+        monkeypatch.setattr(windows_vm_agent, "MAX_AGENT_LOG_BATCH_BYTES", 1024)
+
+        with pytest.raises(HTTPException) as exc_info:
+            _read_log_batch(b'[{}, {}, {}]', None)
+        assert exc_info.value.status_code == 413
+
+        # A small compressed body that expands beyond the limit
+        body = json.dumps([{"message": "x" * 4096}]).encode("utf-8")
+        with pytest.raises(HTTPException) as exc_info:
+            _read_log_batch(gzip.compress(body), "gzip")
+        assert exc_info.value.status_code == 413
+
+    @pytest.mark.unit
+    def test_read_request_body_limit(self):
+        """Test that bodies over the limit are rejected before they are buffered."""
+        class FakeRequest:
+            def __init__(self, chunks, headers=None):
+                self.chunks = list(chunks)
+                self.headers = headers or {}
+                self.read = 0
+
+            async def stream(self):
+                for chunk in self.chunks:
+                    self.read += 1
+                    yield chunk
+
+        request = FakeRequest([b"ab", b"cd"])
+        assert asyncio.run(_read_request_body(request, 4)) == b"abcd"
+
+        # The announced length is rejected without reading the body
+        request = FakeRequest([b"ab"], {"content-length": "5"})
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(_read_request_body(request, 4))
+        assert exc_info.value.status_code == 413
+        assert request.read == 0
+
+        # A body sent without (or with a wrong) length stops being read once over the limit
+        request = FakeRequest([b"abc", b"def", b"ghi"])
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(_read_request_body(request, 4))
+        assert exc_info.value.status_code == 413
+        assert request.read == 2
+
+    @pytest.mark.unit
+    def test_build_agent_log_entry(self):
+        """Test that agent log entries get the defaults of the single log endpoint."""
+        log_data = {"message": "hello", "details": {"vm_info": {"vm_identifier": "vm-1"}}}
+
+        assert _get_log_vm_id(log_data) == "vm-1"
+        assert _get_log_vm_id({"details": None}) == "unknown"
+        assert _build_agent_log_entry(log_data, "vm-1", 7) == {
+            "message": "hello",
+            "level": "INFO",
+            "category": "windows_vm_agent",
+            "source": "windows_vm_agent",
+            "details": {"vm_info": {"vm_identifier": "vm-1"}},
+            "entity_type": "vm",
+            "entity_id": "vm-1",
+            "user_id": 7,
+            "owner_id": 7,
+            "timestamp": None
+        }
@@ -0,0 +1,113 @@
+"""
+Fake database connections for unit tests.
+
+The fakes record the executed statements and return scripted results, so the
+repositories and the timeseries modules can be tested without a database.
+"""
+
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional, Tuple
+
+class FakeCursor:
+    """Stand-in for a psycopg2 cursor that records executed statements and returns scripted results."""
+
+    def __init__(self, connection: "FakeConnection"):
+        self.connection = connection
+        self.rowcount = -1
+        self.description = None
+        self.rows = None
+
+    def execute(self, query: str, params: Any = None) -> None:
+        if self.connection.error:
+            raise self.connection.error
+        self.rowcount = self.connection.rowcount
+        self.rows = None
+        if self.connection.on_execute:
+            self.connection.on_execute(self, query, params)
+        self.connection.executed.append((query, params))
+
+    def mogrify(self, query: str, params: Any = None) -> bytes:
+        self.connection.executed.append((query, params))
+        return query.encode()
+
+    def copy_expert(self, sql: Any, file, size: int = 8192) -> None:
+        """Write the scripted COPY output to the file, or record the COPY input read from it."""
+        self.connection.executed.append((sql, None))
+        if self.connection.copy_output is not None:
+            for line in self.connection.copy_output:
+                file.write(line)
+        else:
+            self.connection.copied = file.read()
+
+    def fetchone(self) -> Any:
+        if self.rows is not None:
+            return self.rows[0] if self.rows else None
+        return self.connection.results.pop(0)
+
+    def fetchall(self) -> Any:
+        if self.rows is not None:
+            return self.rows
+        return self.connection.results.pop(0)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+class FakeConnection:
+    """
+    Stand-in for a psycopg2 connection.
+
+    Every fetchone() or fetchall() without rows set by on_execute pops the next entry of
+    results. on_execute(cursor, query, params) is called by every execute() before the
+    statement is recorded. It can fail the statement by raising, or set the cursor's rows,
+    rowcount and description for a query.
+    """
+
+    def __init__(self, results: Optional[List[Any]] = None, rowcount: int = -1,
+                 error: Optional[Exception] = None,
+                 on_execute: Optional[Callable[[FakeCursor, str, Any], None]] = None):
+        self.results = list(results or [])
+        self.rowcount = rowcount
+        self.error = error
+        self.on_execute = on_execute
+        self.copy_output = None
+        self.copied = None
+        self.executed: List[Tuple[Any, Any]] = []
+        self.opened = 0
+        self.commits = 0
+        self.rollbacks = 0
+        self.cancelled = False
+
+    def cursor(self, *args, **kwargs) -> FakeCursor:
+        return FakeCursor(self)
+
+    def commit(self) -> None:
+        self.commits += 1
+
+    def rollback(self) -> None:
+        self.rollbacks += 1
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def executions(self, query: str) -> List[Any]:
+        """Get the parameters of the executions of a query."""
+        return [params for executed, params in self.executed if executed == query]
+
+def fake_connection_factory(connection: FakeConnection) -> Callable:
+    """
+    Get a stand-in for the get_*_connection() context managers yielding a fake connection.
+
+    It accepts any arguments, so it also replaces methods such as BaseRepository.get_connection.
+    """
+    @contextmanager
+    def get_fake_connection(*args, **kwargs):
+        connection.opened += 1
+        yield connection
+
+    return get_fake_connection
@@ -6,15 +6,21 @@ This package provides modules for collecting, storing, and retrieving timeseries
 
 from .collector import (
     init_collector, shutdown_collector, collect_system_metrics,
-    collect_vm_metrics, collect_account_metrics, collect_job_metrics,
+    collect_vm_metrics, collect_account_metrics, collect_job_metrics, collect_all_metrics,
     start_collector_thread, stop_collector_thread
 )
+from .scheduler import (
+    CollectionCycle, CollectorSource, register_collector_source, unregister_collector_source,
+    get_collector_sources, get_collection_stats, run_collection_cycle
+)
 from .storage import (
     store_metric, store_metrics_batch, get_metric_data, get_metric_aggregates,
-    get_latest_metric_value, get_metric_statistics
+    get_downsampled_metric_data, get_latest_metric_value, get_latest_metric_values,
+    get_metric_statistics, get_metrics_batch, GLOBAL_SCOPE
 )
 from .aggregator import (
-    init_aggregator, shutdown_aggregator, aggregate_metrics,
+    init_aggregator, shutdown_aggregator, aggregate_metrics, get_aggregation_stats,
+    rollup_metrics, rollup_period,
     start_aggregator_thread, stop_aggregator_thread
 )
 from .config import (
@@ -27,14 +33,20 @@ __all__ = [
     
     # Collector
     'init_collector', 'shutdown_collector', 'collect_system_metrics',
-    'collect_vm_metrics', 'collect_account_metrics', 'collect_job_metrics',
+    'collect_vm_metrics', 'collect_account_metrics', 'collect_job_metrics', 'collect_all_metrics',
     'start_collector_thread', 'stop_collector_thread',
+
+    # Collection scheduler
+    'CollectionCycle', 'CollectorSource', 'register_collector_source', 'unregister_collector_source',
+    'get_collector_sources', 'get_collection_stats', 'run_collection_cycle',
     
     # Storage
     'store_metric', 'store_metrics_batch', 'get_metric_data', 'get_metric_aggregates',
-    'get_latest_metric_value', 'get_metric_statistics',
+    'get_downsampled_metric_data', 'get_latest_metric_value', 'get_latest_metric_values',
+    'get_metric_statistics', 'get_metrics_batch', 'GLOBAL_SCOPE',
     
     # Aggregator
-    'init_aggregator', 'shutdown_aggregator', 'aggregate_metrics',
+    'init_aggregator', 'shutdown_aggregator', 'aggregate_metrics', 'get_aggregation_stats',
+    'rollup_metrics', 'rollup_period',
     'start_aggregator_thread', 'stop_aggregator_thread'
 ]
@@ -2,17 +2,25 @@
 Timeseries aggregator module.
 
 This module provides functions for aggregating timeseries data.
+
+Rollups are built incrementally: hourly aggregates from raw data, daily aggregates from
+hourly ones, and weekly and monthly aggregates from daily ones. The timeseries_rollup_watermarks
+table records, per period type, up to where buckets have been rolled up, so every run
+only processes the buckets closed since the previous one. Raw points inserted behind the
+hourly watermark are recorded in timeseries_rollup_dirty by a trigger; their buckets are
+rolled up again, and the coarser buckets containing them are marked in turn.
 """
 
 import logging
 import time
 import threading
 from typing import Dict, Any, List, Optional, Tuple
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import psycopg2
 from psycopg2.extras import execute_values
 
 from db.connection import get_db_connection
+from db.partitions import drop_time_partitions
 from db.user_connection import get_user_db_connection
 from .config import timeseries_config
 
@@ -23,6 +31,72 @@ logger = logging.getLogger(__name__)
 _aggregator_thread = None
 _aggregator_stop_event = threading.Event()
 
+# Aggregates every metric/entity/owner bucket of a period in one statement. The points
+# are grouped by series, whose metric, entity and owner key the aggregates.
+AGGREGATE_PERIOD_QUERY = """
+    INSERT INTO public.timeseries_aggregates
+    (metric_id, period_start, period_end, period_type, min_value, max_value, avg_value, sum_value, count_value, entity_type, entity_id, owner_id)
+    SELECT
+        s.metric_id, %(start_time)s, %(end_time)s, %(period_type)s,
+        d.min_value, d.max_value, d.avg_value, d.sum_value, d.count_value,
+        s.entity_type, s.entity_id, s.owner_id
+    FROM (
+        SELECT
+            td.series_id,
+            MIN(td.value) AS min_value, MAX(td.value) AS max_value, AVG(td.value) AS avg_value,
+            SUM(td.value) AS sum_value, COUNT(*) AS count_value
+        FROM public.timeseries_data td
+        WHERE td.timestamp >= %(start_time)s
+        AND td.timestamp < %(end_time)s
+        GROUP BY td.series_id
+    ) d
+    JOIN public.timeseries_series s ON s.id = d.series_id
+    ON CONFLICT (metric_id, period_type, period_start, entity_type, entity_id, owner_id)
+    DO UPDATE SET
+        period_end = EXCLUDED.period_end,
+        min_value = EXCLUDED.min_value,
+        max_value = EXCLUDED.max_value,
+        avg_value = EXCLUDED.avg_value,
+        sum_value = EXCLUDED.sum_value,
+        count_value = EXCLUDED.count_value
+"""
+
+# Aggregation statistics, per period type
+_aggregation_stats: Dict[str, Dict[str, Any]] = {}
+_aggregation_stats_lock = threading.Lock()
+
+def _record_aggregation(period_type: str, start_time: datetime, rows: int, duration: float, failed: bool) -> None:
+    """Record the outcome of the aggregation of a period."""
+    with _aggregation_stats_lock:
+        stats = _aggregation_stats.setdefault(period_type, {
+            "runs": 0,
+            "failures": 0,
+            "total_duration": 0.0
+        })
+        stats["runs"] += 1
+        stats["total_duration"] += duration
+        if failed:
+            stats["failures"] += 1
+        stats["last_period_start"] = start_time
+        stats["last_rows"] = rows
+        stats["last_duration"] = duration
+        stats["last_run"] = datetime.now()
+
+def get_aggregation_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get the runtime statistics of the aggregation, per period type.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: For each period type, the number of runs and failures,
+            the total and average duration in seconds, and the outcome of the last run
+    """
+    with _aggregation_stats_lock:
+        result = {}
+        for period_type, stats in _aggregation_stats.items():
+            result[period_type] = dict(stats)
+            result[period_type]["avg_duration"] = stats["total_duration"] / stats["runs"] if stats["runs"] > 0 else 0
+        return result
+
 def aggregate_metrics(
     period_type: str,
     start_time: datetime,
@@ -33,161 +107,304 @@ def aggregate_metrics(
     """
     Aggregate metrics for a specific period.
 
+    All metric/entity/owner buckets of the period are computed and upserted by a single
+    grouped statement, backed by the unique index on timeseries_aggregates.
+
     Args:
         period_type: The aggregation period type (hourly, daily, weekly, monthly)
-        start_time: The start time of the period
-        end_time: The end time of the period
+        start_time: The start time of the period (inclusive)
+        end_time: The end time of the period (exclusive)
         user_id: The user ID for RLS context (defaults to 1 for admin)
         user_role: The user role for RLS context (defaults to 'admin')
 
     Returns:
-        Tuple[int, int]: (success_count, failure_count)
+        Tuple[int, int]: (success_count, failure_count), the number of aggregates written,
+            and 1 if the period could not be aggregated
     """
-    success_count = 0
-    failure_count = 0
+    started = time.monotonic()
+    rows = 0
+    failed = False
 
     try:
-        # Get database connection with RLS context - use a single connection for the entire operation
         with get_user_db_connection(user_id=user_id, user_role=user_role) as conn:
             if not conn:
                 logger.error("Failed to get database connection for aggregating metrics")
-                return 0, 0
+                failed = True
+            else:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(AGGREGATE_PERIOD_QUERY, {
+                        "period_type": period_type,
+                        "start_time": start_time,
+                        "end_time": end_time
+                    })
+                    rows = cursor.rowcount
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+    except Exception as e:
+        logger.error(f"Error aggregating {period_type} metrics for {start_time} to {end_time}: {e}")
+        failed = True
+
+    duration = time.monotonic() - started
+    _record_aggregation(period_type, start_time, rows, duration, failed)
+    logger.info(f"Aggregated {rows} {period_type} buckets for {start_time} to {end_time} in {duration:.3f}s")
+
+    return rows, 1 if failed else 0
+
+# Rollup cascade: period type -> (date_trunc unit, bucket length, preferred sources)
+ROLLUP_PERIODS = {
+    "hourly": ("hour", "1 hour", []),
+    "daily": ("day", "1 day", ["hourly"]),
+    "weekly": ("week", "1 week", ["daily", "hourly"]),
+    "monthly": ("month", "1 month", ["daily", "hourly"])
+}
+
+# Upsert of the aggregates of a rollup, shared by both sources
+_ROLLUP_UPSERT = """
+    INSERT INTO public.timeseries_aggregates
+    (metric_id, period_start, period_end, period_type, min_value, max_value, avg_value, sum_value, count_value, entity_type, entity_id, owner_id)
+    {select}
+    ON CONFLICT (metric_id, period_type, period_start, entity_type, entity_id, owner_id)
+    DO UPDATE SET
+        period_end = EXCLUDED.period_end,
+        min_value = EXCLUDED.min_value,
+        max_value = EXCLUDED.max_value,
+        avg_value = EXCLUDED.avg_value,
+        sum_value = EXCLUDED.sum_value,
+        count_value = EXCLUDED.count_value
+"""
 
-            # Get all metric definitions
-            cursor = conn.cursor()
-            try:
-                cursor.execute(
-                    "SELECT id, name, data_type FROM public.metrics_definitions"
-                )
-                metric_defs = cursor.fetchall()
-                logger.debug(f"Found {len(metric_defs)} metric definitions for aggregation")
-            finally:
-                cursor.close()
+# Rolls up the raw points of a time range into buckets
+ROLLUP_FROM_RAW_QUERY = _ROLLUP_UPSERT.format(select="""
+    SELECT
+        s.metric_id, d.bucket, d.bucket + %(interval)s::interval, %(period_type)s,
+        d.min_value, d.max_value, d.avg_value, d.sum_value, d.count_value,
+        s.entity_type, s.entity_id, s.owner_id
+    FROM (
+        SELECT
+            td.series_id, date_trunc(%(unit)s, td.timestamp) AS bucket,
+            MIN(td.value) AS min_value, MAX(td.value) AS max_value, AVG(td.value) AS avg_value,
+            SUM(td.value) AS sum_value, COUNT(*) AS count_value
+        FROM public.timeseries_data td
+        WHERE td.timestamp >= %(start_time)s
+        AND td.timestamp < %(end_time)s
+        GROUP BY td.series_id, bucket
+    ) d
+    JOIN public.timeseries_series s ON s.id = d.series_id
+""")
+
+# Merges the finer aggregates of a time range into buckets. The average is weighted by
+# the counts of the finer aggregates that have one.
+ROLLUP_FROM_AGGREGATES_QUERY = _ROLLUP_UPSERT.format(select="""
+    SELECT
+        a.metric_id, a.bucket, a.bucket + %(interval)s::interval, %(period_type)s,
+        MIN(a.min_value), MAX(a.max_value),
+        SUM(a.avg_value * a.count_value) / NULLIF(SUM(a.count_value) FILTER (WHERE a.avg_value IS NOT NULL), 0),
+        SUM(a.sum_value), SUM(a.count_value),
+        a.entity_type, a.entity_id, a.owner_id
+    FROM (
+        SELECT
+            metric_id, date_trunc(%(unit)s, period_start) AS bucket,
+            min_value, max_value, avg_value, sum_value, count_value,
+            entity_type, entity_id, owner_id
+        FROM public.timeseries_aggregates
+        WHERE period_type = %(source)s
+        AND period_start >= %(start_time)s
+        AND period_start < %(end_time)s
+    ) a
+    GROUP BY a.metric_id, a.bucket, a.entity_type, a.entity_id, a.owner_id
+""")
+
+def get_rollup_source(period_type: str) -> Optional[str]:
+    """
+    Get the period type a period type is rolled up from.
+
+    Args:
+        period_type: The aggregation period type (hourly, daily, weekly, monthly)
+
+    Returns:
+        Optional[str]: The finest enabled period type it is built from, or None for raw data
+    """
+    periods = timeseries_config['aggregation']['periods']
+    for source in ROLLUP_PERIODS[period_type][2]:
+        if periods[source]:
+            return source
+    return None
+
+def _rollup_range(cursor, period_type: str, source: Optional[str], start_time: datetime, end_time: datetime) -> int:
+    """Roll up the buckets of a period type in a time range. Returns the number of aggregates written."""
+    unit, interval, _ = ROLLUP_PERIODS[period_type]
+    params = {
+        "period_type": period_type,
+        "unit": unit,
+        "interval": interval,
+        "source": source,
+        "start_time": start_time,
+        "end_time": end_time
+    }
+    cursor.execute(ROLLUP_FROM_RAW_QUERY if source is None else ROLLUP_FROM_AGGREGATES_QUERY, params)
+    return cursor.rowcount
+
+def _get_watermark(cursor, period_type: str) -> datetime:
+    """
+    Lock and return the watermark of a period type.
+
+    A missing watermark starts at the last closed bucket, as older buckets were built
+    before the watermark existed.
+    """
+    unit, interval, _ = ROLLUP_PERIODS[period_type]
+    cursor.execute(
+        """
+        INSERT INTO public.timeseries_rollup_watermarks (period_type, rolled_up_to)
+        VALUES (%s, date_trunc(%s, now()) - %s::interval)
+        ON CONFLICT (period_type) DO NOTHING
+        """,
+        (period_type, unit, interval)
+    )
+    cursor.execute(
+        "SELECT rolled_up_to FROM public.timeseries_rollup_watermarks WHERE period_type = %s FOR UPDATE",
+        (period_type,)
+    )
+    return cursor.fetchone()[0]
+
+def _get_rollup_limit(cursor, period_type: str, source: Optional[str]) -> datetime:
+    """Get the end of the last closed bucket of a period type whose source data is complete."""
+    unit = ROLLUP_PERIODS[period_type][0]
+    if source is None:
+        cursor.execute("SELECT date_trunc(%s, now())", (unit,))
+    else:
+        cursor.execute(
+            """
+            SELECT date_trunc(%s, LEAST(now(), COALESCE(
+                (SELECT rolled_up_to FROM public.timeseries_rollup_watermarks WHERE period_type = %s),
+                '-infinity'::timestamptz
+            )))
+            """,
+            (unit, source)
+        )
+    return cursor.fetchone()[0]
+
+def _mark_dirty_parents(cursor, period_type: str, bucket: datetime) -> None:
+    """Mark the already rolled up coarser buckets containing a re-rolled bucket."""
+    for parent in ROLLUP_PERIODS:
+        if not timeseries_config['aggregation']['periods'][parent] or get_rollup_source(parent) != period_type:
+            continue
+
+        cursor.execute(
+            """
+            INSERT INTO public.timeseries_rollup_dirty (period_type, period_start)
+            SELECT %s, date_trunc(%s, %s::timestamptz)
+            FROM public.timeseries_rollup_watermarks
+            WHERE period_type = %s
+            AND rolled_up_to > %s
+            ON CONFLICT DO NOTHING
+            """,
+            (parent, ROLLUP_PERIODS[parent][0], bucket, parent, bucket)
+        )
+
+def rollup_period(
+    period_type: str,
+    user_id: int = 1,  # Default to admin user
+    user_role: str = 'admin'  # Default to admin role
+) -> Tuple[int, int]:
+    """
+    Roll up the newly closed and the dirty buckets of a period type.
+
+    The watermark row is locked for the duration of the rollup, so concurrent workers
+    roll up each bucket once.
+
+    Args:
+        period_type: The aggregation period type (hourly, daily, weekly, monthly)
+        user_id: The user ID for RLS context (defaults to 1 for admin)
+        user_role: The user role for RLS context (defaults to 'admin')
+
+    Returns:
+        Tuple[int, int]: (success_count, failure_count), the number of aggregates written,
+            and 1 if the rollup failed
+    """
+    started = time.monotonic()
+    source = get_rollup_source(period_type)
+    interval = ROLLUP_PERIODS[period_type][1]
+    watermark = None
+    rows = 0
+    failed = False
 
-            # Process each metric
-            for metric_id, metric_name, data_type in metric_defs:
+    try:
+        with get_user_db_connection(user_id=user_id, user_role=user_role) as conn:
+            if not conn:
+                logger.error("Failed to get database connection for rolling up metrics")
+                failed = True
+            else:
+                cursor = conn.cursor()
                 try:
-                    # Get all entity types and IDs for this metric
-                    cursor = conn.cursor()
-                    try:
+                    watermark = _get_watermark(cursor, period_type)
+                    limit = _get_rollup_limit(cursor, period_type, source)
+
+                    # Newly closed buckets
+                    if limit > watermark:
+                        rows += _rollup_range(cursor, period_type, source, watermark, limit)
                         cursor.execute(
                             """
-                            SELECT DISTINCT entity_type, entity_id, owner_id
-                            FROM public.timeseries_data
-                            WHERE metric_id = %s
-                            AND timestamp BETWEEN %s AND %s
+                            UPDATE public.timeseries_rollup_watermarks
+                            SET rolled_up_to = %s, updated_at = now()
+                            WHERE period_type = %s
                             """,
-                            (metric_id, start_time, end_time)
+                            (limit, period_type)
                         )
-                        entities = cursor.fetchall()
-                        logger.debug(f"Found {len(entities)} entities for metric '{metric_name}' in period {start_time} to {end_time}")
-                    finally:
-                        cursor.close()
-
-                    # Process each entity
-                    for entity_type, entity_id, owner_id in entities:
-                        try:
-                            # Calculate aggregates
-                            cursor = conn.cursor()
-                            try:
-                                cursor.execute(
-                                    """
-                                    SELECT
-                                        MIN(CASE
-                                            WHEN %s = 'float' THEN value_float
-                                            WHEN %s = 'integer' THEN value_int::float
-                                            WHEN %s = 'boolean' THEN value_bool::int::float
-                                            ELSE NULL
-                                        END) AS min_value,
-                                        MAX(CASE
-                                            WHEN %s = 'float' THEN value_float
-                                            WHEN %s = 'integer' THEN value_int::float
-                                            WHEN %s = 'boolean' THEN value_bool::int::float
-                                            ELSE NULL
-                                        END) AS max_value,
-                                        AVG(CASE
-                                            WHEN %s = 'float' THEN value_float
-                                            WHEN %s = 'integer' THEN value_int::float
-                                            WHEN %s = 'boolean' THEN value_bool::int::float
-                                            ELSE NULL
-                                        END) AS avg_value,
-                                        SUM(CASE
-                                            WHEN %s = 'float' THEN value_float
-                                            WHEN %s = 'integer' THEN value_int::float
-                                            WHEN %s = 'boolean' THEN value_bool::int::float
-                                            ELSE NULL
-                                        END) AS sum_value,
-                                        COUNT(*) AS count_value
-                                    FROM public.timeseries_data
-                                    WHERE metric_id = %s
-                                    AND entity_type = %s
-                                    AND entity_id = %s
-                                    AND timestamp BETWEEN %s AND %s
-                                    """,
-                                    (
-                                        data_type, data_type, data_type,
-                                        data_type, data_type, data_type,
-                                        data_type, data_type, data_type,
-                                        data_type, data_type, data_type,
-                                        metric_id, entity_type, entity_id, start_time, end_time
-                                    )
-                                )
-                                result = cursor.fetchone()
-                                min_value, max_value, avg_value, sum_value, count_value = result
-                            finally:
-                                cursor.close()
-
-                            # Skip if no data
-                            if count_value == 0:
-                                continue
-
-                            # Check if aggregate already exists and update/insert in a single operation
-                            cursor = conn.cursor()
-                            try:
-                                # First try to update existing record
-                                cursor.execute(
-                                    """
-                                    UPDATE public.timeseries_aggregates
-                                    SET min_value = %s, max_value = %s, avg_value = %s, sum_value = %s, count_value = %s
-                                    WHERE metric_id = %s
-                                    AND period_type = %s
-                                    AND period_start = %s
-                                    AND period_end = %s
-                                    AND entity_type = %s
-                                    AND entity_id = %s
-                                    RETURNING id
-                                    """,
-                                    (min_value, max_value, avg_value, sum_value, count_value,
-                                     metric_id, period_type, start_time, end_time, entity_type, entity_id)
-                                )
-
-                                # If no rows were updated, insert a new record
-                                if cursor.rowcount == 0:
-                                    cursor.execute(
-                                        """
-                                        INSERT INTO public.timeseries_aggregates
-                                        (metric_id, period_start, period_end, period_type, min_value, max_value, avg_value, sum_value, count_value, entity_type, entity_id, owner_id)
-                                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                                        """,
-                                        (metric_id, start_time, end_time, period_type, min_value, max_value, avg_value, sum_value, count_value, entity_type, entity_id, owner_id)
-                                    )
-
-                                conn.commit()
-                            finally:
-                                cursor.close()
-
-                            success_count += 1
-                        except Exception as e:
-                            logger.error(f"Error aggregating metric '{metric_name}' for entity '{entity_type}:{entity_id}': {e}")
-                            failure_count += 1
-                except Exception as e:
-                    logger.error(f"Error processing metric '{metric_name}': {e}")
-                    failure_count += 1
-
-        return success_count, failure_count
+
+                    # Buckets that received late data
+                    cursor.execute(
+                        """
+                        DELETE FROM public.timeseries_rollup_dirty
+                        WHERE period_type = %s
+                        RETURNING period_start, period_start + %s::interval
+                        """,
+                        (period_type, interval)
+                    )
+                    for bucket_start, bucket_end in cursor.fetchall():
+                        rows += _rollup_range(cursor, period_type, source, bucket_start, bucket_end)
+                        _mark_dirty_parents(cursor, period_type, bucket_start)
+
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
     except Exception as e:
-        logger.error(f"Error aggregating metrics: {e}")
-        return 0, 0
+        logger.error(f"Error rolling up {period_type} metrics: {e}")
+        failed = True
+
+    duration = time.monotonic() - started
+    _record_aggregation(period_type, watermark, rows, duration, failed)
+    if rows or failed:
+        logger.info(f"Rolled up {rows} {period_type} buckets from {source or 'raw data'} in {duration:.3f}s")
+
+    return rows, 1 if failed else 0
+
+def rollup_metrics(
+    user_id: int = 1,  # Default to admin user
+    user_role: str = 'admin'  # Default to admin role
+) -> Dict[str, Tuple[int, int]]:
+    """
+    Run the rollup cascade for every enabled period type, finest first.
+
+    Args:
+        user_id: The user ID for RLS context (defaults to 1 for admin)
+        user_role: The user role for RLS context (defaults to 'admin')
+
+    Returns:
+        Dict[str, Tuple[int, int]]: (success_count, failure_count) per period type
+    """
+    results = {}
+    for period_type in ROLLUP_PERIODS:
+        if timeseries_config['aggregation']['periods'][period_type]:
+            results[period_type] = rollup_period(period_type, user_id=user_id, user_role=user_role)
+    return results
 
 def clean_old_data(
     user_id: int = 1,  # Default to admin user
@@ -209,17 +426,18 @@ def clean_old_data(
 
             cursor = conn.cursor()
             try:
-                # Clean raw data
+                # Clean raw data by dropping the daily partitions past the retention period
                 raw_retention = timeseries_config['retention']['raw_data_days']
-                raw_cutoff = datetime.now() - timedelta(days=raw_retention)
+                raw_cutoff = datetime.now(timezone.utc) - timedelta(days=raw_retention)
 
-                cursor.execute(
-                    "DELETE FROM public.timeseries_data WHERE timestamp < %s",
-                    (raw_cutoff,)
-                )
+                raw_deleted = drop_time_partitions(cursor, "timeseries_data", raw_cutoff)
+                logger.info(f"Dropped {raw_deleted} raw data points older than {raw_cutoff}")
+
+                # Latest values of series that stopped reporting expire with their raw data
+                cursor.execute("DELETE FROM public.timeseries_latest WHERE timestamp < %s", (raw_cutoff,))
 
-                raw_deleted = cursor.rowcount
-                logger.info(f"Deleted {raw_deleted} raw data points older than {raw_cutoff}")
+                latest_deleted = cursor.rowcount
+                logger.info(f"Deleted {latest_deleted} latest values older than {raw_cutoff}")
 
                 # Clean hourly aggregates
                 hourly_retention = timeseries_config['retention']['hourly_aggregates_days']
@@ -286,74 +504,11 @@ def aggregator_thread_func() -> None:
         try:
             now = datetime.now()
 
-            # Hourly aggregation
-            if timeseries_config['aggregation']['periods']['hourly']:
-                # Round to the current hour
-                hour_start = now.replace(minute=0, second=0, microsecond=0)
-                hour_end = hour_start + timedelta(hours=1)
-
-                logger.info(f"Aggregating hourly data for {hour_start} to {hour_end}")
-                success, failure = aggregate_metrics(
-                    period_type='hourly',
-                    start_time=hour_start,
-                    end_time=hour_end,
-                    user_id=1,  # Admin user ID
-                    user_role='admin'  # Admin role
-                )
-                logger.info(f"Hourly aggregation: {success} successes, {failure} failures")
-
-            # Daily aggregation (at midnight)
-            if timeseries_config['aggregation']['periods']['daily'] and now.hour == 0 and now.minute < 10:
-                # Round to the previous day
-                day_end = now.replace(hour=0, minute=0, second=0, microsecond=0)
-                day_start = day_end - timedelta(days=1)
-
-                logger.info(f"Aggregating daily data for {day_start} to {day_end}")
-                success, failure = aggregate_metrics(
-                    period_type='daily',
-                    start_time=day_start,
-                    end_time=day_end,
-                    user_id=1,  # Admin user ID
-                    user_role='admin'  # Admin role
-                )
-                logger.info(f"Daily aggregation: {success} successes, {failure} failures")
-
-            # Weekly aggregation (on Monday)
-            if timeseries_config['aggregation']['periods']['weekly'] and now.weekday() == 0 and now.hour == 1 and now.minute < 10:
-                # Round to the previous week (Monday to Monday)
-                week_end = now.replace(hour=0, minute=0, second=0, microsecond=0)
-                week_start = week_end - timedelta(days=7)
-
-                logger.info(f"Aggregating weekly data for {week_start} to {week_end}")
-                success, failure = aggregate_metrics(
-                    period_type='weekly',
-                    start_time=week_start,
-                    end_time=week_end,
-                    user_id=1,  # Admin user ID
-                    user_role='admin'  # Admin role
-                )
-                logger.info(f"Weekly aggregation: {success} successes, {failure} failures")
-
-            # Monthly aggregation (on the 1st of the month)
-            if timeseries_config['aggregation']['periods']['monthly'] and now.day == 1 and now.hour == 2 and now.minute < 10:
-                # Round to the previous month
-                month_end = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-                # Get the last day of the previous month
-                if month_end.month == 1:
-                    month_start = month_end.replace(year=month_end.year-1, month=12, day=1)
-                else:
-                    month_start = month_end.replace(month=month_end.month-1, day=1)
-
-                logger.info(f"Aggregating monthly data for {month_start} to {month_end}")
-                success, failure = aggregate_metrics(
-                    period_type='monthly',
-                    start_time=month_start,
-                    end_time=month_end,
-                    user_id=1,  # Admin user ID
-                    user_role='admin'  # Admin role
-                )
-                logger.info(f"Monthly aggregation: {success} successes, {failure} failures")
+            # Roll up the buckets closed since the last run
+            rollup_metrics(
+                user_id=1,  # Admin user ID
+                user_role='admin'  # Admin role
+            )
 
             # Clean old data (once a day at 3 AM)
             if now.hour == 3 and now.minute < 10:
@@ -1,21 +1,24 @@
 """
 Timeseries collector module.
 
-This module provides functions for collecting timeseries data.
+This module provides functions for collecting timeseries data. Each kind of metrics is
+collected by a source registered with the collection scheduler, at its own interval.
 """
 
 import logging
 import time
 import threading
 import psutil
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
-from db.connection import get_db_connection
-from db.user_connection import get_user_db_connection
 from .config import timeseries_config
+from .scheduler import (
+    CollectionCycle, collection_cycle, register_collector_source, run_collection_cycle,
+    get_collector_sources, get_next_collection_delay
+)
 from .vm_status import collect_vm_status_distribution
-from .storage import store_metric, store_metrics_batch
+from .storage import store_metric, store_metrics_batch, GLOBAL_SCOPE
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -24,398 +27,222 @@ logger = logging.getLogger(__name__)
 _collector_thread = None
 _collector_stop_event = threading.Event()
 
-def collect_system_metrics() -> List[Dict[str, Any]]:
+# CPU times of the previous CPU usage sample. Sampled at import, so that the first
+# collection measures the usage since then instead of blocking to measure it.
+_last_cpu_times = psutil.cpu_times()
+_cpu_lock = threading.Lock()
+
+def _global_metric(metric_name: str, value: Any, timestamp: datetime) -> Dict[str, Any]:
+    """
+    Build a system-wide metric, stored once and readable by every user.
+
+    Args:
+        metric_name: The name of the metric
+        value: The metric value
+        timestamp: The timestamp of the measurement
+
+    Returns:
+        Dict[str, Any]: The metric
+    """
+    return {
+        'metric_name': metric_name,
+        'value': value,
+        'entity_type': 'system',
+        'entity_id': 'system',
+        'scope': GLOBAL_SCOPE,
+        'timestamp': timestamp
+    }
+
+def _cpu_time(times: Any) -> Tuple[float, float]:
+    """Get the total and busy CPU time of a psutil.cpu_times() sample."""
+    # Guest time is already accounted in user time, and I/O wait is idle time
+    total = sum(times) - getattr(times, 'guest', 0) - getattr(times, 'guest_nice', 0)
+    busy = total - times.idle - getattr(times, 'iowait', 0)
+    return total, busy
+
+def sample_cpu_usage() -> float:
+    """
+    Get the CPU usage since the previous sample, without blocking.
+
+    Returns:
+        float: The CPU usage in percent
+    """
+    global _last_cpu_times
+
+    times = psutil.cpu_times()
+    with _cpu_lock:
+        last_times, _last_cpu_times = _last_cpu_times, times
+
+    total, busy = _cpu_time(times)
+    last_total, last_busy = _cpu_time(last_times)
+    if total <= last_total:
+        return 0.0
+
+    return round(min(100.0, max(0.0, (busy - last_busy) / (total - last_total) * 100)), 1)
+
+def collect_system_metrics(cycle: Optional[CollectionCycle] = None) -> List[Dict[str, Any]]:
     """
     Collect system metrics.
 
+    Args:
+        cycle: The collection cycle, or None to collect outside of a cycle
+
     Returns:
         List[Dict[str, Any]]: List of system metrics
     """
     try:
-        metrics = []
-        timestamp = datetime.now()
+        with collection_cycle(cycle) as cycle:
+            metrics = []
+            timestamp = cycle.timestamp
 
-        # Get all user IDs to store metrics for each user (for RLS)
-        user_ids = [1]  # Start with admin user
-        try:
-            with get_db_connection() as conn:
-                if conn:
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT id FROM public.users WHERE is_active = TRUE")
-                    for row in cursor.fetchall():
-                        if row[0] != 1:  # Skip admin user (already added)
-                            user_ids.append(row[0])
-                    cursor.close()
-        except Exception as e:
-            logger.error(f"Error getting user IDs: {e}")
-
-        logger.info(f"Collecting system metrics for {len(user_ids)} users")
-
-        # CPU usage
-        cpu_percent = psutil.cpu_percent(interval=1)
-        for user_id in user_ids:
-            metrics.append({
-                'metric_name': 'cpu_usage',
-                'value': cpu_percent,
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': user_id,
-                'timestamp': timestamp
-            })
-
-        # Memory usage
-        memory = psutil.virtual_memory()
-        for user_id in user_ids:
-            metrics.append({
-                'metric_name': 'memory_usage',
-                'value': memory.percent,
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': user_id,
-                'timestamp': timestamp
-            })
-
-        # Disk usage
-        disk = psutil.disk_usage('/')
-        for user_id in user_ids:
-            metrics.append({
-                'metric_name': 'disk_usage',
-                'value': disk.percent,
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': user_id,
-                'timestamp': timestamp
-            })
-
-        # Network usage
-        net_io = psutil.net_io_counters()
-        for user_id in user_ids:
-            metrics.append({
-                'metric_name': 'network_in',
-                'value': net_io.bytes_recv / 1024,  # KB
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': user_id,
-                'timestamp': timestamp
-            })
-            metrics.append({
-                'metric_name': 'network_out',
-                'value': net_io.bytes_sent / 1024,  # KB
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': user_id,
-                'timestamp': timestamp
-            })
-
-        # Database connections
-        try:
-            with get_db_connection() as conn:
-                if conn:
-                    cursor = conn.cursor()
+            # CPU usage
+            metrics.append(_global_metric('cpu_usage', sample_cpu_usage(), timestamp))
+
+            # Memory usage
+            memory = psutil.virtual_memory()
+            metrics.append(_global_metric('memory_usage', memory.percent, timestamp))
+
+            # Disk usage
+            disk = psutil.disk_usage('/')
+            metrics.append(_global_metric('disk_usage', disk.percent, timestamp))
+
+            # Network usage
+            net_io = psutil.net_io_counters()
+            metrics.append(_global_metric('network_in', net_io.bytes_recv / 1024, timestamp))  # KB
+            metrics.append(_global_metric('network_out', net_io.bytes_sent / 1024, timestamp))  # KB
+
+            # Database connections
+            try:
+                with cycle.cursor() as cursor:
                     cursor.execute("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()")
                     active_connections = cursor.fetchone()[0]
-                    cursor.close()
-
-                    for user_id in user_ids:
-                        metrics.append({
-                            'metric_name': 'active_connections',
-                            'value': active_connections,
-                            'entity_type': 'system',
-                            'entity_id': 'system',
-                            'owner_id': user_id,
-                            'timestamp': timestamp
-                        })
-        except Exception as e:
-            logger.error(f"Error getting database connection count: {e}")
 
-        return metrics
+                metrics.append(_global_metric('active_connections', active_connections, timestamp))
+            except Exception as e:
+                logger.error(f"Error getting database connection count: {e}")
+
+            return metrics
     except Exception as e:
         logger.error(f"Error collecting system metrics: {e}")
         return []
 
-def collect_vm_metrics() -> List[Dict[str, Any]]:
+def _vm_metric(metric_name: str, value: Any, entity_type: str, entity_id: str, owner_id: int, timestamp: datetime) -> Dict[str, Any]:
+    """Build a metric of a VM, stored for its owner."""
+    return {
+        'metric_name': metric_name,
+        'value': value,
+        'entity_type': entity_type,
+        'entity_id': entity_id,
+        'owner_id': owner_id,
+        'timestamp': timestamp
+    }
+
+def collect_vm_metrics(cycle: Optional[CollectionCycle] = None) -> List[Dict[str, Any]]:
     """
     Collect VM metrics.
 
+    Args:
+        cycle: The collection cycle, or None to collect outside of a cycle
+
     Returns:
         List[Dict[str, Any]]: List of VM metrics
     """
     try:
-        metrics = []
-        timestamp = datetime.now()
-
-        # Get all user IDs to store metrics for each user (for RLS)
-        user_ids = [1]  # Start with admin user
-        try:
-            with get_db_connection() as conn:
-                if conn:
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT id FROM public.users WHERE is_active = TRUE")
-                    for row in cursor.fetchall():
-                        if row[0] != 1:  # Skip admin user (already added)
-                            user_ids.append(row[0])
-                    cursor.close()
-        except Exception as e:
-            logger.error(f"Error getting user IDs: {e}")
-
-        logger.info(f"Collecting VM metrics for {len(user_ids)} users")
-
-        # Get database connection with RLS context
-        with get_user_db_connection(user_id=1, user_role='admin') as conn:
-            if not conn:
-                logger.error("Failed to get database connection for VM metrics")
-                return []
-
-            cursor = conn.cursor()
+        with collection_cycle(cycle) as cycle:
+            metrics = []
+            timestamp = cycle.timestamp
+            vms = cycle.get_vms()
 
             # Get VM counts by status
-            cursor.execute("""
-                SELECT status, COUNT(*)
-                FROM public.vms
-                GROUP BY status
-            """)
-
-            status_counts = {row[0]: row[1] for row in cursor.fetchall()}
-
-        # Calculate total VMs
-        total_vms = sum(status_counts.values())
-
-        # Add VM count metrics for each user
-        for user_id in user_ids:
-            metrics.append({
-                'metric_name': 'vm_count',
-                'value': total_vms,
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': user_id,
-                'timestamp': timestamp
-            })
-
-            running_vms = status_counts.get('running', 0)
-            metrics.append({
-                'metric_name': 'vm_running_count',
-                'value': running_vms,
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': user_id,
-                'timestamp': timestamp
-            })
-
-            stopped_vms = status_counts.get('stopped', 0)
-            metrics.append({
-                'metric_name': 'vm_stopped_count',
-                'value': stopped_vms,
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': user_id,
-                'timestamp': timestamp
-            })
-
-            error_vms = status_counts.get('error', 0)
-            metrics.append({
-                'metric_name': 'vm_error_count',
-                'value': error_vms,
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': user_id,
-                'timestamp': timestamp
-            })
-
-        with get_user_db_connection(user_id=1, user_role='admin') as conn:
-            if not conn:
-                logger.error("Failed to get database connection for VM metrics")
-                return metrics
-
-            cursor = conn.cursor()
-
-            # Get individual VM metrics
-            cursor.execute("""
-                SELECT
-                    id, vmid, name, status, cpu_usage_percent,
-                    memory_mb, uptime_seconds, owner_id
-                FROM public.vms
-            """)
-
-            for row in cursor.fetchall():
-                vm_id, vmid, name, status, cpu_usage, memory_mb, uptime, owner_id = row
-
+            status_counts = {}
+            for _, status, _, _, _ in vms:
+                status_counts[status] = status_counts.get(status, 0) + 1
+
+            # Add VM count metrics
+            metrics.append(_global_metric('vm_count', len(vms), timestamp))
+            metrics.append(_global_metric('vm_running_count', status_counts.get('running', 0), timestamp))
+            metrics.append(_global_metric('vm_stopped_count', status_counts.get('stopped', 0), timestamp))
+            metrics.append(_global_metric('vm_error_count', status_counts.get('error', 0), timestamp))
+
+            # Add individual VM metrics
+            for vm_id, _, cpu_usage, uptime, owner_id in vms:
                 # Use default owner_id if it's None or empty
                 safe_owner_id = owner_id if owner_id else 1
 
-                # Add CPU usage metric
                 if cpu_usage is not None:
-                    metrics.append({
-                        'metric_name': 'vm_cpu_usage',
-                        'value': cpu_usage,
-                        'entity_type': 'vm',
-                        'entity_id': str(vm_id),
-                        'owner_id': safe_owner_id,
-                        'timestamp': timestamp
-                    })
-
-                # Add uptime metric
+                    metrics.append(_vm_metric('vm_cpu_usage', cpu_usage, 'vm', str(vm_id), safe_owner_id, timestamp))
                 if uptime is not None:
-                    metrics.append({
-                        'metric_name': 'vm_uptime',
-                        'value': uptime,
-                        'entity_type': 'vm',
-                        'entity_id': str(vm_id),
-                        'owner_id': safe_owner_id,
-                        'timestamp': timestamp
-                    })
+                    metrics.append(_vm_metric('vm_uptime', uptime, 'vm', str(vm_id), safe_owner_id, timestamp))
 
             # Get Windows VM agent metrics
-            cursor.execute("""
-                SELECT
-                    vm_id, cpu_usage_percent, memory_usage_percent,
-                    disk_usage_percent, uptime_seconds, owner_id
-                FROM public.windows_vm_agents
-                WHERE status = 'active'
-            """)
-
-            for row in cursor.fetchall():
-                vm_id, cpu_usage, memory_usage, disk_usage, uptime, owner_id = row
-
+            with cycle.cursor() as cursor:
+                cursor.execute("""
+                    SELECT
+                        vm_id, cpu_usage_percent, memory_usage_percent,
+                        disk_usage_percent, uptime_seconds, owner_id
+                    FROM public.windows_vm_agents
+                    WHERE status = 'active'
+                """)
+                agents = cursor.fetchall()
+
+            for vm_id, cpu_usage, memory_usage, disk_usage, uptime, owner_id in agents:
                 # Use default owner_id if it's None or empty
                 safe_owner_id = owner_id if owner_id else 1
 
-                # Add CPU usage metric
-                if cpu_usage is not None:
-                    metrics.append({
-                        'metric_name': 'vm_cpu_usage',
-                        'value': cpu_usage,
-                        'entity_type': 'vm_agent',
-                        'entity_id': vm_id,
-                        'owner_id': safe_owner_id,
-                        'timestamp': timestamp
-                    })
-
-                # Add memory usage metric
-                if memory_usage is not None:
-                    metrics.append({
-                        'metric_name': 'vm_memory_usage',
-                        'value': memory_usage,
-                        'entity_type': 'vm_agent',
-                        'entity_id': vm_id,
-                        'owner_id': safe_owner_id,
-                        'timestamp': timestamp
-                    })
-
-                # Add disk usage metric
-                if disk_usage is not None:
-                    metrics.append({
-                        'metric_name': 'vm_disk_usage',
-                        'value': disk_usage,
-                        'entity_type': 'vm_agent',
-                        'entity_id': vm_id,
-                        'owner_id': safe_owner_id,
-                        'timestamp': timestamp
-                    })
-
-                # Add uptime metric
-                if uptime is not None:
-                    metrics.append({
-                        'metric_name': 'vm_uptime',
-                        'value': uptime,
-                        'entity_type': 'vm_agent',
-                        'entity_id': vm_id,
-                        'owner_id': safe_owner_id,
-                        'timestamp': timestamp
-                    })
-
-            cursor.close()
-
-        return metrics
+                for metric_name, value in (
+                    ('vm_cpu_usage', cpu_usage),
+                    ('vm_memory_usage', memory_usage),
+                    ('vm_disk_usage', disk_usage),
+                    ('vm_uptime', uptime)
+                ):
+                    if value is not None:
+                        metrics.append(_vm_metric(metric_name, value, 'vm_agent', vm_id, safe_owner_id, timestamp))
+
+            return metrics
     except Exception as e:
         logger.error(f"Error collecting VM metrics: {e}")
         return []
 
-def collect_account_metrics() -> List[Dict[str, Any]]:
+def collect_account_metrics(cycle: Optional[CollectionCycle] = None) -> List[Dict[str, Any]]:
     """
     Collect account metrics.
 
+    Args:
+        cycle: The collection cycle, or None to collect outside of a cycle
+
     Returns:
         List[Dict[str, Any]]: List of account metrics
     """
     try:
-        metrics = []
-        timestamp = datetime.now()
+        with collection_cycle(cycle) as cycle:
+            metrics = []
+            timestamp = cycle.timestamp
 
-        # Get all user IDs to store metrics for each user (for RLS)
-        user_ids = [1]  # Start with admin user
-        try:
-            with get_db_connection() as conn:
-                if conn:
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT id FROM public.users WHERE is_active = TRUE")
-                    for row in cursor.fetchall():
-                        if row[0] != 1:  # Skip admin user (already added)
-                            user_ids.append(row[0])
-                    cursor.close()
-        except Exception as e:
-            logger.error(f"Error getting user IDs: {e}")
-
-        logger.info(f"Collecting account metrics for {len(user_ids)} users")
-
-        # Get database connection with RLS context
-        with get_user_db_connection(user_id=1, user_role='admin') as conn:
-            if not conn:
-                logger.error("Failed to get database connection for account metrics")
-                return []
-
-            cursor = conn.cursor()
-
-            # Get account counts
-            cursor.execute("SELECT COUNT(*) FROM public.accounts")
-            total_accounts = cursor.fetchone()[0]
-
-            # Get locked account counts
-            cursor.execute("SELECT COUNT(*) FROM public.accounts WHERE lock = TRUE")
-            locked_accounts = cursor.fetchone()[0]
-
-            cursor.close()
-
-        # Get active account count (not locked)
-        active_accounts = total_accounts - locked_accounts
-
-        # Add metrics for each user
-        for user_id in user_ids:
-            metrics.append({
-                'metric_name': 'account_count',
-                'value': total_accounts,
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': user_id,
-                'timestamp': timestamp
-            })
-
-            metrics.append({
-                'metric_name': 'account_locked_count',
-                'value': locked_accounts,
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': user_id,
-                'timestamp': timestamp
-            })
-
-            metrics.append({
-                'metric_name': 'account_active_count',
-                'value': active_accounts,
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': user_id,
-                'timestamp': timestamp
-            })
-
-        return metrics
+            # Get total and locked account counts
+            with cycle.cursor() as cursor:
+                cursor.execute("SELECT COUNT(*), COUNT(*) FILTER (WHERE lock = TRUE) FROM public.accounts")
+                total_accounts, locked_accounts = cursor.fetchone()
+
+            # Get active account count (not locked)
+            active_accounts = total_accounts - locked_accounts
+
+            # Add account count metrics
+            metrics.append(_global_metric('account_count', total_accounts, timestamp))
+            metrics.append(_global_metric('account_locked_count', locked_accounts, timestamp))
+            metrics.append(_global_metric('account_active_count', active_accounts, timestamp))
+
+            return metrics
     except Exception as e:
         logger.error(f"Error collecting account metrics: {e}")
         return []
 
-def collect_job_metrics() -> List[Dict[str, Any]]:
+def collect_job_metrics(cycle: Optional[CollectionCycle] = None) -> List[Dict[str, Any]]:
     """
     Collect job metrics.
 
+    Args:
+        cycle: The collection cycle, or None to collect outside of a cycle
+
     Returns:
         List[Dict[str, Any]]: List of job metrics
     """
@@ -423,60 +250,71 @@ def collect_job_metrics() -> List[Dict[str, Any]]:
     # Implement based on your job tracking system
     return []
 
-def collect_all_metrics() -> None:
+def register_default_sources() -> None:
     """
-    Collect all metrics and store them.
+    Register the built-in sources of metrics with the intervals of the configuration.
     """
-    try:
-        all_metrics = []
-
-        # Collect system metrics
-        if timeseries_config['collection']['metrics']['system']:
-            system_metrics = collect_system_metrics()
-            all_metrics.extend(system_metrics)
-
-        # Collect VM metrics
-        if timeseries_config['collection']['metrics']['vm']:
-            vm_metrics = collect_vm_metrics()
-            all_metrics.extend(vm_metrics)
-
-            # Collect VM status distribution
-            vm_status_metrics = collect_vm_status_distribution()
-            all_metrics.extend(vm_status_metrics)
+    collection = timeseries_config['collection']
+    for name, collect, setting in (
+        ('system', collect_system_metrics, 'system'),
+        ('vm', collect_vm_metrics, 'vm'),
+        ('vm_status', collect_vm_status_distribution, 'vm'),
+        ('account', collect_account_metrics, 'account'),
+        ('job', collect_job_metrics, 'job')
+    ):
+        register_collector_source(
+            name,
+            collect,
+            interval=collection['intervals'].get(name, collection['interval']),
+            enabled=collection['metrics'][setting]
+        )
+
+def collect_all_metrics(force: bool = False, user_id: int = 1, user_role: str = 'admin') -> Tuple[int, int, int]:
+    """
+    Collect the metrics of the sources that are due and store them.
 
-        # Collect account metrics
-        if timeseries_config['collection']['metrics']['account']:
-            account_metrics = collect_account_metrics()
-            all_metrics.extend(account_metrics)
+    Args:
+        force: Collect every enabled source, whether it is due or not
+        user_id: The ID of the user collecting and storing the metrics (defaults to the admin user)
+        user_role: The role of the user collecting and storing the metrics
 
-        # Collect job metrics
-        if timeseries_config['collection']['metrics']['job']:
-            job_metrics = collect_job_metrics()
-            all_metrics.extend(job_metrics)
+    Returns:
+        Tuple[int, int, int]: The number of collected metrics, of stored metrics and of failures
+    """
+    try:
+        start = time.monotonic()
+        all_metrics = run_collection_cycle(force=force, user_id=user_id, user_role=user_role)
+        duration = time.monotonic() - start
 
         # Log metrics count by type
         metric_types = {}
         for metric in all_metrics:
             metric_name = metric.get('metric_name', 'unknown')
-            if metric_name not in metric_types:
-                metric_types[metric_name] = 0
-            metric_types[metric_name] += 1
-
-        logger.info(f"Collected metrics by type: {metric_types}")
-
-        # Store metrics with admin RLS context
-        if all_metrics:
-            logger.info(f"Storing {len(all_metrics)} metrics...")
-            success_count, failure_count = store_metrics_batch(
-                metrics=all_metrics,
-                user_id=1,  # Admin user ID
-                user_role='admin'  # Admin role
-            )
-            logger.info(f"Stored {success_count} metrics, {failure_count} failures")
-        else:
-            logger.warning("No metrics collected!")
+            metric_types[metric_name] = metric_types.get(metric_name, 0) + 1
+
+        logger.info(f"Collected metrics by type in {duration:.3f}s: {metric_types}")
+
+        # Warn when a cycle takes longer than the shortest interval, since the next one is late
+        intervals = [source.interval for source in get_collector_sources() if source.enabled]
+        if intervals and duration > min(intervals):
+            logger.warning(f"Metrics collection took {duration:.3f}s, longer than the {min(intervals)}s interval")
+
+        if not all_metrics:
+            logger.debug("No metrics due for collection")
+            return 0, 0, 0
+
+        # Store metrics with the RLS context of the user
+        logger.info(f"Storing {len(all_metrics)} metrics...")
+        success_count, failure_count = store_metrics_batch(
+            metrics=all_metrics,
+            user_id=user_id,
+            user_role=user_role
+        )
+        logger.info(f"Stored {success_count} metrics, {failure_count} failures")
+        return len(all_metrics), success_count, failure_count
     except Exception as e:
         logger.error(f"Error collecting metrics: {e}", exc_info=True)
+        return 0, 0, 0
 
 def collector_thread_func() -> None:
     """
@@ -489,8 +327,8 @@ def collector_thread_func() -> None:
             # Collect and store metrics
             collect_all_metrics()
 
-            # Sleep until next interval
-            _collector_stop_event.wait(timeseries_config['collection']['interval'])
+            # Sleep until the next source is due
+            _collector_stop_event.wait(get_next_collection_delay(timeseries_config['collection']['interval']))
         except Exception as e:
             logger.error(f"Error in collector thread: {e}")
             # Sleep for a short time to avoid busy-waiting in case of persistent errors
@@ -546,3 +384,5 @@ def shutdown_collector() -> None:
     """
     logger.info("Shutting down timeseries collector")
     stop_collector_thread()
+
+register_default_sources()
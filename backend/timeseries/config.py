@@ -28,6 +28,14 @@ timeseries_config = {
             "vm": os.environ.get("TIMESERIES_COLLECT_VM", "true").lower() == "true",
             "account": os.environ.get("TIMESERIES_COLLECT_ACCOUNT", "true").lower() == "true",
             "job": os.environ.get("TIMESERIES_COLLECT_JOB", "true").lower() == "true"
+        },
+        # Collection interval of each source in seconds, defaulting to the collection interval
+        "intervals": {
+            source: int(os.environ.get(
+                f"TIMESERIES_{source.upper()}_INTERVAL",
+                os.environ.get("TIMESERIES_COLLECTION_INTERVAL", DEFAULT_COLLECTION_INTERVAL)
+            ))
+            for source in ("system", "vm", "vm_status", "account", "job")
         }
     },
     "aggregation": {
@@ -69,6 +77,8 @@ def log_timeseries_config() -> None:
     logger.info(f"  Collect VM metrics: {timeseries_config['collection']['metrics']['vm']}")
     logger.info(f"  Collect account metrics: {timeseries_config['collection']['metrics']['account']}")
     logger.info(f"  Collect job metrics: {timeseries_config['collection']['metrics']['job']}")
+    for source, interval in timeseries_config['collection']['intervals'].items():
+        logger.info(f"  Collection interval of {source} metrics: {interval} seconds")
     logger.info(f"  Aggregation enabled: {timeseries_config['aggregation']['enabled']}")
     logger.info(f"  Aggregation interval: {timeseries_config['aggregation']['interval']} seconds")
     logger.info(f"  Aggregate hourly: {timeseries_config['aggregation']['periods']['hourly']}")
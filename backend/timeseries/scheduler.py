@@ -0,0 +1,340 @@
+"""
+Timeseries collection scheduler module.
+
+Metrics are collected by sources, each registered with its own interval. A collection
+cycle runs the sources that are due concurrently, and records how long each of them
+took, so that the collection interval can be lowered without a cycle overrunning it.
+
+The sources of a cycle share a CollectionCycle: its timestamp, the RLS context its
+connections are opened with, and the rows every source needs, such as the VMs, which
+are only queried once per cycle. Each source works on its own pooled connection and
+transaction, so that their database work runs concurrently too.
+"""
+
+import logging
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, Iterator, Tuple
+from datetime import datetime
+
+from db.user_connection import get_user_db_connection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Maximum number of sources run at the same time
+DEFAULT_MAX_WORKERS = 4
+
+# VMs read once per cycle, shared by the VM sources
+CYCLE_VMS_QUERY = """
+    SELECT id, status, cpu_usage_percent, uptime_seconds, owner_id
+    FROM public.vms
+"""
+
+# Row of CYCLE_VMS_QUERY: (id, status, cpu_usage_percent, uptime_seconds, owner_id)
+VmRow = Tuple[int, Optional[str], Optional[float], Optional[int], Optional[int]]
+
+class CollectionCycle:
+    """
+    State shared by the sources of a collection cycle.
+
+    Every cursor is opened on its own pooled connection, in a transaction committed when
+    the block exits, so that the sources do not wait for each other's statements, and a
+    failing source does not abort the writes of the others. A write that cannot be
+    committed raises in the source that made it, before its metrics are returned.
+    """
+
+    def __init__(self, user_id: int = 1, user_role: str = 'admin'):
+        """
+        Initialize the cycle.
+
+        Args:
+            user_id: The ID of the user whose RLS context the connections use
+            user_role: The role of the user whose RLS context the connections use
+        """
+        self.timestamp = datetime.now()
+        self.user_id = user_id
+        self.user_role = user_role
+        self._lock = threading.Lock()
+        self._vms: Optional[List[VmRow]] = None
+
+    @contextmanager
+    def cursor(self) -> Iterator[Any]:
+        """
+        Get a cursor on a connection of its own, in a transaction committed when the block exits.
+
+        Yields:
+            A database cursor, whose statements are rolled back if the block raises
+
+        Raises:
+            RuntimeError: If no database connection is available
+        """
+        with get_user_db_connection(user_id=self.user_id, user_role=self.user_role) as conn:
+            if not conn:
+                raise RuntimeError("Failed to get database connection for metrics collection")
+
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def get_vms(self) -> List[VmRow]:
+        """
+        Get the VMs, queried on the first call of the cycle.
+
+        Returns:
+            List[VmRow]: The VMs, as (id, status, cpu_usage_percent, uptime_seconds, owner_id)
+        """
+        with self._lock:
+            if self._vms is None:
+                with self.cursor() as cursor:
+                    cursor.execute(CYCLE_VMS_QUERY)
+                    self._vms = cursor.fetchall()
+            return self._vms
+
+    def close(self) -> None:
+        """
+        Release the rows shared by the sources.
+        """
+        with self._lock:
+            self._vms = None
+
+@contextmanager
+def collection_cycle(
+    cycle: Optional[CollectionCycle] = None,
+    user_id: int = 1,
+    user_role: str = 'admin'
+) -> Iterator[CollectionCycle]:
+    """
+    Use the given cycle, or a new one closed when the block exits.
+
+    Args:
+        cycle: The cycle of the caller, if any
+        user_id: The ID of the user whose RLS context a new cycle uses
+        user_role: The role of the user whose RLS context a new cycle uses
+
+    Yields:
+        CollectionCycle: The cycle
+    """
+    if cycle is not None:
+        yield cycle
+        return
+
+    cycle = CollectionCycle(user_id=user_id, user_role=user_role)
+    try:
+        yield cycle
+    finally:
+        cycle.close()
+
+class CollectorSource:
+    """
+    A source of metrics, collected every `interval` seconds.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        collect: Callable[[CollectionCycle], List[Dict[str, Any]]],
+        interval: float,
+        enabled: bool = True
+    ):
+        """
+        Initialize the source.
+
+        Args:
+            name: The name of the source
+            collect: The function collecting the metrics of the source in a cycle
+            interval: The collection interval of the source in seconds
+            enabled: Whether the source is collected
+        """
+        self.name = name
+        self.collect = collect
+        self.interval = interval
+        self.enabled = enabled
+        self.last_run: Optional[float] = None
+
+    def is_due(self, now: float) -> bool:
+        """
+        Check whether the source has to be collected.
+
+        Args:
+            now: The current time.monotonic() value
+
+        Returns:
+            bool: True if the source is enabled and its interval has elapsed
+        """
+        return self.enabled and (self.last_run is None or now - self.last_run >= self.interval)
+
+    def next_run(self) -> float:
+        """
+        Get the time at which the source is due next.
+
+        Returns:
+            float: The time.monotonic() value at which the source is due
+        """
+        return (self.last_run or 0) + self.interval
+
+# Registered sources, by name, in registration order
+_sources: Dict[str, CollectorSource] = {}
+_sources_lock = threading.Lock()
+
+# Collection statistics, per source
+_source_stats: Dict[str, Dict[str, Any]] = {}
+_source_stats_lock = threading.Lock()
+
+def register_collector_source(
+    name: str,
+    collect: Callable[[CollectionCycle], List[Dict[str, Any]]],
+    interval: float,
+    enabled: bool = True
+) -> CollectorSource:
+    """
+    Register a source of metrics, replacing a source registered with the same name.
+
+    Args:
+        name: The name of the source
+        collect: The function collecting the metrics of the source in a cycle
+        interval: The collection interval of the source in seconds
+        enabled: Whether the source is collected
+
+    Returns:
+        CollectorSource: The registered source
+    """
+    source = CollectorSource(name, collect, interval, enabled)
+    with _sources_lock:
+        _sources[name] = source
+    return source
+
+def unregister_collector_source(name: str) -> None:
+    """
+    Unregister a source of metrics.
+
+    Args:
+        name: The name of the source
+    """
+    with _sources_lock:
+        _sources.pop(name, None)
+
+def get_collector_sources() -> List[CollectorSource]:
+    """
+    Get the registered sources of metrics.
+
+    Returns:
+        List[CollectorSource]: The sources, in registration order
+    """
+    with _sources_lock:
+        return list(_sources.values())
+
+def get_next_collection_delay(default: float) -> float:
+    """
+    Get the number of seconds until a source is due.
+
+    Args:
+        default: The delay if no source is enabled
+
+    Returns:
+        float: The delay in seconds
+    """
+    next_runs = [source.next_run() for source in get_collector_sources() if source.enabled]
+    if not next_runs:
+        return default
+    return max(0.0, min(next_runs) - time.monotonic())
+
+def _record_collection(name: str, metrics: int, duration: float, failed: bool) -> None:
+    """Record the outcome of the collection of a source."""
+    with _source_stats_lock:
+        stats = _source_stats.setdefault(name, {
+            "runs": 0,
+            "failures": 0,
+            "total_duration": 0.0,
+            "max_duration": 0.0
+        })
+        stats["runs"] += 1
+        stats["total_duration"] += duration
+        stats["max_duration"] = max(stats["max_duration"], duration)
+        if failed:
+            stats["failures"] += 1
+        stats["last_metrics"] = metrics
+        stats["last_duration"] = duration
+        stats["last_run"] = datetime.now()
+
+def get_collection_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Get the runtime statistics of the collection, per source.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: For each source, the number of runs and failures, the
+            total, average and maximum duration in seconds, and the outcome of the last run
+    """
+    with _source_stats_lock:
+        result = {}
+        for name, stats in _source_stats.items():
+            result[name] = dict(stats)
+            result[name]["avg_duration"] = stats["total_duration"] / stats["runs"] if stats["runs"] > 0 else 0
+        return result
+
+def reset_collection_stats() -> None:
+    """
+    Reset the runtime statistics of the collection.
+    """
+    with _source_stats_lock:
+        _source_stats.clear()
+
+def _run_source(source: CollectorSource, cycle: CollectionCycle) -> List[Dict[str, Any]]:
+    """Collect a source, recording how long it took."""
+    start = time.monotonic()
+    metrics: List[Dict[str, Any]] = []
+    failed = False
+    try:
+        metrics = source.collect(cycle) or []
+    except Exception as e:
+        failed = True
+        logger.error(f"Error collecting {source.name} metrics: {e}")
+    duration = time.monotonic() - start
+
+    _record_collection(source.name, len(metrics), duration, failed)
+    logger.debug(f"Collected {len(metrics)} {source.name} metrics in {duration:.3f}s")
+    return metrics
+
+def run_collection_cycle(
+    force: bool = False,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    user_id: int = 1,
+    user_role: str = 'admin'
+) -> List[Dict[str, Any]]:
+    """
+    Collect the sources that are due, concurrently.
+
+    Args:
+        force: Collect every enabled source, whether it is due or not
+        max_workers: Maximum number of sources run at the same time
+        user_id: The ID of the user whose RLS context the sources use
+        user_role: The role of the user whose RLS context the sources use
+
+    Returns:
+        List[Dict[str, Any]]: The collected metrics, in the order the sources were registered
+    """
+    now = time.monotonic()
+    due = [
+        source for source in get_collector_sources()
+        if source.enabled and (force or source.is_due(now))
+    ]
+    if not due:
+        return []
+
+    for source in due:
+        source.last_run = now
+
+    with collection_cycle(user_id=user_id, user_role=user_role) as cycle:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(due)), thread_name_prefix="collector") as executor:
+            futures = [executor.submit(_run_source, source, cycle) for source in due]
+            results = [future.result() for future in futures]
+
+    return [metric for metrics in results for metric in metrics]
@@ -0,0 +1,148 @@
+"""
+Timeseries series module.
+
+Points of timeseries_data only reference their series, a row of timeseries_series
+holding the metric, the entity and the owner they belong to. The IDs of the series
+are cached in memory by their key, so storing points only reaches timeseries_series
+for series not seen by this process yet.
+
+IDs are only cached once the transaction that resolved them has committed, through
+remember_series_ids(). A series created by a transaction that is still open, or that
+rolls back, is never handed to writers on other connections.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+DEFAULT_MAX_SERIES = 100000
+
+# Key of a series: (metric_id, entity_type, entity_id, owner_id)
+SeriesKey = Tuple[int, Optional[str], Optional[str], Optional[int]]
+
+# Typed so that keys whose columns are all NULL still compare with the series columns
+SERIES_KEY_TEMPLATE = "(%s::integer, %s::varchar, %s::varchar, %s::integer)"
+
+CREATE_SERIES_QUERY = """
+    INSERT INTO public.timeseries_series (metric_id, entity_type, entity_id, owner_id)
+    VALUES %s
+    ON CONFLICT (metric_id, entity_type, entity_id, owner_id) DO NOTHING
+"""
+
+GET_SERIES_QUERY = """
+    SELECT s.id, s.metric_id, s.entity_type, s.entity_id, s.owner_id
+    FROM (VALUES %s) AS k(metric_id, entity_type, entity_id, owner_id)
+    JOIN public.timeseries_series s
+    ON s.metric_id = k.metric_id
+    AND s.entity_type IS NOT DISTINCT FROM k.entity_type
+    AND s.entity_id IS NOT DISTINCT FROM k.entity_id
+    AND s.owner_id IS NOT DISTINCT FROM k.owner_id
+"""
+
+# Series cache state: key -> series ID
+_series: "OrderedDict[SeriesKey, int]" = OrderedDict()
+_max_series = DEFAULT_MAX_SERIES
+_cache_lock = threading.Lock()
+
+# Cache statistics
+_cache_stats = {
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0
+}
+
+def _count(name: str, value: int = 1) -> None:
+    """Increment a cache counter. Must be called with _cache_lock held."""
+    _cache_stats[name] += value
+
+def resolve_series_ids(cursor, keys: Iterable[SeriesKey]) -> Dict[SeriesKey, int]:
+    """
+    Get the IDs of series, creating the series that do not exist yet.
+
+    The series are created in the transaction of the cursor. The IDs read from the
+    database are not cached: pass the result to remember_series_ids() once the
+    transaction has committed.
+
+    Args:
+        cursor: The database cursor
+        keys: The keys of the series, as (metric_id, entity_type, entity_id, owner_id)
+
+    Returns:
+        Dict[SeriesKey, int]: The series ID per key. Keys of series the RLS context
+        cannot see are missing.
+    """
+    ids = {}
+    missing = []
+    with _cache_lock:
+        for key in set(keys):
+            series_id = _series.get(key)
+            if series_id is None:
+                missing.append(key)
+                continue
+            _series.move_to_end(key)
+            ids[key] = series_id
+        _count("hits", len(ids))
+        _count("misses", len(missing))
+
+    if not missing:
+        return ids
+
+    execute_values(cursor, CREATE_SERIES_QUERY, missing, template=SERIES_KEY_TEMPLATE)
+    rows = execute_values(cursor, GET_SERIES_QUERY, missing, template=SERIES_KEY_TEMPLATE, fetch=True)
+
+    for series_id, metric_id, entity_type, entity_id, owner_id in rows:
+        ids[(metric_id, entity_type, entity_id, owner_id)] = series_id
+
+    return ids
+
+def remember_series_ids(ids: Dict[SeriesKey, int]) -> None:
+    """
+    Cache the IDs of series resolved by a committed transaction.
+
+    Args:
+        ids: The series ID per key, from resolve_series_ids()
+    """
+    with _cache_lock:
+        for key, series_id in ids.items():
+            _series[key] = series_id
+            _series.move_to_end(key)
+
+        while len(_series) > _max_series:
+            _series.popitem(last=False)
+            _count("evictions")
+
+def invalidate_series_cache() -> None:
+    """
+    Clear the series ID cache.
+    """
+    with _cache_lock:
+        _series.clear()
+
+def get_series_cache_stats() -> Dict[str, Any]:
+    """
+    Get statistics of the series ID cache.
+
+    Returns:
+        Dict[str, Any]: Cache statistics
+    """
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["size"] = len(_series)
+        stats["max_size"] = _max_series
+
+    return stats
+
+def reset_series_cache_stats() -> None:
+    """
+    Reset the counters of the series ID cache.
+    """
+    with _cache_lock:
+        for name in _cache_stats:
+            _cache_stats[name] = 0
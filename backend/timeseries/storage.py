@@ -12,15 +12,111 @@ import psycopg2
 from psycopg2.extras import execute_values
 
 from db.connection import get_db_connection
+from db.metrics_registry import get_metric_definition
 from db.user_connection import get_user_db_connection
 from .config import timeseries_config
+from .series import SeriesKey, resolve_series_ids, remember_series_ids
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Scope of system-wide metrics. They are stored once, without an owner, and the RLS
+# policies let every user read them.
+GLOBAL_SCOPE = 'global'
+
+# Restricts a query to the series of an owner and the system-wide series
+OWNER_CONDITION = " AND (owner_id = %s OR owner_id IS NULL)"
+
+# Inserts points of timeseries_data, as (series_id, timestamp, value)
+INSERT_POINTS_QUERY = """
+    INSERT INTO public.timeseries_data (series_id, timestamp, value)
+    VALUES %s
+"""
+
+# Keeps the latest value of every series, without moving it back to an older point
+UPSERT_LATEST_QUERY = """
+    INSERT INTO public.timeseries_latest AS tl (series_id, timestamp, value)
+    VALUES %s
+    ON CONFLICT (series_id)
+    DO UPDATE SET
+        timestamp = EXCLUDED.timestamp,
+        value = EXCLUDED.value,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE tl.timestamp <= EXCLUDED.timestamp
+"""
+
+def to_point_value(data_type: str, value: Union[float, int, bool]) -> float:
+    """
+    Convert a metric value to the value stored in timeseries_data.
+
+    Args:
+        data_type: The data type of the metric (float, integer or boolean)
+        value: The metric value
+
+    Returns:
+        float: The stored value, with booleans stored as 0 or 1
+
+    Raises:
+        ValueError: If the value cannot be converted or the data type is not numeric
+    """
+    if data_type == 'float':
+        return float(value)
+    if data_type == 'integer':
+        return float(int(value))
+    if data_type == 'boolean':
+        return float(bool(value))
+    raise ValueError(f"Data type '{data_type}' is not stored as a number")
+
+def upsert_latest_values(cursor, rows: List[Tuple]) -> None:
+    """
+    Record the latest value of the series of inserted points, in the transaction of the insert.
+
+    Args:
+        cursor: The database cursor that inserted the points
+        rows: The inserted rows of timeseries_data, as (series_id, timestamp, value)
+    """
+    # A statement cannot upsert a row twice, so only the latest point of each series is kept
+    latest = {}
+    for row in rows:
+        if row[0] not in latest or latest[row[0]][1] <= row[1]:
+            latest[row[0]] = row
+
+    if latest:
+        execute_values(cursor, UPSERT_LATEST_QUERY, list(latest.values()))
+
+def insert_points(cursor, points: List[Tuple]) -> Dict[SeriesKey, int]:
+    """
+    Insert points into their series, creating the series that do not exist yet.
+
+    Args:
+        cursor: The database cursor
+        points: The points, as (metric_id, entity_type, entity_id, owner_id, timestamp, value)
+
+    Returns:
+        Dict[SeriesKey, int]: The IDs of the series of the points, to be passed to
+        remember_series_ids() once the transaction has committed
+
+    Raises:
+        ValueError: If the series of a point cannot be seen in the RLS context
+    """
+    series_ids = resolve_series_ids(cursor, [point[:4] for point in points])
+
+    rows = []
+    for point in points:
+        series_id = series_ids.get(point[:4])
+        if series_id is None:
+            raise ValueError(f"Series {point[:4]} is not visible to the current user")
+        rows.append((series_id, point[4], point[5]))
+
+    if rows:
+        execute_values(cursor, INSERT_POINTS_QUERY, rows)
+        upsert_latest_values(cursor, rows)
+
+    return series_ids
+
 def store_metric(
     metric_name: str,
-    value: Union[float, int, bool, str],
+    value: Union[float, int, bool],
     entity_type: Optional[str] = None,
     entity_id: Optional[str] = None,
     owner_id: Optional[int] = None,
@@ -36,7 +132,7 @@ def store_metric(
         value: The metric value
         entity_type: The entity type (e.g., 'vm', 'account', 'system')
         entity_id: The entity ID (e.g., VM ID, account ID)
-        owner_id: The owner ID for RLS
+        owner_id: The owner ID for RLS, or None for a system-wide metric readable by every user
         timestamp: The timestamp of the measurement (defaults to now)
         user_id: The user ID for RLS context (defaults to 1 for admin)
         user_role: The user role for RLS context (defaults to 'admin')
@@ -53,55 +149,31 @@ def store_metric(
 
             cursor = conn.cursor()
 
-            # Get metric ID
-            cursor.execute(
-                "SELECT id, data_type FROM public.metrics_definitions WHERE name = %s",
-                (metric_name,)
-            )
-            result = cursor.fetchone()
+            # Get metric ID and data type from the registry
+            metric = get_metric_definition(metric_name)
 
-            if not result:
+            if not metric:
                 logger.error(f"Metric '{metric_name}' not found")
                 return False
 
-            metric_id, data_type = result
-
             # Set timestamp to now if not provided
             if timestamp is None:
                 timestamp = datetime.now()
 
-            # Determine which value column to use based on data type
-            value_float = None
-            value_int = None
-            value_bool = None
-            value_text = None
-
-            if data_type == 'float':
-                value_float = float(value)
-            elif data_type == 'integer':
-                value_int = int(value)
-            elif data_type == 'boolean':
-                value_bool = bool(value)
-            elif data_type == 'string':
-                value_text = str(value)
-            else:
-                logger.error(f"Unknown data type '{data_type}' for metric '{metric_name}'")
+            try:
+                point_value = to_point_value(metric["data_type"], value)
+            except (ValueError, TypeError) as e:
+                logger.error(f"Error converting value '{value}' for metric '{metric_name}': {e}")
                 return False
 
             # Insert metric value
-            cursor.execute(
-                """
-                INSERT INTO public.timeseries_data
-                (metric_id, timestamp, value_float, value_int, value_bool, value_text, entity_type, entity_id, owner_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                (metric_id, timestamp, value_float, value_int, value_bool, value_text, entity_type, entity_id, owner_id)
-            )
+            series_ids = insert_points(cursor, [(metric["id"], entity_type, entity_id, owner_id, timestamp, point_value)])
 
             # Commit transaction
             conn.commit()
             cursor.close()
 
+        remember_series_ids(series_ids)
         return True
     except Exception as e:
         logger.error(f"Error storing metric '{metric_name}': {e}")
@@ -122,10 +194,12 @@ def store_metrics_batch(
     Args:
         metrics: List of metric dictionaries, each containing:
             - metric_name: The name of the metric
+            - category: The category of the metric, needed if its name is defined in several (optional)
             - value: The metric value
             - entity_type: The entity type (optional)
             - entity_id: The entity ID (optional)
             - owner_id: The owner ID for RLS (optional)
+            - scope: GLOBAL_SCOPE to store a system-wide metric once, without an owner (optional)
             - timestamp: The timestamp of the measurement (optional, defaults to now)
         user_id: The user ID for RLS context (defaults to 1 for admin)
         user_role: The user role for RLS context (defaults to 'admin')
@@ -152,60 +226,42 @@ def store_metrics_batch(
 
             cursor = conn.cursor()
 
-            # Get all metric definitions
-            cursor.execute(
-                "SELECT id, name, data_type FROM public.metrics_definitions"
-            )
-            metric_defs = {row[1]: (row[0], row[2]) for row in cursor.fetchall()}
-            logger.info(f"Found {len(metric_defs)} metric definitions")
+            # Metric definitions from the registry, by category and name
+            metric_defs = {}
 
             # Prepare batch data
             batch_data = []
 
             for metric in metrics:
                 metric_name = metric.get('metric_name')
+                key = (metric.get('category'), metric_name)
 
-                if metric_name not in metric_defs:
+                if key not in metric_defs:
+                    metric_defs[key] = get_metric_definition(metric_name, category=key[0])
+                if not metric_defs[key]:
                     logger.error(f"Metric '{metric_name}' not found")
                     failure_count += 1
                     continue
 
-                metric_id, data_type = metric_defs[metric_name]
+                metric_id, data_type = metric_defs[key]["id"], metric_defs[key]["data_type"]
                 value = metric.get('value')
                 entity_type = metric.get('entity_type')
                 entity_id = metric.get('entity_id')
                 owner_id = metric.get('owner_id')
 
-                # Ensure owner_id is set to a valid value (use the user_id parameter if not provided)
-                if owner_id is None:
+                # System-wide metrics have no owner; others default to the user_id parameter
+                if metric.get('scope') == GLOBAL_SCOPE:
+                    owner_id = None
+                elif owner_id is None:
                     owner_id = user_id
                     logger.debug(f"Setting default owner_id={owner_id} for metric '{metric_name}'")
 
                 timestamp = metric.get('timestamp', datetime.now())
 
-                # Determine which value column to use based on data type
-                value_float = None
-                value_int = None
-                value_bool = None
-                value_text = None
-
                 try:
-                    if data_type == 'float':
-                        value_float = float(value)
-                    elif data_type == 'integer':
-                        value_int = int(value)
-                    elif data_type == 'boolean':
-                        value_bool = bool(value)
-                    elif data_type == 'string':
-                        value_text = str(value)
-                    else:
-                        logger.error(f"Unknown data type '{data_type}' for metric '{metric_name}'")
-                        failure_count += 1
-                        continue
-
                     batch_data.append((
-                        metric_id, timestamp, value_float, value_int, value_bool, value_text,
-                        entity_type, entity_id, owner_id
+                        metric_id, entity_type, entity_id, owner_id, timestamp,
+                        to_point_value(data_type, value)
                     ))
                     success_count += 1
                 except (ValueError, TypeError) as e:
@@ -216,18 +272,11 @@ def store_metrics_batch(
             if batch_data:
                 logger.info(f"Inserting {len(batch_data)} metrics into timeseries_data")
                 try:
-                    execute_values(
-                        cursor,
-                        """
-                        INSERT INTO public.timeseries_data
-                        (metric_id, timestamp, value_float, value_int, value_bool, value_text, entity_type, entity_id, owner_id)
-                        VALUES %s
-                        """,
-                        batch_data
-                    )
+                    series_ids = insert_points(cursor, batch_data)
 
                     # Commit transaction
                     conn.commit()
+                    remember_series_ids(series_ids)
                     logger.info(f"Successfully inserted {len(batch_data)} metrics")
                 except Exception as e:
                     logger.error(f"Error inserting batch data: {e}")
@@ -268,7 +317,7 @@ def get_metric_data(
         end_time: The end time of the range
         entity_type: The entity type to filter by (optional)
         entity_id: The entity ID to filter by (optional)
-        owner_id: The owner ID for RLS (optional)
+        owner_id: The owner ID to filter by, along with the system-wide series (optional)
         limit: The maximum number of data points to return
         offset: The offset for pagination
         user_id: The user ID for RLS context (defaults to 1 for admin)
@@ -287,37 +336,28 @@ def get_metric_data(
 
             cursor = conn.cursor()
 
-            # Get metric ID and data type
-            cursor.execute(
-                "SELECT id, data_type FROM public.metrics_definitions WHERE name = %s",
-                (metric_name,)
-            )
-            result = cursor.fetchone()
+            # Get metric ID from the registry
+            metric = get_metric_definition(metric_name)
 
-            if not result:
+            if not metric:
                 logger.error(f"Metric '{metric_name}' not found")
                 cursor.close()
                 return []
 
-            metric_id, data_type = result
+            metric_id = metric["id"]
 
-            # Build query
+            # Build query. The range on the bare partition key prunes the daily
+            # partitions of timeseries_data outside the requested range, and the
+            # points of each matching series are read by their series_id index.
             query = """
-            SELECT
-                id, timestamp,
-                CASE
-                    WHEN %s = 'float' THEN value_float
-                    WHEN %s = 'integer' THEN value_int::float
-                    WHEN %s = 'boolean' THEN value_bool::int::float
-                    ELSE NULL
-                END AS value,
-                entity_type, entity_id
-            FROM public.timeseries_data
-            WHERE metric_id = %s
-            AND timestamp BETWEEN %s AND %s
+            SELECT td.timestamp, td.value, s.entity_type, s.entity_id
+            FROM public.timeseries_series s
+            JOIN public.timeseries_data td ON td.series_id = s.id
+            WHERE s.metric_id = %s
+            AND td.timestamp BETWEEN %s AND %s
             """
 
-            params = [data_type, data_type, data_type, metric_id, start_time, end_time]
+            params = [metric_id, start_time, end_time]
 
             if entity_type:
                 query += " AND entity_type = %s"
@@ -328,10 +368,10 @@ def get_metric_data(
                 params.append(entity_id)
 
             if owner_id:
-                query += " AND owner_id = %s"
+                query += OWNER_CONDITION
                 params.append(owner_id)
 
-            query += " ORDER BY timestamp ASC LIMIT %s OFFSET %s"
+            query += " ORDER BY td.timestamp ASC LIMIT %s OFFSET %s"
             params.extend([limit, offset])
 
             # Execute query
@@ -341,11 +381,10 @@ def get_metric_data(
             results = []
             for row in cursor.fetchall():
                 results.append({
-                    'id': row[0],
-                    'timestamp': row[1],
-                    'value': row[2],
-                    'entity_type': row[3],
-                    'entity_id': row[4]
+                    'timestamp': row[0],
+                    'value': row[1],
+                    'entity_type': row[2],
+                    'entity_id': row[3]
                 })
 
             cursor.close()
@@ -381,7 +420,7 @@ def get_metric_aggregates(
         end_time: The end time of the range
         entity_type: The entity type to filter by (optional)
         entity_id: The entity ID to filter by (optional)
-        owner_id: The owner ID for RLS (optional)
+        owner_id: The owner ID to filter by, along with the system-wide series (optional)
         limit: The maximum number of data points to return
         offset: The offset for pagination
         user_id: The user ID for RLS context (defaults to 1 for admin)
@@ -400,19 +439,15 @@ def get_metric_aggregates(
 
             cursor = conn.cursor()
 
-            # Get metric ID
-            cursor.execute(
-                "SELECT id FROM public.metrics_definitions WHERE name = %s",
-                (metric_name,)
-            )
-            result = cursor.fetchone()
+            # Get metric ID and data type from the registry
+            metric = get_metric_definition(metric_name)
 
-            if not result:
+            if not metric:
                 logger.error(f"Metric '{metric_name}' not found")
                 cursor.close()
                 return []
 
-            metric_id = result[0]
+            metric_id = metric["id"]
 
             # Build query
             query = """
@@ -437,7 +472,7 @@ def get_metric_aggregates(
                 params.append(entity_id)
 
             if owner_id:
-                query += " AND owner_id = %s"
+                query += OWNER_CONDITION
                 params.append(owner_id)
 
             query += " ORDER BY period_start ASC LIMIT %s OFFSET %s"
@@ -472,6 +507,246 @@ def get_metric_aggregates(
         if 'cursor' in locals() and cursor:
             cursor.close()
 
+# Downsampling sources coarser than raw data, finest first, with the longest length of
+# their buckets in seconds
+DOWNSAMPLE_SOURCES = [
+    ("hourly", 3600),
+    ("daily", 86400),
+    ("weekly", 7 * 86400),
+    ("monthly", 31 * 86400)
+]
+
+# Default number of points per series of a downsampled query
+DEFAULT_MAX_POINTS = 500
+
+# LTTB selects its points among this many times more buckets
+LTTB_OVERSAMPLING = 4
+
+# Buckets the points of a metric on the database side. The range up to the rollup
+# watermark of the source period type is read from its aggregates, and the rest from
+# raw data, so the buckets not rolled up yet are not missing. The average is weighted
+# by the counts of the aggregates that have one.
+DOWNSAMPLE_QUERY = """
+    WITH split AS (
+        SELECT GREATEST(%(start_time)s::timestamptz, LEAST(%(end_time)s::timestamptz, COALESCE(
+            (SELECT rolled_up_to FROM public.timeseries_rollup_watermarks WHERE period_type = %(period_type)s),
+            %(start_time)s::timestamptz
+        ))) AS split_time
+    )
+    SELECT
+        date_bin(make_interval(secs => %(resolution)s), s.timestamp, %(start_time)s::timestamptz) AS bucket,
+        s.entity_type, s.entity_id,
+        MIN(s.min_value), MAX(s.max_value),
+        SUM(s.weighted_sum) / NULLIF(SUM(s.weight), 0),
+        SUM(s.count_value)
+    FROM (
+        SELECT
+            period_start AS timestamp, entity_type, entity_id, min_value, max_value,
+            avg_value * count_value AS weighted_sum,
+            CASE WHEN avg_value IS NULL THEN 0 ELSE count_value END AS weight,
+            count_value
+        FROM public.timeseries_aggregates
+        WHERE metric_id = %(metric_id)s
+        AND period_type = %(period_type)s
+        AND period_start >= %(start_time)s
+        AND period_start < (SELECT split_time FROM split)
+        {filters}
+        UNION ALL
+        SELECT td.timestamp, entity_type, entity_id, td.value, td.value, td.value, 1, 1
+        FROM public.timeseries_series ts
+        JOIN public.timeseries_data td ON td.series_id = ts.id
+        WHERE ts.metric_id = %(metric_id)s
+        AND td.timestamp >= (SELECT split_time FROM split)
+        AND td.timestamp < %(end_time)s
+        {filters}
+    ) s
+    GROUP BY 1, 2, 3
+    ORDER BY 2, 3, 1
+"""
+
+def get_downsample_source(start_time: datetime, resolution: float) -> Optional[str]:
+    """
+    Get the coarsest source that still resolves buckets of a resolution.
+
+    A coarser source is used when the finer ones no longer retain the start of the range.
+
+    Args:
+        start_time: The start time of the range
+        resolution: The length of the buckets in seconds
+
+    Returns:
+        Optional[str]: The aggregation period type to read, or None for raw data
+    """
+    periods = timeseries_config['aggregation']['periods']
+    retention = timeseries_config['retention']
+    now = datetime.now(start_time.tzinfo)
+
+    source, retention_days = None, retention['raw_data_days']
+    for period_type, length in DOWNSAMPLE_SOURCES:
+        if not periods[period_type]:
+            continue
+        if length <= resolution or start_time < now - timedelta(days=retention_days):
+            source, retention_days = period_type, retention[f"{period_type}_aggregates_days"]
+    return source
+
+def lttb_downsample(points: List[Dict[str, Any]], threshold: int) -> List[Dict[str, Any]]:
+    """
+    Select the points that best preserve the shape of a series (Largest-Triangle-Three-Buckets).
+
+    Args:
+        points: The points of one series, ordered by timestamp, with a 'timestamp' and a 'value'
+        threshold: The maximum number of points to keep
+
+    Returns:
+        List[Dict[str, Any]]: The selected points
+    """
+    points = [point for point in points if point['value'] is not None]
+    if threshold >= len(points):
+        return points
+    if threshold < 3:
+        return [points[0], points[-1]][:max(threshold, 0)]
+
+    x = [point['timestamp'].timestamp() for point in points]
+    y = [point['value'] for point in points]
+
+    # The first and last points are always kept, and one point is selected per bucket in between
+    selected = [0]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        bucket_start = int(i * bucket_size) + 1
+        bucket_end = int((i + 1) * bucket_size) + 1
+
+        # Average of the next bucket, the third vertex of the triangles
+        next_start = bucket_end
+        next_end = min(int((i + 2) * bucket_size) + 1, len(points))
+        avg_x = sum(x[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(y[next_start:next_end]) / (next_end - next_start)
+
+        best, best_area = bucket_start, -1.0
+        for j in range(bucket_start, bucket_end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+
+        selected.append(best)
+        a = best
+    selected.append(len(points) - 1)
+
+    return [points[i] for i in selected]
+
+def get_downsampled_metric_data(
+    metric_name: str,
+    start_time: datetime,
+    end_time: datetime,
+    max_points: int = DEFAULT_MAX_POINTS,
+    resolution: Optional[int] = None,
+    method: str = "avg",
+    entity_type: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    user_id: Optional[int] = 1,  # Default to admin user
+    user_role: Optional[str] = 'admin'  # Default to admin role
+) -> Dict[str, Any]:
+    """
+    Get metric data for a time range, bucketed to at most max_points points per series.
+
+    The buckets are computed on the database side from raw data or from the coarsest
+    rollup that resolves them, so the number of points does not grow with the range.
+    Each point has the average, minimum and maximum of its bucket. With the 'lttb'
+    method, the points are selected by LTTB among LTTB_OVERSAMPLING times more buckets.
+
+    Args:
+        metric_name: The name of the metric
+        start_time: The start time of the range
+        end_time: The end time of the range (exclusive)
+        max_points: The maximum number of points per series
+        resolution: The minimum length of the buckets in seconds (optional)
+        method: The downsampling method ('avg' or 'lttb')
+        entity_type: The entity type to filter by (optional)
+        entity_id: The entity ID to filter by (optional)
+        owner_id: The owner ID to filter by, along with the system-wide series (optional)
+        user_id: The user ID for RLS context (defaults to 1 for admin)
+        user_role: The user role for RLS context (defaults to 'admin')
+
+    Returns:
+        Dict[str, Any]: The source read, the length of the buckets in seconds and the points
+    """
+    if method not in ("avg", "lttb"):
+        raise ValueError(f"Unknown downsampling method '{method}'")
+
+    # Buckets of this length give at most max_points (or the oversampled count) per series
+    buckets = max_points * LTTB_OVERSAMPLING if method == "lttb" else max_points
+    bucket_length = max((end_time - start_time).total_seconds() / buckets, resolution or 0, 1)
+    source = get_downsample_source(start_time, bucket_length)
+    result = {"source": source or "raw", "resolution": bucket_length, "data": []}
+
+    try:
+        logger.info(f"Getting downsampled metric data: metric={metric_name}, source={result['source']}, resolution={bucket_length}s, method={method}, user_id={user_id}, user_role={user_role}")
+        # Get database connection with RLS context
+        with get_user_db_connection(user_id=user_id, user_role=user_role) as conn:
+            if not conn:
+                logger.error("Failed to get database connection for retrieving downsampled metric data")
+                return result
+
+            cursor = conn.cursor()
+            try:
+                # Get metric ID from the registry
+                metric = get_metric_definition(metric_name)
+
+                if not metric:
+                    logger.error(f"Metric '{metric_name}' not found")
+                    return result
+
+                params = {
+                    "metric_id": metric["id"],
+                    "period_type": source,
+                    "start_time": start_time,
+                    "end_time": end_time,
+                    "resolution": bucket_length
+                }
+
+                # The same filters apply to the aggregates and the raw data
+                filters = ""
+                if entity_type:
+                    filters += " AND entity_type = %(entity_type)s"
+                    params["entity_type"] = entity_type
+
+                if entity_id:
+                    filters += " AND entity_id = %(entity_id)s"
+                    params["entity_id"] = entity_id
+
+                if owner_id:
+                    filters += " AND (owner_id = %(owner_id)s OR owner_id IS NULL)"
+                    params["owner_id"] = owner_id
+
+                cursor.execute(DOWNSAMPLE_QUERY.format(filters=filters), params)
+
+                # Group the buckets per series
+                series: Dict[Tuple[Optional[str], Optional[str]], List[Dict[str, Any]]] = {}
+                for bucket, row_entity_type, row_entity_id, min_value, max_value, avg_value, count in cursor.fetchall():
+                    series.setdefault((row_entity_type, row_entity_id), []).append({
+                        'timestamp': bucket,
+                        'value': avg_value,
+                        'min': min_value,
+                        'max': max_value,
+                        'count': count,
+                        'entity_type': row_entity_type,
+                        'entity_id': row_entity_id
+                    })
+            finally:
+                cursor.close()
+
+        for points in series.values():
+            if method == "lttb":
+                points = lttb_downsample(points, max_points)
+            result["data"].extend(points)
+
+        return result
+    except Exception as e:
+        logger.error(f"Error getting downsampled metric data for '{metric_name}': {e}")
+        return result
+
 def get_latest_metric_value(
     metric_name: str,
     entity_type: Optional[str] = None,
@@ -487,7 +762,7 @@ def get_latest_metric_value(
         metric_name: The name of the metric
         entity_type: The entity type to filter by (optional)
         entity_id: The entity ID to filter by (optional)
-        owner_id: The owner ID for RLS (optional)
+        owner_id: The owner ID to filter by, along with the system-wide series (optional)
         user_id: The user ID for RLS context (defaults to 1 for admin)
         user_role: The user role for RLS context (defaults to 'admin')
 
@@ -504,36 +779,26 @@ def get_latest_metric_value(
 
             cursor = conn.cursor()
 
-            # Get metric ID and data type
-            cursor.execute(
-                "SELECT id, data_type FROM public.metrics_definitions WHERE name = %s",
-                (metric_name,)
-            )
-            result = cursor.fetchone()
+            # Get metric ID from the registry
+            metric = get_metric_definition(metric_name)
 
-            if not result:
+            if not metric:
                 logger.error(f"Metric '{metric_name}' not found")
                 cursor.close()
                 return None
 
-            metric_id, data_type = result
+            metric_id = metric["id"]
 
-            # Build query
+            # Build query. timeseries_latest holds one row per series, so this reads the
+            # matching series by their key instead of searching their history.
             query = """
-            SELECT
-                id, timestamp,
-                CASE
-                    WHEN %s = 'float' THEN value_float
-                    WHEN %s = 'integer' THEN value_int::float
-                    WHEN %s = 'boolean' THEN value_bool::int::float
-                    ELSE NULL
-                END AS value,
-                entity_type, entity_id
-            FROM public.timeseries_data
-            WHERE metric_id = %s
+            SELECT tl.timestamp, tl.value, s.entity_type, s.entity_id
+            FROM public.timeseries_series s
+            JOIN public.timeseries_latest tl ON tl.series_id = s.id
+            WHERE s.metric_id = %s
             """
 
-            params = [data_type, data_type, data_type, metric_id]
+            params = [metric_id]
 
             if entity_type:
                 query += " AND entity_type = %s"
@@ -544,10 +809,10 @@ def get_latest_metric_value(
                 params.append(entity_id)
 
             if owner_id:
-                query += " AND owner_id = %s"
+                query += OWNER_CONDITION
                 params.append(owner_id)
 
-            query += " ORDER BY timestamp DESC LIMIT 1"
+            query += " ORDER BY tl.timestamp DESC LIMIT 1"
 
             # Execute query
             cursor.execute(query, params)
@@ -558,11 +823,10 @@ def get_latest_metric_value(
 
             if row:
                 return {
-                    'id': row[0],
-                    'timestamp': row[1],
-                    'value': row[2],
-                    'entity_type': row[3],
-                    'entity_id': row[4]
+                    'timestamp': row[0],
+                    'value': row[1],
+                    'entity_type': row[2],
+                    'entity_id': row[3]
                 }
 
             return None
@@ -574,6 +838,94 @@ def get_latest_metric_value(
         if 'cursor' in locals() and cursor:
             cursor.close()
 
+# Latest values of several metrics, one row per series
+LATEST_VALUES_QUERY = """
+    SELECT md.name, s.entity_type, s.entity_id, tl.timestamp, tl.value
+    FROM public.timeseries_series s
+    JOIN public.timeseries_latest tl ON tl.series_id = s.id
+    JOIN public.metrics_definitions md ON md.id = s.metric_id
+    WHERE s.metric_id = ANY(%(metric_ids)s)
+    {filters}
+    ORDER BY md.name, s.entity_type, s.entity_id
+"""
+
+def get_latest_metric_values(
+    metric_names: List[str],
+    entity_type: Optional[str] = None,
+    entity_ids: Optional[List[str]] = None,
+    owner_id: Optional[int] = None,
+    user_id: Optional[int] = 1,  # Default to admin user
+    user_role: Optional[str] = 'admin'  # Default to admin role
+) -> List[Dict[str, Any]]:
+    """
+    Get the latest values of several metrics for many entities at once.
+
+    Args:
+        metric_names: The names of the metrics
+        entity_type: The entity type to filter by (optional)
+        entity_ids: The entity IDs to filter by (optional)
+        owner_id: The owner ID to filter by, along with the system-wide series (optional)
+        user_id: The user ID for RLS context (defaults to 1 for admin)
+        user_role: The user role for RLS context (defaults to 'admin')
+
+    Returns:
+        List[Dict[str, Any]]: The latest value of every matching series, ordered by metric
+        name and entity. Metrics that are not defined are skipped.
+    """
+    try:
+        metric_ids = []
+        for metric_name in metric_names:
+            metric = get_metric_definition(metric_name)
+            if not metric:
+                logger.error(f"Metric '{metric_name}' not found")
+                continue
+            metric_ids.append(metric["id"])
+
+        if not metric_ids or entity_ids == []:
+            return []
+
+        params = {"metric_ids": metric_ids}
+        filters = ""
+
+        if entity_type:
+            filters += " AND s.entity_type = %(entity_type)s"
+            params["entity_type"] = entity_type
+
+        if entity_ids is not None:
+            filters += " AND s.entity_id = ANY(%(entity_ids)s)"
+            params["entity_ids"] = list(entity_ids)
+
+        if owner_id:
+            filters += " AND (s.owner_id = %(owner_id)s OR s.owner_id IS NULL)"
+            params["owner_id"] = owner_id
+
+        logger.info(f"Getting latest metric values: metrics={metric_names}, entity_type={entity_type}, entities={len(entity_ids) if entity_ids is not None else 'all'}, owner_id={owner_id}, user_id={user_id}, user_role={user_role}")
+        # Get database connection with RLS context
+        with get_user_db_connection(user_id=user_id, user_role=user_role) as conn:
+            if not conn:
+                logger.error("Failed to get database connection for retrieving latest metric values")
+                return []
+
+            cursor = conn.cursor()
+            try:
+                cursor.execute(LATEST_VALUES_QUERY.format(filters=filters), params)
+
+                return [
+                    {
+                        'metric': name,
+                        'entity_type': row_entity_type,
+                        'entity_id': entity_id,
+                        'timestamp': timestamp,
+                        'value': value
+                    }
+                    for name, row_entity_type, entity_id, timestamp, value in cursor.fetchall()
+                ]
+            finally:
+                cursor.close()
+    except Exception as e:
+        logger.error(f"Error getting latest metric values for {metric_names}: {e}")
+        return []
+
 def get_metric_statistics(
     metric_name: str,
     start_time: datetime,
@@ -591,7 +943,7 @@ def get_metric_statistics(
         end_time: The end time of the range
         entity_type: The entity type to filter by (optional)
         entity_id: The entity ID to filter by (optional)
-        owner_id: The owner ID for RLS (optional)
+        owner_id: The owner ID to filter by, along with the system-wide series (optional)
 
     Returns:
         Dict[str, Any]: Statistics for the metric
@@ -611,14 +963,10 @@ def get_metric_statistics(
 
             cursor = conn.cursor()
 
-            # Get metric ID and data type
-            cursor.execute(
-                "SELECT id, data_type FROM public.metrics_definitions WHERE name = %s",
-                (metric_name,)
-            )
-            result = cursor.fetchone()
+            # Get metric ID from the registry
+            metric = get_metric_definition(metric_name)
 
-            if not result:
+            if not metric:
                 logger.error(f"Metric '{metric_name}' not found")
                 cursor.close()
                 return {
@@ -629,48 +977,23 @@ def get_metric_statistics(
                     'count': 0
                 }
 
-            metric_id, data_type = result
+            metric_id = metric["id"]
 
             # Build query
             query = """
             SELECT
-                MIN(CASE
-                    WHEN %s = 'float' THEN value_float
-                    WHEN %s = 'integer' THEN value_int::float
-                    WHEN %s = 'boolean' THEN value_bool::int::float
-                    ELSE NULL
-                END) AS min_value,
-                MAX(CASE
-                    WHEN %s = 'float' THEN value_float
-                    WHEN %s = 'integer' THEN value_int::float
-                    WHEN %s = 'boolean' THEN value_bool::int::float
-                    ELSE NULL
-                END) AS max_value,
-                AVG(CASE
-                    WHEN %s = 'float' THEN value_float
-                    WHEN %s = 'integer' THEN value_int::float
-                    WHEN %s = 'boolean' THEN value_bool::int::float
-                    ELSE NULL
-                END) AS avg_value,
-                SUM(CASE
-                    WHEN %s = 'float' THEN value_float
-                    WHEN %s = 'integer' THEN value_int::float
-                    WHEN %s = 'boolean' THEN value_bool::int::float
-                    ELSE NULL
-                END) AS sum_value,
+                MIN(td.value) AS min_value,
+                MAX(td.value) AS max_value,
+                AVG(td.value) AS avg_value,
+                SUM(td.value) AS sum_value,
                 COUNT(*) AS count_value
-            FROM public.timeseries_data
-            WHERE metric_id = %s
-            AND timestamp BETWEEN %s AND %s
+            FROM public.timeseries_series s
+            JOIN public.timeseries_data td ON td.series_id = s.id
+            WHERE s.metric_id = %s
+            AND td.timestamp BETWEEN %s AND %s
             """
 
-            params = [
-                data_type, data_type, data_type,
-                data_type, data_type, data_type,
-                data_type, data_type, data_type,
-                data_type, data_type, data_type,
-                metric_id, start_time, end_time
-            ]
+            params = [metric_id, start_time, end_time]
 
             if entity_type:
                 query += " AND entity_type = %s"
@@ -681,7 +1004,7 @@ def get_metric_statistics(
                 params.append(entity_id)
 
             if owner_id:
-                query += " AND owner_id = %s"
+                query += OWNER_CONDITION
                 params.append(owner_id)
 
             # Execute query
@@ -720,3 +1043,191 @@ def get_metric_statistics(
         # Close cursor
         if 'cursor' in locals() and cursor:
             cursor.close()
+
+# Statistics over the range and latest value of every requested metric and entity,
+# in one statement. The latest values are read from timeseries_latest.
+METRICS_BATCH_SUMMARY_QUERY = """
+    SELECT
+        md.id, e.entity_id,
+        st.min_value, st.max_value, st.avg_value, st.sum_value, st.count_value,
+        latest.timestamp, latest.value
+    FROM unnest(%(metric_ids)s::integer[]) AS md(id)
+    CROSS JOIN unnest(%(entity_ids)s::varchar[]) AS e(entity_id)
+    CROSS JOIN LATERAL (
+        SELECT
+            MIN(td.value) AS min_value, MAX(td.value) AS max_value, AVG(td.value) AS avg_value,
+            SUM(td.value) AS sum_value, COUNT(*) AS count_value
+        FROM public.timeseries_series s
+        JOIN public.timeseries_data td ON td.series_id = s.id
+        WHERE s.metric_id = md.id
+        AND td.timestamp BETWEEN %(start_time)s AND %(end_time)s
+        {filters}
+    ) st
+    LEFT JOIN LATERAL (
+        SELECT tl.timestamp, tl.value
+        FROM public.timeseries_series s
+        JOIN public.timeseries_latest tl ON tl.series_id = s.id
+        WHERE s.metric_id = md.id
+        {filters}
+        ORDER BY tl.timestamp DESC
+        LIMIT 1
+    ) latest ON TRUE
+"""
+
+# Raw points of every requested metric and entity, at most limit per series
+METRICS_BATCH_DATA_QUERY = """
+    SELECT d.metric_id, d.entity_id, d.timestamp, d.value
+    FROM (
+        SELECT
+            s.metric_id, s.entity_id, td.timestamp, td.value,
+            row_number() OVER (PARTITION BY s.metric_id, s.entity_id ORDER BY td.timestamp) AS n
+        FROM public.timeseries_series s
+        JOIN public.timeseries_data td ON td.series_id = s.id
+        WHERE s.metric_id = ANY(%(metric_ids)s)
+        AND td.timestamp BETWEEN %(start_time)s AND %(end_time)s
+        {filters}
+    ) d
+    WHERE d.n <= %(limit)s
+    ORDER BY d.metric_id, d.entity_id, d.timestamp
+"""
+
+# Average of the aggregates of every requested metric and entity, at most limit per series
+METRICS_BATCH_AGGREGATES_QUERY = """
+    SELECT d.metric_id, d.entity_id, d.period_start, d.avg_value
+    FROM (
+        SELECT
+            td.metric_id, td.entity_id, td.period_start, td.avg_value,
+            row_number() OVER (PARTITION BY td.metric_id, td.entity_id ORDER BY td.period_start) AS n
+        FROM public.timeseries_aggregates td
+        WHERE td.metric_id = ANY(%(metric_ids)s)
+        AND td.period_type = %(period_type)s
+        AND td.period_start >= %(start_time)s
+        AND td.period_end <= %(end_time)s
+        {filters}
+    ) d
+    WHERE d.n <= %(limit)s
+    ORDER BY d.metric_id, d.entity_id, d.period_start
+"""
+
+def get_metrics_batch(
+    metric_names: List[str],
+    start_time: datetime,
+    end_time: datetime,
+    period_type: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    entity_ids: Optional[List[str]] = None,
+    owner_id: Optional[int] = None,
+    limit: int = 1000,
+    user_id: Optional[int] = 1,  # Default to admin user
+    user_role: Optional[str] = 'admin'  # Default to admin role
+) -> Dict[str, Dict[Optional[str], Dict[str, Any]]]:
+    """
+    Get the latest value, statistics and series of several metrics over a time range.
+
+    The names are resolved to metric IDs by the registry, and every metric and entity is
+    read by two statements on one connection: one for the statistics and latest values,
+    and one for the series.
+
+    Args:
+        metric_names: The names of the metrics
+        start_time: The start time of the range
+        end_time: The end time of the range
+        period_type: The aggregation period type of the series, or None for raw data
+        entity_type: The entity type to filter by (optional)
+        entity_ids: The entity IDs to get the metrics of, or None for all entities together
+        owner_id: The owner ID to filter by, along with the system-wide series (optional)
+        limit: The maximum number of data points per series
+        user_id: The user ID for RLS context (defaults to 1 for admin)
+        user_role: The user role for RLS context (defaults to 'admin')
+
+    Returns:
+        Dict[str, Dict[Optional[str], Dict[str, Any]]]: Per metric name and entity ID, the latest
+        value and its timestamp, the statistics and the data points. Metrics that are not
+        defined are missing.
+    """
+    results: Dict[str, Dict[Optional[str], Dict[str, Any]]] = {}
+    if not metric_names or entity_ids == []:
+        return results
+
+    # Names of the defined metrics, by ID
+    names_by_id = {}
+    for metric_name in dict.fromkeys(metric_names):
+        metric = get_metric_definition(metric_name)
+        if metric:
+            names_by_id[metric["id"]] = metric_name
+    if not names_by_id:
+        return results
+
+    params = {
+        "metric_ids": list(names_by_id),
+        "entity_ids": list(entity_ids) if entity_ids is not None else [None],
+        "period_type": period_type,
+        "start_time": start_time,
+        "end_time": end_time,
+        "limit": limit
+    }
+
+    # Raw points and latest values are filtered on the columns of their series (s), and
+    # aggregates on their own (td)
+    filters = ""
+    if entity_type:
+        filters += " AND {alias}.entity_type = %(entity_type)s"
+        params["entity_type"] = entity_type
+
+    if owner_id:
+        filters += " AND ({alias}.owner_id = %(owner_id)s OR {alias}.owner_id IS NULL)"
+        params["owner_id"] = owner_id
+
+    if entity_ids is not None:
+        # The summary is computed per entity, while the series select all the entities at once
+        summary_filters = filters + " AND {alias}.entity_id = e.entity_id"
+        data_filters = filters + " AND {alias}.entity_id = ANY(%(entity_ids)s)"
+    else:
+        summary_filters = data_filters = filters
+
+    summary_query = METRICS_BATCH_SUMMARY_QUERY.format(filters=summary_filters.format(alias="s"))
+    if period_type in ["hourly", "daily", "weekly", "monthly"]:
+        data_query = METRICS_BATCH_AGGREGATES_QUERY.format(filters=data_filters.format(alias="td"))
+    else:
+        data_query = METRICS_BATCH_DATA_QUERY.format(filters=data_filters.format(alias="s"))
+
+    try:
+        logger.info(f"Getting metrics batch: metrics={metric_names}, period_type={period_type}, entity_type={entity_type}, entities={len(entity_ids) if entity_ids is not None else 'all'}, owner_id={owner_id}, user_id={user_id}, user_role={user_role}")
+        # Get database connection with RLS context
+        with get_user_db_connection(user_id=user_id, user_role=user_role) as conn:
+            if not conn:
+                logger.error("Failed to get database connection for retrieving metrics batch")
+                return results
+
+            cursor = conn.cursor()
+            try:
+                cursor.execute(summary_query, params)
+                for metric_id, entity_id, min_value, max_value, avg_value, sum_value, count, timestamp, value in cursor.fetchall():
+                    results.setdefault(names_by_id[metric_id], {})[entity_id] = {
+                        'latest': value,
+                        'timestamp': timestamp,
+                        'statistics': {
+                            'min': min_value,
+                            'max': max_value,
+                            'avg': avg_value,
+                            'sum': sum_value,
+                            'count': count
+                        },
+                        'data': []
+                    }
+
+                # Points of all entities together belong to the single series of their metric
+                cursor.execute(data_query, params)
+                for metric_id, entity_id, timestamp, value in cursor.fetchall():
+                    series = results[names_by_id[metric_id]][entity_id if entity_ids is not None else None]
+                    series['data'].append({
+                        'timestamp': timestamp,
+                        'value': value
+                    })
+            finally:
+                cursor.close()
+
+        return results
+    except Exception as e:
+        logger.error(f"Error getting metrics batch for {metric_names}: {e}")
+        return {}
@@ -6,123 +6,78 @@ This module provides functions for collecting VM status distribution data.
 
 import logging
 from typing import Dict, Any, List, Optional
-from datetime import datetime
 
-from db.connection import get_db_connection
-from db.user_connection import get_user_db_connection
+from psycopg2.extras import execute_values
+
+from .scheduler import CollectionCycle, collection_cycle
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def collect_vm_status_distribution() -> List[Dict[str, Any]]:
+INSERT_VM_STATUS_DISTRIBUTION_QUERY = """
+    INSERT INTO public.vm_status_distribution
+    (timestamp, running, stopped, error, owner_id)
+    VALUES %s
+"""
+
+def collect_vm_status_distribution(cycle: Optional[CollectionCycle] = None) -> List[Dict[str, Any]]:
     """
     Collect VM status distribution data.
 
+    The distribution is computed from the VMs of the cycle, and the rows of all owners
+    are stored in vm_status_distribution in one statement.
+
+    Args:
+        cycle: The collection cycle, or None to collect outside of a cycle
+
     Returns:
         List[Dict[str, Any]]: List of VM status distribution data points
     """
     try:
-        # Get database connection with RLS context
-        with get_user_db_connection(user_id=1, user_role='admin') as conn:
-            if not conn:
-                logger.error("Failed to get database connection for VM status distribution")
-                return []
-
-            cursor = conn.cursor()
+        with collection_cycle(cycle) as cycle:
+            timestamp = cycle.timestamp
 
-            # Get VM counts by status and owner
-            cursor.execute("""
-                SELECT 
-                    status, 
-                    owner_id, 
-                    COUNT(*) 
-                FROM public.vms 
-                GROUP BY status, owner_id
-            """)
-
-            # Process results
+            # Count VMs by owner and status
             status_counts = {}
-            for row in cursor.fetchall():
-                status, owner_id, count = row
-                
+            for _, status, _, _, owner_id in cycle.get_vms():
                 # Skip if owner_id is None
                 if owner_id is None:
                     continue
-                
+
                 # Initialize owner dict if not exists
-                if owner_id not in status_counts:
-                    status_counts[owner_id] = {
-                        'running': 0,
-                        'stopped': 0,
-                        'error': 0
-                    }
-                
+                counts = status_counts.setdefault(owner_id, {
+                    'running': 0,
+                    'stopped': 0,
+                    'error': 0
+                })
+
                 # Update status count
-                if status == 'running':
-                    status_counts[owner_id]['running'] += count
-                elif status == 'stopped':
-                    status_counts[owner_id]['stopped'] += count
-                elif status == 'error':
-                    status_counts[owner_id]['error'] += count
-            
-            cursor.close()
-        
+                if status in counts:
+                    counts[status] += 1
+
+            if not status_counts:
+                return []
+
+            # Insert into vm_status_distribution table
+            with cycle.cursor() as cursor:
+                execute_values(cursor, INSERT_VM_STATUS_DISTRIBUTION_QUERY, [
+                    (timestamp, counts['running'], counts['stopped'], counts['error'], owner_id)
+                    for owner_id, counts in status_counts.items()
+                ])
+
         # Create data points
         data_points = []
-        timestamp = datetime.now()
-        
         for owner_id, counts in status_counts.items():
-            # Insert into vm_status_distribution table
-            with get_user_db_connection(user_id=1, user_role='admin') as conn:
-                if not conn:
-                    logger.error("Failed to get database connection for VM status distribution")
-                    continue
-                
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    INSERT INTO public.vm_status_distribution 
-                    (timestamp, running, stopped, error, owner_id) 
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    timestamp,
-                    counts['running'],
-                    counts['stopped'],
-                    counts['error'],
-                    owner_id
-                ))
-                
-                conn.commit()
-                cursor.close()
-            
-            # Add to metrics
-            data_points.append({
-                'metric_name': 'vm_running_count',
-                'value': counts['running'],
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': owner_id,
-                'timestamp': timestamp
-            })
-            
-            data_points.append({
-                'metric_name': 'vm_stopped_count',
-                'value': counts['stopped'],
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': owner_id,
-                'timestamp': timestamp
-            })
-            
-            data_points.append({
-                'metric_name': 'vm_error_count',
-                'value': counts['error'],
-                'entity_type': 'system',
-                'entity_id': 'system',
-                'owner_id': owner_id,
-                'timestamp': timestamp
-            })
-        
+            for status in ('running', 'stopped', 'error'):
+                data_points.append({
+                    'metric_name': f'vm_{status}_count',
+                    'value': counts[status],
+                    'entity_type': 'system',
+                    'entity_id': 'system',
+                    'owner_id': owner_id,
+                    'timestamp': timestamp
+                })
+
         return data_points
     except Exception as e:
         logger.error(f"Error collecting VM status distribution: {e}")
@@ -40,6 +40,11 @@ from .logging_utils import (
     log_response, log_database_query, log_performance
 )
 
+from .stream_utils import (
+    UploadTooLargeError, MultipartFileReader, decode_chunks,
+    IncrementalCsvReader, IncrementalJsonArrayParser
+)
+
 __all__ = [
     # String utilities
     'is_valid_uuid', 'is_valid_email', 'is_valid_username', 'is_valid_password',
@@ -67,5 +72,9 @@ __all__ = [
     
     # Logging utilities
     'setup_logging', 'get_logger', 'log_exception', 'log_request',
-    'log_response', 'log_database_query', 'log_performance'
+    'log_response', 'log_database_query', 'log_performance',
+    
+    # Stream utilities
+    'UploadTooLargeError', 'MultipartFileReader', 'decode_chunks',
+    'IncrementalCsvReader', 'IncrementalJsonArrayParser'
 ]
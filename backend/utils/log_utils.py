@@ -26,6 +26,9 @@ _log_context = threading.local()
 # Create a queue for asynchronous logging
 _log_queue = queue.Queue()
 
+# Maximum number of queued log entries inserted in one batch
+LOG_QUEUE_BATCH_SIZE = 1000
+
 # Flag to control the background thread
 _log_thread_running = False
 _log_thread = None
@@ -641,6 +644,27 @@ def log_performance(
         async_log=async_log
     )
 
+def _flush_log_batch(log_repo: LogRepository, batch: List[Dict[str, Any]]) -> None:
+    """
+    Insert a batch of queued log entries.
+
+    The batch is inserted in one transaction. If that fails, the entries are inserted
+    one by one so that a single invalid entry does not lose the whole batch.
+
+    Args:
+        log_repo (LogRepository): The log repository
+        batch (List[Dict[str, Any]]): The queued log entries
+    """
+    if log_repo.add_logs_bulk(batch):
+        return
+
+    logger.warning(f"Bulk insert of {len(batch)} log entries failed, inserting them one by one")
+    for log_entry in batch:
+        try:
+            log_repo.add_log(**log_entry)
+        except Exception as e:
+            logger.error(f"Error processing log entry: {e}")
+
 def _process_log_queue() -> None:
     """
     Process the log queue in a background thread.
@@ -655,10 +679,10 @@ def _process_log_queue() -> None:
 
         while _log_thread_running:
             try:
-                # Get a batch of log entries (up to 100)
+                # Get a batch of log entries
                 batch = []
                 try:
-                    while len(batch) < 100:
+                    while len(batch) < LOG_QUEUE_BATCH_SIZE:
                         # Get an item with a timeout to allow thread to exit
                         item = _log_queue.get(timeout=0.1)
                         batch.append(item)
@@ -673,25 +697,7 @@ def _process_log_queue() -> None:
                     continue
 
                 # Process the batch
-                for log_entry in batch:
-                    try:
-                        log_repo.add_log(
-                            message=log_entry['message'],
-                            level=log_entry['level'],
-                            category=log_entry['category'],
-                            source=log_entry['source'],
-                            details=log_entry['details'],
-                            entity_type=log_entry['entity_type'],
-                            entity_id=log_entry['entity_id'],
-                            user_id=log_entry['user_id'],
-                            owner_id=log_entry['owner_id'],
-                            trace_id=log_entry['trace_id'],
-                            span_id=log_entry['span_id'],
-                            parent_span_id=log_entry['parent_span_id'],
-                            timestamp=log_entry['timestamp']
-                        )
-                    except Exception as e:
-                        logger.error(f"Error processing log entry: {e}")
+                _flush_log_batch(log_repo, batch)
 
             except Exception as e:
                 logger.error(f"Error in log queue processing thread: {e}")
@@ -778,34 +784,24 @@ def shutdown_logging() -> None:
         stop_log_thread()
 
         # Process any remaining items in the queue
-        while not _log_queue.empty():
+        # Create log repository with admin context to bypass RLS
+        log_repo = LogRepository(user_id=1, user_role="admin")
+        while True:
+            batch = []
             try:
-                item = _log_queue.get(block=False)
-
-                # Create log repository with admin context to bypass RLS
-                log_repo = LogRepository(user_id=1, user_role="admin")
-
-                log_repo.add_log(
-                    message=item['message'],
-                    level=item['level'],
-                    category=item['category'],
-                    source=item['source'],
-                    details=item['details'],
-                    entity_type=item['entity_type'],
-                    entity_id=item['entity_id'],
-                    user_id=item['user_id'],
-                    owner_id=item['owner_id'],
-                    trace_id=item['trace_id'],
-                    span_id=item['span_id'],
-                    parent_span_id=item['parent_span_id'],
-                    timestamp=item['timestamp']
-                )
-
-                _log_queue.task_done()
+                while len(batch) < LOG_QUEUE_BATCH_SIZE:
+                    batch.append(_log_queue.get(block=False))
+                    _log_queue.task_done()
             except queue.Empty:
+                pass
+
+            if not batch:
                 break
+
+            try:
+                _flush_log_batch(log_repo, batch)
             except Exception as e:
-                logger.error(f"Error processing remaining log entry during shutdown: {e}")
+                logger.error(f"Error processing remaining log entries during shutdown: {e}")
     except Exception as e:
         logger.error(f"Error shutting down log storage system: {e}")
         logger.error(traceback.format_exc())
@@ -0,0 +1,410 @@
+"""
+Streaming utility functions for the AccountDB application.
+
+This module provides utilities for processing request bodies while they are received:
+a reader for the file of a multipart/form-data body, incremental decoding, and CSV and
+JSON parsers fed with text chunks.
+"""
+
+import codecs
+import csv
+import json
+import re
+from json.decoder import WHITESPACE
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from python_multipart import MultipartParser
+from python_multipart.multipart import parse_options_header
+
+# Characters that may continue a number at the end of a chunk
+NUMBER_TAIL = re.compile(r"[0-9.eE+\-]*\Z")
+
+class UploadTooLargeError(ValueError):
+    """Raised when a file is larger than its size limit."""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"File too large. Maximum size: {max_size / 1024 / 1024} MB")
+        self.max_size = max_size
+
+class MultipartFileReader:
+    """
+    Reader of a file field of a multipart/form-data body, as the body is received.
+
+    The size of the file is counted as it is read, so that a file over the limit is
+    rejected as soon as the limit is reached, without being read to the end.
+    """
+
+    def __init__(self, stream: AsyncIterator[bytes], content_type: str, field_name: str = "file",
+                 max_size: Optional[int] = None):
+        """
+        Initialize the reader.
+
+        Args:
+            stream: The chunks of the request body
+            content_type: The Content-Type header of the request
+            field_name: The name of the file field
+            max_size: The maximum size of the file in bytes
+
+        Raises:
+            ValueError: If the content type is not multipart/form-data with a boundary
+        """
+        media_type, params = parse_options_header(content_type)
+        if media_type != b"multipart/form-data" or not params.get(b"boundary"):
+            raise ValueError("Expected a multipart/form-data request body")
+
+        self.field_name = field_name
+        self.max_size = max_size
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.size = 0
+
+        self._stream = stream.__aiter__()
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._in_file = False
+        self._file_ended = False
+        self._chunks: List[bytes] = []
+        self._parser = MultipartParser(params[b"boundary"], callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end
+        })
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if self.filename is None and options.get(b"name", b"").decode("latin-1") == self.field_name:
+            self._in_file = True
+            self.filename = options.get(b"filename", b"").decode("utf-8", errors="replace")
+            self.content_type = self._headers.get(b"content-type", b"").decode("latin-1")
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self._chunks.append(data[start:end])
+            self.size += end - start
+
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self._file_ended = True
+
+    async def _read(self) -> bool:
+        """Feed the next chunk of the body to the parser, returning False at the end of the body."""
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            self._parser.finalize()
+            return False
+
+        self._parser.write(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            raise UploadTooLargeError(self.max_size)
+        return True
+
+    async def open(self) -> None:
+        """
+        Read the body until the headers of the file have been received.
+
+        Raises:
+            ValueError: If the body has no file field, or is not a valid multipart body
+        """
+        while self.filename is None:
+            if not await self._read():
+                raise ValueError(f"No '{self.field_name}' file in the request body")
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """
+        Read the content of the file as it is received.
+
+        Yields:
+            bytes: The chunks of the file
+
+        Raises:
+            UploadTooLargeError: If the file is larger than max_size
+            ValueError: If the body ends before the file
+        """
+        await self.open()
+        while True:
+            while self._chunks:
+                yield self._chunks.pop(0)
+            if self._file_ended:
+                return
+            if not await self._read() and not self._file_ended:
+                raise ValueError("The request body ended before the end of the file")
+
+async def decode_chunks(chunks: AsyncIterator[bytes], encoding: str = "utf-8-sig") -> AsyncIterator[str]:
+    """
+    Decode chunks of bytes incrementally, including characters split between chunks.
+
+    Args:
+        chunks: The chunks to decode
+        encoding: The encoding of the chunks. Defaults to UTF-8, ignoring a byte order mark.
+
+    Yields:
+        str: The decoded text
+
+    Raises:
+        UnicodeDecodeError: If the chunks are not valid in the encoding
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+class IncrementalCsvReader:
+    """
+    CSV reader fed with text chunks, returning the rows as dictionaries like csv.DictReader.
+
+    Records are only handed to the csv module once they are complete: a line ends a record
+    when the quotes since the start of the record are balanced, so that a quoted field
+    spanning several lines is never read in part.
+    """
+
+    def __init__(self):
+        self.fieldnames: Optional[List[str]] = None
+        self._partial_line = ""
+        self._record: List[str] = []
+        self._quotes = 0
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Parse the records completed by a chunk of text.
+
+        Args:
+            text: The next chunk of the CSV text
+
+        Returns:
+            List[Dict[str, Any]]: The completed rows, by column name
+        """
+        lines = (self._partial_line + text).split("\n")
+        self._partial_line = lines.pop()
+
+        complete: List[str] = []
+        for line in lines:
+            self._record.append(line + "\n")
+            self._quotes += line.count('"')
+            if self._quotes % 2 == 0:
+                complete.extend(self._record)
+                self._record = []
+                self._quotes = 0
+
+        return self._parse(complete)
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Parse the rest of the CSV text, at its end.
+
+        Returns:
+            List[Dict[str, Any]]: The remaining rows, by column name
+        """
+        if self._partial_line:
+            self._record.append(self._partial_line)
+            self._partial_line = ""
+
+        lines, self._record = self._record, []
+        return self._parse(lines)
+
+    def _parse(self, lines: List[str]) -> List[Dict[str, Any]]:
+        """Parse complete records, the first of which is the header of the file."""
+        if not lines:
+            return []
+
+        reader = csv.DictReader(lines, fieldnames=self.fieldnames)
+        rows = list(reader)
+        self.fieldnames = reader.fieldnames
+        return rows
+
+class IncrementalJsonArrayParser:
+    """
+    Parser of a JSON array fed with text chunks, returning the items of the array as soon
+    as they are complete. A document that is not an array is returned as a single item
+    at its end.
+
+    An item that cannot be decoded is only kept for the next chunk while its end has not
+    been received yet; an invalid item is rejected as soon as its end is received.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+
+        # Position of the start of the buffer in the document, for error messages
+        self._offset = 0
+        self._line = 0
+        self._column = 0
+
+        # Scan of the incomplete item at the current position for its end, resumed by the next chunk
+        self._scan_pos: Optional[int] = None
+        self._scan_depth = 0
+        self._scan_in_string = False
+        self._scan_escape = False
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        Parse the items completed by a chunk of text.
+
+        Args:
+            text: The next chunk of the JSON text
+
+        Returns:
+            List[Any]: The completed items
+
+        Raises:
+            json.JSONDecodeError: If the text is not valid JSON
+        """
+        consumed = self._buffer[:self._pos]
+        newlines = consumed.count("\n")
+        if newlines:
+            self._column = len(consumed) - consumed.rfind("\n") - 1
+        else:
+            self._column += len(consumed)
+        self._line += newlines
+        self._offset += len(consumed)
+
+        self._buffer = self._buffer[self._pos:] + text
+        if self._scan_pos is not None:
+            self._scan_pos -= self._pos
+        self._pos = 0
+        return self._parse(final=False)
+
+    def close(self) -> List[Any]:
+        """
+        Parse the rest of the JSON text, at its end.
+
+        Returns:
+            List[Any]: The remaining items
+
+        Raises:
+            json.JSONDecodeError: If the text is not valid JSON, or ends early
+        """
+        items = self._parse(final=True)
+        if self._state != "done":
+            raise self._error("Expecting ',' delimiter" if self._state == "after" else "Expecting value", len(self._buffer))
+        return items
+
+    def _error(self, msg: str, pos: int) -> json.JSONDecodeError:
+        """Create a decoding error at a position of the buffer, located in the whole document."""
+        error = json.JSONDecodeError(msg, self._buffer, pos)
+        newlines = self._buffer.count("\n", 0, pos)
+        error.lineno = self._line + newlines + 1
+        error.colno = pos - self._buffer.rfind("\n", 0, pos) if newlines else self._column + pos + 1
+        error.pos = self._offset + pos
+        error.args = (f"{msg}: line {error.lineno} column {error.colno} (char {error.pos})",)
+        return error
+
+    def _item_received(self) -> bool:
+        """
+        Check whether the end of the item at the current position is in the buffer.
+
+        The item ends with the bracket or quote closing it, or for other values with the
+        first delimiter or whitespace after it. The scan resumes where the previous one
+        stopped, so that every character of an item is only scanned once.
+        """
+        if self._scan_pos is None:
+            self._scan_pos = self._pos
+            self._scan_depth = 0
+            self._scan_in_string = self._scan_escape = False
+
+        buffer = self._buffer
+        pos = self._scan_pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            pos += 1
+            if self._scan_in_string:
+                if self._scan_escape:
+                    self._scan_escape = False
+                elif char == "\\":
+                    self._scan_escape = True
+                elif char == '"':
+                    self._scan_in_string = False
+                    if self._scan_depth == 0:
+                        return True
+            elif char == '"':
+                self._scan_in_string = True
+            elif char in "[{":
+                self._scan_depth += 1
+            elif char in "]}":
+                self._scan_depth -= 1
+                if self._scan_depth <= 0:
+                    return True
+            elif self._scan_depth == 0 and (char == "," or char.isspace()):
+                return True
+
+        self._scan_pos = pos
+        return False
+
+    def _decode(self, final: bool) -> Optional[Any]:
+        """Decode the value at the current position, or return None if it may not be complete yet."""
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError as e:
+            if final or self._item_received():
+                raise self._error(e.msg, e.pos)
+            return None
+
+        # A number at the end of the buffer may continue in the next chunk
+        if not final and (end == len(self._buffer) or (
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            and NUMBER_TAIL.match(self._buffer, end)
+        )):
+            return None
+
+        self._pos = end
+        self._scan_pos = None
+        return (value,)
+
+    def _parse(self, final: bool) -> List[Any]:
+        items = []
+        while True:
+            self._pos = WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos == len(self._buffer):
+                return items
+
+            char = self._buffer[self._pos]
+            if self._state == "start":
+                if char == "[":
+                    self._state = "first"
+                    self._pos += 1
+                else:
+                    self._state = "single"
+            elif char == "]" and self._state in ("first", "after"):
+                self._state = "done"
+                self._pos += 1
+            elif self._state == "after":
+                if char != ",":
+                    raise self._error("Expecting ',' delimiter", self._pos)
+                self._state = "item"
+                self._pos += 1
+            elif self._state in ("first", "item", "single"):
+                decoded = self._decode(final)
+                if decoded is None:
+                    return items
+                items.append(decoded[0])
+                self._state = "done" if self._state == "single" else "after"
+            else:
+                raise self._error("Extra data", self._pos)
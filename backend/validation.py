@@ -7,9 +7,11 @@ the required format and constraints before being processed by the application.
 
 import re
 import logging
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple, Union
-from pydantic import BaseModel, ValidationError, validator, Field
-from pydantic.networks import EmailStr
+from pydantic import BaseModel, ValidationError, validator, Field, TypeAdapter
+from pydantic.networks import EmailStr, validate_email as validate_email_address
+from pydantic_core import PydanticCustomError
 from datetime import datetime
 import uuid
 
@@ -23,8 +25,13 @@ EMAIL_PATTERN = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
 UUID_PATTERN = r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
 STEAMID_PATTERN = r'^[0-9]{17}$'
 
+# Local parts of email addresses accepted without the full email validation
+EMAIL_LOCAL_PART_PATTERN = re.compile(r'^[A-Za-z0-9_+-]+(\.[A-Za-z0-9_+-]+)*$')
+
 # File validation constants
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
+MAX_IMPORT_FILE_SIZE = 100 * 1024 * 1024  # 100 MB, for account imports
+MAX_IMPORT_ROWS = 100000
 ALLOWED_FILE_TYPES = {
     'json': ['application/json'],
     'csv': ['text/csv', 'application/csv', 'application/vnd.ms-excel'],
@@ -390,11 +397,44 @@ class UserValidator(BaseModel):
             raise ValueError(result.errors[0]['message'])
         return v
 
+@lru_cache(maxsize=4096)
+def _email_domain_is_valid(domain: str) -> bool:
+    """Check whether the full email validation accepts a domain, once per domain."""
+    try:
+        validate_email_address(f"postmaster@{domain}")
+        return True
+    except PydanticCustomError:
+        return False
+
+def check_email_address(address: str) -> str:
+    """
+    Validate an email address with the rules of EmailStr.
+    
+    Plain addresses are checked with a pattern and a cached check of their domain, which
+    is most of the cost of the full validation. Other addresses, and invalid ones, go
+    through the full validation, which raises the error.
+    
+    Args:
+        address: The email address to validate
+        
+    Returns:
+        str: The email address
+    """
+    local_part, _, domain = address.rpartition("@")
+    if not (len(address) <= 254 and len(local_part) <= 64 and EMAIL_LOCAL_PART_PATTERN.match(local_part)
+            and _email_domain_is_valid(domain)):
+        validate_email_address(address)
+    return address
+
 class EmailValidator(BaseModel):
     """Validator for email data."""
-    address: EmailStr
+    address: str
     password: str
     
+    @validator('address')
+    def address_must_be_valid(cls, v):
+        return check_email_address(v)
+    
     @validator('password')
     def password_must_be_valid(cls, v):
         result = validate_password(v)
@@ -470,6 +510,32 @@ def validate_account_data(data: Dict[str, Any]) -> ValidationResult:
     
     return ValidationResult(valid=len(errors) == 0, errors=errors)
 
+_account_list_adapter = TypeAdapter(List[AccountValidator])
+
+def validate_account_data_batch(data: List[Any]) -> List[ValidationResult]:
+    """
+    Validate a batch of account data in one pass.
+    
+    Args:
+        data: The account data to validate
+        
+    Returns:
+        List[ValidationResult]: The validation result of each account, in order
+    """
+    errors: List[List[Dict[str, Any]]] = [[] for _ in data]
+    
+    try:
+        _account_list_adapter.validate_python(data)
+    except ValidationError as e:
+        for error in e.errors():
+            index, *loc = error["loc"]
+            errors[index].append({
+                "field": ".".join(str(part) for part in loc),
+                "message": error["msg"]
+            })
+    
+    return [ValidationResult(valid=len(account_errors) == 0, errors=account_errors) for account_errors in errors]
+
 def validate_card_data(data: Dict[str, Any]) -> ValidationResult:
     """
     Validate card data.
@@ -7,6 +7,8 @@ CREATE TABLE IF NOT EXISTS public.accounts
     prime boolean NOT NULL DEFAULT false,                             -- Whether the account is prime
     lock boolean NOT NULL DEFAULT false,                              -- Whether the account is locked
     perm_lock boolean NOT NULL DEFAULT false,                         -- Whether the account is permanently locked
+    lease_id uuid,                                                    -- Lease holding the lock of the account
+    lease_expires_at timestamp with time zone,                        -- When the lease expires unless renewed
     farmlabs_upload uuid,                                             -- FarmLabs upload UUID
     acc_email_address text,                                  -- Email address associated with the account
     acc_email_password text,                                 -- Password for the email account
@@ -54,10 +56,19 @@ COMMENT ON COLUMN public.accounts.acc_uri IS 'URI';
 COMMENT ON COLUMN public.accounts.prime IS 'Whether the account is prime';
 COMMENT ON COLUMN public.accounts.lock IS 'Whether the account is locked';
 COMMENT ON COLUMN public.accounts.perm_lock IS 'Whether the account is permanently locked';
+COMMENT ON COLUMN public.accounts.lease_id IS 'Lease holding the lock of the account';
+COMMENT ON COLUMN public.accounts.lease_expires_at IS 'When the lease expires unless renewed';
 
 CREATE INDEX idx_accounts_id ON public.accounts (id);
-CREATE INDEX idx_accounts_username ON public.accounts (acc_username);
-CREATE INDEX idx_accounts_email ON public.accounts (acc_email_address);
+-- Sort orders of the account listings, with acc_id breaking the ties between pages
+CREATE INDEX idx_accounts_username ON public.accounts (acc_username, acc_id);
+CREATE INDEX idx_accounts_email ON public.accounts (acc_email_address, acc_id);
+CREATE INDEX idx_accounts_acc_created_at_acc_id ON public.accounts (acc_created_at, acc_id);
+
+-- Accounts available for leasing, in the order they are leased
+CREATE INDEX idx_accounts_fresh ON public.accounts (id) WHERE prime = false AND lock = false AND perm_lock = false;
+CREATE INDEX idx_accounts_lease_id ON public.accounts (lease_id) WHERE lease_id IS NOT NULL;
+CREATE INDEX idx_accounts_lease_expires_at ON public.accounts (lease_expires_at) WHERE lease_expires_at IS NOT NULL;
 
 ALTER TABLE IF EXISTS public.accounts
     OWNER to ps_user;
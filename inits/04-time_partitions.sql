@@ -0,0 +1,116 @@
+-- Time Partition Maintenance
+-- This script creates the functions maintaining the range partitions of time-partitioned tables
+--
+-- A time-partitioned table is partitioned by RANGE (timestamp) into partitions named
+-- <table>_pYYYYMMDD after the start of their range, plus a <table>_default partition
+-- receiving the rows no partition covers yet, so an insert never fails for lack of a
+-- partition. The functions run as their owner, since creating and dropping partitions
+-- requires owning the partitioned table, so they only accept range-partitioned tables,
+-- and only the application role may execute them.
+
+-- Create the partitions covering a time range, moving their rows out of the default partition
+CREATE OR REPLACE FUNCTION public.create_time_partitions(
+    p_table TEXT,
+    p_interval INTERVAL,
+    p_from TIMESTAMP WITH TIME ZONE,
+    p_to TIMESTAMP WITH TIME ZONE
+) RETURNS INTEGER AS $$
+DECLARE
+    v_unit TEXT := CASE WHEN p_interval = INTERVAL '1 week' THEN 'week' ELSE 'day' END;
+    v_start TIMESTAMP WITH TIME ZONE;
+    v_end TIMESTAMP WITH TIME ZONE;
+    v_partition TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    -- Only the range-partitioned tables can be maintained, since the function runs as their owner
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_catalog.pg_partitioned_table
+        WHERE partrelid = to_regclass(format('public.%I', p_table)) AND partstrat = 'r'
+    ) THEN
+        RAISE EXCEPTION 'public.% is not a range-partitioned table', p_table;
+    END IF;
+
+    -- Serialize the maintenance of a table between worker processes
+    PERFORM pg_advisory_xact_lock(hashtext('time_partitions:' || p_table));
+
+    v_start := date_trunc(v_unit, p_from);
+    WHILE v_start < p_to LOOP
+        v_end := v_start + p_interval;
+        v_partition := format('%s_p%s', p_table, to_char(v_start, 'YYYYMMDD'));
+
+        IF to_regclass(format('public.%I', v_partition)) IS NULL THEN
+            -- A partition cannot be attached over rows of the default partition, so they are moved first
+            EXECUTE format('CREATE TABLE public.%I (LIKE public.%I INCLUDING DEFAULTS)', v_partition, p_table);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM public.%I WHERE timestamp >= $1 AND timestamp < $2 RETURNING *) '
+                'INSERT INTO public.%I SELECT * FROM moved',
+                p_table || '_default', v_partition
+            ) USING v_start, v_end;
+            EXECUTE format(
+                'ALTER TABLE public.%I ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+                p_table, v_partition, v_start, v_end
+            );
+            v_created := v_created + 1;
+        END IF;
+
+        v_start := v_end;
+    END LOOP;
+
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = pg_catalog, public, pg_temp SET timezone = 'UTC';
+
+-- Detach and drop the partitions whose whole range is older than a cutoff, returning the number of dropped rows
+CREATE OR REPLACE FUNCTION public.drop_time_partitions(
+    p_table TEXT,
+    p_before TIMESTAMP WITH TIME ZONE
+) RETURNS BIGINT AS $$
+DECLARE
+    v_partition RECORD;
+    v_rows BIGINT;
+    v_dropped BIGINT := 0;
+BEGIN
+    -- Only the range-partitioned tables can be maintained, since the function runs as their owner
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_catalog.pg_partitioned_table
+        WHERE partrelid = to_regclass(format('public.%I', p_table)) AND partstrat = 'r'
+    ) THEN
+        RAISE EXCEPTION 'public.% is not a range-partitioned table', p_table;
+    END IF;
+
+    -- Serialize the maintenance of a table between worker processes
+    PERFORM pg_advisory_xact_lock(hashtext('time_partitions:' || p_table));
+
+    FOR v_partition IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = format('public.%I', p_table)::regclass
+        AND substring(pg_get_expr(c.relpartbound, c.oid) FROM 'TO \(''([^'']+)''\)')::TIMESTAMP WITH TIME ZONE <= p_before
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('SELECT COUNT(*) FROM public.%I', v_partition.relname) INTO v_rows;
+        EXECUTE format('ALTER TABLE public.%I DETACH PARTITION public.%I', p_table, v_partition.relname);
+        EXECUTE format('DROP TABLE public.%I', v_partition.relname);
+        v_dropped := v_dropped + v_rows;
+    END LOOP;
+
+    -- Old rows that ended up in the default partition are few, and deleted
+    EXECUTE format('DELETE FROM public.%I WHERE timestamp < $1', p_table || '_default') USING p_before;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    RETURN v_dropped + v_rows;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = pg_catalog, public, pg_temp SET timezone = 'UTC';
+
+ALTER FUNCTION public.create_time_partitions(TEXT, INTERVAL, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE) OWNER TO ps_user;
+ALTER FUNCTION public.drop_time_partitions(TEXT, TIMESTAMP WITH TIME ZONE) OWNER TO ps_user;
+
+-- The functions run as their owner, so only the application role may call them
+REVOKE EXECUTE ON FUNCTION public.create_time_partitions(TEXT, INTERVAL, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION public.drop_time_partitions(TEXT, TIMESTAMP WITH TIME ZONE) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.create_time_partitions(TEXT, INTERVAL, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE) TO acc_user;
+GRANT EXECUTE ON FUNCTION public.drop_time_partitions(TEXT, TIMESTAMP WITH TIME ZONE) TO acc_user;
+
+COMMENT ON FUNCTION public.create_time_partitions(TEXT, INTERVAL, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE) IS 'Create the range partitions of a time-partitioned table covering a time range';
+COMMENT ON FUNCTION public.drop_time_partitions(TEXT, TIMESTAMP WITH TIME ZONE) IS 'Detach and drop the range partitions of a time-partitioned table older than a cutoff';
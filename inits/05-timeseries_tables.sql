@@ -1,6 +1,16 @@
 -- Timeseries Tables for Performance Metrics
 -- This script creates tables for storing timeseries data for various metrics
 
+-- The unique indexes of the upserts treat NULL entities and owners as equal with
+-- NULLS NOT DISTINCT, which needs PostgreSQL 15 or later
+DO $$
+BEGIN
+    IF current_setting('server_version_num')::integer < 150000 THEN
+        RAISE EXCEPTION 'PostgreSQL 15 or later is required, found %', current_setting('server_version');
+    END IF;
+END
+$$;
+
 -- Create metrics_categories table to define metric categories
 CREATE TABLE IF NOT EXISTS public.metrics_categories
 (
@@ -27,27 +37,71 @@ CREATE TABLE IF NOT EXISTS public.metrics_definitions
     UNIQUE(category_id, name)                                        -- Ensure metric names are unique within a category
 );
 
--- Create timeseries_data table to store metric values
-CREATE TABLE IF NOT EXISTS public.timeseries_data
+-- Create timeseries_series table to define the series of metric values, one per metric
+-- and entity/owner, so that the points of timeseries_data only reference their series
+CREATE TABLE IF NOT EXISTS public.timeseries_series
 (
-    id BIGSERIAL PRIMARY KEY,                                        -- Auto-incrementing ID (Primary Key)
+    id SERIAL PRIMARY KEY,                                           -- Auto-incrementing ID (Primary Key)
     metric_id INTEGER NOT NULL REFERENCES public.metrics_definitions(id), -- Metric ID (Foreign Key)
-    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,                     -- Timestamp of the measurement
-    value_float DOUBLE PRECISION,                                    -- Float value (for float metrics)
-    value_int BIGINT,                                                -- Integer value (for integer metrics)
-    value_bool BOOLEAN,                                              -- Boolean value (for boolean metrics)
-    value_text TEXT,                                                 -- Text value (for string metrics)
     entity_type VARCHAR(50),                                         -- Entity type (e.g., 'vm', 'account', 'system')
     entity_id VARCHAR(100),                                          -- Entity ID (e.g., VM ID, account ID)
     owner_id INTEGER,                                                -- Owner ID for RLS
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP    -- Creation timestamp
 );
 
--- Create index on timeseries_data for faster queries
-CREATE INDEX idx_timeseries_data_metric_id ON public.timeseries_data(metric_id);
-CREATE INDEX idx_timeseries_data_timestamp ON public.timeseries_data(timestamp);
-CREATE INDEX idx_timeseries_data_entity ON public.timeseries_data(entity_type, entity_id);
-CREATE INDEX idx_timeseries_data_owner_id ON public.timeseries_data(owner_id);
+-- One series per metric and entity/owner
+CREATE UNIQUE INDEX idx_timeseries_series_key ON public.timeseries_series
+    (metric_id, entity_type, entity_id, owner_id) NULLS NOT DISTINCT;
+
+-- Get the ID of a series, creating it if it does not exist yet
+CREATE OR REPLACE FUNCTION public.get_timeseries_series_id(
+    p_metric_id INTEGER,
+    p_entity_type VARCHAR,
+    p_entity_id VARCHAR,
+    p_owner_id INTEGER
+) RETURNS INTEGER AS $$
+DECLARE
+    v_series_id INTEGER;
+BEGIN
+    INSERT INTO public.timeseries_series (metric_id, entity_type, entity_id, owner_id)
+    VALUES (p_metric_id, p_entity_type, p_entity_id, p_owner_id)
+    ON CONFLICT (metric_id, entity_type, entity_id, owner_id) DO NOTHING
+    RETURNING id INTO v_series_id;
+
+    IF v_series_id IS NULL THEN
+        SELECT id INTO v_series_id
+        FROM public.timeseries_series
+        WHERE metric_id = p_metric_id
+        AND entity_type IS NOT DISTINCT FROM p_entity_type
+        AND entity_id IS NOT DISTINCT FROM p_entity_id
+        AND owner_id IS NOT DISTINCT FROM p_owner_id;
+    END IF;
+
+    RETURN v_series_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create timeseries_data table to store metric values, partitioned by day so that
+-- retention drops whole partitions instead of deleting rows. Points are stored as the
+-- value of their series at a timestamp; integer and boolean metrics are stored as
+-- numbers (booleans as 0 or 1).
+CREATE TABLE IF NOT EXISTS public.timeseries_data
+(
+    series_id INTEGER NOT NULL REFERENCES public.timeseries_series(id), -- Series ID (Foreign Key)
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,                     -- Timestamp of the measurement
+    value DOUBLE PRECISION NOT NULL                                  -- Measured value
+) PARTITION BY RANGE (timestamp);
+
+-- Create the default partition and the daily partitions from the retention period to a week ahead
+CREATE TABLE IF NOT EXISTS public.timeseries_data_default PARTITION OF public.timeseries_data DEFAULT;
+SELECT public.create_time_partitions('timeseries_data', INTERVAL '1 day', CURRENT_TIMESTAMP - INTERVAL '30 days', CURRENT_TIMESTAMP + INTERVAL '7 days');
+
+-- Create indexes on timeseries_data: the points of a series, whose duplicate keys are
+-- deduplicated into posting lists, and a BRIN index for scans of a time range, which is
+-- tiny since points are inserted in time order. Reads of a series are pruned to the daily
+-- partitions of their range before either index is used.
+CREATE INDEX idx_timeseries_data_series ON public.timeseries_data(series_id);
+CREATE INDEX idx_timeseries_data_timestamp ON public.timeseries_data USING brin(timestamp);
 
 -- Create timeseries_aggregates table for pre-calculated aggregates
 CREATE TABLE IF NOT EXISTS public.timeseries_aggregates
@@ -74,19 +128,102 @@ CREATE INDEX idx_timeseries_aggregates_period ON public.timeseries_aggregates(pe
 CREATE INDEX idx_timeseries_aggregates_entity ON public.timeseries_aggregates(entity_type, entity_id);
 CREATE INDEX idx_timeseries_aggregates_owner_id ON public.timeseries_aggregates(owner_id);
 
+-- One aggregate per metric, period and entity/owner bucket, upserted by the aggregator
+CREATE UNIQUE INDEX idx_timeseries_aggregates_bucket ON public.timeseries_aggregates
+    (metric_id, period_type, period_start, entity_type, entity_id, owner_id) NULLS NOT DISTINCT;
+
+-- Create timeseries_latest table to keep the latest value of every series, upserted along
+-- with the inserts into timeseries_data so that current values are read without a scan
+CREATE TABLE IF NOT EXISTS public.timeseries_latest
+(
+    series_id INTEGER PRIMARY KEY REFERENCES public.timeseries_series(id), -- Series ID (Primary Key)
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,                     -- Timestamp of the latest measurement
+    value DOUBLE PRECISION NOT NULL,                                 -- Latest measured value
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP    -- Update timestamp
+);
+
+-- Create timeseries_rollup_watermarks table to record up to where each period type is rolled up
+CREATE TABLE IF NOT EXISTS public.timeseries_rollup_watermarks
+(
+    period_type VARCHAR(20) PRIMARY KEY,                             -- Aggregation period type (hourly, daily, weekly, monthly)
+    rolled_up_to TIMESTAMP WITH TIME ZONE NOT NULL,                  -- End of the last rolled up bucket
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP    -- Update timestamp
+);
+
+-- Create timeseries_rollup_dirty table to record rolled up buckets that received late data
+CREATE TABLE IF NOT EXISTS public.timeseries_rollup_dirty
+(
+    period_type VARCHAR(20) NOT NULL,                                -- Aggregation period type (hourly, daily, weekly, monthly)
+    period_start TIMESTAMP WITH TIME ZONE NOT NULL,                  -- Start of the bucket to roll up again
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,   -- Creation timestamp
+    PRIMARY KEY (period_type, period_start)
+);
+
+-- Mark the hourly buckets of points inserted behind the hourly watermark
+CREATE OR REPLACE FUNCTION public.mark_late_timeseries_data()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO public.timeseries_rollup_dirty (period_type, period_start)
+    SELECT DISTINCT 'hourly', date_trunc('hour', n.timestamp)
+    FROM new_rows n
+    JOIN public.timeseries_rollup_watermarks w ON w.period_type = 'hourly'
+    WHERE n.timestamp < w.rolled_up_to
+    ON CONFLICT DO NOTHING;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS timeseries_data_mark_late ON public.timeseries_data;
+CREATE TRIGGER timeseries_data_mark_late
+    AFTER INSERT ON public.timeseries_data
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION public.mark_late_timeseries_data();
+
+-- Create RLS policies for timeseries_series
+ALTER TABLE public.timeseries_series ENABLE ROW LEVEL SECURITY;
+
+-- Series without an owner are system-wide, readable by every user and written by admins
+CREATE POLICY timeseries_series_user_policy ON public.timeseries_series
+    USING (owner_id IS NULL OR
+           owner_id = current_setting('app.current_user_id')::INTEGER OR
+           current_setting('app.current_user_role')::TEXT = 'admin')
+    WITH CHECK (owner_id = current_setting('app.current_user_id')::INTEGER OR
+                current_setting('app.current_user_role')::TEXT = 'admin');
+
 -- Create RLS policies for timeseries_data
 ALTER TABLE public.timeseries_data ENABLE ROW LEVEL SECURITY;
 
+-- Points are visible with their series, and written to the series the user can write
 CREATE POLICY timeseries_data_user_policy ON public.timeseries_data
-    USING (owner_id = current_setting('app.current_user_id')::INTEGER OR
-           current_setting('app.current_user_role')::TEXT = 'admin');
+    USING (series_id IN (SELECT id FROM public.timeseries_series))
+    WITH CHECK (series_id IN (
+        SELECT id FROM public.timeseries_series
+        WHERE owner_id = current_setting('app.current_user_id')::INTEGER OR
+              current_setting('app.current_user_role')::TEXT = 'admin'
+    ));
 
 -- Create RLS policies for timeseries_aggregates
 ALTER TABLE public.timeseries_aggregates ENABLE ROW LEVEL SECURITY;
 
 CREATE POLICY timeseries_aggregates_user_policy ON public.timeseries_aggregates
-    USING (owner_id = current_setting('app.current_user_id')::INTEGER OR
-           current_setting('app.current_user_role')::TEXT = 'admin');
+    USING (owner_id IS NULL OR
+           owner_id = current_setting('app.current_user_id')::INTEGER OR
+           current_setting('app.current_user_role')::TEXT = 'admin')
+    WITH CHECK (owner_id = current_setting('app.current_user_id')::INTEGER OR
+                current_setting('app.current_user_role')::TEXT = 'admin');
+
+-- Create RLS policies for timeseries_latest
+ALTER TABLE public.timeseries_latest ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY timeseries_latest_user_policy ON public.timeseries_latest
+    USING (series_id IN (SELECT id FROM public.timeseries_series))
+    WITH CHECK (series_id IN (
+        SELECT id FROM public.timeseries_series
+        WHERE owner_id = current_setting('app.current_user_id')::INTEGER OR
+              current_setting('app.current_user_role')::TEXT = 'admin'
+    ));
 
 -- Insert default metric categories
 INSERT INTO public.metrics_categories (name, description)
@@ -135,27 +272,39 @@ ON CONFLICT (category_id, name) DO NOTHING;
 -- Set ownership
 ALTER TABLE public.metrics_categories OWNER TO ps_user;
 ALTER TABLE public.metrics_definitions OWNER TO ps_user;
+ALTER TABLE public.timeseries_series OWNER TO ps_user;
 ALTER TABLE public.timeseries_data OWNER TO ps_user;
 ALTER TABLE public.timeseries_aggregates OWNER TO ps_user;
+ALTER TABLE public.timeseries_latest OWNER TO ps_user;
+ALTER TABLE public.timeseries_rollup_watermarks OWNER TO ps_user;
+ALTER TABLE public.timeseries_rollup_dirty OWNER TO ps_user;
 
 -- Grant permissions
 GRANT ALL ON TABLE public.metrics_categories TO acc_user;
 GRANT ALL ON TABLE public.metrics_definitions TO acc_user;
+GRANT ALL ON TABLE public.timeseries_series TO acc_user;
 GRANT ALL ON TABLE public.timeseries_data TO acc_user;
 GRANT ALL ON TABLE public.timeseries_aggregates TO acc_user;
+GRANT ALL ON TABLE public.timeseries_latest TO acc_user;
+GRANT ALL ON TABLE public.timeseries_rollup_watermarks TO acc_user;
+GRANT ALL ON TABLE public.timeseries_rollup_dirty TO acc_user;
 
 GRANT ALL ON TABLE public.metrics_categories TO ps_user;
 GRANT ALL ON TABLE public.metrics_definitions TO ps_user;
+GRANT ALL ON TABLE public.timeseries_series TO ps_user;
 GRANT ALL ON TABLE public.timeseries_data TO ps_user;
 GRANT ALL ON TABLE public.timeseries_aggregates TO ps_user;
+GRANT ALL ON TABLE public.timeseries_latest TO ps_user;
+GRANT ALL ON TABLE public.timeseries_rollup_watermarks TO ps_user;
+GRANT ALL ON TABLE public.timeseries_rollup_dirty TO ps_user;
 
 -- Grant sequence permissions
 GRANT USAGE, SELECT ON SEQUENCE metrics_categories_id_seq TO acc_user;
 GRANT USAGE, SELECT ON SEQUENCE metrics_definitions_id_seq TO acc_user;
-GRANT USAGE, SELECT ON SEQUENCE timeseries_data_id_seq TO acc_user;
+GRANT USAGE, SELECT ON SEQUENCE timeseries_series_id_seq TO acc_user;
 GRANT USAGE, SELECT ON SEQUENCE timeseries_aggregates_id_seq TO acc_user;
 
 GRANT USAGE, SELECT ON SEQUENCE metrics_categories_id_seq TO ps_user;
 GRANT USAGE, SELECT ON SEQUENCE metrics_definitions_id_seq TO ps_user;
-GRANT USAGE, SELECT ON SEQUENCE timeseries_data_id_seq TO ps_user;
+GRANT USAGE, SELECT ON SEQUENCE timeseries_series_id_seq TO ps_user;
 GRANT USAGE, SELECT ON SEQUENCE timeseries_aggregates_id_seq TO ps_user;
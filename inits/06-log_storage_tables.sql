@@ -32,10 +32,11 @@ CREATE TABLE IF NOT EXISTS public.logs_levels
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP    -- Update timestamp
 );
 
--- Create logs table to store log entries
+-- Create logs table to store log entries, partitioned by week so that
+-- retention drops whole partitions instead of deleting rows
 CREATE TABLE IF NOT EXISTS public.logs
 (
-    id BIGSERIAL PRIMARY KEY,                                        -- Auto-incrementing ID (Primary Key)
+    id BIGSERIAL,                                                    -- Auto-incrementing ID
     timestamp TIMESTAMP WITH TIME ZONE NOT NULL,                     -- Timestamp of the log entry
     category_id INTEGER REFERENCES public.logs_categories(id),       -- Category ID (Foreign Key)
     source_id INTEGER REFERENCES public.logs_sources(id),            -- Source ID (Foreign Key)
@@ -49,11 +50,16 @@ CREATE TABLE IF NOT EXISTS public.logs
     trace_id VARCHAR(100),                                           -- Trace ID for distributed tracing
     span_id VARCHAR(100),                                            -- Span ID for distributed tracing
     parent_span_id VARCHAR(100),                                     -- Parent Span ID for distributed tracing
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP    -- Creation timestamp
-);
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,   -- Creation timestamp
+    PRIMARY KEY (id, timestamp)                                      -- Primary Key, including the partition key
+) PARTITION BY RANGE (timestamp);
+
+-- Create the default partition and the weekly partitions up to four weeks ahead
+CREATE TABLE IF NOT EXISTS public.logs_default PARTITION OF public.logs DEFAULT;
+SELECT public.create_time_partitions('logs', INTERVAL '1 week', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP + INTERVAL '28 days');
 
 -- Create index on logs for faster queries
-CREATE INDEX idx_logs_timestamp ON public.logs(timestamp);
+CREATE INDEX idx_logs_timestamp ON public.logs(timestamp, id);
 CREATE INDEX idx_logs_category_id ON public.logs(category_id);
 CREATE INDEX idx_logs_source_id ON public.logs(source_id);
 CREATE INDEX idx_logs_level_id ON public.logs(level_id);
@@ -199,14 +205,26 @@ GRANT USAGE, SELECT ON SEQUENCE logs_levels_id_seq TO ps_user;
 GRANT USAGE, SELECT ON SEQUENCE logs_id_seq TO ps_user;
 GRANT USAGE, SELECT ON SEQUENCE logs_retention_policies_id_seq TO ps_user;
 
--- Create function to clean up old logs based on retention policies
+-- Create function to clean up old logs based on retention policies. The partitions past the
+-- longest retention period are dropped whole; the shorter policies delete their rows from the
+-- remaining partitions.
 CREATE OR REPLACE FUNCTION cleanup_old_logs()
 RETURNS INTEGER AS $$
 DECLARE
-    deleted_count INTEGER := 0;
+    deleted_count BIGINT := 0;
+    policy_count BIGINT;
+    max_retention_days INTEGER;
     policy RECORD;
 BEGIN
-    -- Process each retention policy
+    SELECT MAX(retention_days) INTO max_retention_days FROM public.logs_retention_policies;
+
+    IF max_retention_days IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    deleted_count := public.drop_time_partitions('logs', CURRENT_TIMESTAMP - (max_retention_days || ' days')::INTERVAL);
+
+    -- Process each shorter retention policy
     FOR policy IN
         SELECT
             category_id,
@@ -215,20 +233,18 @@ BEGIN
             retention_days
         FROM
             public.logs_retention_policies
+        WHERE
+            retention_days < max_retention_days
     LOOP
-        -- Build the WHERE clause based on the policy
-        WITH deleted AS (
-            DELETE FROM public.logs
-            WHERE timestamp < (CURRENT_TIMESTAMP - (policy.retention_days || ' days')::INTERVAL)
-            AND (policy.category_id IS NULL OR category_id = policy.category_id)
-            AND (policy.source_id IS NULL OR source_id = policy.source_id)
-            AND (policy.level_id IS NULL OR level_id = policy.level_id)
-            RETURNING id
-        )
-        SELECT COUNT(*) INTO deleted_count FROM deleted;
+        DELETE FROM public.logs
+        WHERE timestamp < (CURRENT_TIMESTAMP - (policy.retention_days || ' days')::INTERVAL)
+        AND (policy.category_id IS NULL OR category_id = policy.category_id)
+        AND (policy.source_id IS NULL OR source_id = policy.source_id)
+        AND (policy.level_id IS NULL OR level_id = policy.level_id);
 
         -- Add to the total count
-        deleted_count := deleted_count + deleted_count;
+        GET DIAGNOSTICS policy_count = ROW_COUNT;
+        deleted_count := deleted_count + policy_count;
     END LOOP;
 
     RETURN deleted_count;
@@ -13,6 +13,7 @@ CREATE OR REPLACE FUNCTION generate_sample_timeseries_data(
 ) RETURNS VOID AS $$
 DECLARE
     v_metric_id INTEGER;
+    v_series_id INTEGER;
     v_current_time TIMESTAMP WITH TIME ZONE;
     v_start_time TIMESTAMP WITH TIME ZONE;
     v_value FLOAT;
@@ -26,6 +27,9 @@ BEGIN
         RAISE EXCEPTION 'Metric % not found', p_metric_name;
     END IF;
 
+    -- Get series ID
+    v_series_id := public.get_timeseries_series_id(v_metric_id, p_entity_type, p_entity_id, p_owner_id);
+
     -- Set time range
     v_current_time := NOW();
     v_start_time := v_current_time - (p_days || ' days')::INTERVAL;
@@ -56,9 +60,9 @@ BEGIN
 
             -- Insert raw data point
             INSERT INTO public.timeseries_data (
-                metric_id, timestamp, value_float, entity_type, entity_id, owner_id
+                series_id, timestamp, value
             ) VALUES (
-                v_metric_id, v_current_time, v_value, p_entity_type, p_entity_id, p_owner_id
+                v_series_id, v_current_time, v_value
             );
         END LOOP;
     END LOOP;
@@ -70,27 +74,24 @@ BEGIN
         entity_type, entity_id, owner_id
     )
     SELECT
-        metric_id,
+        v_metric_id,
         date_trunc('hour', timestamp) AS period_start,
         date_trunc('hour', timestamp) + '1 hour'::INTERVAL AS period_end,
         'hourly' AS period_type,
-        MIN(value_float) AS min_value,
-        MAX(value_float) AS max_value,
-        AVG(value_float) AS avg_value,
-        SUM(value_float) AS sum_value,
+        MIN(value) AS min_value,
+        MAX(value) AS max_value,
+        AVG(value) AS avg_value,
+        SUM(value) AS sum_value,
         COUNT(*) AS count_value,
-        entity_type,
-        entity_id,
-        owner_id
+        p_entity_type,
+        p_entity_id,
+        p_owner_id
     FROM
         public.timeseries_data
     WHERE
-        metric_id = v_metric_id AND
-        entity_type = p_entity_type AND
-        entity_id = p_entity_id AND
-        owner_id = p_owner_id
+        series_id = v_series_id
     GROUP BY
-        metric_id, date_trunc('hour', timestamp), entity_type, entity_id, owner_id;
+        date_trunc('hour', timestamp);
 
     -- Generate daily aggregates
     INSERT INTO public.timeseries_aggregates (
@@ -99,27 +100,24 @@ BEGIN
         entity_type, entity_id, owner_id
     )
     SELECT
-        metric_id,
+        v_metric_id,
         date_trunc('day', timestamp) AS period_start,
         date_trunc('day', timestamp) + '1 day'::INTERVAL AS period_end,
         'daily' AS period_type,
-        MIN(value_float) AS min_value,
-        MAX(value_float) AS max_value,
-        AVG(value_float) AS avg_value,
-        SUM(value_float) AS sum_value,
+        MIN(value) AS min_value,
+        MAX(value) AS max_value,
+        AVG(value) AS avg_value,
+        SUM(value) AS sum_value,
         COUNT(*) AS count_value,
-        entity_type,
-        entity_id,
-        owner_id
+        p_entity_type,
+        p_entity_id,
+        p_owner_id
     FROM
         public.timeseries_data
     WHERE
-        metric_id = v_metric_id AND
-        entity_type = p_entity_type AND
-        entity_id = p_entity_id AND
-        owner_id = p_owner_id
+        series_id = v_series_id
     GROUP BY
-        metric_id, date_trunc('day', timestamp), entity_type, entity_id, owner_id;
+        date_trunc('day', timestamp);
 END;
 $$ LANGUAGE plpgsql;
 
@@ -0,0 +1,26 @@
+-- Migration script to add the unique bucket index the timeseries aggregator upserts into
+
+-- The unique indexes of the upserts treat NULL entities and owners as equal with
+-- NULLS NOT DISTINCT, which needs PostgreSQL 15 or later
+DO $$
+BEGIN
+    IF current_setting('server_version_num')::integer < 150000 THEN
+        RAISE EXCEPTION 'PostgreSQL 15 or later is required, found %', current_setting('server_version');
+    END IF;
+END
+$$;
+
+-- Remove duplicate aggregates left by the per-entity aggregation, keeping the latest one
+DELETE FROM public.timeseries_aggregates a
+USING public.timeseries_aggregates b
+WHERE a.metric_id = b.metric_id
+AND a.period_type = b.period_type
+AND a.period_start = b.period_start
+AND a.entity_type IS NOT DISTINCT FROM b.entity_type
+AND a.entity_id IS NOT DISTINCT FROM b.entity_id
+AND a.owner_id IS NOT DISTINCT FROM b.owner_id
+AND a.id < b.id;
+
+-- One aggregate per metric, period and entity/owner bucket
+CREATE UNIQUE INDEX IF NOT EXISTS idx_timeseries_aggregates_bucket ON public.timeseries_aggregates
+    (metric_id, period_type, period_start, entity_type, entity_id, owner_id) NULLS NOT DISTINCT;
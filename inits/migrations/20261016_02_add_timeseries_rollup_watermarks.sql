@@ -0,0 +1,50 @@
+-- Migration script to add the watermarks of the incremental timeseries rollups
+
+-- Create timeseries_rollup_watermarks table to record up to where each period type is rolled up
+CREATE TABLE IF NOT EXISTS public.timeseries_rollup_watermarks
+(
+    period_type VARCHAR(20) PRIMARY KEY,                             -- Aggregation period type (hourly, daily, weekly, monthly)
+    rolled_up_to TIMESTAMP WITH TIME ZONE NOT NULL,                  -- End of the last rolled up bucket
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP    -- Update timestamp
+);
+
+-- Create timeseries_rollup_dirty table to record rolled up buckets that received late data
+CREATE TABLE IF NOT EXISTS public.timeseries_rollup_dirty
+(
+    period_type VARCHAR(20) NOT NULL,                                -- Aggregation period type (hourly, daily, weekly, monthly)
+    period_start TIMESTAMP WITH TIME ZONE NOT NULL,                  -- Start of the bucket to roll up again
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,   -- Creation timestamp
+    PRIMARY KEY (period_type, period_start)
+);
+
+-- Mark the hourly buckets of points inserted behind the hourly watermark
+CREATE OR REPLACE FUNCTION public.mark_late_timeseries_data()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO public.timeseries_rollup_dirty (period_type, period_start)
+    SELECT DISTINCT 'hourly', date_trunc('hour', n.timestamp)
+    FROM new_rows n
+    JOIN public.timeseries_rollup_watermarks w ON w.period_type = 'hourly'
+    WHERE n.timestamp < w.rolled_up_to
+    ON CONFLICT DO NOTHING;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS timeseries_data_mark_late ON public.timeseries_data;
+CREATE TRIGGER timeseries_data_mark_late
+    AFTER INSERT ON public.timeseries_data
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION public.mark_late_timeseries_data();
+
+-- Set ownership
+ALTER TABLE public.timeseries_rollup_watermarks OWNER TO ps_user;
+ALTER TABLE public.timeseries_rollup_dirty OWNER TO ps_user;
+
+-- Grant permissions
+GRANT ALL ON TABLE public.timeseries_rollup_watermarks TO acc_user;
+GRANT ALL ON TABLE public.timeseries_rollup_dirty TO acc_user;
+GRANT ALL ON TABLE public.timeseries_rollup_watermarks TO ps_user;
+GRANT ALL ON TABLE public.timeseries_rollup_dirty TO ps_user;
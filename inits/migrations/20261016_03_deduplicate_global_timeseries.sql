@@ -0,0 +1,87 @@
+-- Migration script to store system-wide timeseries once instead of once per active user
+--
+-- System-wide metrics were copied for every active user so that RLS would let each of them
+-- read the series. They are now stored once without an owner, and the policies let every
+-- user read rows without an owner.
+
+BEGIN;
+
+-- System-wide metrics collected by the timeseries collector
+CREATE TEMPORARY TABLE global_timeseries_metrics ON COMMIT DROP AS
+SELECT id FROM public.metrics_definitions
+WHERE name IN (
+    'cpu_usage', 'memory_usage', 'disk_usage', 'network_in', 'network_out', 'active_connections',
+    'vm_count', 'vm_running_count', 'vm_stopped_count', 'vm_error_count',
+    'account_count', 'account_active_count', 'account_locked_count'
+);
+
+-- Copies share the metric and timestamp, include the admin's copy and all have the same
+-- value. Per-owner series, such as the VM status distribution, are left as they are.
+CREATE TEMPORARY TABLE timeseries_data_copies ON COMMIT DROP AS
+SELECT metric_id, timestamp, MIN(id) AS keep_id
+FROM public.timeseries_data
+WHERE entity_type = 'system'
+AND entity_id = 'system'
+AND metric_id IN (SELECT id FROM global_timeseries_metrics)
+GROUP BY metric_id, timestamp
+HAVING COUNT(DISTINCT owner_id) > 1
+AND bool_or(owner_id = 1)
+AND COUNT(DISTINCT COALESCE(value_float::text, value_int::text, value_bool::text, value_text)) = 1;
+
+DELETE FROM public.timeseries_data td
+USING timeseries_data_copies c
+WHERE td.metric_id = c.metric_id
+AND td.timestamp = c.timestamp
+AND td.entity_type = 'system'
+AND td.entity_id = 'system'
+AND td.id <> c.keep_id;
+
+UPDATE public.timeseries_data td
+SET owner_id = NULL
+FROM timeseries_data_copies c
+WHERE td.id = c.keep_id;
+
+-- Collapse the aggregates of the copies the same way
+CREATE TEMPORARY TABLE timeseries_aggregates_copies ON COMMIT DROP AS
+SELECT metric_id, period_type, period_start, MIN(id) AS keep_id
+FROM public.timeseries_aggregates
+WHERE entity_type = 'system'
+AND entity_id = 'system'
+AND metric_id IN (SELECT id FROM global_timeseries_metrics)
+GROUP BY metric_id, period_type, period_start
+HAVING COUNT(DISTINCT owner_id) > 1
+AND bool_or(owner_id = 1)
+AND COUNT(DISTINCT (min_value, max_value, avg_value, count_value)) = 1;
+
+DELETE FROM public.timeseries_aggregates ta
+USING timeseries_aggregates_copies c
+WHERE ta.metric_id = c.metric_id
+AND ta.period_type = c.period_type
+AND ta.period_start = c.period_start
+AND ta.entity_type = 'system'
+AND ta.entity_id = 'system'
+AND ta.id <> c.keep_id;
+
+UPDATE public.timeseries_aggregates ta
+SET owner_id = NULL
+FROM timeseries_aggregates_copies c
+WHERE ta.id = c.keep_id;
+
+-- Let every user read the series without an owner; only admins write them
+DROP POLICY IF EXISTS timeseries_data_user_policy ON public.timeseries_data;
+CREATE POLICY timeseries_data_user_policy ON public.timeseries_data
+    USING (owner_id IS NULL OR
+           owner_id = current_setting('app.current_user_id')::INTEGER OR
+           current_setting('app.current_user_role')::TEXT = 'admin')
+    WITH CHECK (owner_id = current_setting('app.current_user_id')::INTEGER OR
+                current_setting('app.current_user_role')::TEXT = 'admin');
+
+DROP POLICY IF EXISTS timeseries_aggregates_user_policy ON public.timeseries_aggregates;
+CREATE POLICY timeseries_aggregates_user_policy ON public.timeseries_aggregates
+    USING (owner_id IS NULL OR
+           owner_id = current_setting('app.current_user_id')::INTEGER OR
+           current_setting('app.current_user_role')::TEXT = 'admin')
+    WITH CHECK (owner_id = current_setting('app.current_user_id')::INTEGER OR
+                current_setting('app.current_user_role')::TEXT = 'admin');
+
+COMMIT;
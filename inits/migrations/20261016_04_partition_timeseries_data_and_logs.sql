@@ -0,0 +1,320 @@
+-- Migration script to partition timeseries_data and logs by time
+--
+-- timeseries_data is partitioned by day and logs by week, so that retention drops whole
+-- partitions instead of deleting rows. Each table is rebuilt as a partitioned table and its
+-- rows are copied over, with partitions created from the oldest row still within the default
+-- retention period up to the ones the maintenance thread keeps ahead. Older rows land in the
+-- default partition and are deleted by the next cleanup. Both tables are locked while
+-- they are copied, so run this during a maintenance window on large databases.
+
+BEGIN;
+
+-- Create the partitions covering a time range, moving their rows out of the default partition
+CREATE OR REPLACE FUNCTION public.create_time_partitions(
+    p_table TEXT,
+    p_interval INTERVAL,
+    p_from TIMESTAMP WITH TIME ZONE,
+    p_to TIMESTAMP WITH TIME ZONE
+) RETURNS INTEGER AS $$
+DECLARE
+    v_unit TEXT := CASE WHEN p_interval = INTERVAL '1 week' THEN 'week' ELSE 'day' END;
+    v_start TIMESTAMP WITH TIME ZONE;
+    v_end TIMESTAMP WITH TIME ZONE;
+    v_partition TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    -- Only the range-partitioned tables can be maintained, since the function runs as their owner
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_catalog.pg_partitioned_table
+        WHERE partrelid = to_regclass(format('public.%I', p_table)) AND partstrat = 'r'
+    ) THEN
+        RAISE EXCEPTION 'public.% is not a range-partitioned table', p_table;
+    END IF;
+
+    -- Serialize the maintenance of a table between worker processes
+    PERFORM pg_advisory_xact_lock(hashtext('time_partitions:' || p_table));
+
+    v_start := date_trunc(v_unit, p_from);
+    WHILE v_start < p_to LOOP
+        v_end := v_start + p_interval;
+        v_partition := format('%s_p%s', p_table, to_char(v_start, 'YYYYMMDD'));
+
+        IF to_regclass(format('public.%I', v_partition)) IS NULL THEN
+            -- A partition cannot be attached over rows of the default partition, so they are moved first
+            EXECUTE format('CREATE TABLE public.%I (LIKE public.%I INCLUDING DEFAULTS)', v_partition, p_table);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM public.%I WHERE timestamp >= $1 AND timestamp < $2 RETURNING *) '
+                'INSERT INTO public.%I SELECT * FROM moved',
+                p_table || '_default', v_partition
+            ) USING v_start, v_end;
+            EXECUTE format(
+                'ALTER TABLE public.%I ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+                p_table, v_partition, v_start, v_end
+            );
+            v_created := v_created + 1;
+        END IF;
+
+        v_start := v_end;
+    END LOOP;
+
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = pg_catalog, public, pg_temp SET timezone = 'UTC';
+
+-- Detach and drop the partitions whose whole range is older than a cutoff, returning the number of dropped rows
+CREATE OR REPLACE FUNCTION public.drop_time_partitions(
+    p_table TEXT,
+    p_before TIMESTAMP WITH TIME ZONE
+) RETURNS BIGINT AS $$
+DECLARE
+    v_partition RECORD;
+    v_rows BIGINT;
+    v_dropped BIGINT := 0;
+BEGIN
+    -- Only the range-partitioned tables can be maintained, since the function runs as their owner
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_catalog.pg_partitioned_table
+        WHERE partrelid = to_regclass(format('public.%I', p_table)) AND partstrat = 'r'
+    ) THEN
+        RAISE EXCEPTION 'public.% is not a range-partitioned table', p_table;
+    END IF;
+
+    -- Serialize the maintenance of a table between worker processes
+    PERFORM pg_advisory_xact_lock(hashtext('time_partitions:' || p_table));
+
+    FOR v_partition IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = format('public.%I', p_table)::regclass
+        AND substring(pg_get_expr(c.relpartbound, c.oid) FROM 'TO \(''([^'']+)''\)')::TIMESTAMP WITH TIME ZONE <= p_before
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('SELECT COUNT(*) FROM public.%I', v_partition.relname) INTO v_rows;
+        EXECUTE format('ALTER TABLE public.%I DETACH PARTITION public.%I', p_table, v_partition.relname);
+        EXECUTE format('DROP TABLE public.%I', v_partition.relname);
+        v_dropped := v_dropped + v_rows;
+    END LOOP;
+
+    -- Old rows that ended up in the default partition are few, and deleted
+    EXECUTE format('DELETE FROM public.%I WHERE timestamp < $1', p_table || '_default') USING p_before;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    RETURN v_dropped + v_rows;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = pg_catalog, public, pg_temp SET timezone = 'UTC';
+
+ALTER FUNCTION public.create_time_partitions(TEXT, INTERVAL, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE) OWNER TO ps_user;
+ALTER FUNCTION public.drop_time_partitions(TEXT, TIMESTAMP WITH TIME ZONE) OWNER TO ps_user;
+
+-- The functions run as their owner, so only the application role may call them
+REVOKE EXECUTE ON FUNCTION public.create_time_partitions(TEXT, INTERVAL, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION public.drop_time_partitions(TEXT, TIMESTAMP WITH TIME ZONE) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION public.create_time_partitions(TEXT, INTERVAL, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE) TO acc_user;
+GRANT EXECUTE ON FUNCTION public.drop_time_partitions(TEXT, TIMESTAMP WITH TIME ZONE) TO acc_user;
+
+-- Rebuild timeseries_data, keeping its sequence
+ALTER TABLE public.timeseries_data RENAME TO timeseries_data_unpartitioned;
+ALTER TABLE public.timeseries_data_unpartitioned RENAME CONSTRAINT timeseries_data_pkey TO timeseries_data_unpartitioned_pkey;
+ALTER TABLE public.timeseries_data_unpartitioned RENAME CONSTRAINT timeseries_data_metric_id_fkey TO timeseries_data_unpartitioned_metric_id_fkey;
+DROP INDEX IF EXISTS public.idx_timeseries_data_metric_id;
+DROP INDEX IF EXISTS public.idx_timeseries_data_timestamp;
+DROP INDEX IF EXISTS public.idx_timeseries_data_entity;
+DROP INDEX IF EXISTS public.idx_timeseries_data_owner_id;
+
+CREATE TABLE public.timeseries_data
+(
+    id BIGINT NOT NULL DEFAULT nextval('public.timeseries_data_id_seq'), -- Auto-incrementing ID
+    metric_id INTEGER NOT NULL REFERENCES public.metrics_definitions(id), -- Metric ID (Foreign Key)
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,                     -- Timestamp of the measurement
+    value_float DOUBLE PRECISION,                                    -- Float value (for float metrics)
+    value_int BIGINT,                                                -- Integer value (for integer metrics)
+    value_bool BOOLEAN,                                              -- Boolean value (for boolean metrics)
+    value_text TEXT,                                                 -- Text value (for string metrics)
+    entity_type VARCHAR(50),                                         -- Entity type (e.g., 'vm', 'account', 'system')
+    entity_id VARCHAR(100),                                          -- Entity ID (e.g., VM ID, account ID)
+    owner_id INTEGER,                                                -- Owner ID for RLS
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,   -- Creation timestamp
+    PRIMARY KEY (id, timestamp)                                      -- Primary Key, including the partition key
+) PARTITION BY RANGE (timestamp);
+
+ALTER TABLE public.timeseries_data OWNER TO ps_user;
+ALTER SEQUENCE public.timeseries_data_id_seq OWNED BY public.timeseries_data.id;
+
+CREATE TABLE public.timeseries_data_default PARTITION OF public.timeseries_data DEFAULT;
+SELECT public.create_time_partitions(
+    'timeseries_data', INTERVAL '1 day',
+    GREATEST((SELECT MIN(timestamp) FROM public.timeseries_data_unpartitioned), CURRENT_TIMESTAMP - INTERVAL '30 days'),
+    CURRENT_TIMESTAMP + INTERVAL '7 days'
+);
+
+INSERT INTO public.timeseries_data
+    (id, metric_id, timestamp, value_float, value_int, value_bool, value_text, entity_type, entity_id, owner_id, created_at)
+SELECT id, metric_id, timestamp, value_float, value_int, value_bool, value_text, entity_type, entity_id, owner_id, created_at
+FROM public.timeseries_data_unpartitioned;
+
+DROP TABLE public.timeseries_data_unpartitioned;
+
+CREATE INDEX idx_timeseries_data_metric_id ON public.timeseries_data(metric_id);
+CREATE INDEX idx_timeseries_data_timestamp ON public.timeseries_data(timestamp);
+CREATE INDEX idx_timeseries_data_entity ON public.timeseries_data(entity_type, entity_id);
+CREATE INDEX idx_timeseries_data_owner_id ON public.timeseries_data(owner_id);
+
+-- The copied rows are not late data, so the trigger is only created now
+CREATE TRIGGER timeseries_data_mark_late
+    AFTER INSERT ON public.timeseries_data
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION public.mark_late_timeseries_data();
+
+ALTER TABLE public.timeseries_data ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY timeseries_data_user_policy ON public.timeseries_data
+    USING (owner_id IS NULL OR
+           owner_id = current_setting('app.current_user_id')::INTEGER OR
+           current_setting('app.current_user_role')::TEXT = 'admin')
+    WITH CHECK (owner_id = current_setting('app.current_user_id')::INTEGER OR
+                current_setting('app.current_user_role')::TEXT = 'admin');
+
+GRANT ALL ON TABLE public.timeseries_data TO acc_user;
+GRANT ALL ON TABLE public.timeseries_data TO ps_user;
+
+-- Rebuild logs, keeping its sequence. The logs_with_rls view is recreated on the new table.
+DROP VIEW IF EXISTS public.logs_with_rls;
+
+ALTER TABLE public.logs RENAME TO logs_unpartitioned;
+ALTER TABLE public.logs_unpartitioned RENAME CONSTRAINT logs_pkey TO logs_unpartitioned_pkey;
+ALTER TABLE public.logs_unpartitioned RENAME CONSTRAINT logs_category_id_fkey TO logs_unpartitioned_category_id_fkey;
+ALTER TABLE public.logs_unpartitioned RENAME CONSTRAINT logs_source_id_fkey TO logs_unpartitioned_source_id_fkey;
+ALTER TABLE public.logs_unpartitioned RENAME CONSTRAINT logs_level_id_fkey TO logs_unpartitioned_level_id_fkey;
+DROP INDEX IF EXISTS public.idx_logs_timestamp;
+DROP INDEX IF EXISTS public.idx_logs_category_id;
+DROP INDEX IF EXISTS public.idx_logs_source_id;
+DROP INDEX IF EXISTS public.idx_logs_level_id;
+DROP INDEX IF EXISTS public.idx_logs_entity;
+DROP INDEX IF EXISTS public.idx_logs_user_id;
+DROP INDEX IF EXISTS public.idx_logs_owner_id;
+DROP INDEX IF EXISTS public.idx_logs_trace_id;
+DROP INDEX IF EXISTS public.idx_logs_message_text;
+DROP INDEX IF EXISTS public.idx_logs_details;
+
+CREATE TABLE public.logs
+(
+    id BIGINT NOT NULL DEFAULT nextval('public.logs_id_seq'),        -- Auto-incrementing ID
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,                     -- Timestamp of the log entry
+    category_id INTEGER REFERENCES public.logs_categories(id),       -- Category ID (Foreign Key)
+    source_id INTEGER REFERENCES public.logs_sources(id),            -- Source ID (Foreign Key)
+    level_id INTEGER REFERENCES public.logs_levels(id),              -- Level ID (Foreign Key)
+    message TEXT NOT NULL,                                           -- Log message
+    details JSONB,                                                   -- Additional details in JSON format
+    entity_type VARCHAR(50),                                         -- Entity type (e.g., 'vm', 'account', 'system')
+    entity_id VARCHAR(100),                                          -- Entity ID (e.g., VM ID, account ID)
+    user_id INTEGER,                                                 -- User ID associated with the log
+    owner_id INTEGER,                                                -- Owner ID for RLS
+    trace_id VARCHAR(100),                                           -- Trace ID for distributed tracing
+    span_id VARCHAR(100),                                            -- Span ID for distributed tracing
+    parent_span_id VARCHAR(100),                                     -- Parent Span ID for distributed tracing
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,   -- Creation timestamp
+    PRIMARY KEY (id, timestamp)                                      -- Primary Key, including the partition key
+) PARTITION BY RANGE (timestamp);
+
+ALTER TABLE public.logs OWNER TO ps_user;
+ALTER SEQUENCE public.logs_id_seq OWNED BY public.logs.id;
+
+CREATE TABLE public.logs_default PARTITION OF public.logs DEFAULT;
+SELECT public.create_time_partitions(
+    'logs', INTERVAL '1 week',
+    GREATEST((SELECT MIN(timestamp) FROM public.logs_unpartitioned), CURRENT_TIMESTAMP - INTERVAL '730 days'),
+    CURRENT_TIMESTAMP + INTERVAL '28 days'
+);
+
+INSERT INTO public.logs
+    (id, timestamp, category_id, source_id, level_id, message, details, entity_type, entity_id,
+     user_id, owner_id, trace_id, span_id, parent_span_id, created_at)
+SELECT id, timestamp, category_id, source_id, level_id, message, details, entity_type, entity_id,
+       user_id, owner_id, trace_id, span_id, parent_span_id, created_at
+FROM public.logs_unpartitioned;
+
+DROP TABLE public.logs_unpartitioned;
+
+CREATE INDEX idx_logs_timestamp ON public.logs(timestamp, id);
+CREATE INDEX idx_logs_category_id ON public.logs(category_id);
+CREATE INDEX idx_logs_source_id ON public.logs(source_id);
+CREATE INDEX idx_logs_level_id ON public.logs(level_id);
+CREATE INDEX idx_logs_entity ON public.logs(entity_type, entity_id);
+CREATE INDEX idx_logs_user_id ON public.logs(user_id);
+CREATE INDEX idx_logs_owner_id ON public.logs(owner_id);
+CREATE INDEX idx_logs_trace_id ON public.logs(trace_id);
+CREATE INDEX idx_logs_message_text ON public.logs USING gin(to_tsvector('english', message));
+CREATE INDEX idx_logs_details ON public.logs USING gin(details);
+
+ALTER TABLE public.logs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.logs FORCE ROW LEVEL SECURITY;
+
+CREATE POLICY logs_admin_policy ON public.logs
+    FOR ALL
+    TO PUBLIC
+    USING (current_setting('app.current_user_role', TRUE) = 'admin');
+
+CREATE POLICY logs_user_policy ON public.logs
+    FOR ALL
+    TO PUBLIC
+    USING (owner_id = current_setting('app.current_user_id', TRUE)::INTEGER OR
+           current_setting('app.current_user_role', TRUE)::TEXT = 'admin');
+
+CREATE OR REPLACE VIEW public.logs_with_rls AS
+SELECT * FROM public.logs
+WHERE
+    current_setting('app.current_user_role', TRUE) = 'admin'
+    OR owner_id = current_setting('app.current_user_id', TRUE)::INTEGER;
+
+GRANT ALL ON TABLE public.logs TO acc_user;
+GRANT ALL ON TABLE public.logs TO ps_user;
+
+-- Create function to clean up old logs based on retention policies. The partitions past the
+-- longest retention period are dropped whole; the shorter policies delete their rows from the
+-- remaining partitions.
+CREATE OR REPLACE FUNCTION cleanup_old_logs()
+RETURNS INTEGER AS $$
+DECLARE
+    deleted_count BIGINT := 0;
+    policy_count BIGINT;
+    max_retention_days INTEGER;
+    policy RECORD;
+BEGIN
+    SELECT MAX(retention_days) INTO max_retention_days FROM public.logs_retention_policies;
+
+    IF max_retention_days IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    deleted_count := public.drop_time_partitions('logs', CURRENT_TIMESTAMP - (max_retention_days || ' days')::INTERVAL);
+
+    -- Process each shorter retention policy
+    FOR policy IN
+        SELECT
+            category_id,
+            source_id,
+            level_id,
+            retention_days
+        FROM
+            public.logs_retention_policies
+        WHERE
+            retention_days < max_retention_days
+    LOOP
+        DELETE FROM public.logs
+        WHERE timestamp < (CURRENT_TIMESTAMP - (policy.retention_days || ' days')::INTERVAL)
+        AND (policy.category_id IS NULL OR category_id = policy.category_id)
+        AND (policy.source_id IS NULL OR source_id = policy.source_id)
+        AND (policy.level_id IS NULL OR level_id = policy.level_id);
+
+        -- Add to the total count
+        GET DIAGNOSTICS policy_count = ROW_COUNT;
+        deleted_count := deleted_count + policy_count;
+    END LOOP;
+
+    RETURN deleted_count;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,65 @@
+-- Migration script to add the latest value of every timeseries series
+--
+-- Runs after 20261016_03_deduplicate_global_timeseries.sql, so the latest values are
+-- taken from timeseries_data once the per-user copies of global metrics are removed
+
+BEGIN;
+
+-- The unique index of the upsert treats NULL entities and owners as equal with
+-- NULLS NOT DISTINCT, which needs PostgreSQL 15 or later
+DO $$
+BEGIN
+    IF current_setting('server_version_num')::integer < 150000 THEN
+        RAISE EXCEPTION 'PostgreSQL 15 or later is required, found %', current_setting('server_version');
+    END IF;
+END
+$$;
+
+-- Create timeseries_latest table to keep the latest value of every series, upserted along
+-- with the inserts into timeseries_data so that current values are read without a scan
+CREATE TABLE IF NOT EXISTS public.timeseries_latest
+(
+    metric_id INTEGER NOT NULL REFERENCES public.metrics_definitions(id), -- Metric ID (Foreign Key)
+    entity_type VARCHAR(50),                                         -- Entity type (e.g., 'vm', 'account', 'system')
+    entity_id VARCHAR(100),                                          -- Entity ID (e.g., VM ID, account ID)
+    owner_id INTEGER,                                                -- Owner ID for RLS
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,                     -- Timestamp of the latest measurement
+    value_float DOUBLE PRECISION,                                    -- Float value (for float metrics)
+    value_int BIGINT,                                                -- Integer value (for integer metrics)
+    value_bool BOOLEAN,                                              -- Boolean value (for boolean metrics)
+    value_text TEXT,                                                 -- Text value (for string metrics)
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP    -- Update timestamp
+);
+
+-- One latest value per metric and entity/owner series
+CREATE UNIQUE INDEX IF NOT EXISTS idx_timeseries_latest_series ON public.timeseries_latest
+    (metric_id, entity_type, entity_id, owner_id) NULLS NOT DISTINCT;
+
+-- Fill in the latest value of the series in the raw data
+INSERT INTO public.timeseries_latest
+    (metric_id, entity_type, entity_id, owner_id, timestamp, value_float, value_int, value_bool, value_text)
+SELECT DISTINCT ON (metric_id, entity_type, entity_id, owner_id)
+    metric_id, entity_type, entity_id, owner_id, timestamp, value_float, value_int, value_bool, value_text
+FROM public.timeseries_data
+ORDER BY metric_id, entity_type, entity_id, owner_id, timestamp DESC, id DESC
+ON CONFLICT DO NOTHING;
+
+-- Create RLS policies for timeseries_latest
+ALTER TABLE public.timeseries_latest ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS timeseries_latest_user_policy ON public.timeseries_latest;
+CREATE POLICY timeseries_latest_user_policy ON public.timeseries_latest
+    USING (owner_id IS NULL OR
+           owner_id = current_setting('app.current_user_id')::INTEGER OR
+           current_setting('app.current_user_role')::TEXT = 'admin')
+    WITH CHECK (owner_id = current_setting('app.current_user_id')::INTEGER OR
+                current_setting('app.current_user_role')::TEXT = 'admin');
+
+-- Set ownership
+ALTER TABLE public.timeseries_latest OWNER TO ps_user;
+
+-- Grant permissions
+GRANT ALL ON TABLE public.timeseries_latest TO acc_user;
+GRANT ALL ON TABLE public.timeseries_latest TO ps_user;
+
+COMMIT;
@@ -0,0 +1,217 @@
+-- Migration script to store timeseries points by series
+--
+-- A point of timeseries_data used to repeat its metric, entity and owner next to four
+-- typed value columns, a surrogate ID and a creation timestamp, and was covered by four
+-- B-tree indexes. The metric, entity and owner of a point now live once in
+-- timeseries_series, and a point is only its series ID, its timestamp and its value as a
+-- number, indexed by series_id and by a BRIN index on timestamp.
+--
+-- timeseries_data is rebuilt and its rows are copied over, with integer and boolean values
+-- converted to numbers (booleans as 0 or 1). Points without a numeric value (string
+-- metrics) are not copied. timeseries_latest is rebuilt from the copied points. Both tables
+-- are locked while they are copied, so run this during a maintenance window on large
+-- databases.
+
+BEGIN;
+
+-- The unique index of the upsert treats NULL entities and owners as equal with
+-- NULLS NOT DISTINCT, which needs PostgreSQL 15 or later
+DO $$
+BEGIN
+    IF current_setting('server_version_num')::integer < 150000 THEN
+        RAISE EXCEPTION 'PostgreSQL 15 or later is required, found %', current_setting('server_version');
+    END IF;
+END
+$$;
+
+-- Create timeseries_series table to define the series of metric values, one per metric
+-- and entity/owner, so that the points of timeseries_data only reference their series
+CREATE TABLE IF NOT EXISTS public.timeseries_series
+(
+    id SERIAL PRIMARY KEY,                                           -- Auto-incrementing ID (Primary Key)
+    metric_id INTEGER NOT NULL REFERENCES public.metrics_definitions(id), -- Metric ID (Foreign Key)
+    entity_type VARCHAR(50),                                         -- Entity type (e.g., 'vm', 'account', 'system')
+    entity_id VARCHAR(100),                                          -- Entity ID (e.g., VM ID, account ID)
+    owner_id INTEGER,                                                -- Owner ID for RLS
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP    -- Creation timestamp
+);
+
+-- One series per metric and entity/owner
+CREATE UNIQUE INDEX IF NOT EXISTS idx_timeseries_series_key ON public.timeseries_series
+    (metric_id, entity_type, entity_id, owner_id) NULLS NOT DISTINCT;
+
+-- Get the ID of a series, creating it if it does not exist yet
+CREATE OR REPLACE FUNCTION public.get_timeseries_series_id(
+    p_metric_id INTEGER,
+    p_entity_type VARCHAR,
+    p_entity_id VARCHAR,
+    p_owner_id INTEGER
+) RETURNS INTEGER AS $$
+DECLARE
+    v_series_id INTEGER;
+BEGIN
+    INSERT INTO public.timeseries_series (metric_id, entity_type, entity_id, owner_id)
+    VALUES (p_metric_id, p_entity_type, p_entity_id, p_owner_id)
+    ON CONFLICT (metric_id, entity_type, entity_id, owner_id) DO NOTHING
+    RETURNING id INTO v_series_id;
+
+    IF v_series_id IS NULL THEN
+        SELECT id INTO v_series_id
+        FROM public.timeseries_series
+        WHERE metric_id = p_metric_id
+        AND entity_type IS NOT DISTINCT FROM p_entity_type
+        AND entity_id IS NOT DISTINCT FROM p_entity_id
+        AND owner_id IS NOT DISTINCT FROM p_owner_id;
+    END IF;
+
+    RETURN v_series_id;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Create the series of the raw data and of the latest values
+INSERT INTO public.timeseries_series (metric_id, entity_type, entity_id, owner_id)
+SELECT metric_id, entity_type, entity_id, owner_id FROM public.timeseries_data
+UNION
+SELECT metric_id, entity_type, entity_id, owner_id FROM public.timeseries_latest
+ON CONFLICT DO NOTHING;
+
+-- Rebuild timeseries_data. The old partitions are renamed so that the new ones can take their names.
+DROP TRIGGER IF EXISTS timeseries_data_mark_late ON public.timeseries_data;
+DROP INDEX IF EXISTS public.idx_timeseries_data_metric_id;
+DROP INDEX IF EXISTS public.idx_timeseries_data_timestamp;
+DROP INDEX IF EXISTS public.idx_timeseries_data_entity;
+DROP INDEX IF EXISTS public.idx_timeseries_data_owner_id;
+
+ALTER TABLE public.timeseries_data RENAME TO timeseries_data_wide;
+
+DO $$
+DECLARE
+    v_partition RECORD;
+BEGIN
+    FOR v_partition IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public.timeseries_data_wide'::regclass
+    LOOP
+        EXECUTE format(
+            'ALTER TABLE public.%I RENAME TO %I',
+            v_partition.relname, 'timeseries_data_wide_' || substring(v_partition.relname FROM 17)
+        );
+    END LOOP;
+END $$;
+
+-- Points are stored as the value of their series at a timestamp; integer and boolean
+-- metrics are stored as numbers (booleans as 0 or 1)
+CREATE TABLE public.timeseries_data
+(
+    series_id INTEGER NOT NULL REFERENCES public.timeseries_series(id), -- Series ID (Foreign Key)
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,                     -- Timestamp of the measurement
+    value DOUBLE PRECISION NOT NULL                                  -- Measured value
+) PARTITION BY RANGE (timestamp);
+
+ALTER TABLE public.timeseries_data OWNER TO ps_user;
+
+CREATE TABLE public.timeseries_data_default PARTITION OF public.timeseries_data DEFAULT;
+SELECT public.create_time_partitions(
+    'timeseries_data', INTERVAL '1 day',
+    GREATEST((SELECT MIN(timestamp) FROM public.timeseries_data_wide), CURRENT_TIMESTAMP - INTERVAL '30 days'),
+    CURRENT_TIMESTAMP + INTERVAL '7 days'
+);
+
+-- The series are matched on their key with NULLs replaced, so that the join can be hashed
+INSERT INTO public.timeseries_data (series_id, timestamp, value)
+SELECT s.id, d.timestamp, COALESCE(d.value_float, d.value_int::float, d.value_bool::int::float)
+FROM public.timeseries_data_wide d
+JOIN public.timeseries_series s
+ON s.metric_id = d.metric_id
+AND COALESCE(s.entity_type, '') = COALESCE(d.entity_type, '')
+AND COALESCE(s.entity_id, '') = COALESCE(d.entity_id, '')
+AND COALESCE(s.owner_id, 0) = COALESCE(d.owner_id, 0)
+AND s.entity_type IS NOT DISTINCT FROM d.entity_type
+AND s.entity_id IS NOT DISTINCT FROM d.entity_id
+AND s.owner_id IS NOT DISTINCT FROM d.owner_id
+WHERE COALESCE(d.value_float, d.value_int::float, d.value_bool::int::float) IS NOT NULL
+ORDER BY d.timestamp;
+
+DROP TABLE public.timeseries_data_wide;
+
+-- Create indexes on timeseries_data: the points of a series, whose duplicate keys are
+-- deduplicated into posting lists, and a BRIN index for scans of a time range, which is
+-- tiny since points are inserted in time order. Reads of a series are pruned to the daily
+-- partitions of their range before either index is used.
+CREATE INDEX idx_timeseries_data_series ON public.timeseries_data(series_id);
+CREATE INDEX idx_timeseries_data_timestamp ON public.timeseries_data USING brin(timestamp);
+
+-- The copied rows are not late data, so the trigger is only created now
+CREATE TRIGGER timeseries_data_mark_late
+    AFTER INSERT ON public.timeseries_data
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION public.mark_late_timeseries_data();
+
+-- Rebuild timeseries_latest from the copied points
+DROP TABLE IF EXISTS public.timeseries_latest;
+
+CREATE TABLE public.timeseries_latest
+(
+    series_id INTEGER PRIMARY KEY REFERENCES public.timeseries_series(id), -- Series ID (Primary Key)
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,                     -- Timestamp of the latest measurement
+    value DOUBLE PRECISION NOT NULL,                                 -- Latest measured value
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP    -- Update timestamp
+);
+
+INSERT INTO public.timeseries_latest (series_id, timestamp, value)
+SELECT DISTINCT ON (series_id) series_id, timestamp, value
+FROM public.timeseries_data
+ORDER BY series_id, timestamp DESC;
+
+-- Create RLS policies
+ALTER TABLE public.timeseries_series ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.timeseries_data ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.timeseries_latest ENABLE ROW LEVEL SECURITY;
+
+-- Series without an owner are system-wide, readable by every user and written by admins
+DROP POLICY IF EXISTS timeseries_series_user_policy ON public.timeseries_series;
+CREATE POLICY timeseries_series_user_policy ON public.timeseries_series
+    USING (owner_id IS NULL OR
+           owner_id = current_setting('app.current_user_id')::INTEGER OR
+           current_setting('app.current_user_role')::TEXT = 'admin')
+    WITH CHECK (owner_id = current_setting('app.current_user_id')::INTEGER OR
+                current_setting('app.current_user_role')::TEXT = 'admin');
+
+-- Points are visible with their series, and written to the series the user can write
+CREATE POLICY timeseries_data_user_policy ON public.timeseries_data
+    USING (series_id IN (SELECT id FROM public.timeseries_series))
+    WITH CHECK (series_id IN (
+        SELECT id FROM public.timeseries_series
+        WHERE owner_id = current_setting('app.current_user_id')::INTEGER OR
+              current_setting('app.current_user_role')::TEXT = 'admin'
+    ));
+
+CREATE POLICY timeseries_latest_user_policy ON public.timeseries_latest
+    USING (series_id IN (SELECT id FROM public.timeseries_series))
+    WITH CHECK (series_id IN (
+        SELECT id FROM public.timeseries_series
+        WHERE owner_id = current_setting('app.current_user_id')::INTEGER OR
+              current_setting('app.current_user_role')::TEXT = 'admin'
+    ));
+
+-- Set ownership
+ALTER TABLE public.timeseries_series OWNER TO ps_user;
+ALTER TABLE public.timeseries_latest OWNER TO ps_user;
+
+-- Grant permissions
+GRANT ALL ON TABLE public.timeseries_series TO acc_user;
+GRANT ALL ON TABLE public.timeseries_data TO acc_user;
+GRANT ALL ON TABLE public.timeseries_latest TO acc_user;
+
+GRANT ALL ON TABLE public.timeseries_series TO ps_user;
+GRANT ALL ON TABLE public.timeseries_data TO ps_user;
+GRANT ALL ON TABLE public.timeseries_latest TO ps_user;
+
+-- Grant sequence permissions
+GRANT USAGE, SELECT ON SEQUENCE timeseries_series_id_seq TO acc_user;
+GRANT USAGE, SELECT ON SEQUENCE timeseries_series_id_seq TO ps_user;
+
+COMMIT;
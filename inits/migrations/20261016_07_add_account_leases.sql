@@ -0,0 +1,26 @@
+-- Migration script to lease fresh accounts with an expiry instead of locking them for good
+
+BEGIN;
+
+-- A lease locks an account until it is released or expires without being renewed
+ALTER TABLE public.accounts ADD COLUMN IF NOT EXISTS lease_id uuid;
+ALTER TABLE public.accounts ADD COLUMN IF NOT EXISTS lease_expires_at timestamp with time zone;
+
+COMMENT ON COLUMN public.accounts.lease_id IS 'Lease holding the lock of the account';
+COMMENT ON COLUMN public.accounts.lease_expires_at IS 'When the lease expires unless renewed';
+
+-- Accounts available for leasing, in the order they are leased
+CREATE INDEX IF NOT EXISTS idx_accounts_fresh ON public.accounts (id)
+    WHERE prime = false AND lock = false AND perm_lock = false;
+CREATE INDEX IF NOT EXISTS idx_accounts_lease_id ON public.accounts (lease_id) WHERE lease_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_accounts_lease_expires_at ON public.accounts (lease_expires_at)
+    WHERE lease_expires_at IS NOT NULL;
+
+-- Include the new columns in the RLS view
+CREATE OR REPLACE VIEW public.accounts_with_rls AS
+SELECT * FROM public.accounts
+WHERE
+    current_setting('app.current_user_role', TRUE) = 'admin'
+    OR owner_id = current_setting('app.current_user_id', TRUE)::INTEGER;
+
+COMMIT;
@@ -0,0 +1,20 @@
+-- Migration script to index the orderings of the keyset-paginated listings, by their sort
+-- column and then by the unique column that breaks the ties between pages
+
+BEGIN;
+
+-- Accounts, by username, email address or creation time and then by acc_id
+DROP INDEX IF EXISTS public.idx_accounts_username;
+CREATE INDEX idx_accounts_username ON public.accounts (acc_username, acc_id);
+
+DROP INDEX IF EXISTS public.idx_accounts_email;
+CREATE INDEX idx_accounts_email ON public.accounts (acc_email_address, acc_id);
+
+DROP INDEX IF EXISTS public.idx_accounts_acc_created_at;
+CREATE INDEX IF NOT EXISTS idx_accounts_acc_created_at_acc_id ON public.accounts (acc_created_at, acc_id);
+
+-- Logs, newest first and then by id; the index is created on every partition
+DROP INDEX IF EXISTS public.idx_logs_timestamp;
+CREATE INDEX idx_logs_timestamp ON public.logs (timestamp, id);
+
+COMMIT;
@@ -41,14 +41,11 @@ BEGIN
                     -- Insert some sample data points
                     FOR i IN 0..6 LOOP
                         INSERT INTO public.timeseries_data (
-                            metric_id, timestamp, value_float, entity_type, entity_id, owner_id
+                            series_id, timestamp, value
                         ) VALUES (
-                            v_metric_id, 
+                            public.get_timeseries_series_id(v_metric_id, 'system', 'system', admin_id), 
                             NOW() - ((6-i) || ' days')::INTERVAL, 
-                            FLOOR(RANDOM() * 10), 
-                            'system', 
-                            'system', 
-                            admin_id
+                            FLOOR(RANDOM() * 10)
                         );
                     END LOOP;
                 END;
@@ -65,14 +62,11 @@ BEGIN
                     -- Insert some sample data points
                     FOR i IN 0..6 LOOP
                         INSERT INTO public.timeseries_data (
-                            metric_id, timestamp, value_float, entity_type, entity_id, owner_id
+                            series_id, timestamp, value
                         ) VALUES (
-                            v_metric_id, 
+                            public.get_timeseries_series_id(v_metric_id, 'system', 'system', user_id), 
                             NOW() - ((6-i) || ' days')::INTERVAL, 
-                            FLOOR(RANDOM() * 5), 
-                            'system', 
-                            'system', 
-                            user_id
+                            FLOOR(RANDOM() * 5)
                         );
                     END LOOP;
                 END;
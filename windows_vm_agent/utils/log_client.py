@@ -7,6 +7,7 @@ This module provides a client for sending logs to the central log storage system
 import logging
 import requests
 import json
+import gzip
 import socket
 import platform
 import threading
@@ -17,10 +18,23 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Default batching of queued logs: a batch is sent when it reaches either size,
+# or when its oldest entry has waited for the flush interval
+DEFAULT_MAX_BATCH_SIZE = 500
+DEFAULT_MAX_BATCH_BYTES = 256 * 1024
+DEFAULT_FLUSH_INTERVAL = 2.0  # seconds
+
+# Time to wait before trying the batch endpoint again after the server answered 404
+DEFAULT_BATCH_RETRY_INTERVAL = 300.0  # seconds
+
 class LogClient:
     """Client for sending logs to the central log storage system."""
 
-    def __init__(self, api_url: str, api_key: str, vm_identifier: str):
+    def __init__(self, api_url: str, api_key: str, vm_identifier: str,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 batch_retry_interval: float = DEFAULT_BATCH_RETRY_INTERVAL):
         """
         Initialize the log client.
 
@@ -28,10 +42,23 @@ class LogClient:
             api_url: Base URL of the API.
             api_key: API key for authentication.
             vm_identifier: Identifier for this VM.
+            max_batch_size: Maximum number of log entries sent in one request.
+            max_batch_bytes: Maximum size of the JSON body of one request, before compression.
+            flush_interval: Maximum time in seconds a queued log entry waits before it is sent.
+            batch_retry_interval: Time in seconds logs are sent one by one after the batch
+                endpoint answered 404, before it is tried again.
         """
         self.api_url = api_url.rstrip('/')
         self.api_key = api_key
         self.vm_identifier = vm_identifier
+        self.max_batch_size = max_batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.flush_interval = flush_interval
+        self.batch_retry_interval = batch_retry_interval
+
+        # Servers without the batch endpoint get the logs one by one until this time,
+        # so a server that is upgraded or was briefly misrouted gets batches again
+        self._batch_endpoint_retry_at = 0.0
         self.hostname = socket.gethostname()
         self.session = requests.Session()
         self.session.headers.update({
@@ -63,28 +90,34 @@ class LogClient:
         """Process the log queue in a background thread."""
         logger.info("Starting log queue processing thread")
 
+        # Log entries are serialized once, when they are added to the batch
+        batch = []
+        batch_bytes = 0
+        batch_started = 0.0
+
         try:
             while self._log_thread_running:
                 try:
-                    # Get a batch of log entries (up to 10)
-                    batch = []
                     try:
-                        while len(batch) < 10:
-                            # Get an item with a timeout to allow thread to exit
-                            item = self._log_queue.get(timeout=0.1)
-                            batch.append(item)
-                            self._log_queue.task_done()
+                        # Get an item with a timeout to allow thread to exit and flush on time
+                        item = self._log_queue.get(timeout=0.1)
+                        self._log_queue.task_done()
+
+                        if not batch:
+                            batch_started = time.time()
+                        batch.append(json.dumps(item))
+                        batch_bytes += len(batch[-1]) + 1
                     except queue.Empty:
                         # No more items in the queue
                         pass
 
-                    # If batch is empty, continue
-                    if not batch:
-                        time.sleep(1)
-                        continue
-
-                    # Process the batch
-                    self._send_logs_batch(batch)
+                    # Send the batch when it is full or its oldest entry has waited long enough
+                    if batch and (len(batch) >= self.max_batch_size
+                                  or batch_bytes >= self.max_batch_bytes
+                                  or time.time() - batch_started >= self.flush_interval):
+                        self._send_serialized_batch(batch)
+                        batch = []
+                        batch_bytes = 0
 
                 except Exception as e:
                     logger.error(f"Error in log queue processing thread: {e}")
@@ -94,13 +127,79 @@ class LogClient:
             logger.error(f"Fatal error in log queue processing thread: {e}")
 
         finally:
+            # Send what was collected before stopping
+            if batch:
+                self._send_serialized_batch(batch)
             logger.info("Log queue processing thread stopped")
             self._log_thread_running = False
 
+    def _get_logs_url(self, path: str = "logs") -> str:
+        """
+        Get the URL of a log endpoint, with the API key as query parameter.
+
+        Args:
+            path: The path of the endpoint below /windows-vm-agent/.
+
+        Returns:
+            The URL of the endpoint.
+        """
+        return f"{self.api_url}/windows-vm-agent/{path}?api_key={self.api_key}"
+
     def _send_logs_batch(self, logs: List[Dict[str, Any]]) -> None:
         """
         Send a batch of logs to the central log storage system.
 
+        Args:
+            logs: List of log entries to send.
+        """
+        for start in range(0, len(logs), self.max_batch_size):
+            self._send_serialized_batch([json.dumps(log_entry) for log_entry in logs[start:start + self.max_batch_size]])
+
+    def _send_serialized_batch(self, batch: List[str]) -> None:
+        """
+        Send a batch of serialized log entries in one gzip-compressed request.
+
+        The server authenticates the batch once and inserts all entries in one statement.
+        If the server has no batch endpoint, the entries are sent one by one,
+        and the batch endpoint is tried again after batch_retry_interval seconds.
+
+        Args:
+            batch: The log entries, each serialized as JSON.
+        """
+        if time.time() < self._batch_endpoint_retry_at:
+            self._send_logs_individually([json.loads(log_entry) for log_entry in batch])
+            return
+
+        try:
+            body = gzip.compress(("[" + ",".join(batch) + "]").encode("utf-8"))
+            url = self._get_logs_url("logs/batch")
+
+            logger.debug(f"Sending {len(batch)} logs ({len(body)} bytes compressed) to central storage")
+
+            response = self.session.post(
+                url,
+                params={"vm_id": self.vm_identifier},
+                data=body,
+                headers={"Content-Encoding": "gzip"}
+            )
+
+            if response.status_code == 404:
+                # Older servers only have the single log endpoint
+                logger.info(f"Batch log endpoint not available, sending logs one by one "
+                            f"for {self.batch_retry_interval:.0f} seconds")
+                self._batch_endpoint_retry_at = time.time() + self.batch_retry_interval
+                self._send_logs_individually([json.loads(log_entry) for log_entry in batch])
+            elif response.status_code != 200 and response.status_code != 201:
+                logger.error(f"Failed to send {len(batch)} logs to central storage: {response.status_code} {response.text}")
+            else:
+                logger.debug(f"Successfully sent {len(batch)} logs to central storage: {response.status_code}")
+        except Exception as e:
+            logger.error(f"Error sending log batch to central storage: {e}")
+
+    def _send_logs_individually(self, logs: List[Dict[str, Any]]) -> None:
+        """
+        Send log entries to the central log storage system one request at a time.
+
         Args:
             logs: List of log entries to send.
         """
@@ -116,7 +215,6 @@ class LogClient:
 
             logger.info(f"Sending logs to URL: {url}")
 
-            # Send each log individually (could be optimized with a batch endpoint)
             for log_entry in logs:
                 try:
                     # Log the request details for debugging